@@ -0,0 +1,205 @@
+#! /usr/bin/env python
+"""Report how long each git-commands entry point takes to import, in the style of `python -X importtime`.
+
+Every entry point is loaded in a fresh interpreter with its main() left uncalled, so the report covers only what it
+costs to start before doing any work. Each line is an import statement that loaded new modules: the time spent in it
+excluding nested imports, the time including them, and the modules it loaded, indented by nesting.
+
+    python benchmarks/imports.py
+    python benchmarks/imports.py --commands git-upstream git-changes --tree
+    python benchmarks/imports.py --output imports.json --compare baseline.json
+
+Python 2 has no -X importtime so imports are timed by wrapping __import__.
+"""
+
+from __future__ import print_function
+
+import __builtin__
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_BIN = os.path.join(_ROOT, 'bin')
+_VERSION = 1
+
+_NOISE_FLOOR_MS = 2.0
+
+
+def _entry_points():
+    return sorted(name for name in os.listdir(_BIN) if name.startswith('git-') and os.path.isfile(os.path.join(_BIN, name)))
+
+
+class _ImportTimer(object):
+    """Times every import statement that loads a module."""
+
+    def __init__(self):
+        self.records = []
+        self._nested = []
+        self._original = __builtin__.__import__
+
+    def __enter__(self):
+        __builtin__.__import__ = self._import
+        return self
+
+    def __exit__(self, *exc_info):
+        __builtin__.__import__ = self._original
+
+    def _import(self, name, *args, **kwargs):
+        before = set(sys.modules)
+        depth = len(self._nested)
+        self._nested.append([0.0, set()])
+        start = time.time()
+        try:
+            return self._original(name, *args, **kwargs)
+        finally:
+            elapsed = time.time() - start
+            nested_time, nested_modules = self._nested.pop()
+            # implicit relative imports leave None behind for every name that wasn't found relatively
+            loaded = set(module for module in set(sys.modules) - before if sys.modules[module] is not None)
+            if self._nested:
+                self._nested[-1][0] += elapsed
+                self._nested[-1][1].update(loaded)
+            own = loaded - nested_modules
+            if own:
+                self.records.append({
+                    'modules': sorted(own),
+                    'self_us': int((elapsed - nested_time) * 1e6),
+                    'cumulative_us': int(elapsed * 1e6),
+                    'depth': depth
+                })
+
+
+def _child(path):
+    """Load an entry point without running it and print its import records as JSON."""
+
+    sys.path.insert(0, os.path.dirname(path))
+    sys.argv = [path]
+    with open(path) as script:
+        code = compile(script.read(), path, 'exec', dont_inherit=True)
+
+    with _ImportTimer() as timer:
+        start = time.time()
+        exec code in {'__name__': '__imports__', '__file__': path}
+        total = time.time() - start
+    json.dump({'total_us': int(total * 1e6), 'modules': len(sys.modules), 'records': timer.records}, sys.stdout)
+
+
+def _load(name):
+    """Load an entry point in a fresh interpreter.
+
+    :return dict: its total import time, the number of modules loaded, and the import records
+    """
+
+    # compiling sources would dwarf the imports themselves, so bytecode is written as an installed copy would
+    env = dict((key, value) for key, value in os.environ.items() if key != 'PYTHONDONTWRITEBYTECODE')
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child', os.path.join(_BIN, name)], env=env)
+    return json.loads(output)
+
+
+def _stats(samples):
+    ordered = sorted(samples)
+    middle = len(ordered) // 2
+    median = ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2.0
+    return {'min_ms': round(ordered[0], 2), 'median_ms': round(median, 2), 'max_ms': round(ordered[-1], 2), 'samples': len(ordered)}
+
+
+def measure(name, repeat):
+    """Load an entry point repeatedly, keeping the records of the run closest to the median.
+
+    :return dict: stats for the total import time, the modules loaded, and the import records
+    """
+
+    _load(name)  # warm up the bytecode and the file system cache
+    loads = sorted((_load(name) for _ in range(repeat)), key=lambda load: load['total_us'])
+    representative = loads[len(loads) // 2]
+    return {
+        'import': _stats([load['total_us'] / 1000.0 for load in loads]),
+        'modules': representative['modules'],
+        'records': representative['records']
+    }
+
+
+def print_tree(name, result):
+    """Print the import records of an entry point the way -X importtime does."""
+
+    print('\n{}'.format(name))
+    print('import time: {:>9} | {:>10} | {}'.format('self [us]', 'cumulative', 'imported package'))
+    for record in result['records']:
+        print('import time: {:>9} | {:>10} | {}{}'.format(
+            record['self_us'], record['cumulative_us'], '  ' * record['depth'], ', '.join(record['modules'])
+        ))
+
+
+def compare(results, baseline, threshold):
+    """Print each entry point's import time beside its baseline.
+
+    :param dict results: the current results
+    :param dict baseline: earlier results
+    :param float threshold: the fraction a median may grow by before it counts as a regression
+
+    :return list: the entry points that regressed
+    """
+
+    regressions = []
+    print('\n{:<22} {:>12} {:>12} {:>9}'.format('entry point', 'baseline ms', 'median ms', 'change'))
+    for name, result in sorted(results['results'].items()):
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+
+        before, after = previous['import']['median_ms'], result['import']['median_ms']
+        change = (after - before) / before if before else 0.0
+        regressed = change > threshold and after - before > _NOISE_FLOOR_MS
+        if regressed:
+            regressions.append(name)
+        print('{:<22} {:>12.1f} {:>12.1f} {:>+8.0%}{}'.format(name, before, after, change, '  REGRESSED' if regressed else ''))
+    return regressions
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description='Time how long each git-commands entry point takes to import.')
+    parser.add_argument('--commands', nargs='+', choices=_entry_points(), metavar='COMMAND', help='entry points to load (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='loads of each entry point (default: 5)')
+    parser.add_argument('--tree', action='store_true', help='print every import of each entry point')
+    parser.add_argument('--output', help='write results as JSON to a file')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare against results from an earlier run and exit non-zero on regressions')
+    parser.add_argument('--threshold', type=float, default=0.1, help='median growth counted as a regression (default: 0.1)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    if args.child:
+        _child(args.child)
+        return 0
+
+    results = {'version': _VERSION, 'python': platform.python_version(), 'repeat': args.repeat, 'results': {}}
+    for name in args.commands or _entry_points():
+        result = measure(name, args.repeat)
+        results['results'][name] = result
+        print('{:<22} {:>9.1f} ms  {:>4} modules'.format(name, result['import']['median_ms'], result['modules']), file=sys.stderr)
+        if args.tree:
+            print_tree(name, result)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+            output.write('\n')
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        if regressions:
+            print('\n{} regression(s)'.format(len(regressions)), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
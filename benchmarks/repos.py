@@ -0,0 +1,275 @@
+"""Repeatable synthetic repositories for benchmarking.
+
+Each shape starts from a small base repository and scales up a single dimension so a slowdown can be traced to the
+characteristic that caused it. Every repository is written with `git fast-import` using fixed identities and dates so
+the same shape always produces the same objects.
+
+Every shape has the same layout:
+
+- master: a single commit tracking all files
+- feature: the checked out branch, FEATURE_COMMITS ahead of master and tracking origin/feature
+- origin/master and origin/feature: remote-tracking branches, origin/feature a few commits behind feature
+- bench/*: extra branches pointing at master
+- stashes: each modifying STASH_FILE, which no other commit or the dirty worktree touches
+- [bench "sectionN"]: extra local config keys
+- a dirty worktree: modified files, some of which are staged and then modified again
+"""
+
+import os
+import shutil
+import subprocess
+
+# bump when the generated repositories change so cached copies are rebuilt
+VERSION = 1
+
+FEATURE_COMMITS = 20
+STASH_FILE = 'stash/file.txt'
+
+_FILES_PER_DIRECTORY = 1000
+_KEYS_PER_SECTION = 100
+_IDENTITY = 'Bench <bench@example.com>'
+_EPOCH = 1500000000
+_MARKER = '.git/bench-shape'
+
+BASE = {
+    'files': 1000,
+    'branches': 10,
+    'stashes': 20,
+    'config_keys': 20,
+    'modified': 0,
+    'staged': 0
+}
+
+SHAPES = {
+    'base': {},
+    'files': {'files': 100000},
+    'branches': {'branches': 20000},
+    'stashes': {'stashes': 2000},
+    'config': {'config_keys': 5000},
+    'dirty': {'files': 100000, 'modified': 50000, 'staged': 5000}
+}
+
+
+def characteristics(shape, scale=1.0):
+    """Returns the characteristics of a shape.
+
+    :param str shape: the name of the shape
+    :param float scale: multiplier applied to the dimensions the shape scales up
+
+    :return dict: the characteristics
+    """
+
+    overrides = SHAPES[shape]
+    result = dict(BASE)
+    for key, value in overrides.items():
+        result[key] = max(1, int(value * scale))
+    result['modified'] = min(result['modified'], result['files'])
+    result['staged'] = min(result['staged'], result['modified'])
+    return result
+
+
+def _file_path(index):
+    return 'src/d{:04d}/f{:06d}.txt'.format(index // _FILES_PER_DIRECTORY, index)
+
+
+def _git(repo, *args, **kwargs):
+    subprocess.check_call(('git',) + args, cwd=repo, **kwargs)
+
+
+class _FastImport(object):
+    """Writes a fast-import stream."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._mark = 0
+        self._time = _EPOCH
+
+    def _write(self, text):
+        self._stream.write(text.encode('utf-8'))
+
+    def _data(self, text):
+        data = text.encode('utf-8')
+        self._stream.write('data {}\n'.format(len(data)).encode('utf-8'))
+        self._stream.write(data)
+        self._stream.write(b'\n')
+
+    def commit(self, ref, message, files=(), parents=()):
+        """Write a commit and return its mark.
+
+        :param str ref: the ref to update
+        :param str message: the commit message
+        :param iterable files: (path, contents) tuples to add or modify
+        :param tuple parents: marks of the parent commits, first parent first
+
+        :return str: the mark of the commit
+        """
+
+        self._mark += 1
+        self._time += 1
+        self._write('commit {}\nmark :{}\ncommitter {} {} +0000\n'.format(ref, self._mark, _IDENTITY, self._time))
+        self._data(message)
+        for i, parent in enumerate(parents):
+            self._write('{} {}\n'.format('from' if i == 0 else 'merge', parent))
+        for path, contents in files:
+            self._write('M 100644 inline {}\n'.format(path))
+            self._data(contents)
+        self._write('\n')
+        return ':{}'.format(self._mark)
+
+    def reset(self, ref, mark):
+        """Point a ref at a commit."""
+
+        self._write('reset {}\nfrom {}\n\n'.format(ref, mark))
+
+    def time(self):
+        """Returns the committer time of the last commit."""
+
+        return self._time
+
+    def done(self):
+        self._write('done\n')
+
+
+def _import(repo, shape):
+    """Write every commit and ref of a shape.
+
+    :return list: the shas and committer times of the stashes, oldest first
+    """
+
+    marks_path = os.path.join(repo, '.git', 'bench-marks')
+    proc = subprocess.Popen(['git', 'fast-import', '--quiet', '--export-marks=' + marks_path], cwd=repo, stdin=subprocess.PIPE)
+    importer = _FastImport(proc.stdin)
+
+    files = [(_file_path(i), 'file {}\n'.format(i)) for i in range(shape['files'])]
+    files.append((STASH_FILE, 'base\n'))
+    master = importer.commit('refs/heads/master', 'initial commit', files)
+
+    feature = master
+    for i in range(FEATURE_COMMITS):
+        feature = importer.commit('refs/heads/feature', 'feature commit {}'.format(i), [('feature/f{}.txt'.format(i), '{}\n'.format(i))], [feature])
+        if i == FEATURE_COMMITS - 5:
+            importer.reset('refs/remotes/origin/feature', feature)
+    importer.reset('refs/remotes/origin/master', master)
+
+    for i in range(shape['branches']):
+        importer.reset('refs/heads/bench/branch-{:06d}'.format(i), master)
+
+    stashes = []
+    for i in range(shape['stashes']):
+        contents = [(STASH_FILE, 'stash {}\n'.format(i))]
+        index = importer.commit('refs/bench/stash', 'index on feature: stash {}'.format(i), contents, [feature])
+        work = importer.commit('refs/bench/stash', 'On feature: stash {}'.format(i), contents, [feature, index])
+        stashes.append((work, importer.time()))
+
+    importer.done()
+    proc.stdin.close()
+    if proc.wait():
+        raise RuntimeError('git fast-import failed in {!r}'.format(repo))
+
+    with open(marks_path) as marks_file:
+        shas = dict(line.split() for line in marks_file)
+    os.remove(marks_path)
+    return [(shas[mark], time) for mark, time in stashes]
+
+
+def _write_stashes(repo, stashes):
+    """Point refs/stash and its reflog at the stash commits, newest last, as `git stash` itself would."""
+
+    if not stashes:
+        return
+
+    _git(repo, 'update-ref', '-d', 'refs/bench/stash')
+    logs = os.path.join(repo, '.git', 'logs', 'refs')
+    if not os.path.isdir(logs):
+        os.makedirs(logs)
+
+    previous = '0' * 40
+    with open(os.path.join(logs, 'stash'), 'w') as reflog:
+        for i, (sha, time) in enumerate(stashes):
+            reflog.write('{} {} {} {} +0000\tOn feature: stash {}\n'.format(previous, sha, _IDENTITY, time, i))
+            previous = sha
+
+    # written directly since update-ref would add another reflog entry
+    with open(os.path.join(repo, '.git', 'refs', 'stash'), 'w') as ref:
+        ref.write(previous + '\n')
+
+
+def _write_config(repo, shape):
+    _git(repo, 'config', 'user.name', 'Bench')
+    _git(repo, 'config', 'user.email', 'bench@example.com')
+    _git(repo, 'config', 'remote.origin.url', '.')
+    _git(repo, 'config', 'remote.origin.fetch', '+refs/heads/*:refs/remotes/origin/*')
+    _git(repo, 'config', 'branch.feature.remote', 'origin')
+    _git(repo, 'config', 'branch.feature.merge', 'refs/heads/feature')
+
+    with open(os.path.join(repo, '.git', 'config'), 'a') as config:
+        for i in range(shape['config_keys']):
+            if i % _KEYS_PER_SECTION == 0:
+                config.write('[bench "section{}"]\n'.format(i // _KEYS_PER_SECTION))
+            config.write('\tkey{} = value {}\n'.format(i, i))
+
+
+def _dirty(repo, shape):
+    """Modify files in the worktree, staging some of them before modifying them again."""
+
+    def modify(count):
+        for i in range(count):
+            with open(os.path.join(repo, _file_path(i)), 'a') as modified:
+                modified.write('modified\n')
+
+    if shape['staged']:
+        modify(shape['staged'])
+        proc = subprocess.Popen(['git', 'add', '--pathspec-from-file=-'], cwd=repo, stdin=subprocess.PIPE)
+        proc.communicate(''.join(_file_path(i) + '\n' for i in range(shape['staged'])).encode('utf-8'))
+        if proc.returncode:
+            raise RuntimeError('git add failed in {!r}'.format(repo))
+    modify(shape['modified'])
+
+
+def create(path, shape):
+    """Create a repository with a shape's characteristics, replacing anything at the path.
+
+    :param str path: where to create the repository
+    :param dict shape: the characteristics, see characteristics()
+    """
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+
+    with open(os.devnull, 'w') as devnull:
+        _git(path, 'init', '--quiet')
+        _git(path, 'symbolic-ref', 'HEAD', 'refs/heads/feature')
+        _write_stashes(path, _import(path, shape))
+        _git(path, 'pack-refs', '--all')
+        _write_config(path, shape)
+        _git(path, 'checkout', '--quiet', '--force', 'feature', stdout=devnull)
+        _dirty(path, shape)
+        _git(path, 'update-index', '-q', '--refresh', stdout=devnull)
+
+    with open(os.path.join(path, _MARKER), 'w') as marker:
+        marker.write(_signature(shape))
+
+
+def _signature(shape):
+    return '{} {}\n'.format(VERSION, sorted(shape.items()))
+
+
+def ensure(path, shape):
+    """Create a repository unless one with the same characteristics already exists at the path.
+
+    :param str path: where the repository lives
+    :param dict shape: the characteristics, see characteristics()
+
+    :return bool: whether the repository was created
+    """
+
+    try:
+        with open(os.path.join(path, _MARKER)) as marker:
+            if marker.read() == _signature(shape):
+                return False
+    except (IOError, OSError):
+        pass
+
+    create(path, shape)
+    return True
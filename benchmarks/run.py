@@ -0,0 +1,368 @@
+#! /usr/bin/env python
+"""Time every git-commands entry point against synthetic repositories.
+
+Each benchmark runs a command alongside the raw git it stands in for, e.g. `git state` and `git status --short
+--branch`, so results show the overhead the command adds as well as its absolute time. Results are written as JSON and
+can be compared against an earlier run to catch regressions.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --compare results.json --scale 0.01 --shapes base dirty
+
+Repositories are generated on first use and cached, see repos.py.
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import repos
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_VERSION = 1
+
+# files a benchmark may change that are put back after each run
+_PRESERVED_STASH = ('refs/stash', 'logs/refs/stash', 'packed-refs')
+_PRESERVED_INDEX = ('index',)
+
+_NOISE_FLOOR_MS = 5.0
+
+Benchmark = collections.namedtuple('Benchmark', 'name command raw setup teardown preserve')
+
+
+def _benchmark(name, command, raw, setup=(), teardown=(), preserve=()):
+    """Define a benchmark.
+
+    :param str name: the name results are recorded under
+    :param list command: argv of the git-commands invocation
+    :param list raw: the raw git equivalent. Each item is an argv or a list of argvs piped into one another.
+    :param tuple setup: argvs run before each timed run
+    :param tuple teardown: argvs run after each timed run and after the preserved files are put back
+    :param tuple preserve: paths relative to the git directory put back after each timed run
+    """
+
+    return Benchmark(name, command, raw, setup, teardown, preserve)
+
+
+_STASH_COUNT = 10
+_REFRESH = (('git', 'update-index', '-q', '--refresh'),)
+
+BENCHMARKS = [
+    _benchmark(
+        'state',
+        ['git', 'state', 'view', '--no-page', '--no-clear', '--no-color'],
+        [['git', 'status', '--short', '--branch']]
+    ),
+    _benchmark(
+        'changes',
+        ['git', 'changes', 'view', '--no-color'],
+        [['git', 'log', '--no-decorate', '--oneline', 'master..HEAD']]
+    ),
+    _benchmark(
+        'changes --inverse',
+        ['git', 'changes', 'view', '--inverse', '--no-color'],
+        [['git', 'log', '--no-decorate', '--oneline', '-10', 'master']]
+    ),
+    _benchmark(
+        'changes --count',
+        ['git', 'changes', 'view', '--count'],
+        [['git', 'rev-list', '--count', 'master..HEAD']]
+    ),
+    _benchmark(
+        'changes --stat',
+        ['git', 'changes', 'view', '--stat', '--no-color'],
+        [['git', 'diff', '--stat', 'master...HEAD']]
+    ),
+    _benchmark(
+        'changes --diff',
+        ['git', 'changes', 'view', '--diff', '--no-color'],
+        [['git', 'diff', 'master...HEAD']]
+    ),
+    _benchmark(
+        'changes associate',
+        ['git', 'changes', 'associate'],
+        [['git', 'config', '--local', '--default', '', '--get', 'git-changes.associations.feature.with']]
+    ),
+    _benchmark(
+        'upstream',
+        ['git', 'upstream'],
+        [['git', 'rev-parse', '--abbrev-ref', '@{upstream}']]
+    ),
+    _benchmark(
+        'abandon',
+        ['git', 'abandon', '--quiet', '0', str(_STASH_COUNT)],
+        [['git', 'stash', 'drop', '--quiet']] * _STASH_COUNT,
+        preserve=_PRESERVED_STASH
+    ),
+    _benchmark(
+        'restash',
+        ['git', 'restash', '--quiet'],
+        [[['git', 'stash', 'show', '--patch', '--no-color', 'stash@{0}'], ['git', 'apply', '--reverse']]],
+        setup=(('git', 'stash', 'apply', '--quiet'),)
+    ),
+    _benchmark(
+        'snapshot',
+        ['git', 'snapshot', '--quiet'],
+        [['git', 'stash', 'push', '--quiet'], ['git', 'stash', 'apply', '--quiet', '--index']],
+        # with nothing to stash the raw apply restores the newest stash instead
+        teardown=_REFRESH + (('git', 'checkout', '--quiet', 'HEAD', '--', repos.STASH_FILE),),
+        preserve=_PRESERVED_STASH + _PRESERVED_INDEX
+    ),
+    _benchmark(
+        'reindex',
+        ['git', 'reindex'],
+        [[['git', 'diff', '--name-only', '--cached', '-z'], ['git', 'add', '--pathspec-from-file=-', '--pathspec-file-nul']]],
+        teardown=_REFRESH,
+        preserve=_PRESERVED_INDEX
+    ),
+    _benchmark(
+        'settings list',
+        ['git', 'settings', 'list'],
+        [['git', 'config', '--list']]
+    )
+]
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def _environment(home):
+    """Returns an environment isolated from the user's configuration that runs this checkout's commands."""
+
+    env = dict((key, value) for key, value in os.environ.items() if not key.startswith(('GIT_', 'PAGER')))
+    env.update({
+        'PATH': os.pathsep.join([os.path.join(_ROOT, 'bin'), os.path.dirname(sys.executable), os.environ.get('PATH', '')]),
+        'HOME': home,
+        'XDG_CONFIG_HOME': home,
+        'GIT_CONFIG_NOSYSTEM': '1',
+        'GIT_PAGER': 'cat',
+        'PAGER': 'cat',
+        'LC_ALL': 'C'
+    })
+    return env
+
+
+def _run(argvs, cwd, env):
+    """Run argvs piped into one another and raise BenchmarkError if any fails."""
+
+    with open(os.devnull, 'w') as devnull:
+        procs = []
+        stdin = None
+        for i, argv in enumerate(argvs):
+            last = i == len(argvs) - 1
+            errors = tempfile.TemporaryFile()
+            proc = subprocess.Popen(argv, cwd=cwd, env=env, stdin=stdin, stdout=devnull if last else subprocess.PIPE, stderr=errors)
+            if stdin is not None:
+                stdin.close()  # so the previous process sees SIGPIPE if this one exits early
+            stdin = proc.stdout
+            procs.append((argv, proc, errors))
+
+        for argv, proc, errors in procs:
+            returncode = proc.wait()
+            errors.seek(0)
+            error = errors.read().decode('utf-8', 'replace').strip()
+            errors.close()
+            if returncode:
+                raise BenchmarkError('{!r} exited {}: {}'.format(' '.join(argv), returncode, error))
+
+
+def _steps(steps):
+    """Normalize a list of argvs and pipelines into a list of pipelines."""
+
+    return [step if isinstance(step[0], list) else [step] for step in steps]
+
+
+class _Preserved(object):
+    """Copies files out of a git directory and puts them back, removing any that didn't exist."""
+
+    def __init__(self, git_dir, paths):
+        self._git_dir = git_dir
+        self._paths = paths
+        self._backup = tempfile.mkdtemp(prefix='git-commands-benchmark-')
+
+        for path in paths:
+            source = os.path.join(git_dir, path)
+            if os.path.exists(source):
+                target = os.path.join(self._backup, path)
+                if not os.path.isdir(os.path.dirname(target)):
+                    os.makedirs(os.path.dirname(target))
+                shutil.copy2(source, target)
+
+    def restore(self):
+        for path in self._paths:
+            backup = os.path.join(self._backup, path)
+            target = os.path.join(self._git_dir, path)
+            if os.path.exists(backup):
+                shutil.copy2(backup, target)
+            elif os.path.exists(target):
+                os.remove(target)
+
+    def close(self):
+        shutil.rmtree(self._backup)
+
+
+def _time(benchmark, pipelines, repo, env):
+    """Time a single run of pipelines, running the benchmark's setup and teardown around it.
+
+    :return float: elapsed milliseconds
+    """
+
+    preserved = _Preserved(os.path.join(repo, '.git'), benchmark.preserve)
+    try:
+        for argv in benchmark.setup:
+            _run([list(argv)], repo, env)
+
+        start = time.time()
+        for pipeline in pipelines:
+            _run(pipeline, repo, env)
+        elapsed = (time.time() - start) * 1000
+    finally:
+        preserved.restore()
+        preserved.close()
+        for argv in benchmark.teardown:
+            _run([list(argv)], repo, env)
+    return elapsed
+
+
+def _stats(samples):
+    ordered = sorted(samples)
+    middle = len(ordered) // 2
+    median = ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2.0
+    return {
+        'min_ms': round(ordered[0], 2),
+        'median_ms': round(median, 2),
+        'mean_ms': round(sum(ordered) / len(ordered), 2),
+        'max_ms': round(ordered[-1], 2),
+        'samples': len(ordered)
+    }
+
+
+def measure(benchmark, repo, env, repeat):
+    """Time a benchmark and its raw equivalent, alternating runs so drift affects both equally.
+
+    :return dict: stats for the command and the raw equivalent and the overhead between their medians
+    """
+
+    variants = (('command', [[benchmark.command]]), ('raw', _steps(benchmark.raw)))
+    for _, pipelines in variants:
+        _time(benchmark, pipelines, repo, env)  # warm up caches
+
+    samples = dict((name, []) for name, _ in variants)
+    for _ in range(repeat):
+        for name, pipelines in variants:
+            samples[name].append(_time(benchmark, pipelines, repo, env))
+
+    result = dict((name, _stats(values)) for name, values in samples.items())
+    command, raw = result['command']['median_ms'], result['raw']['median_ms']
+    result['overhead_ms'] = round(command - raw, 2)
+    result['overhead_ratio'] = round(command / raw, 2) if raw else None
+    return result
+
+
+def compare(results, baseline, threshold):
+    """Print each result beside its baseline.
+
+    :param dict results: the current results
+    :param dict baseline: earlier results
+    :param float threshold: the fraction a median may grow by before it counts as a regression
+
+    :return list: (benchmark, shape) tuples that regressed
+    """
+
+    regressions = []
+    print('\n{:<20} {:<10} {:>12} {:>12} {:>9}'.format('benchmark', 'shape', 'baseline ms', 'median ms', 'change'))
+    for name, shapes in sorted(results['results'].items()):
+        for shape, result in sorted(shapes.items()):
+            previous = baseline.get('results', {}).get(name, {}).get(shape)
+            if not previous or 'error' in result or 'error' in previous:
+                continue
+
+            before, after = previous['command']['median_ms'], result['command']['median_ms']
+            change = (after - before) / before if before else 0.0
+            regressed = change > threshold and after - before > _NOISE_FLOOR_MS
+            if regressed:
+                regressions.append((name, shape))
+            print('{:<20} {:<10} {:>12.1f} {:>12.1f} {:>+8.0%}{}'.format(
+                name, shape, before, after, change, '  REGRESSED' if regressed else ''
+            ))
+    return regressions
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description='Benchmark git-commands against synthetic repositories.')
+    parser.add_argument('--shapes', nargs='+', choices=sorted(repos.SHAPES), default=sorted(repos.SHAPES), help='repository shapes to run against')
+    parser.add_argument('--benchmarks', nargs='+', choices=[b.name for b in BENCHMARKS], metavar='BENCHMARK', help='benchmarks to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs of each benchmark (default: 5)')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier for the size of each shape (default: 1.0)')
+    parser.add_argument('--repos', default=os.path.join(tempfile.gettempdir(), 'git-commands-benchmarks'), help='where repositories are cached')
+    parser.add_argument('--output', help='write results as JSON to a file')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare against results from an earlier run and exit non-zero on regressions')
+    parser.add_argument('--threshold', type=float, default=0.1, help='median growth counted as a regression (default: 0.1)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    benchmarks = [b for b in BENCHMARKS if not args.benchmarks or b.name in args.benchmarks]
+
+    home = tempfile.mkdtemp(prefix='git-commands-benchmark-home-')
+    env = _environment(home)
+    results = {
+        'version': _VERSION,
+        'git': subprocess.check_output(['git', '--version']).decode('utf-8').strip(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': args.scale,
+        'repeat': args.repeat,
+        'shapes': {},
+        'results': {}
+    }
+
+    try:
+        for shape_name in args.shapes:
+            shape = repos.characteristics(shape_name, args.scale)
+            repo = os.path.join(args.repos, '{}-{}'.format(shape_name, args.scale))
+            print('{}: {}'.format(shape_name, ', '.join('{}={}'.format(k, v) for k, v in sorted(shape.items()))), file=sys.stderr)
+            if repos.ensure(repo, shape):
+                print('  generated {}'.format(repo), file=sys.stderr)
+            results['shapes'][shape_name] = shape
+
+            for benchmark in benchmarks:
+                try:
+                    result = measure(benchmark, repo, env, args.repeat)
+                except BenchmarkError as error:
+                    result = {'error': str(error)}
+                    print('  {:<20} failed: {}'.format(benchmark.name, error), file=sys.stderr)
+                else:
+                    print('  {:<20} {:>9.1f} ms  raw {:>9.1f} ms  overhead {:>+9.1f} ms'.format(
+                        benchmark.name, result['command']['median_ms'], result['raw']['median_ms'], result['overhead_ms']
+                    ), file=sys.stderr)
+                results['results'].setdefault(benchmark.name, {})[shape_name] = result
+    finally:
+        shutil.rmtree(home)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+            output.write('\n')
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        if regressions:
+            print('\n{} regression(s)'.format(len(regressions)), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
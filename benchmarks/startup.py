@@ -0,0 +1,128 @@
+#! /usr/bin/env python
+"""Time how long each git-commands entry point takes to start, from the loose scripts and from a bundle.
+
+Each run is `git-<command> --version` in a fresh interpreter, which imports everything the command does and parses its
+arguments but starts no processes. Runs alternate between the two layouts so drift affects both equally.
+
+    python bundle.py --output build/git-commands.pyz
+    python benchmarks/startup.py --bundle build/git-commands.pyz
+
+Loose scripts are timed with their bytecode already written, as after their first run on a writable install. Add
+--no-bytecode to time them from a copy without bytecode that may not write any, the way a read-only install runs them,
+compiling every module each time.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_BIN = os.path.join(_ROOT, 'bin')
+_VERSION = 1
+
+
+def _entry_points():
+    return sorted(name for name in os.listdir(_BIN) if name.startswith('git-') and os.path.isfile(os.path.join(_BIN, name)))
+
+
+def _environment(bytecode):
+    env = dict((key, value) for key, value in os.environ.items() if key != 'PYTHONDONTWRITEBYTECODE')
+    env['GIT_COMMANDS_DAEMON'] = '0'  # time this process starting, not a daemon's
+    if not bytecode:
+        env['PYTHONDONTWRITEBYTECODE'] = '1'
+    return env
+
+
+def _time(argv, env):
+    """Run argv once and return its elapsed milliseconds."""
+
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        returncode = subprocess.call(argv, stdout=devnull, stderr=devnull, env=env)
+        elapsed = (time.time() - start) * 1000
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, argv)
+    return elapsed
+
+
+def _median(samples):
+    ordered = sorted(samples)
+    middle = len(ordered) // 2
+    return round(ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2.0, 2)
+
+
+def measure(name, scripts, links, repeat, bytecode):
+    """Time an entry point from the loose scripts and from the bundle.
+
+    :param str name: the entry point
+    :param str scripts: the directory of loose scripts
+    :param str links: a directory where each entry point links to the bundle
+    :param int repeat: timed runs of each layout
+    :param bool bytecode: whether the loose scripts may write bytecode
+
+    :return dict: the median milliseconds of each layout
+    """
+
+    variants = (
+        ('loose', [sys.executable, os.path.join(scripts, name), '--version'], _environment(bytecode)),
+        ('bundle', [sys.executable, os.path.join(links, name), '--version'], _environment(True))
+    )
+    for _, argv, env in variants:
+        _time(argv, env)  # warm up the file system cache and, if allowed, the bytecode
+
+    samples = dict((layout, []) for layout, _, _ in variants)
+    for _ in range(repeat):
+        for layout, argv, env in variants:
+            samples[layout].append(_time(argv, env))
+    return dict((layout + '_ms', _median(values)) for layout, values in samples.items())
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description='Time git-commands start-up from the loose scripts and from a bundle.')
+    parser.add_argument('--bundle', required=True, help='a bundle built by bundle.py')
+    parser.add_argument('--commands', nargs='+', choices=_entry_points(), metavar='COMMAND', help='entry points to time (default: all)')
+    parser.add_argument('--repeat', type=int, default=10, help='timed runs of each layout (default: 10)')
+    parser.add_argument('--no-bytecode', dest='bytecode', action='store_false', help='run the loose scripts without bytecode')
+    parser.add_argument('--output', help='write results as JSON to a file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+
+    # the bundle runs the entry point it's invoked as
+    links = tempfile.mkdtemp(prefix='git-commands-startup-')
+    results = {'version': _VERSION, 'python': platform.python_version(), 'repeat': args.repeat, 'bytecode': args.bytecode, 'results': {}}
+    try:
+        scripts = _BIN
+        if not args.bytecode:
+            scripts = os.path.join(links, 'bin')
+            shutil.copytree(_BIN, scripts, ignore=shutil.ignore_patterns('*.pyc', '*.pyo'))
+
+        print('{:<22} {:>9} {:>9} {:>9}'.format('entry point', 'loose ms', 'bundle ms', 'change'))
+        for name in args.commands or _entry_points():
+            os.symlink(os.path.abspath(args.bundle), os.path.join(links, name))
+            result = measure(name, scripts, links, args.repeat, args.bytecode)
+            results['results'][name] = result
+            change = (result['bundle_ms'] - result['loose_ms']) / result['loose_ms'] if result['loose_ms'] else 0.0
+            print('{:<22} {:>9.1f} {:>9.1f} {:>+8.0%}'.format(name, result['loose_ms'], result['bundle_ms'], change))
+    finally:
+        shutil.rmtree(links)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+            output.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
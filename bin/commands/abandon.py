@@ -1,43 +1,46 @@
 """Drop a count or range of stashes."""
 
-import subprocess
 
-from utils import messages
+from utils import execute, messages
+from utils.context import RepoContext
 
 
-def abandon(start, end, dry_run=False, quiet=False):
+def abandon(start, end, dry_run=False, quiet=False, context=None):
     """Drop a range of stashes from start (inclusive) to end (exclusive).
 
     :param int start: the range start (inclusive) of stashes to drop
     :param int end: the range end (exclusive) of stashes to drop
     :param bool dry_run: print the stashes that would be dropped but don't drop them
     :param bool quiet: suppress all output
+    :param RepoContext context: facts about the current repository
     """
 
-    start, end = _validate_bounds(start, end)
+    context = context or RepoContext()
+    start, end = _validate_bounds(start, end, context)
     if dry_run:
         _dry_run(start, end)
     else:
         _run(start, end, quiet)
+        context.invalidate('stashes')
 
 
 def _dry_run(start, end):
     for i in range(start, end):
         stash = 'stash@{{{}}}'.format(i)
-        stash_sha = subprocess.check_output(['git', 'rev-parse', stash]).splitlines()[0]
+        stash_sha = execute.check_output(['git', 'rev-parse', stash]).splitlines()[0]
         messages.info('Would drop refs/{} ({})'.format(stash, stash_sha))
 
 
 def _run(start, end, quiet):
     start_stash = 'stash@{{{}}}'.format(start)
     for i in range(start, end):
-        stash_sha = subprocess.check_output(['git', 'rev-parse', start_stash]).splitlines()[0]
-        subprocess.call(['git', 'stash', 'drop', '--quiet', start_stash])
+        stash_sha = execute.check_output(['git', 'rev-parse', start_stash]).splitlines()[0]
+        execute.call(['git', 'stash', 'drop', '--quiet', start_stash])
         messages.info('Dropped refs/stash@{{{}}} ({})'.format(i, stash_sha), quiet)
 
 
-def _validate_bounds(start, end):
-    stash_count = len(subprocess.check_output(['git', 'stash', 'list']).splitlines())
+def _validate_bounds(start, end, context):
+    stash_count = len(context.stashes())
     if end < 0:
         messages.error('end cannot be negative')
     elif end < start:
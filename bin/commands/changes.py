@@ -3,77 +3,81 @@
 import os
 import subprocess
 
-from . import upstream
-from utils import directories, git, messages
+from utils import execute, git, messages
+from utils.context import RepoContext
 
 _DETAIL_OPTIONS = ('log', 'inverse_log', 'diff', 'stat', 'count')
 _COLOR_OPTIONS = ('always', 'auto', 'never')
 
 
-def _ambiguous_ref(ref):
-    ref_names = [r.split(' ')[1] for r in subprocess.check_output(('git', 'show-ref', '--tags', '--heads', ref)).splitlines()]
-    messages.error('{0!r} is an ambiguous ref. Use one of:\n{1}'.format(ref, '\n'.join(ref_names)))
+def _ambiguous_ref(classification):
+    ref_names = classification.refs.get('heads', []) + classification.refs.get('tags', [])
+    messages.error('{0!r} is an ambiguous ref. Use one of:\n{1}'.format(classification.name, '\n'.join(ref_names)))
 
 
-def associate(committish, quiet=False):
+def associate(committish, quiet=False, context=None):
     """Associate the current branch with a commit-ish.
 
     :param str or unicode committish: the commit-ish to associate the current branch with
     :param bool quiet: suppress non-error output
+    :param RepoContext context: facts about the current repository
     """
 
-    if not directories.is_git_repository():
+    context = context or RepoContext()
+    if not context.is_git_repository():
         messages.error('{0!r} not a git repository'.format(os.getcwd()))
-    elif git.is_empty_repository():
+    elif context.is_empty_repository():
         messages.error('cannot associate while empty')
-    elif git.is_detached():
+    elif context.is_detached():
         messages.error('cannot associate while HEAD is detached')
 
-    # is it a ref?
-    if git.is_ref(committish):
-        if not git.is_ref_ambiguous(committish, limit=('heads', 'tags')):
-            committish = git.symbolic_full_name(committish)
-        else:
-            _ambiguous_ref(committish)
-    else:
-        resolved_committish = git.resolve_sha1(committish)
-        if not resolved_committish:
-            messages.error('{} is not a valid revision'.format(committish))
-        committish = resolved_committish
-
-    current_branch = git.current_branch()
-    subprocess.call(['git', 'config', '--local', 'git-changes.associations.' + current_branch + '.with', committish])
+    # prefer the full name of a ref over the commit it currently points to
+    classification = git.classify(committish)
+    if classification.is_ambiguous:
+        _ambiguous_ref(classification)
+    resolved_committish = classification.symbolic_full_name if classification.is_ref else None
+    resolved_committish = resolved_committish or classification.sha
+    if not resolved_committish:
+        messages.error('{} is not a valid revision'.format(committish))
+    committish = resolved_committish
+
+    current_branch = context.current_branch()
+    execute.call(['git', 'config', '--local', 'git-changes.associations.' + current_branch + '.with', committish])
+    context.invalidate('association')
     messages.info('{} has been associated with {}'.format(current_branch, committish), quiet)
 
 
-def associate_upstream(quiet=False):
+def associate_upstream(quiet=False, context=None):
     """Associate the current branch with its upstream branch.
 
     :param bool quiet: suppress non-error output
+    :param RepoContext context: facts about the current repository
     """
 
-    if not directories.is_git_repository():
+    context = context or RepoContext()
+    if not context.is_git_repository():
         messages.error('{0!r} not a git repository'.format(os.getcwd()))
 
-    branch = git.current_branch()
-    upstream_branch = upstream.upstream(branch, include_remote=upstream.IncludeRemote.NONE_LOCAL)
+    branch = context.current_branch()
+    from . import upstream  # only needed to associate with an upstream
+    upstream_branch = upstream.upstream(branch, include_remote=upstream.IncludeRemote.NONE_LOCAL, context=context)
     if not upstream_branch:
         messages.error('{} has no upstream branch'.format(branch))
-    associate(upstream_branch, quiet)
+    associate(upstream_branch, quiet, context=context)
 
 
 def _get_associated_branches():
     config_command = ('git', 'config', '--local', '--name-only', '--get-regexp', 'git-changes.associations')
-    config_proc = subprocess.Popen(config_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    config_proc = execute.popen(config_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     current_associations = config_proc.communicate()[0].splitlines()
     return [association[25:-5] for association in current_associations]  # slice off git-changes.associations. and .with
 
 
-def _prune_associations(cleanup, quiet, dry_run=False):
+def _prune_associations(cleanup, quiet, dry_run=False, context=None):
     """Remove associations for branches that no longer exist."""
 
     # get branches and associations
-    current_branches = [ref.split()[1][11:] for ref in subprocess.check_output(('git', 'show-ref', '--heads')).splitlines()]
+    current_branches = [ref.split()[1][11:] for ref in execute.check_output(('git', 'show-ref', '--heads')).splitlines()]
     current_associations = _get_associated_branches()
 
     branches_to_prune = current_associations
@@ -84,105 +88,117 @@ def _prune_associations(cleanup, quiet, dry_run=False):
         if dry_run:
             messages.info('Would remove association {0!r}'.format(to_prune), quiet)
         else:
-            unassociate(to_prune)
+            unassociate(to_prune, context=context)
             messages.info('Removed association {0!r}'.format(to_prune), quiet)
 
 
-def unassociate(branch=None, cleanup=None, quiet=False, dry_run=False):
+def unassociate(branch=None, cleanup=None, quiet=False, dry_run=False, context=None):
     """Unassociate a branch.
 
     :param str or unicode branch: branch to unassociate
     :param str or unicode cleanup: cleanup action (one of: all, prune)
     :param bool quiet: suppress non-error output
     :param bool dry_run: show the association(s) that would be remove but do nothing
+    :param RepoContext context: facts about the current repository
     """
 
     assert not cleanup or cleanup in ('all', 'prune'), 'cleanup must be one of ' + str(['all', 'prune'])
 
-    if not directories.is_git_repository():
+    context = context or RepoContext()
+    if not context.is_git_repository():
         messages.error('{0!r} not a git repository'.format(os.getcwd()))
-    elif git.is_empty_repository():
+    elif context.is_empty_repository():
         return
 
     if cleanup:
-        _prune_associations(cleanup, quiet, dry_run)
+        _prune_associations(cleanup, quiet, dry_run, context=context)
     else:
-        branch = branch if branch else git.current_branch()
-        current_association = get_association(branch)
+        branch = branch if branch else context.current_branch()
+        current_association = get_association(branch, context=context)
         if current_association:
             if dry_run:
                 messages.info('Would unassociate {0!r} from {1!r}'.format(branch, current_association))
             else:
-                subprocess.call(['git', 'config', '--local', '--remove-section', 'git-changes.associations.' + branch])
+                execute.call(['git', 'config', '--local', '--remove-section', 'git-changes.associations.' + branch])
+                context.invalidate('association')
 
 
-def get_association(branch=None, verbose=False):
+def get_association(branch=None, verbose=False, context=None):
     """Return the associated commit-ish.
 
     :param str or unicode branch: the branch whose association should be returned
     :param bool verbose: print default association when none exist
+    :param RepoContext context: facts about the current repository
     :return str or unicode: the associated commit-ish or None
     """
 
-    if not directories.is_git_repository():
+    context = context or RepoContext()
+    if not context.is_git_repository():
         messages.error('{0!r} not a git repository'.format(os.getcwd()))
-    elif git.is_empty_repository():
+    elif context.is_empty_repository():
         messages.warn('repository is empty')
         return None
 
-    branch = branch if branch else git.current_branch()
+    branch = branch if branch else context.current_branch()
     default_branch = git.get_config_value('git-changes.default-commit-ish', default='refs/heads/master')
     if branch == 'HEAD' or not branch:
         associated_branch = None
     else:
-        associated_branch = git.get_config_value('git-changes.associations.' + branch + '.with', config='local')
+        associated_branch = context.memoize(
+            ('association', branch),
+            lambda: git.get_config_value('git-changes.associations.' + branch + '.with', config='local')
+        )
 
     if not associated_branch and verbose:
         return default_branch
     return associated_branch
 
 
-def changes(committish, details=None, color_when=None, files=None):
+def changes(committish, details=None, color_when=None, files=None, context=None):
     """Print the changes between a given branch and HEAD.
 
     :param str or unicode committish: commit-ish to view changes from
     :param str or unicode details: the level of details to show (diff, stat, or None)
     :param str or unicode color_when: when to color output
     :param list files: a list of pathspecs to specific files
+    :param RepoContext context: facts about the current repository
     """
 
     assert not details or details in _DETAIL_OPTIONS, 'details must be one of ' + str(_DETAIL_OPTIONS)
     assert not color_when or color_when in _COLOR_OPTIONS, 'color_when must be one of ' + str(_COLOR_OPTIONS)
 
-    if not directories.is_git_repository():
+    context = context or RepoContext()
+    if not context.is_git_repository():
         messages.error('{0!r} not a git repository'.format(os.getcwd()))
-    elif not git.is_commit(committish):
+
+    classification = git.classify(committish)
+    if not classification.is_commit:
         messages.error('{0!r} is not a valid commit'.format(committish))
-    elif git.is_ref(committish) and git.is_ref_ambiguous(committish, limit=('heads', 'tags')):
-        _ambiguous_ref(committish)
+    elif classification.is_ambiguous:
+        _ambiguous_ref(classification)
 
     color_when = git.resolve_coloring(color_when)
     if details == 'diff':
         command = ['git', 'diff', '--color={}'.format(color_when), committish + '...HEAD']
-        subprocess.call(_append_any_file_args(command, files))
+        execute.call(_append_any_file_args(command, files))
     elif details == 'stat':
         command = ['git', 'diff', '--color={}'.format(color_when), '--stat', committish + '...HEAD']
-        subprocess.call(_append_any_file_args(command, files))
+        execute.call(_append_any_file_args(command, files))
     elif details == 'count':
         command = ['git', 'log', '--no-decorate', '--oneline', '{}..HEAD'.format(committish)]
-        log = subprocess.check_output(_append_any_file_args(command, files))
+        log = execute.check_output(_append_any_file_args(command, files))
         log = log.splitlines()
         messages.info(str(len(log)))
     elif details == 'inverse_log':
-        merge_base = subprocess.check_output(['git', 'merge-base', committish, 'HEAD']).strip()
+        merge_base = execute.check_output(['git', 'merge-base', committish, 'HEAD']).strip()
         # TODO: make length configurable
         command = ['git', 'log', '--no-decorate', '--oneline', '-10', merge_base, '--color={}'.format(color_when)]
-        subprocess.call(_append_any_file_args(command, files))
+        execute.call(_append_any_file_args(command, files))
     else:
         command = [
             'git', 'log', '--no-decorate', '--oneline', '{}..HEAD'.format(committish), '--color={}'.format(color_when)
         ]
-        subprocess.call(_append_any_file_args(command, files))
+        execute.call(_append_any_file_args(command, files))
 
 
 def _append_any_file_args(command, files):
@@ -0,0 +1,639 @@
+"""Run the commands from a long-lived process so each call skips interpreter start-up, imports, and config parsing.
+
+The daemon listens on a Unix socket, see utils.forward for the protocol, and runs each request in a child forked from
+itself, which reads the request so a slow client only holds up its own. A child starts with every command imported and
+with the config files and packed refs of recently used repositories already read, see utils.gitconfig and utils.refs.
+The git directories of those repositories are watched so a change to their config, HEAD, or refs is read again by the
+daemon as soon as it happens rather than by the next request.
+
+Each recently used repository also keeps its persistent extensions running, see utils.coprocess, which a child asks for
+over a channel to the daemon. What's cached on disk, like extension output, is shared by every child as it would be by
+separate processes. The status isn't kept since a prompt is shown right after whatever changed the working tree, before
+a watcher could tell, so every request scans it again.
+"""
+
+import collections
+import contextlib
+import errno
+import imp
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from utils import coprocess, directories, forward, gitconfig, messages, refs, watch
+
+_MAX_REPOSITORIES = 8
+
+# how often the daemon reaps children and reads changed repositories again while idle
+_IDLE_INTERVAL = 1.0
+# how long a watcher waits for changes before checking whether it was closed
+_WATCH_INTERVAL = 1.0
+# how long a client may take to send its request
+_REQUEST_TIMEOUT = 5.0
+
+_READ_SIZE = 64 * 1024
+
+# the inputs which change what the daemon reads ahead of a request
+_WARMED_INPUTS = frozenset(['config', 'head', 'refs'])
+
+
+def _entry_points(directory, exclude):
+    """Yields the name, path, and compiled code of every git-* entry point in a directory.
+
+    Run from a bundle, the directory is within the bundle's archive and the entry points come from it, see bundle.py.
+    """
+
+    if not os.path.isdir(directory):
+        import _entrypoints
+        for name in sorted(set(_entrypoints.COMMANDS) - set(exclude)):
+            yield name, os.path.join(directory, name), _entrypoints.code(name)
+        return
+
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.startswith('git-') and name not in exclude and os.path.isfile(path):
+            with open(path) as script:
+                yield name, path, compile(script.read(), path, 'exec')
+
+
+def load_commands(directory, exclude=()):
+    """Import every git-* entry point in a directory that has a main().
+
+    :param str directory: where the entry points are
+    :param iterable exclude: entry points not to load
+
+    :return dict: the entry point modules by name
+    """
+
+    commands = {}
+    for name, path, code in _entry_points(directory, exclude):
+        # executed rather than imported so nothing is compiled next to the script
+        module = imp.new_module(name.replace('-', '_'))
+        module.__file__ = path
+        exec code in module.__dict__
+        if callable(getattr(module, 'main', None)):
+            commands[name] = module
+    return commands
+
+
+def _encode(value):
+    """Turn the unicode JSON decodes into the str the commands expect."""
+
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    elif isinstance(value, list):
+        return [_encode(item) for item in value]
+    elif isinstance(value, dict):
+        return dict((_encode(key), _encode(item)) for key, item in value.iteritems())
+    return value
+
+
+@contextlib.contextmanager
+def _environment(directory, environment):
+    """Run within a request's working directory and environment, restoring the daemon's afterwards."""
+
+    previous_directory = os.getcwd()
+    previous_environment = dict(os.environ)
+    os.chdir(directory)
+    os.environ.clear()
+    os.environ.update(environment)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(previous_environment)
+        os.chdir(previous_directory)
+
+
+def _read_repository():
+    """Read the config and refs of the current repository, leaving them cached for children to inherit."""
+
+    try:
+        gitconfig.get_all('core.bare')
+        gitconfig.get_all('core.bare', config='local')
+    except gitconfig.ConfigUnavailable:
+        pass
+    try:
+        refs.store().has_branches()
+    except refs.RefsUnavailable:
+        pass
+
+
+class _Repository(object):
+    """A repository whose git directory is watched on a thread of its own.
+
+    :param watcher: the repository's watcher, which is closed along with the repository
+    :param str directory: where the last request for it ran
+    :param dict environment: the environment of the last request for it
+    """
+
+    def __init__(self, watcher, directory, environment):
+        self.directory = directory
+        self.environment = environment
+        self.changed = threading.Event()
+        self._closed = threading.Event()
+        self._watcher = watcher
+        self._thread = threading.Thread(target=self._watch)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _watch(self):
+        with self._watcher:
+            while not self._closed.is_set():
+                if self._watcher.wait(_WATCH_INTERVAL) & _WARMED_INPUTS:
+                    self.changed.set()
+
+    def close(self):
+        self._closed.set()
+
+
+class _Repositories(object):
+    """The most recently used repositories, kept read ahead of the requests for them along with their coprocesses.
+
+    Children ask for a repository to be read from the threads serving them, so it's only read once the daemon's main
+    thread gets to it rather than while it might be forking.
+
+    :param int limit: how many repositories to watch
+    """
+
+    def __init__(self, limit=_MAX_REPOSITORIES):
+        self._limit = limit
+        self._watched = collections.OrderedDict()
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._requested = collections.deque()
+        self._wake_read, self._wake_write = os.pipe()
+
+    def fileno(self):
+        """Returns a file descriptor that becomes readable once a repository is requested, to wait on with select."""
+
+        return self._wake_read
+
+    def request(self, directory, environment):
+        """Ask for a repository a child runs in to be read and watched, see warm.
+
+        :param str directory: the request's working directory
+        :param dict environment: the request's environment
+        """
+
+        self._requested.append((directory, environment))
+        try:
+            os.write(self._wake_write, '\0')
+        except OSError:
+            pass  # the daemon is stopping
+
+    def pool(self, git_dir):
+        """Returns the coprocesses kept for a repository, stopped once it's no longer among the most recently used.
+
+        :param str git_dir: the repository's git directory
+        """
+
+        with self._lock:
+            if git_dir not in self._pools:
+                self._pools[git_dir] = coprocess.Pool()
+            return self._pools[git_dir]
+
+    def _forget(self, git_dir):
+        self._watched.pop(git_dir).close()
+        with self._lock:
+            pool = self._pools.pop(git_dir, None)
+        if pool:
+            pool.close()
+
+    def warm(self, directory, environment):
+        """Read the repository a request runs in, watching it from then on.
+
+        :param str directory: the request's working directory
+        :param dict environment: the request's environment
+        """
+
+        with _environment(directory, environment):
+            _read_repository()
+            git_dir = directories.git_directory()
+            repository = self._watched.pop(git_dir, None) if git_dir else None
+            if git_dir and repository is None:
+                repository = _Repository(watch.watch(worktree=False), directory, environment)
+        if repository is None:
+            return
+
+        repository.directory, repository.environment = directory, environment
+        self._watched[git_dir] = repository
+        while len(self._watched) > self._limit:
+            self._forget(next(iter(self._watched)))
+
+    def refresh(self):
+        """Read the repositories children asked for and every watched repository that changed again."""
+
+        if select.select([self._wake_read], [], [], 0)[0]:
+            os.read(self._wake_read, _READ_SIZE)
+        while self._requested:
+            try:
+                self.warm(*self._requested.popleft())
+            except OSError:
+                pass  # the directory was removed
+
+        for git_dir, repository in self._watched.items():
+            if not repository.changed.is_set():
+                continue
+            repository.changed.clear()
+            try:
+                with _environment(repository.directory, repository.environment):
+                    _read_repository()
+            except OSError:
+                self._forget(git_dir)  # the directory was removed
+
+    def close(self):
+        for git_dir in list(self._watched):
+            self._forget(git_dir)
+        with self._lock:
+            pools, self._pools = self._pools.values(), {}
+        for pool in pools:
+            pool.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+
+
+class _SharedCoprocess(object):
+    """A coprocess of the daemon's, see coprocess.Coprocess."""
+
+    def __init__(self, pool, command, directory):
+        self.command = command
+        self.directory = directory
+        self._pool = pool
+
+    def request(self, arguments, timeout=None):
+        return self._pool.request(self.command, self.directory, arguments, timeout)
+
+
+class _SharedPool(object):
+    """The coprocesses the daemon keeps for a child's repository, asked for over a channel to the daemon.
+
+    Each request is a JSON line answered by one with the same id, so the threads showing sections still wait on their
+    coprocesses at the same time. Closing it leaves the coprocesses running for the next request.
+
+    :param socket.socket channel: the child's end of the channel
+    """
+
+    def __init__(self, channel):
+        self._channel = channel
+        self._lock = threading.Lock()
+        self._waiting = {}
+        self._requests = 0
+        self._closed = False
+        reader = threading.Thread(target=self._read)
+        reader.daemon = True
+        reader.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, command, directory=None, environment=None):
+        return _SharedCoprocess(self, list(command), directory or os.getcwd())
+
+    def request(self, command, directory, arguments, timeout):
+        """Send a request to a coprocess of the daemon's, see coprocess.Coprocess.request."""
+
+        with self._lock:
+            if self._closed:
+                return '', False, False
+            self._requests += 1
+            id_ = self._requests
+            waiting = self._waiting[id_] = [threading.Event(), None]
+            try:
+                self._channel.sendall(json.dumps({
+                    'id': id_,
+                    'command': command,
+                    'directory': directory,
+                    'arguments': arguments,
+                    'timeout': timeout
+                }) + '\n')
+            except (socket.error, UnicodeDecodeError):
+                del self._waiting[id_]
+                return '', False, False
+
+        waiting[0].wait()
+        response = waiting[1]
+        if response is None:
+            return '', False, False  # the daemon stopped
+        return response['output'], response['timed_out'], response['succeeded']
+
+    def _read(self):
+        try:
+            for line in iter(self._channel.makefile('r').readline, ''):
+                response = _encode(json.loads(line))
+                with self._lock:
+                    waiting = self._waiting.pop(response['id'], None)
+                if waiting:
+                    waiting[1] = response
+                    waiting[0].set()
+        except (socket.error, ValueError):
+            pass
+        finally:
+            with self._lock:
+                self._closed = True
+                abandoned, self._waiting = self._waiting.values(), {}
+            for waiting in abandoned:
+                waiting[0].set()
+
+    def close(self):
+        pass
+
+
+def _answer(channel, lock, pool, request, environment):
+    """Send a child's request to a coprocess and the response back to the child."""
+
+    try:
+        coprocess_ = pool.get(request['command'], request['directory'], environment)
+        output, timed_out, succeeded = coprocess_.request(request['arguments'], request['timeout'])
+    except OSError as error:
+        output, timed_out, succeeded = '{}: {}\n'.format(request['command'][0], error.strerror), False, False
+    response = {'id': request['id'], 'output': output.decode('utf-8', 'replace'), 'timed_out': timed_out, 'succeeded': succeeded}
+    with lock:
+        try:
+            channel.sendall(json.dumps(response) + '\n')
+        except socket.error:
+            pass  # the child exited without waiting
+
+
+def _serve(channel, repositories):
+    """Serve a child until it exits, reading its repository ahead of later requests and answering coprocess requests.
+
+    The child first sends the directory and environment it runs in along with its repository's git directory, and then
+    its coprocess requests.
+
+    :param socket.socket channel: the daemon's end of the channel
+    :param _Repositories repositories: the recently used repositories
+    """
+
+    lock = threading.Lock()
+    try:
+        lines = iter(channel.makefile('r').readline, '')
+        child = _encode(json.loads(next(lines)))
+        repositories.request(child['directory'], child['environment'])
+        for line in lines:
+            request = _encode(json.loads(line))
+            answer = threading.Thread(
+                target=_answer,
+                args=(channel, lock, repositories.pool(child['git_dir']), request, child['environment'])
+            )
+            answer.daemon = True
+            answer.start()
+    except (StopIteration, socket.error, ValueError):
+        pass  # the child exited before it read its request or isn't in a repository
+    finally:
+        channel.close()
+
+
+def _relay(connection, outputs, finished):
+    """Send what's read from pipes to the client until the command finishes and what it wrote is sent.
+
+    Closing the command's ends of the pipes isn't enough to tell it finished since a thread of its own may still be
+    polling one, which keeps it open.
+
+    :param socket.socket connection: the client
+    :param dict outputs: the stream each pipe is sent as, by file descriptor
+    :param int finished: a file descriptor that becomes readable once the command returns
+    """
+
+    outputs = dict(outputs)
+    waiting = [finished]
+    try:
+        while outputs:
+            ready = select.select(list(outputs) + waiting, [], [], None if waiting else 0)[0]
+            if finished in ready:
+                waiting = []  # send what's left without waiting for more
+            elif not ready:
+                return
+
+            for fd in set(ready) & set(outputs):
+                data = os.read(fd, _READ_SIZE)
+                if data:
+                    forward.write_frame(connection, outputs[fd], data)
+                else:
+                    del outputs[fd]
+                    os.close(fd)
+    except socket.error:
+        pass  # the client went away, so anything still writing gets a broken pipe
+    finally:
+        for fd in outputs:
+            os.close(fd)
+
+
+def _call(main):
+    """Call an entry point the way the interpreter would run it.
+
+    :return int: its exit status
+    """
+
+    try:
+        main()
+    except SystemExit as exit_:
+        if exit_.code is None or isinstance(exit_.code, int):
+            return exit_.code or 0
+        sys.stderr.write('{}\n'.format(exit_.code))
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+def _run(connection, channel, commands, verbose, accepted):
+    """Read a request and run it in this child, with its output sent to the client.
+
+    Returning before the command starts closes the connection, so the client runs the command itself.
+
+    :param socket.socket connection: the client
+    :param socket.socket channel: this child's end of the channel to the daemon
+    :param dict commands: the entry point modules by name
+    :param bool verbose: print the request as it's started
+    :param float accepted: when the client connected
+    """
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    request = _read_request(connection)
+    command = commands.get(request.get('command')) if isinstance(request, dict) else None
+    if command is None:
+        return
+    connection.settimeout(None)
+
+    try:
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        sys.argv = request['argv']
+    except (KeyError, OSError, TypeError):
+        return  # a malformed request or one from a directory that's since been removed
+
+    git_dir = directories.git_directory()
+    if git_dir:
+        channel.sendall(json.dumps({'directory': request['cwd'], 'environment': request['env'], 'git_dir': git_dir}) + '\n')
+        coprocess.share(_SharedPool(channel))
+    if verbose:
+        messages.info('{} {} ({} ms)'.format(os.getpid(), ' '.join(sys.argv), int((time.time() - accepted) * 1000)))
+        sys.stdout.flush()
+
+    stdout_read, stdout_write = os.pipe()
+    stderr_read, stderr_write = os.pipe()
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(stdout_write, 1)
+    os.dup2(stderr_write, 2)
+    os.close(stdout_write)
+    os.close(stderr_write)
+    sys.stdout = os.fdopen(1, 'w')
+    sys.stderr = os.fdopen(2, 'w', 0)
+
+    finished_read, finished_write = os.pipe()
+    forward.write_frame(connection, forward.STARTED, '')
+    relay = threading.Thread(
+        target=_relay,
+        args=(connection, {stdout_read: forward.STDOUT, stderr_read: forward.STDERR}, finished_read)
+    )
+    relay.start()
+    status = _call(command.main)
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    os.write(finished_write, '\0')
+    relay.join()
+    forward.write_frame(connection, forward.EXIT, str(status))
+
+
+def _read_request(connection):
+    """Read a request or return None if the client didn't send a whole one in time."""
+
+    connection.settimeout(_REQUEST_TIMEOUT)
+    try:
+        line = connection.makefile('r').readline()
+        return _encode(json.loads(line)) if line.endswith('\n') else None
+    except (socket.error, ValueError):
+        return None
+
+
+def _handle(connection, listener, commands, repositories, verbose):
+    """Start a child to read and run a request, serving it from a thread until it exits.
+
+    :return int: the child's pid
+    """
+
+    accepted = time.time()
+    channel, child_channel = socket.socketpair()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        listener.close()
+        channel.close()
+        try:
+            _run(connection, child_channel, commands, verbose, accepted)
+        except BaseException:
+            pass  # the client sees the connection close and reports it, or runs the command itself
+        finally:
+            os._exit(0)
+
+    child_channel.close()
+    server = threading.Thread(target=_serve, args=(channel, repositories))
+    server.daemon = True
+    server.start()
+    return pid
+
+
+def _reap():
+    """Collect every child that has exited."""
+
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except OSError as error:
+            if error.errno == errno.ECHILD:
+                return
+            raise
+        if not pid:
+            return
+
+
+def _listen(path):
+    """Returns a socket listening at path, which only this user may connect to."""
+
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            messages.error('a daemon is already listening on {0!r}'.format(path))
+        except socket.error:
+            os.remove(path)  # left behind by a daemon that didn't exit cleanly
+        finally:
+            probe.close()
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)
+    try:
+        listener.bind(path)
+    finally:
+        os.umask(umask)
+    listener.listen(64)
+    return listener
+
+
+def _stop(signal_number, frame):
+    sys.exit(0)
+
+
+def daemon(directory, socket_path=None, verbose=False):
+    """Serve the commands in a directory until stopped.
+
+    :param str directory: where the git-* entry points are
+    :param str socket_path: where to listen (default: utils.forward.socket_path())
+    :param bool verbose: print each request as it's started
+    """
+
+    socket_path = os.path.abspath(socket_path or forward.socket_path())
+    commands = load_commands(directory, exclude=(os.path.basename(sys.argv[0]),))
+    listener = _listen(socket_path)
+    os.chdir('/')  # requests run in their own directories and this one may be removed
+    repositories = _Repositories()
+    signal.signal(signal.SIGTERM, _stop)
+    messages.info('listening on {}'.format(socket_path))
+
+    try:
+        while True:
+            try:
+                ready = select.select([listener, repositories], [], [], _IDLE_INTERVAL)[0]
+            except select.error as error:
+                if error.args[0] == errno.EINTR:
+                    continue
+                raise
+
+            _reap()
+            repositories.refresh()
+            if listener in ready:
+                connection = listener.accept()[0]
+                try:
+                    _handle(connection, listener, commands, repositories, verbose)
+                finally:
+                    connection.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        repositories.close()
+        listener.close()
+        try:
+            os.remove(socket_path)
+        except OSError:
+            pass
@@ -1,9 +1,29 @@
 """Re-add already indexed files to the index."""
 
 import os
-import subprocess
+from subprocess import PIPE
 
-from utils import directories, git, messages
+from utils import directories, execute, messages
+
+
+def _indexed_files():
+    """Returns the files with staged changes other than deletions, from a single `git status` pass.
+
+    :return list: file paths relative to the repository root
+    """
+
+    entries = iter(execute.check_output(['git', 'status', '--porcelain', '-z', '--untracked-files=no']).split('\0'))
+    indexed_files = []
+    for entry in entries:
+        if not entry:
+            continue
+
+        index_status, path = entry[0], entry[3:]
+        if index_status in 'RC':
+            next(entries, None)  # skip the original path of a rename or copy
+        if index_status not in ' ?!D':
+            indexed_files.append(path)
+    return indexed_files
 
 
 def reindex():
@@ -11,7 +31,8 @@ def reindex():
     if not directories.is_git_repository():
         messages.error('{0!r} not a git repository'.format(os.getcwd()))
 
-    indexed_files = subprocess.check_output(['git', 'diff', '--name-only', '--cached']).splitlines()
-    indexed_files = [f for f in indexed_files if f not in git.deleted_files()]
+    indexed_files = _indexed_files()
     if indexed_files:
-        subprocess.call(['git', 'add', '--'] + indexed_files)
+        # paths are streamed rather than passed as arguments so large changesets can't exceed ARG_MAX
+        add_proc = execute.popen(['git', '--literal-pathspecs', 'add', '--pathspec-from-file=-', '--pathspec-file-nul'], stdin=PIPE)
+        add_proc.communicate(input='\0'.join(indexed_files))
@@ -1,49 +1,52 @@
 """Create a snapshot of the changes in a dirty working directory."""
 
-import subprocess
 import time
 
 from utils import execute, messages
+from utils.context import RepoContext
 
 
-def _stash_buffer(quiet):
+def _stash_buffer(quiet, context):
     """
     You cannot create two stashes of the same contents within the same second. So wait if we've executed too quickly.
     """
 
     # TODO: this should check that the stash would be a duplicate first
-    if subprocess.check_output(('git', 'stash', 'list')).strip():
-        last_stash_date = subprocess.check_output(('git', 'show', '-s', '--format=%ci', 'stash@{0}')).rstrip()
+    if context.stashes():
+        last_stash_date = execute.check_output(('git', 'show', '-s', '--format=%ci', 'stash@{0}')).rstrip()
         warned = False
         while last_stash_date == time.strftime('%Y-%m-%d %H:%M:%S %z'):
             warned = messages.warn('snapshot created too close to last stash', quiet=quiet, ignore=warned)
             time.sleep(0.1)
 
 
-def _drop_stash_by_message(message):
+def _drop_stash_by_message(message, context):
     if not message:
         return
 
-    stashes = subprocess.check_output(['git', 'stash', 'list']).strip().splitlines()
-    for stash in stashes:
+    for stash in context.stashes():
         # include ': ' to make sure the match is the entire message
         if stash.endswith(': ' + message):
             stash_ref = stash[:stash.index(':')]
-            subprocess.call(['git', 'stash', 'drop', '--quiet', stash_ref])
+            execute.call(['git', 'stash', 'drop', '--quiet', stash_ref])
+            context.invalidate('stashes')
             return
 
 
-def snapshot(message=None, replace=False, quiet=False, files=None):
+def snapshot(message=None, replace=False, quiet=False, files=None, context=None):
     """Create a snapshot of the working directory and index.
 
     :param str or unicode message: the message to use when creating the underlying stash
     :param bool replace: replace any existing snapshot with the same message
     :param bool quiet: suppress all output
     :param list files: a list of pathspecs to specific files to use when creating the snapshot
+    :param RepoContext context: facts about the current repository
     """
 
+    context = context or RepoContext()
+
     status_command = ['git', 'status', '--porcelain']
-    status_output = subprocess.check_output(status_command).splitlines()
+    status_output = execute.check_output(status_command).splitlines()
 
     # if there aren't any changes then we don't have anything to do
     if not status_output:
@@ -51,14 +54,15 @@ def snapshot(message=None, replace=False, quiet=False, files=None):
         return
 
     if replace:
-        _drop_stash_by_message(message)
+        _drop_stash_by_message(message, context)
 
     stash_command = ['git', 'stash', 'push', '--include-untracked']
     stash_command = stash_command if not quiet else stash_command + ['--quiet']
     stash_command = stash_command if message is None else stash_command + ['--message', message]
     stash_command = stash_command if not files else stash_command + ['--'] + files
-    _stash_buffer(quiet)
-    subprocess.call(stash_command)
+    _stash_buffer(quiet, context)
+    execute.call(stash_command)
+    context.invalidate('stashes')
 
     # apply isn't completely quiet when the stash only contains untracked files so swallow all output
     execute.swallow(['git', 'stash', 'apply', '--quiet', '--index'])
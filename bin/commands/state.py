@@ -1,19 +1,36 @@
 """View the state of the working tree."""
 
+import errno
+import importlib
 import os
-import re
+import select
 import shlex
-import subprocess
+import signal
+import stat
 import sys
-from ast import literal_eval
-from collections import OrderedDict
+import threading
+import time
+import traceback
+from collections import OrderedDict, namedtuple
 from subprocess import PIPE
 
-import colorama
+from stateextensions import prompt, registry, status
+from utils import coprocess, directories, execute, git, gitcolor, messages, parallel, parse_string, resultcache, terminal, watch
+from utils.context import RepoContext
 
-from . import settings
-from stateextensions import status
-from utils import directories, git, messages, parse_string
+# extensions mostly wait on their own processes so more can run at once than there are cores
+_MAX_WORKERS = 8
+
+# the inputs, see utils.watch, that each part of a cache basis is fingerprinted from
+_BASIS_INPUTS = {'head': ('head',), 'index': ('index',), 'refs': ('head', 'refs'), 'worktree': ('head', 'index', 'worktree')}
+_STATUS_INPUTS = frozenset(['head', 'index', 'refs', 'worktree'])
+
+# a claim on refreshing late sections in the background, see --budget, and how long it holds in case the refresh dies
+_REFRESH_CLAIM = os.path.join('git-state', 'refresh')
+_REFRESH_CLAIM_AGE = 60
+
+# a section to show: run returns its result, inputs are what it depends on or None if it could depend on anything
+_Job = namedtuple('_Job', 'name timeout run inputs ttl')
 
 
 def _print_section(title, accent=None, text=None, format_='compact', show_empty=False, color='auto'):
@@ -22,16 +39,16 @@ def _print_section(title, accent=None, text=None, format_='compact', show_empty=
     if not show_empty and not text:
         return ""
 
-    header_color = colorama.Fore.RESET
+    header_color = gitcolor.DEFAULT
     if color == 'auto' and sys.stdout.isatty():
-        header_color = colorama.Fore.GREEN
+        header_color = gitcolor.GREEN
     elif color == 'always':
-        header_color = colorama.Fore.GREEN
+        header_color = gitcolor.GREEN
 
     if accent:
-        section = '# {}{} {}{}'.format(header_color, title, accent, colorama.Fore.RESET) + os.linesep
+        section = '# {}{} {}{}'.format(header_color, title, accent, gitcolor.DEFAULT) + os.linesep
     else:
-        section = '# {}{}{}'.format(header_color, title, colorama.Fore.RESET) + os.linesep
+        section = '# {}{}{}'.format(header_color, title, gitcolor.DEFAULT) + os.linesep
 
     if format_ == 'pretty' and text is not None and len(text) > 0:
         # pretty print
@@ -52,62 +69,363 @@ def _print_section(title, accent=None, text=None, format_='compact', show_empty=
     return section
 
 
+def _order_titles(titles, order=[]):
+    """Returns titles in the order to print them: those with a predefined order first, the rest as they were given."""
+
+    ordered = []
+    for title in list(order) + list(titles):
+        if title in titles and title not in ordered:
+            ordered.append(title)
+    return ordered
+
+
+def _join_sections(sections, order=[]):
+    state_result = ''.join(sections[title] for title in _order_titles(list(sections), order))
+    return state_result[:-1]  # strip the extra trailing newline
+
+
+def _info(text):
+    """Print text, dropping its trailing newline since one is printed anyway."""
+
+    messages.info(text[:-len(os.linesep)] if text.endswith(os.linesep) else text)
+    sys.stdout.flush()
+
+
+def _call_when_closed(fileno, callback):
+    """Call back once whatever reads from a pipe closes it."""
+
+    poller = select.poll()
+    poller.register(fileno, 0)  # errors and hangups are always reported
+    poller.poll()
+    callback()
+
+
+def _cancel_when_closed(pipe, cancel):
+    try:
+        fileno = pipe.fileno()
+        is_pipe = stat.S_ISFIFO(os.fstat(fileno).st_mode)
+    except (AttributeError, IOError, OSError, ValueError):
+        return  # not backed by a descriptor, such as when replaced with a buffer
+    if cancel and is_pipe:
+        thread = threading.Thread(target=_call_when_closed, args=(fileno, cancel))
+        thread.daemon = True
+        thread.start()
+
+
+def _print_held(held, clear, cancel):
+    if clear and terminal.is_terminal():
+        terminal.clear()
+    _cancel_when_closed(sys.stdout, cancel)
+    _info(''.join(held))
+
+
+def _stream_sections(sections, page=False, clear=False, cancel=None):
+    """Print sections as soon as each is ready.
+
+    When paging, sections are held back only until they no longer fit in the terminal and are then streamed to a pager.
+
+    :param iterable sections: the text of each section in the order to print them
+    :param bool page: page output if too long
+    :param bool clear: clear terminal before printing
+    :param callable cancel: called if the pager or whatever reads the output exits early so anything still producing
+        sections can stop
+
+    :return bool: whether every section was printed, False if the pager or whatever was reading exited first
+    """
+
+    terminal_lines = terminal.lines() if page and terminal.is_terminal() else None
+    held = []
+    held_lines = 0
+    printed = False
+    pager = None
+    try:
+        for section in sections:
+            if not section:
+                continue
+
+            if pager:
+                pager.stdin.write(section)
+                pager.stdin.flush()
+            elif terminal_lines is not None:
+                held.append(section)
+                held_lines += section.count(os.linesep)
+                if held_lines + 1 > terminal_lines:  # one for the prompt
+                    terminal_lines = None
+                    pager = terminal.pager()
+                    if pager:
+                        _cancel_when_closed(pager.stdin, cancel)
+                        pager.stdin.write(''.join(held))
+                        pager.stdin.flush()
+                    else:
+                        _print_held(held, clear, cancel)  # paging is disabled
+                        printed = True
+                    held = None
+            else:
+                if not printed and clear and terminal.is_terminal():
+                    terminal.clear()
+                if not printed:
+                    _cancel_when_closed(sys.stdout, cancel)
+                _info(section)
+                printed = True
+
+        if held:
+            _print_held(held, clear, cancel)
+    except IOError as error:
+        if error.errno != errno.EPIPE:
+            raise
+        if not pager:
+            # keep the interpreter from failing to flush stdout on exit
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+            os.close(devnull)
+        return False
+    finally:
+        if pager:
+            try:
+                pager.stdin.close()
+            except IOError:
+                pass  # the pager already exited
+            pager.wait()
+    return True
+
+
 def _print_sections(sections, order=[], page=False, clear=False):
+    _stream_sections((sections[title] for title in _order_titles(list(sections), order)), page, clear)
 
-    state_result = ''
-
-    # print sections with a predefined order
-    for section in order:
-        if section in sections:
-            state_result += sections.pop(section)
-
-    # print any remaining sections in the order they were defined
-    for section_info in sections:
-        state_result += sections[section_info]
-
-    if state_result:
-        state_result = state_result[:-1]  # strip the extra trailing newline
-        state_lines = len(state_result.splitlines())
-        terminal_lines = literal_eval(subprocess.check_output(['tput', 'lines']))
-        if not page or terminal_lines >= state_lines + 2:  # one for the newline and one for the prompt
-            if clear and sys.stdout.isatty():
-                subprocess.call('clear')
-            messages.info(state_result)
-        else:
-            echo = subprocess.Popen(['echo', state_result], stdout=PIPE)
-            subprocess.call(['less', '-r'], stdin=echo.stdout)
-            echo.wait()
 
+def _extension_options(extension, options):
+    """Returns the options of an extension from config then the command line, each split into arguments.
 
-def _run_extension(extension, options, show_color):
-    extension_command = git.get_config_value('git-state.extensions.' + extension + '.command')
-    extension_name = git.get_config_value('git-state.extensions.' + extension + '.name', default=extension)
-
-    # merge config and command line options
-    extension_options = git.get_config_value(
-        'git-state.extensions.' + extension + '.options',
-        default=[],
-        as_type=(lambda value: [value])  # pragma: no cover since this call is mocked and the lambda never fires
-    )
-    extension_options += options[extension_name] if extension_name in options else []
-    extension_options = [o for sub in [shlex.split(line) for line in extension_options] for o in sub]
+    :param registry.Extension extension: the extension
+    :param dict options: command line options for each extension by name
+    """
+
+    extension_options = extension.options + (options[extension.name] if extension.name in options else [])
+    return [o for sub in [shlex.split(line) for line in extension_options] for o in sub]
+
+
+def _extension_command(extension, options, show_color):
+    """Returns the name, command, and timeout of an extension from its configuration.
+
+    :param registry.Extension extension: the extension
+    :param dict options: command line options for each extension by name
+    :param str show_color: when to color output
+    """
 
-    extension_command = shlex.split(extension_command) + extension_options
-    if git.get_config_value('git-state.extensions.' + extension + '.color', default=True, as_type=parse_string.as_bool):
+    extension_name = extension.name
+    extension_command = shlex.split(extension.command) + _extension_options(extension, options)
+    if extension.color:
         extension_command += ['--color={}'.format(show_color)]
 
-    extension_proc = subprocess.Popen(extension_command, stdout=PIPE, stderr=PIPE)
-    extension_out, extension_error = extension_proc.communicate()
-    extension_text = extension_out if not extension_proc.returncode else extension_error
+    return extension_name, extension_command, extension.timeout
+
+
+def _kill(proc, group):
+    try:
+        if group:
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except OSError:
+        pass  # already exited
+
+
+def _kill_process_group(proc, timed_out):
+    timed_out.set()
+    _kill(proc, True)
+
+
+class _Processes(object):
+    """The extension processes still running, so they can be killed once their output is no longer wanted."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = {}
+        self._cancelled = False
+
+    def popen(self, command, group=False, **kwargs):
+        """Start a process, or kill it straight away if already cancelled.
+
+        :param list command: the command
+        :param bool group: whether the process leads its own process group, which is killed with it
+        """
+
+        proc = execute.popen(command, **kwargs)
+        with self._lock:
+            self._running[proc] = group
+            cancelled = self._cancelled
+        if cancelled:
+            _kill(proc, group)
+        return proc
+
+    def finished(self, proc):
+        with self._lock:
+            self._running.pop(proc, None)
 
+    def cancel(self):
+        """Kill every running process and any started later."""
+
+        with self._lock:
+            self._cancelled = True
+            running = list(self._running.items())
+        for proc, group in running:
+            _kill(proc, group)
+
+
+def _popen_extension(extension_command, processes, group=False):
+    kwargs = {'stdout': PIPE, 'stderr': PIPE}
+    if group:
+        kwargs['preexec_fn'] = os.setsid
+    if processes:
+        return processes.popen(extension_command, group, **kwargs)
+    return execute.popen(extension_command, **kwargs)
+
+
+def _coprocess(extension, coprocesses):
+    """Returns the coprocess to send an extension's requests to or None if its command is started for every render."""
+
+    if extension.protocol != 'persistent':
+        return None
+    return coprocesses.get(shlex.split(extension.command))
+
+
+def _execute_extension(extension_command, timeout=None, processes=None, coprocess_=None):
+    """Execute an extension command.
+
+    :param list extension_command: the command
+    :param float timeout: seconds after which the command and anything it started are killed
+    :param _Processes processes: where to track the command while it runs
+    :param coprocess.Coprocess coprocess_: the running command to send the options to instead, if persistent
+
+    :return tuple: the text to show, whether the command timed out, and whether it succeeded
+    """
+
+    if coprocess_:
+        return coprocess_.request(extension_command[len(coprocess_.command):], timeout)
+
+    if not timeout:
+        # when tracked, run in a new process group so cancelling also kills anything the extension starts
+        extension_proc = _popen_extension(extension_command, processes, group=processes is not None)
+        try:
+            extension_out, extension_error = extension_proc.communicate()
+        finally:
+            if processes:
+                processes.finished(extension_proc)
+        succeeded = not extension_proc.returncode
+        return (extension_out if succeeded else extension_error), False, succeeded
+
+    # run in a new process group so anything the extension starts is killed with it
+    extension_proc = _popen_extension(extension_command, processes, group=True)
+    timed_out = threading.Event()
+    timer = threading.Timer(timeout, _kill_process_group, [extension_proc, timed_out])
+    timer.start()
+    try:
+        extension_out, extension_error = extension_proc.communicate()
+    finally:
+        timer.cancel()
+        if processes:
+            processes.finished(extension_proc)
+
+    if timed_out.is_set():
+        return extension_out, True, False
+    succeeded = not extension_proc.returncode
+    return (extension_out if succeeded else extension_error), False, succeeded
+
+
+def _import_function(module):
+    """Import the function an in-process extension names.
+
+    :param str module: the function as package.module:function
+
+    :raise ImportError: if the module can't be imported or has no such function
+    """
+
+    module_name, _, function_name = module.partition(':')
+    if not module_name or not function_name:
+        raise ImportError('{0!r} is not of the form package.module:function'.format(module))
+
+    function = importlib.import_module(module_name)
+    for attribute in function_name.split('.'):
+        try:
+            function = getattr(function, attribute)
+        except AttributeError:
+            raise ImportError('{0!r} has no attribute {1!r}'.format(module_name, function_name))
+    return function
+
+
+def _call_module(module, context, arguments, show_color, format_):
+    """Call an in-process extension.
+
+    The function is passed the context, options, show_color, and format_ keyword arguments and returns the text of its
+    section. Failing to import it, or an exception it raises, is shown as the section the way a failed command's stderr
+    is. That includes exiting, such as through messages.error, which would otherwise end the whole run.
+
+    :param str module: the function as package.module:function
+    :param RepoContext context: facts about the current repository
+    :param list arguments: the extension's options
+    :param str show_color: when to color output
+    :param str format_: the format sections are printed in
+
+    :return tuple: the text to show, whether it timed out, which it never does, and whether it succeeded
+    """
+
+    try:
+        function = _import_function(module)
+        extension_text = function(context=context, options=arguments, show_color=show_color, format_=format_)
+    except (Exception, SystemExit) as error:
+        return '{}: {}'.format(module, ''.join(traceback.format_exception_only(type(error), error))), False, False
+
+    if isinstance(extension_text, unicode):
+        extension_text = extension_text.encode('utf-8')
+    return extension_text or '', False, True
+
+
+def _cached(cache, key, ttl, run):
+    """Returns the cached result of a job or runs it, caching the result only if it succeeded."""
+
+    extension_text = cache.get(key, ttl)
+    if extension_text is not None:
+        return extension_text, False, True
+
+    extension_text, timed_out, succeeded = run()
+    if succeeded:
+        cache.put(key, extension_text)
+    return extension_text, timed_out, succeeded
+
+
+def _run_extension(extension, options, show_color):
+    if extension.module:
+        arguments = _extension_options(extension, options)
+        extension_text, _, _ = _call_module(extension.module, RepoContext(), arguments, show_color, 'compact')
+        return extension.name, extension_text
+
+    extension_name, extension_command, extension_timeout = _extension_command(extension, options, show_color)
+    with coprocess.pool() as coprocesses:
+        extension_text, _, _ = _execute_extension(
+            extension_command,
+            extension_timeout,
+            coprocess_=_coprocess(extension, coprocesses)
+        )
     return extension_name, extension_text
 
 
+def _timed_out_accent(timeout):
+    return '{}(timed out after {:g}s)'.format(gitcolor.DEFAULT, timeout)
+
+
+def _stale_accent(age):
+    return '{}(stale, {:d}s old)'.format(gitcolor.DEFAULT, int(age))
+
+
+def _pending_accent():
+    return '{}(pending)'.format(gitcolor.DEFAULT)
+
+
 def _extension_exists(extension):
-    return bool(int(settings.list_('git-state.extensions.' + extension, count=True)))
+    return extension in registry.load()
 
 
-def edit_extension(extension, command=None, name=None, options=None, show=None, color=True):
+def edit_extension(extension, command=None, name=None, options=None, show=None, color=True, module=None):
     # print 'Would create extension', extension, command, name, options, show, show_color
     # TODO: where to put the extension? global/sys/local/file
     # TODO: is name necessary when subsection values can be anything exception \n and null byte?
@@ -115,21 +433,22 @@ def edit_extension(extension, command=None, name=None, options=None, show=None,
     extension_section = 'git-state.extensions.' + extension
     already_exists = _extension_exists(extension)
     if command:
-        subprocess.call(['git', 'config', '--local', extension_section + '.command', command])
+        execute.call(['git', 'config', '--local', extension_section + '.command', command])
+    if module:
+        execute.call(['git', 'config', '--local', extension_section + '.module', module])
     if name:
-        subprocess.call(['git', 'config', '--local', extension_section + '.name', name])
+        execute.call(['git', 'config', '--local', extension_section + '.name', name])
     if options:
-        subprocess.call(['git', 'config', '--local', extension_section + '.options', options])
+        execute.call(['git', 'config', '--local', extension_section + '.options', options])
     if show is not None:
-        subprocess.call(['git', 'config', '--local', extension_section + '.show', str(show)])
+        execute.call(['git', 'config', '--local', extension_section + '.show', str(show)])
     if color is not None:
-        subprocess.call(['git', 'config', '--local', extension_section + '.color', str(color)])
+        execute.call(['git', 'config', '--local', extension_section + '.color', str(color)])
     messages.info('Extension {} {}'.format(extension, 'updated' if already_exists else 'created'))
 
 
 def get_extensions():
-    extensions = settings.list_(limit_to='sections')
-    return [match.group(1) for match in re.finditer('^git-state\\.extensions\\.([^.\n]+)$', extensions, re.MULTILINE)]
+    return registry.load().keys()
 
 
 def print_extensions():
@@ -140,17 +459,30 @@ def print_extensions():
 
 def print_extension_config(extension):
     # TODO: add pretty/compact options
-    config = settings.list_(section='git-state.extensions.' + extension, format_='pretty')
-    if config:
-        messages.info(config)
+    extension = registry.load().get(extension)
+    if extension:
+        lines = ['[git-state "extensions.{}"]'.format(extension.key)]
+        lines += ['    {} = {}'.format(variable, value) for variable, value in extension.entries]
+        messages.info(os.linesep.join(lines))
+
+
+def _init_color(strip):
+    """Set up colored output, stripping color codes if asked to.
+
+    colorama loads ctypes, so it's only imported once there's output to write.
+    """
+
+    import colorama
+    colorama.init(strip=strip)
 
 
 def run_extension(extension):
     # TODO: BUG: piping to less prints the header with ANSII codes
     # TODO: add proper coloring
     # TODO: add proper formatting
-    colorama.init(strip=True)
-    if _extension_exists(extension):
+    _init_color(strip=True)
+    extension = registry.load().get(extension)
+    if extension:
         extension_name, extension_text = _run_extension(extension, {}, 'never')
         section_text = _print_section(extension_name, text=extension_text, show_empty=True, color='never')
         sections = {extension_name: section_text}
@@ -161,10 +493,404 @@ def delete_extension(extension):
     # TODO: where to delete from?
     # TODO: quiet
     if _extension_exists(extension):
-        subprocess.call(['git', 'config', '--local', '--remove-section', 'git-state.extensions.{}'.format(extension)])
+        execute.call(['git', 'config', '--local', '--remove-section', 'git-state.extensions.{}'.format(extension)])
         messages.info('Extension {} deleted'.format(extension))
 
 
+def _open_cache():
+    return resultcache.open_(
+        git.get_config_value('git-state.cache.max-size', default=resultcache.DEFAULT_MAX_SIZE, as_type=int)
+    )
+
+
+def _inputs(basis):
+    """Returns the inputs an extension's cache basis depends on or None if the extension could depend on anything."""
+
+    if not basis or not basis.bases:
+        return None
+    return frozenset(input_ for base in basis.bases for input_ in _BASIS_INPUTS[base])
+
+
+def _jobs(context, registry_, processes=None, coprocesses=None, **kwargs):
+    """Returns the sections to show as jobs along with the cache extension results are kept in, if any.
+
+    :param RepoContext context: facts about the current repository
+    :param registry.ExtensionRegistry registry_: the configured extensions
+    :param _Processes processes: where to track extension processes while they run
+    :param coprocess.Pool coprocesses: where persistent extensions are kept between renders
+    """
+
+    show_color = kwargs.get('show_color')
+    ignore_extensions = kwargs.get('ignore_extensions')
+    show_extensions = list(set(kwargs.get('show_extensions', [])))
+
+    jobs = []
+    if context.is_empty_repository():
+        extensions = ['status']
+        extensions = list(set(show_extensions).union(set(extensions) - set(ignore_extensions)))
+
+        if 'status' in extensions:
+            jobs.append(_Job(None, None, lambda: (status.get(new_repository=True, **kwargs), status.accent(new_repository=True, **kwargs)), None, None))
+        return jobs, None
+
+    extensions = registry_.keys() + ['status']
+    extensions = list(set(show_extensions).union(set(extensions) - set(ignore_extensions)))
+
+    # the working tree is fingerprinted from the scan the status section shows so it's only scanned once
+    status_scan = lambda: status.scan(context, False, kwargs.get('summary'))
+
+    # gather every command up front so only processes, not config reads, run concurrently
+    if 'status' in extensions:
+        jobs.append(_Job(
+            None,
+            None,
+            lambda: (
+                status.get(context=context, **kwargs),
+                status.accent(show_color=show_color, context=context, summary=kwargs.get('summary'))
+            ),
+            _STATUS_INPUTS,
+            None
+        ))
+        extensions.remove('status')
+
+    # show any user defined sections
+    options = kwargs.get('options')
+    format_ = kwargs.get('format_')
+    cache = None
+    for extension in [registry_.get(key) for key in extensions]:
+
+        # skip unknown extensions and those we should ignore
+        if not extension or (extension.key not in show_extensions and not extension.show):
+            continue
+
+        extension_module = extension.module
+        if extension_module:
+            # called in-process so it can't be killed once it runs too long
+            extension_name, extension_timeout = extension.name, None
+            extension_arguments = _extension_options(extension, options)
+            extension_command = ['module:' + extension_module] + extension_arguments + [show_color, format_]  # its cache key
+            job = lambda m=extension_module, a=extension_arguments: _call_module(m, context, a, show_color, format_)
+        else:
+            extension_name, extension_command, extension_timeout = _extension_command(extension, options, show_color)
+            extension_coprocess = _coprocess(extension, coprocesses)
+            job = lambda c=extension_command, t=extension_timeout, p=extension_coprocess: _execute_extension(c, t, processes, p)
+
+        # fingerprints are taken here, before anything runs, so the extensions can't change what they depend on
+        extension_basis = extension.cache
+        if extension_basis:
+            cache = cache or _open_cache()
+            fingerprint = resultcache.fingerprint(extension_basis.bases, context, status_scan)
+            if cache and fingerprint:
+                key = resultcache.key(extension_command, extension_basis, fingerprint)
+                job = lambda run=job, k=key, ttl=extension_basis.ttl: _cached(cache, k, ttl, run)
+
+        jobs.append(_Job(
+            extension_name,
+            extension_timeout,
+            job,
+            _inputs(extension_basis),
+            extension_basis.ttl if extension_basis else None
+        ))
+
+    return jobs, cache
+
+
+def _is_stale(job, changed):
+    """Returns whether a job's section must be shown again after a change.
+
+    :param _Job job: the job
+    :param set changed: the inputs that changed. Empty if none did but some time passed.
+    """
+
+    if job.ttl is not None:
+        return True  # the cache knows whether the result expired
+    return job.inputs is None and bool(changed) or bool(job.inputs and job.inputs & changed)
+
+
+def _section(job, title, result, format_, show_empty, show_color):
+    """Print the section of a job from its result."""
+
+    if job.name is None:
+        status_output, status_accent = result
+        return _print_section(title, status_accent, status_output, format_, show_empty=show_empty, color=show_color)
+
+    extension_text, timed_out, _ = result
+    if timed_out:
+        return _print_section(
+            title=title,
+            accent=_timed_out_accent(job.timeout),
+            text=extension_text,
+            format_=format_,
+            show_empty=True,
+            color=show_color
+        )
+    return _print_section(
+        title=title,
+        text=extension_text,
+        format_=format_,
+        show_empty=show_empty,
+        color=show_color
+    )
+
+
+class _LastResults(object):
+    """The last result of each section, shown in place of a section that isn't ready within the budget.
+
+    :param resultcache.ResultCache cache: where the results are kept or None if they can't be
+    :param str show_color: when sections are colored, since their results depend on it
+    """
+
+    def __init__(self, cache, show_color):
+        self._cache = cache
+        self._show_color = show_color
+
+    def _key(self, title):
+        return resultcache.key(['git-state', 'last', title, self._show_color], None, None)
+
+    def remember(self, job, title, result):
+        """Keep the result of a job unless it failed."""
+
+        if not self._cache:
+            return
+        if job.name is None:
+            status_output, status_accent = result
+            text = (status_accent or '') + '\n' + status_output
+        else:
+            text, _, succeeded = result
+            if not succeeded:
+                return
+        self._cache.put(self._key(title), text)
+
+    def recall(self, job, title):
+        """Returns the last result of a job and seconds since it was kept, or None if there isn't one."""
+
+        cached = self._cache.get_with_age(self._key(title)) if self._cache else None
+        if cached is None:
+            return None
+        text, age = cached
+        if job.name is None:
+            status_accent, _, status_output = text.partition('\n')
+            return (status_output, status_accent), age
+        return (text, False, True), age
+
+    def evict(self):
+        if self._cache:
+            self._cache.evict()
+
+
+def _late_section(job, title, last, format_, show_empty, show_color):
+    """Print the section of a job that isn't ready from its last result, or as pending if there isn't one."""
+
+    recalled = last.recall(job, title) if last else None
+    if recalled is None:
+        return _print_section(title, _pending_accent(), None, format_, show_empty=True, color=show_color)
+
+    result, age = recalled
+    if job.name is None:
+        status_output, status_accent = result
+        accent = ' '.join(part for part in (status_accent, _stale_accent(age)) if part)
+        return _print_section(title, accent, status_output, format_, show_empty=show_empty, color=show_color)
+    return _print_section(title, _stale_accent(age), result[0], format_, show_empty=show_empty, color=show_color)
+
+
+def _sections(jobs, format_, show_empty, show_color, previous=None, changed=None):
+    """Run jobs and print their sections.
+
+    :param list jobs: the jobs
+    :param dict previous: the sections last printed. A job's section is reused unless its inputs changed.
+    :param set changed: the inputs that changed since previous was printed, see utils.watch
+
+    :return OrderedDict: each printed section keyed by its title
+    """
+
+    titles = [job.name or status.title() for job in jobs]
+    stale = [
+        previous is None or title not in previous or 'config' in changed or _is_stale(job, changed)
+        for job, title in zip(jobs, titles)
+    ]
+    results = iter(parallel.call_all([job.run for job, run in zip(jobs, stale) if run], _MAX_WORKERS))
+
+    sections = OrderedDict()
+    for job, title, run in zip(jobs, titles, stale):
+        sections[title] = _section(job, title, next(results), format_, show_empty, show_color) if run else previous[title]
+    return sections
+
+
+def _stream(jobs, order, format_, show_empty, show_color, deadline=None, last=None, late=None):
+    """Run jobs, yielding their sections in the order to print them as soon as each is ready.
+
+    :param float deadline: when, as a time.time() value, to stop waiting for jobs or None to wait for every job
+    :param _LastResults last: where the result of each job is kept and recalled for those not ready by the deadline
+    :param list late: where the titles of jobs not ready by the deadline are added
+    """
+
+    titles = [job.name or status.title() for job in jobs]
+    by_title = dict(zip(titles, jobs))
+    titles = _order_titles(titles, order)
+    jobs = [by_title[title] for title in titles]
+
+    results = parallel.imap([job.run for job in jobs], _MAX_WORKERS, deadline)
+    try:
+        for job, title in zip(jobs, titles):
+            result = next(results)
+            if result is parallel.LATE:
+                late.append(title)
+                yield _late_section(job, title, last, format_, show_empty, show_color)
+                continue
+            if last:
+                last.remember(job, title, result)
+            yield _section(job, title, result, format_, show_empty, show_color)
+    finally:
+        results.close()
+
+
+def _refresh_claim():
+    git_dir = directories.git_directory()
+    return os.path.join(git_dir, _REFRESH_CLAIM) if git_dir else None
+
+
+def _claim_refresh(claim):
+    """Claim refreshing late sections so only one refresh runs at a time.
+
+    :param str claim: the path of the claim
+
+    :return bool: whether it was claimed, False if a refresh is already running
+    """
+
+    try:
+        if not os.path.isdir(os.path.dirname(claim)):
+            os.makedirs(os.path.dirname(claim))
+        try:
+            descriptor = os.open(claim, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError as error:
+            if error.errno != errno.EEXIST or time.time() - os.path.getmtime(claim) < _REFRESH_CLAIM_AGE:
+                return False
+            os.remove(claim)  # left by a refresh that died
+            descriptor = os.open(claim, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.close(descriptor)
+    except OSError:
+        return False
+    return True
+
+
+def _release_refresh(claim):
+    try:
+        os.remove(claim)
+    except OSError:
+        pass  # already released
+
+
+def _refresh_in_background(titles, **kwargs):
+    """Run late sections again in a detached process that keeps their results for the next state.
+
+    :param list titles: the sections to run
+    """
+
+    claim = _refresh_claim()
+    if not claim or not _claim_refresh(claim):
+        return
+
+    command = [sys.executable, os.path.abspath(sys.argv[0]), 'view', '--color', kwargs.get('show_color'), '--refresh'] + titles
+    options = kwargs.get('options')
+    if options:
+        command += ['--options'] + ['{}:{}'.format(name, option) for name, values in options.iteritems() for option in values]
+    if kwargs.get('summary') is not None:
+        command.append('--summary' if kwargs.get('summary') else '--no-summary')
+
+    try:
+        with open(os.devnull, 'r+') as devnull:
+            # its own session so it outlives this process and doesn't see the user's interrupt
+            execute.popen(command, stdin=devnull, stdout=devnull, stderr=devnull, preexec_fn=os.setsid, close_fds=True)
+    except OSError:
+        _release_refresh(claim)
+
+
+def _refresh(context, titles, **kwargs):
+    """Run sections and keep their results to show when a later state runs out of budget.
+
+    :param RepoContext context: facts about the current repository
+    :param list titles: the sections to run
+    """
+
+    claim = _refresh_claim()
+    try:
+        registry_ = registry.load()
+        kwargs['show_extensions'] = registry_.keys() + ['status']  # even those hidden by config
+        with coprocess.pool() as coprocesses:
+            jobs, cache = _jobs(context, registry_, coprocesses=coprocesses, **kwargs)
+            jobs = [job for job in jobs if (job.name or status.title()) in titles]
+            results = parallel.call_all([job.run for job in jobs], _MAX_WORKERS)
+
+        last = _LastResults(_open_cache(), kwargs.get('show_color'))
+        for job, result in zip(jobs, results):
+            last.remember(job, job.name or status.title(), result)
+        last.evict()
+        if cache:
+            cache.evict()
+    finally:
+        if claim:
+            _release_refresh(claim)
+
+
+def _redraw(previous, current):
+    """Redraw the screen from the first line that changed.
+
+    :param str previous: what was last drawn or None if nothing was
+    :param str current: what to draw
+    """
+
+    if not sys.stdout.isatty():
+        if current != previous:
+            messages.info(current)
+        return
+
+    previous_lines = previous.splitlines() if previous is not None else []
+    current_lines = current.splitlines()
+    terminal_lines = terminal.lines()
+    if previous is None or terminal_lines is None or max(len(previous_lines), len(current_lines)) >= terminal_lines:
+        sys.stdout.write(terminal.CLEAR_SCREEN + current + os.linesep)
+    else:
+        first = 0
+        while first < min(len(previous_lines), len(current_lines)) and previous_lines[first] == current_lines[first]:
+            first += 1
+        if first == len(previous_lines) == len(current_lines):
+            return
+        sys.stdout.write(terminal.CLEAR_FROM_LINE.format(first + 1) + ''.join(line + os.linesep for line in current_lines[first:]))
+    sys.stdout.flush()
+
+
+def _watch(context, **kwargs):
+    """Print the state of the working tree and reprint whatever changes until interrupted."""
+
+    format_ = kwargs.get('format_')
+    show_empty = kwargs.get('show_empty')
+    show_color = kwargs.get('show_color')
+
+    drawn = None
+    sections = None
+    changed = None
+    # persistent extensions are started once and kept for every render
+    with watch.watch() as watcher, coprocess.pool() as coprocesses:
+        try:
+            while True:
+                registry_ = registry.load()
+                jobs, cache = _jobs(context, registry_, coprocesses=coprocesses, **kwargs)
+                sections = _sections(jobs, format_, show_empty, show_color, sections, changed)
+                if cache:
+                    cache.evict()
+
+                order = kwargs.get('order', registry_.order)
+                current = _join_sections(sections, order)
+                _redraw(drawn, current)
+                drawn = current
+
+                ttls = [job.ttl for job in jobs if job.ttl is not None]
+                changed = watcher.wait(min(ttls) if ttls else None)
+                context = RepoContext()
+        except KeyboardInterrupt:
+            pass
+
+
 def state(**kwargs):
     """Print the state of the working tree.
 
@@ -177,13 +903,33 @@ def state(**kwargs):
     :keyword list order: order to print sections in
     :keyword bool clear: clear terminal before printing
     :keyword bool page: page output if too long
+    :keyword bool watch: keep printing the state as it changes until interrupted
+    :keyword bool summary: summarize the status section or None to summarize only when there are many changed paths
+    :keyword int budget: milliseconds to wait for sections. Those not ready are shown from their last result, or as
+        pending, and refreshed in the background. None or 0 waits for every section. Ignored when watching.
+    :keyword list refresh: only run these sections, keeping their results for a later budgeted state, and print nothing
+    :keyword str prompt: print only a one-line summary in this format for shell prompts, see stateextensions.prompt.
+        Nothing is printed outside of a repository.
+    :keyword RepoContext context: facts about the current repository
     """
 
-    if not directories.is_git_repository():
+    started = time.time()
+    budget = kwargs.pop('budget', None)
+    refresh = kwargs.pop('refresh', None)
+
+    context = kwargs.pop('context', None) or RepoContext()
+    prompt_format = kwargs.pop('prompt', None)
+    if prompt_format is not None:
+        # prompts are shown from anywhere in a worktree, not only its top level
+        if context.git_directory():
+            messages.info(prompt.render(prompt_format, context))
+        return
+
+    if not context.is_git_repository():
         messages.error('{0!r} not a git repository'.format(os.getcwd()))
 
     show_color = git.resolve_coloring(kwargs.get('show_color').lower())
-    colorama.init(strip=(show_color == 'never'))
+    _init_color(strip=(show_color == 'never'))
 
     kwargs['show_color'] = show_color
     kwargs['show_clean_message'] = git.get_config_value(
@@ -192,50 +938,41 @@ def state(**kwargs):
         as_type=parse_string.as_bool
     )
 
-    format_ = kwargs.get('format_')
-    show_empty = kwargs.get('show_empty')
-    ignore_extensions = kwargs.get('ignore_extensions')
-    show_extensions = list(set(kwargs.get('show_extensions', [])))
-
-    sections = OrderedDict()
-    if git.is_empty_repository():
-        extensions = ['status']
-        extensions = list(set(show_extensions).union(set(extensions) - set(ignore_extensions)))
-
-        if 'status' in extensions:
-            status_output = status.get(new_repository=True, **kwargs)
-            status_title = status.title()
-            status_accent = status.accent(new_repository=True, **kwargs)
-            sections[status_title] = _print_section(status_title, status_accent, status_output, format_, show_empty=show_empty, color=show_color)
-            extensions.remove('status')
-    else:
-        extensions = get_extensions() + ['status']
-        extensions = list(set(show_extensions).union(set(extensions) - set(ignore_extensions)))
-
-        if 'status' in extensions:
-            status_output = status.get(**kwargs)
-            status_title = status.title()
-            status_accent = status.accent(show_color=show_color)
-            sections[status_title] = _print_section(status_title, status_accent, status_output, format_, show_empty=show_empty, color=show_color)
-            extensions.remove('status')
-
-        # show any user defined sections
-        options = kwargs.get('options')
-        for extension in extensions or []:
-
-            # skip if we should ignore this extension
-            if extension not in show_extensions and not git.get_config_value('git-state.extensions.' + extension + '.show', default=True, as_type=parse_string.as_bool):
-                continue
-
-            extension_name, extension_text = _run_extension(extension, options, show_color)
-
-            sections[extension_name] = _print_section(
-                title=extension_name,
-                text=extension_text,
-                format_=format_,
-                show_empty=show_empty,
-                color=show_color
-            )
-
-    order = kwargs.get('order', git.get_config_value('git-state.order', default=[], as_type=parse_string.as_delimited_list('|')))
-    _print_sections(sections, order, kwargs.get('page', True), kwargs.get('clear'))
+    if refresh:
+        kwargs.pop('watch', None)
+        _refresh(context, refresh, **kwargs)
+        return
+
+    if kwargs.pop('watch', False):
+        _watch(context, **kwargs)
+        return
+
+    processes = _Processes()
+    coprocesses = coprocess.pool()
+    registry_ = registry.load()
+    jobs, cache = _jobs(context, registry_, processes, coprocesses, **kwargs)
+    order = kwargs.get('order', registry_.order)
+
+    deadline = started + budget / 1000.0 if budget and budget > 0 else None
+    last = _LastResults(_open_cache(), show_color) if deadline else None
+    late = []
+
+    sections = _stream(jobs, order, kwargs.get('format_'), kwargs.get('show_empty'), show_color, deadline, last, late)
+    try:
+        if not _stream_sections(sections, kwargs.get('page', True), kwargs.get('clear'), processes.cancel):
+            processes.cancel()  # the reader went away so nothing else will be printed
+    except KeyboardInterrupt:
+        processes.cancel()  # extensions in their own process groups don't see the interrupt
+        raise
+    finally:
+        sections.close()
+        if late:
+            processes.cancel()  # late sections are refreshed in the background instead
+        coprocesses.close()
+
+    if late:
+        _refresh_in_background(late, **kwargs)
+    if last:
+        last.evict()
+    if cache:
+        cache.evict()
@@ -0,0 +1,151 @@
+"""A one-line summary of the repository for shell prompts, see `git state --prompt`.
+
+Only what the format uses is computed. HEAD is read from the ref store without running git, the counts come from a
+single `git status --porcelain=v2` that counts paths rather than listing them, and the rendered prompt is cached until
+HEAD, the index, or refs change.
+"""
+
+import os
+import string
+import subprocess
+
+from . import status
+from ..utils import execute, git, messages, refs, resultcache
+from ..utils.context import RepoContext
+
+DEFAULT_FORMAT = '{branch}{behind: <}{ahead: >}{conflicts: !}{staged: +}{unstaged: ~}{untracked: ?}{changes: ^}'
+FIELDS = ('branch', 'ahead', 'behind', 'staged', 'unstaged', 'untracked', 'conflicts', 'changes')
+
+# fields that need a status scan, and those that depend on the working tree which the fingerprint doesn't cover
+_STATUS_FIELDS = frozenset(['ahead', 'behind', 'staged', 'unstaged', 'untracked', 'conflicts'])
+_PATH_FIELDS = frozenset(['staged', 'unstaged', 'untracked', 'conflicts'])
+
+_BASES = ('head', 'index', 'refs')
+_DEFAULT_TTL = 5.0
+
+
+class _Formatter(string.Formatter):
+    """Formats a field with a spec as the spec followed by the value, or nothing when the value is empty or zero."""
+
+    def format_field(self, value, format_spec):
+        if format_spec:
+            return format_spec + str(value) if value else ''
+        return str(value)
+
+
+_FORMATTER = _Formatter()
+
+
+def fields(format_):
+    """Returns the fields a format uses.
+
+    :param str format_: the format
+
+    :return set: the field names
+    """
+
+    try:
+        return set(name for _, name, _, _ in _FORMATTER.parse(format_) if name is not None)
+    except ValueError as error:
+        messages.error('invalid prompt format {0!r}: {1}'.format(format_, error))
+
+
+def _branch(context):
+    """Returns the current branch or the abbreviated commit when HEAD is detached."""
+
+    try:
+        store = refs.store()
+        target = store.symbolic_target('HEAD')
+        if target:
+            return store.shorten(target)
+        sha = store.resolve('HEAD')
+        return sha[:7] if sha else ''
+    except refs.RefsUnavailable:
+        branch = context.current_branch()
+        return (git.resolve_sha1('HEAD') or '')[:7] if branch == 'HEAD' else branch or ''
+
+
+def _association(branch):
+    """Returns what `git changes` compares a branch with when not given a commit-ish."""
+
+    associated = git.get_config_value('git-changes.associations.' + branch + '.with', config='local') if branch else None
+    return associated or git.get_config_value('git-changes.default-commit-ish', default='refs/heads/master')
+
+
+def _count_changes(association):
+    """Returns the commits `git changes --details=count` would count, 0 if the association doesn't resolve."""
+
+    with open(os.devnull, 'w') as devnull:
+        proc = execute.popen(['git', 'rev-list', '--count', association + '..HEAD'], stdout=subprocess.PIPE, stderr=devnull)
+        output = proc.communicate()[0]
+    return int(output) if not proc.returncode and output.strip() else 0
+
+
+def _counts(scan):
+    """Returns the changed paths of a status scan counted by kind."""
+
+    counts = dict.fromkeys(_PATH_FIELDS, 0)
+    groups = scan.summary.counts.iteritems() if scan.summary else []
+    for (code, _), paths in groups:
+        if code == '??':
+            counts['untracked'] += paths
+        elif code in status.UNMERGED:
+            counts['conflicts'] += paths
+        else:
+            counts['staged'] += paths if code[0] != ' ' else 0
+            counts['unstaged'] += paths if code[1] != ' ' else 0
+    return counts
+
+
+def _values(used, context, branch, association):
+    values = dict.fromkeys(FIELDS, 0)
+    values['branch'] = branch
+    if used & _STATUS_FIELDS:
+        # untracked directories are counted rather than every file inside them, which is what makes this fast
+        scan = context.status('normal' if 'untracked' in used else 'no', summary_threshold=0)
+        values['ahead'] = scan.branch.ahead or 0
+        values['behind'] = scan.branch.behind or 0
+        values.update(_counts(scan))
+    if 'changes' in used:
+        values['changes'] = _count_changes(association)
+    return values
+
+
+def render(format_=DEFAULT_FORMAT, context=None):
+    """Returns the prompt.
+
+    A field with a format spec, such as {ahead: >}, is shown as the spec followed by its value and left out entirely
+    when the value is zero.
+
+    :param str format_: the format, using the names in FIELDS
+    :param RepoContext context: facts about the current repository
+
+    :return str: the prompt
+    """
+
+    context = context or RepoContext()
+    used = fields(format_)
+    unknown = used - set(FIELDS)
+    if unknown:
+        messages.error('unknown prompt field {0!r}. Use any of: {1}'.format(sorted(unknown)[0], ', '.join(FIELDS)))
+
+    branch = _branch(context)
+    association = _association(branch) if 'changes' in used else None
+
+    # the working tree isn't fingerprinted so counts of its paths are only reused for a while
+    ttl = git.get_config_value('git-state.prompt.ttl', default=_DEFAULT_TTL, as_type=float) if used & _PATH_FIELDS else None
+    cache = resultcache.open_(
+        git.get_config_value('git-state.cache.max-size', default=resultcache.DEFAULT_MAX_SIZE, as_type=int)
+    )
+    fingerprint = resultcache.fingerprint(_BASES, context) if cache else None
+    key = resultcache.key(['git-state', 'prompt', format_, association], _BASES, fingerprint) if fingerprint else None
+    if key:
+        cached = cache.get(key, ttl)
+        if cached is not None:
+            return cached
+
+    prompt = _FORMATTER.format(format_, **_values(used, context, branch, association))
+    if key:
+        cache.put(key, prompt)
+        cache.evict()
+    return prompt
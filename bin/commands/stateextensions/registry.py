@@ -0,0 +1,172 @@
+"""The extensions configured under git-state.extensions.<extension>.
+
+Every git-state key is read at once, as `git config --null --get-regexp '^git-state\\.'` would list them, and grouped
+into one record per extension. Values are converted when first used so a malformed value only fails whatever needs it.
+"""
+
+import collections
+from subprocess import PIPE
+
+from ..utils import execute, gitconfig, messages, parse_string, resultcache
+
+_PATTERN = '^git-state\\.'
+_EXTENSIONS_PREFIX = 'git-state.extensions.'
+_ORDER_KEY = 'git-state.order'
+
+# oneshot starts the command for every render, persistent starts it once and sends it requests, see utils.coprocess
+PROTOCOLS = ('oneshot', 'persistent')
+
+
+def _convert(key, value, default, as_type):
+    """Convert a value the way git.get_config_value does."""
+
+    value = (value or '').strip()
+    if not value:
+        return default
+    try:
+        return as_type(value)
+    except ValueError:
+        messages.error('Cannot parse value {0!r} for key {1!r} using format {2!r}'.format(value, key, as_type.__name__))
+
+
+class Extension(object):
+    """A configured extension.
+
+    :ivar str key: the extension as named in its config section and by the extensions subcommands
+    :ivar list entries: its (variable, value) entries in precedence order
+    """
+
+    __slots__ = ('key', 'entries', '_values')
+
+    def __init__(self, key):
+        self.key = key
+        self.entries = []
+        self._values = {}
+
+    def _add(self, variable, value):
+        self.entries.append((variable, value))
+        self._values.setdefault(variable, []).append(value)
+
+    def _get(self, variable, default=None, as_type=str):
+        values = self._values.get(variable)
+        return _convert(_EXTENSIONS_PREFIX + self.key + '.' + variable, values[-1] if values else None, default, as_type)
+
+    @property
+    def command(self):
+        """The command or None if none is configured."""
+        return self._get('command')
+
+    @property
+    def module(self):
+        """The function called in-process instead of a command, as package.module:function, or None."""
+        return self._get('module')
+
+    @property
+    def name(self):
+        """The section title, the key unless configured."""
+        return self._get('name', default=self.key)
+
+    @property
+    def options(self):
+        """Every configured options value, lowest precedence first."""
+        return [value.strip() for value in self._values.get('options', []) if value and value.strip()]
+
+    @property
+    def show(self):
+        """Whether the section is shown unless asked for."""
+        return self._get('show', default=True, as_type=parse_string.as_bool)
+
+    @property
+    def color(self):
+        """Whether the command is passed --color=<when>."""
+        return self._get('color', default=True, as_type=parse_string.as_bool)
+
+    @property
+    def timeout(self):
+        """Seconds the command may run or None if it isn't limited."""
+        return self._get('timeout', as_type=float)
+
+    @property
+    def protocol(self):
+        """How the command is run, one of PROTOCOLS."""
+        protocol = self._get('protocol', default='oneshot')
+        if protocol not in PROTOCOLS:
+            messages.error('invalid value {0!r} for {1}. Use one of: {2}'.format(
+                protocol,
+                _EXTENSIONS_PREFIX + self.key + '.protocol',
+                ', '.join(PROTOCOLS)
+            ))
+        return protocol
+
+    @property
+    def cache(self):
+        """What cached output depends on or None if it isn't cached."""
+        return self._get('cache', as_type=resultcache.parse_basis)
+
+
+class ExtensionRegistry(object):
+    """The configured extensions, in the order they first appear in config.
+
+    :param list entries: (key, value) git-state entries in precedence order with keys canonical as git lists them
+
+    :ivar list order: the configured section order, git-state.order
+    """
+
+    def __init__(self, entries):
+        self._extensions = collections.OrderedDict()
+        order = None
+        for key, value in entries:
+            if key == _ORDER_KEY:
+                order = value
+            elif key.startswith(_EXTENSIONS_PREFIX):
+                extension, _, variable = key[len(_EXTENSIONS_PREFIX):].rpartition('.')
+                if extension:
+                    self._extensions.setdefault(extension, Extension(extension))._add(variable, value)
+        self.order = _convert(_ORDER_KEY, order, [], parse_string.as_delimited_list('|'))
+
+    def __contains__(self, key):
+        return key in self._extensions
+
+    def __iter__(self):
+        return iter(self._extensions.values())
+
+    def __len__(self):
+        return len(self._extensions)
+
+    def get(self, key):
+        """Returns an extension or None if it isn't configured.
+
+        :param str key: the extension
+        """
+
+        return self._extensions.get(key)
+
+    def keys(self):
+        """Returns every configured extension."""
+
+        return list(self._extensions)
+
+
+def _parse_null_list(output):
+    """Parse the output of `git config --null --get-regexp`."""
+
+    entries = []
+    for record in output.split('\0'):
+        if record:
+            key, _, value = record.partition('\n')
+            entries.append((key, value))
+    return entries
+
+
+def load():
+    """Read every git-state key at once.
+
+    :return ExtensionRegistry: the configured extensions
+    """
+
+    try:
+        entries = gitconfig.get_regexp(_PATTERN)
+    except gitconfig.ConfigUnavailable:
+        proc = execute.popen(['git', 'config', '--null', '--get-regexp', _PATTERN], stdout=PIPE)
+        entries = _parse_null_list(proc.communicate()[0])
+    return ExtensionRegistry(entries)
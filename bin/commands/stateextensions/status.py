@@ -1,27 +1,239 @@
 import os
-import re
-import subprocess
 
-from colorama import Fore
+from ..utils import git, gitcolor, messages, parse_string
+from ..utils.context import RepoContext
+
+# color.status slot -> default, as in git's wt-status.c
+_COLOR_SLOTS = {
+    'header': 'normal',
+    'updated': 'green',
+    'changed': 'red',
+    'untracked': 'red',
+    'nobranch': 'red',
+    'unmerged': 'red',
+    'localbranch': 'green',
+    'remotebranch': 'red'
+}
+_COLOR_ALIASES = {'updated': 'added'}
+
+# git-state.status.untracked-files -> how git status is asked to show untracked files
+_UNTRACKED_FILES = ('all', 'normal', 'no', 'auto')
+_DEFAULT_UNTRACKED_LIMIT = 1000
+_DEFAULT_UNTRACKED_TIMEOUT = 1.0
+
+_DEFAULT_SUMMARY_THRESHOLD = 1000
+_DEFAULT_SUMMARY_LIMIT = 10
+
+# short format statuses of unmerged paths, as in git's wt-status.c
+UNMERGED = frozenset(('DD', 'AU', 'UD', 'UA', 'DU', 'AA', 'UU'))
+
+_C_ESCAPES = {'\a': 'a', '\b': 'b', '\t': 't', '\n': 'n', '\v': 'v', '\f': 'f', '\r': 'r', '"': '"', '\\': '\\'}
 
 
 def title():
     return 'status'
 
 
+def _summary_threshold(summary):
+    """Returns the most entries to list before summarizing them or None to never summarize."""
+
+    if summary is not None:
+        return 0 if summary else None
+    threshold = git.get_config_value(
+        'git-state.status.summary-threshold',
+        default=_DEFAULT_SUMMARY_THRESHOLD,
+        as_type=int
+    )
+    return threshold if threshold > 0 else None
+
+
+def scan(context, new_repository, summary=None):
+    """Returns the single status scan shared by the accent, the listing, and the fingerprint of the working tree.
+
+    :param bool summary: whether to summarize the changed paths or None to summarize only when there are many
+    """
+
+    context = context or RepoContext()
+    summary_threshold = _summary_threshold(summary)
+    if new_repository:
+        return context.status('normal', summary_threshold=summary_threshold)
+
+    untracked_files = git.get_config_value('git-state.status.untracked-files', default='all')
+    if untracked_files not in _UNTRACKED_FILES:
+        messages.error('invalid value {0!r} for git-state.status.untracked-files. Use one of: {1}'.format(
+            untracked_files,
+            ', '.join(_UNTRACKED_FILES)
+        ))
+    if untracked_files != 'auto':
+        return context.status(untracked_files, summary_threshold=summary_threshold)
+
+    return context.status(
+        'auto',
+        untracked_limit=git.get_config_value(
+            'git-state.status.untracked-limit',
+            default=_DEFAULT_UNTRACKED_LIMIT,
+            as_type=int
+        ),
+        timeout=git.get_config_value(
+            'git-state.status.untracked-timeout',
+            default=_DEFAULT_UNTRACKED_TIMEOUT,
+            as_type=float
+        ),
+        summary_threshold=summary_threshold
+    )
+
+
+def _colors(show_color):
+    """Returns each color.status slot's escape sequence, or empty sequences when not coloring."""
+
+    if show_color != 'always':
+        return dict((slot, '') for slot in _COLOR_SLOTS)
+
+    colors = {}
+    for slot, default in _COLOR_SLOTS.iteritems():
+        value = git.get_config_value('color.status.' + slot)
+        if value is None and slot in _COLOR_ALIASES:
+            value = git.get_config_value('color.status.' + _COLOR_ALIASES[slot])
+        try:
+            colors[slot] = gitcolor.parse(value if value is not None else default)
+        except gitcolor.InvalidColor as error:
+            messages.error(str(error))
+    return colors
+
+
+def _quote(path, quote_high_bytes):
+    """Quote a path the way `git status --short` does."""
+
+    quoted = []
+    needs_quotes = ' ' in path
+    for character in path:
+        code = ord(character)
+        if character in _C_ESCAPES:
+            quoted.append('\\' + _C_ESCAPES[character])
+        elif code < 0x20 or code == 0x7f or (quote_high_bytes and code >= 0x80):
+            quoted.append('\\{:03o}'.format(code))
+        else:
+            quoted.append(character)
+            continue
+        needs_quotes = True
+    return '"{}"'.format(''.join(quoted)) if needs_quotes else path
+
+
+def _worktree_status(entry):
+    """Returns the working tree letter, distinguishing how a submodule changed like the short format."""
+
+    submodule = entry.submodule
+    if submodule[0] != 'S' or entry.worktree != 'M':
+        return entry.worktree
+    if submodule[1] == 'C':
+        return 'M'
+    if submodule[2] == 'M':
+        return 'm'
+    if submodule[3] == 'U':
+        return '?'
+    return entry.worktree
+
+
+def _short_format(entries, colors, quote_high_bytes):
+    """Render entries like `git status --short`."""
+
+    lines = []
+    for entry in entries:
+        path = _quote(entry.path, quote_high_bytes)
+        if entry.kind == 'untracked':
+            lines.append(gitcolor.colorize('??', colors['untracked']) + ' ' + path)
+        elif entry.kind == 'unmerged':
+            lines.append(gitcolor.colorize(entry.index + entry.worktree, colors['unmerged']) + ' ' + path)
+        elif entry.kind != 'ignored':
+            worktree = _worktree_status(entry)
+            index = gitcolor.colorize(entry.index, colors['updated']) if entry.index != ' ' else ' '
+            worktree = gitcolor.colorize(worktree, colors['changed']) if worktree != ' ' else ' '
+            if entry.original_path is not None:
+                path = _quote(entry.original_path, quote_high_bytes) + ' -> ' + path
+            lines.append(index + worktree + ' ' + path)
+    return ''.join(line + '\n' for line in lines)
+
+
+def _summary_format(summary, colors, quote_high_bytes, limit):
+    """Render the largest groups of a summary like `git status --short` with the number of paths in each."""
+
+    lines = []
+    listed = 0
+    for (code, directory), paths in summary.most_common(limit):
+        if code == '??':
+            code = gitcolor.colorize(code, colors['untracked'])
+        elif code in UNMERGED:
+            code = gitcolor.colorize(code, colors['unmerged'])
+        else:
+            index = gitcolor.colorize(code[0], colors['updated']) if code[0] != ' ' else ' '
+            code = index + (gitcolor.colorize(code[1], colors['changed']) if code[1] != ' ' else ' ')
+        lines.append('{} {} ({})'.format(code, _quote(directory, quote_high_bytes), paths))
+        listed += paths
+
+    remaining = len(summary.counts) - len(lines)
+    if remaining:
+        lines.append('... {} more group{} ({} paths)'.format(remaining, '' if remaining == 1 else 's', summary.total - listed))
+    return ''.join(line + '\n' for line in lines)
+
+
+def _branch_header(branch, colors):
+    """Render the branch header like `git status --short --branch`, without the leading '## '."""
+
+    header = colors['header']
+    parts = []
+    if branch.oid is None:
+        parts.append(gitcolor.colorize('No commits yet on ', header))
+    if branch.head is None:
+        parts.append(gitcolor.colorize('HEAD (no branch)', colors['nobranch']))
+        return ''.join(parts)
+
+    parts.append(gitcolor.colorize(branch.head, colors['localbranch']))
+    if branch.upstream is None:
+        return ''.join(parts)
+
+    parts.append(gitcolor.colorize('...', header))
+    parts.append(gitcolor.colorize(branch.upstream, colors['remotebranch']))
+    if not branch.gone and branch.ahead == 0 and branch.behind == 0:
+        return ''.join(parts)
+
+    parts.append(gitcolor.colorize(' [', header))
+    if branch.gone:
+        parts.append(gitcolor.colorize('gone', header))
+    elif branch.ahead is None:
+        parts.append(gitcolor.colorize('different', header))
+    elif not branch.ahead:
+        parts.append(gitcolor.colorize('behind ', header))
+        parts.append(gitcolor.colorize(str(branch.behind), colors['remotebranch']))
+    elif not branch.behind:
+        parts.append(gitcolor.colorize('ahead ', header))
+        parts.append(gitcolor.colorize(str(branch.ahead), colors['localbranch']))
+    else:
+        parts.append(gitcolor.colorize('ahead ', header))
+        parts.append(gitcolor.colorize(str(branch.ahead), colors['localbranch']))
+        parts.append(gitcolor.colorize(', behind ', header))
+        parts.append(gitcolor.colorize(str(branch.behind), colors['remotebranch']))
+    parts.append(gitcolor.colorize(']', header))
+    return ''.join(parts)
+
+
 def accent(**kwargs):
 
     new_repository = kwargs.get('new_repository', False)
     show_color = kwargs.get('show_color', 'always')
+    context = kwargs.get('context')
 
     if new_repository:
-        status_title = '{no_color}({green}master{no_color})'.format(no_color=Fore.RESET, green=Fore.GREEN)
+        status_title = '{no_color}({green}master{no_color})'.format(no_color=gitcolor.DEFAULT, green=gitcolor.GREEN)
     else:
-        status_title = subprocess.check_output(
-            ('git', '-c', 'color.status=' + show_color, 'status', '--branch', '--short')
-        ).splitlines()[0]
-        status_title = re.match('.*##.*? (.*)', status_title).group(1)
-        status_title = '{}({})'.format(Fore.RESET, status_title)
+        status_scan = scan(context, new_repository, kwargs.get('summary'))
+        status_title = '{}({})'.format(gitcolor.DEFAULT, _branch_header(status_scan.branch, _colors(show_color)))
+        notes = []
+        if status_scan.collapsed:
+            notes.append('untracked files collapsed')
+        if status_scan.summary:
+            notes.append('{} paths summarized'.format(status_scan.summary.total))
+        if notes:
+            status_title += ' ' + ', '.join(notes)
 
     return status_title
 
@@ -31,15 +243,20 @@ def get(**kwargs):
     new_repository = kwargs.get('new_repository', False)
     show_color = kwargs.get('show_color', 'always')
     show_clean_message = kwargs.get('show_clean_message', True)
+    context = kwargs.get('context')
 
-    status_command = ['git', '-c', 'color.status=' + show_color, 'status', '--short']
     if new_repository:
         no_changes_message = 'repository is empty'
     else:
-        status_command += ['--untracked-files=all']
         no_changes_message = 'working directory is clean'
 
-    status_output = subprocess.check_output(status_command)
+    quote_high_bytes = git.get_config_value('core.quotePath', default=True, as_type=parse_string.as_bool)
+    status_scan = scan(context, new_repository, kwargs.get('summary'))
+    if status_scan.summary:
+        limit = git.get_config_value('git-state.status.summary-limit', default=_DEFAULT_SUMMARY_LIMIT, as_type=int)
+        status_output = _summary_format(status_scan.summary, _colors(show_color), quote_high_bytes, limit)
+    else:
+        status_output = _short_format(status_scan.entries, _colors(show_color), quote_high_bytes)
     if not status_output and show_clean_message:
         status_output = 'nothing to commit, ' + no_changes_message + os.linesep
 
@@ -1,12 +1,12 @@
 """Get the current upstream branch."""
 
 import os
-import subprocess
 from subprocess import PIPE
 
 from enum import Enum
 
-from utils import directories, git, messages
+from utils import execute, git, messages
+from utils.context import RepoContext
 
 _MERGE_CONFIG = 'git config --local branch.{}.merge'
 _REMOTE_CONFIG = 'git config --local branch.{}.remote'
@@ -21,22 +21,24 @@ class IncludeRemote(Enum):
     NONE_LOCAL = 'Only include remote information when not a local remote'
 
 
-def upstream(branch=None, include_remote=IncludeRemote.NEVER):
+def upstream(branch=None, include_remote=IncludeRemote.NEVER, context=None):
     """Get the upstream branch of the current branch.
 
     :param str or unicode branch: the branch whose upstream to find
     :param IncludeRemote include_remote: include the remote name in the response
+    :param RepoContext context: facts about the current repository
 
     :return str or unicode: the upstream branch name or an empty string
     """
 
     assert type(include_remote) == IncludeRemote, "'include_remote' must be a {!r}. Given {!r}".format(IncludeRemote, type(include_remote))
 
-    if git.is_empty_repository():
+    context = context or RepoContext()
+    if context.is_empty_repository():
         return None
 
     if not branch:
-        branch = git.current_branch()
+        branch = context.current_branch()
     elif not git.is_valid_reference(branch):
         messages.error('{0!r} is not a valid branch'.format(branch))
 
@@ -46,13 +48,13 @@ def upstream(branch=None, include_remote=IncludeRemote.NEVER):
     # get remote name
     remote_name = None
     if remote_branch and include_remote != IncludeRemote.NEVER:
-        remote_name = subprocess.check_output(_REMOTE_CONFIG.format(branch).split()).strip()
+        remote_name = execute.check_output(_REMOTE_CONFIG.format(branch).split()).strip()
 
     return _upstream_info(remote_name, remote_branch, include_remote)
 
 
 def _get_remote_branch(branch):
-    proc = subprocess.Popen(_MERGE_CONFIG.format(branch).split(), stdout=PIPE)
+    proc = execute.popen(_MERGE_CONFIG.format(branch).split(), stdout=PIPE)
     upstream_info = proc.communicate()[0].strip()
     remote_branch = upstream_info.rsplit('/', 1)[-1]
     return remote_branch
@@ -0,0 +1,98 @@
+"""Repository facts shared across a single invocation."""
+
+import os
+
+import directories, execute, git, messages, parse_string
+
+
+class RepoContext(object):
+    """Memoizes facts about the current repository for the length of one invocation.
+
+    An entry point creates a single context and passes it to every command it runs so each fact is computed at most
+    once. Commands that change a fact, such as associating a branch or dropping a stash, must invalidate it.
+    """
+
+    def __init__(self):
+        self._facts = {}
+
+    def memoize(self, fact, compute):
+        """Return a fact, computing it only if it isn't already known.
+
+        :param fact: a hashable name for the fact. Tuples are grouped by their first element for invalidation.
+        :param callable compute: computes the fact
+
+        :return: the fact
+        """
+
+        if fact not in self._facts:
+            self._facts[fact] = compute()
+        return self._facts[fact]
+
+    def invalidate(self, *facts):
+        """Forget facts so they are recomputed on next use.
+
+        :param facts: the facts to forget. A name also forgets every tuple fact grouped under it. Forgets everything when
+            no facts are given.
+        """
+
+        if not facts:
+            self._facts.clear()
+            return
+
+        for known in list(self._facts):
+            group = known[0] if isinstance(known, tuple) else known
+            if known in facts or group in facts:
+                del self._facts[known]
+
+    def is_git_repository(self):
+        """Returns whether the current working directory is a Git repository."""
+
+        return self.memoize('is_git_repository', directories.is_git_repository)
+
+    def git_directory(self):
+        """Returns the git directory of the repository the current working directory is within or None, see
+        directories.git_directory."""
+
+        return self.memoize('git_directory', directories.git_directory)
+
+    def exit_if_not_git_repository(self):
+        if not self.is_git_repository():
+            messages.error('{0!r} not a git repository'.format(os.getcwd()))
+
+    def is_empty_repository(self):
+        """Returns whether the repository is empty."""
+
+        return self.memoize('is_empty_repository', git.is_empty_repository)
+
+    def current_branch(self):
+        """Returns the current branch. 'HEAD' is returned if detached."""
+
+        return self.memoize('current_branch', git.current_branch)
+
+    def is_detached(self):
+        """Returns whether HEAD is detached."""
+
+        return self.memoize('is_detached', git.is_detached)
+
+    def stashes(self):
+        """Returns the lines of `git stash list`."""
+
+        return self.memoize('stashes', lambda: execute.check_output(['git', 'stash', 'list']).splitlines())
+
+    def status(self, untracked_files='all', **limits):
+        """Returns a single status scan, see porcelain.status.
+
+        :param str untracked_files: how to show untracked files (all, normal, no, or auto)
+        :keyword int untracked_limit: with auto, the most untracked files to list individually
+        :keyword float timeout: with auto, the most seconds to spend listing untracked files individually
+        :keyword int summary_threshold: the most entries to list before summarizing them
+        """
+
+        import porcelain  # only commands that read the status need it
+
+        def scan():
+            # porcelain output ignores status.aheadBehind so it's applied here like the short format does
+            ahead_behind = git.get_config_value('status.aheadBehind', default=True, as_type=parse_string.as_bool)
+            return porcelain.status(untracked_files, ahead_behind, **limits)
+
+        return self.memoize(('status', untracked_files) + tuple(sorted(limits.iteritems())), scan)
@@ -0,0 +1,224 @@
+"""Long-lived processes sent requests as JSON lines.
+
+A coprocess is started once and kept running between requests so work like interpreter startup is only paid for once.
+Each request is a single line of JSON written to its stdin and each response a single line of JSON read from its
+stdout:
+
+    {"id": 1, "arguments": ["--color=never"], "directory": "/path/to/repo"}
+    {"id": 1, "status": 0, "output": "..."}
+
+A nonzero status means the output is an error message. A coprocess that exits, closes stdout, or responds with
+something that isn't JSON is started again.
+
+Commands get their pool from pool(). It's a pool of their own unless something longer lived, such as the daemon, shared
+one with share(), in which case coprocesses outlive the command.
+"""
+
+import json
+import os
+import signal
+import threading
+import time
+from subprocess import PIPE
+
+import execute
+
+# how long a coprocess may take to exit once its stdin is closed before it's killed
+_STOP_GRACE = 0.5
+_STOP_INTERVAL = 0.01
+
+# how much of what a crashed coprocess wrote to stderr to show
+_ERROR_TAIL = 4096
+
+_shared = None
+
+
+def _kill(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass  # already exited
+
+
+class Coprocess(object):
+    """A command started on first use and sent requests one at a time.
+
+    :param list command: the command
+    :param str directory: where to start the command
+    :param dict environment: the command's environment (default: this process's)
+    """
+
+    def __init__(self, command, directory, environment=None):
+        self.command = command
+        self.directory = directory
+        self.environment = environment
+        self._proc = None
+        self._stderr = None
+        self._requests = 0
+        self._stopping = False
+        self._lock = threading.Lock()
+
+    def _start(self):
+        import tempfile  # only a persistent extension's first request needs it
+        self._stderr = tempfile.TemporaryFile()
+        # its own process group so anything it starts is killed with it, and it doesn't see the user's interrupt
+        self._proc = execute.popen(
+            self.command,
+            stdin=PIPE,
+            stdout=PIPE,
+            stderr=self._stderr,
+            cwd=self.directory,
+            env=self.environment,
+            close_fds=True,  # it may outlive whatever else this process has open
+            preexec_fn=os.setsid
+        )
+
+    def _error(self):
+        """Returns the end of what the process wrote to stderr."""
+
+        self._stderr.seek(0, os.SEEK_END)
+        self._stderr.seek(max(0, self._stderr.tell() - _ERROR_TAIL))
+        return self._stderr.read()
+
+    def _exchange(self, request, timeout):
+        """Send a request and read its response.
+
+        :return tuple: the response or None if the process timed out or crashed, and whether it timed out
+        """
+
+        proc = self._proc
+        timed_out = threading.Event()
+        timer = None
+        if timeout:
+            timer = threading.Timer(timeout, lambda: (timed_out.set(), _kill(proc)))
+            timer.start()
+        try:
+            proc.stdin.write(json.dumps(request) + '\n')
+            proc.stdin.flush()
+            while True:
+                line = proc.stdout.readline()
+                if not line:
+                    return None, timed_out.is_set()
+                response = json.loads(line)
+                if response.get('id', request['id']) == request['id']:
+                    return response, False
+        except (IOError, ValueError):
+            return None, timed_out.is_set()  # a broken pipe or a line that isn't JSON
+        finally:
+            if timer:
+                timer.cancel()
+
+    def request(self, arguments, timeout=None):
+        """Send a request, starting the command if it isn't running and again if it crashes.
+
+        :param list arguments: the arguments for this request
+        :param float timeout: seconds to wait for the response before killing the command
+
+        :return tuple: the text to show, whether the command timed out, and whether it succeeded
+        """
+
+        with self._lock:
+            for _ in range(2):
+                if self._proc is None:
+                    self._start()
+                self._requests += 1
+                request = {'id': self._requests, 'arguments': arguments, 'directory': self.directory}
+
+                response, timed_out = self._exchange(request, timeout)
+                if response is not None:
+                    output = response.get('output', '')
+                    output = output.encode('utf-8') if isinstance(output, unicode) else output
+                    return output, False, not response.get('status', 0)
+
+                error = self._error()
+                self._stop(0)
+                if timed_out or self._stopping:
+                    return '', timed_out, False
+            return error, False, False
+
+    def _stop(self, grace):
+        """Close the command's stdin, killing it if it hasn't exited after grace seconds."""
+
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+        except IOError:
+            pass  # it already exited
+
+        deadline = time.time() + grace
+        while proc.poll() is None and time.time() < deadline:
+            time.sleep(_STOP_INTERVAL)
+        _kill(proc)
+        proc.wait()
+        proc.stdout.close()
+        self._stderr.close()
+
+    def stop(self):
+        """Stop the command if it's running. A request still waiting on it is abandoned rather than waited for."""
+
+        self._stopping = True
+        if not self._lock.acquire(False):
+            proc = self._proc
+            if proc is not None:
+                _kill(proc)
+            self._lock.acquire()
+        try:
+            self._stop(_STOP_GRACE)
+        finally:
+            self._stopping = False
+            self._lock.release()
+
+
+class Pool(object):
+    """Coprocesses kept between requests, one per command and directory."""
+
+    def __init__(self):
+        self._coprocesses = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, command, directory=None, environment=None):
+        """Returns the coprocess for a command, creating it if needed. It isn't started until its first request.
+
+        :param list command: the command
+        :param str directory: where to start the command (default: the current working directory)
+        :param dict environment: the command's environment if it has to be created (default: this process's)
+        """
+
+        directory = directory or os.getcwd()
+        key = (tuple(command), directory)
+        with self._lock:
+            if key not in self._coprocesses:
+                self._coprocesses[key] = Coprocess(command, directory, environment)
+            return self._coprocesses[key]
+
+    def close(self):
+        """Stop every coprocess."""
+
+        with self._lock:
+            coprocesses, self._coprocesses = self._coprocesses.values(), {}
+        for coprocess in coprocesses:
+            coprocess.stop()
+
+
+def share(pool_):
+    """Have pool() return a pool kept by something longer lived than this command.
+
+    :param pool_: an object with Pool's get method and a close method that leaves its coprocesses running
+    """
+
+    global _shared
+    _shared = pool_
+
+
+def pool():
+    """Returns the pool to keep this command's coprocesses in, shared if something longer lived shared one."""
+
+    return _shared or Pool()
@@ -14,3 +14,73 @@ def exit_if_not_git_repository(directory=None):
         directory = os.getcwd()
     if not is_git_repository(directory):
         messages.error('{0!r} not a git repository'.format(directory))
+
+
+def _read_gitfile(path):
+    """Returns the git directory a gitfile points to or None if the file isn't a gitfile."""
+
+    try:
+        with open(path) as gitfile:
+            contents = gitfile.read(4096).strip()
+    except (IOError, OSError):
+        return None
+    if not contents.startswith('gitdir:'):
+        return None
+    return os.path.normpath(os.path.join(os.path.dirname(path), contents[len('gitdir:'):].strip()))
+
+
+def _is_git_directory(path):
+    return os.path.isfile(os.path.join(path, 'HEAD')) and (
+        os.path.isdir(os.path.join(path, 'objects')) or os.path.isfile(os.path.join(path, 'commondir'))
+    )
+
+
+def git_directory(directory=None):
+    """Returns the git directory of a repository the same way git discovers it.
+
+    $GIT_DIR is respected and gitfiles, as used by linked worktrees and submodules, are followed.
+
+    :param str or unicode directory: the directory to start searching from (default: the current directory)
+
+    :return str or unicode: the absolute path of the git directory or None if not within a repository
+    """
+
+    try:
+        directory = os.path.abspath(directory or os.getcwd())
+    except OSError:
+        return None  # the working directory no longer exists
+
+    if os.environ.get('GIT_DIR'):
+        git_dir = os.path.join(directory, os.environ['GIT_DIR'])
+        return os.path.normpath(git_dir) if _is_git_directory(git_dir) else None
+
+    while True:
+        dot_git = os.path.join(directory, '.git')
+        if os.path.isdir(dot_git) and _is_git_directory(dot_git):
+            return dot_git
+        elif os.path.isfile(dot_git):
+            git_dir = _read_gitfile(dot_git)
+            if git_dir and _is_git_directory(git_dir):
+                return git_dir
+        elif _is_git_directory(directory):
+            return directory  # bare repository
+
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+def common_directory(git_dir):
+    """Returns the directory holding the data shared between all worktrees of a repository.
+
+    :param str or unicode git_dir: a git directory
+
+    :return str or unicode: the common directory, which is the git directory itself outside of linked worktrees
+    """
+
+    try:
+        with open(os.path.join(git_dir, 'commondir')) as commondir:
+            return os.path.normpath(os.path.join(git_dir, commondir.read().strip()))
+    except (IOError, OSError):
+        return git_dir
@@ -1,7 +1,252 @@
-"""A collection of wrappers around subprocess."""
+"""A collection of wrappers around subprocess.
 
+Every process the commands spawn goes through call, check_output, or popen. These pass their arguments to subprocess
+unchanged. When tracing is enabled, through GIT_COMMANDS_TRACE=1 or a --trace flag, each process is also recorded with
+its argv, wall time, exit code, and bytes read, and a summary is printed to stderr at exit.
+"""
+
+import atexit
 import os
 import subprocess
+import sys
+import time
+
+TRACE_ENVIRONMENT_VARIABLE = 'GIT_COMMANDS_TRACE'
+TRACE_FLAG = '--trace'
+
+_SLOWEST_COUNT = 10
+
+# global git options whose value is a separate argument, skipped when naming a record
+_OPTIONS_WITH_VALUES = ('-c', '-C', '--git-dir', '--work-tree', '--namespace')
+
+_records = []
+_tracing = False
+
+
+class _Record(object):
+    """A single spawned process."""
+
+    def __init__(self, argv):
+        self.argv = [argv] if isinstance(argv, basestring) else list(argv)
+        self.start = time.time()
+        self.end = None
+        self.returncode = None
+        self.bytes_read = 0
+
+    def finish(self, returncode, *outputs):
+        if self.end is None:
+            self.end = time.time()
+        self.returncode = returncode
+        self.bytes_read += sum(len(output) for output in outputs if output)
+
+    @property
+    def elapsed(self):
+        return (self.end if self.end is not None else time.time()) - self.start
+
+    @property
+    def name(self):
+        """The program and its subcommand, e.g. 'git status', used to group records."""
+
+        if not self.argv:
+            return ''
+
+        name = os.path.basename(self.argv[0])
+        args = iter(self.argv[1:])
+        for arg in args:
+            if arg in _OPTIONS_WITH_VALUES:
+                next(args, None)
+            elif not arg.startswith('-'):
+                return name + ' ' + arg
+        return name
+
+
+class _CountingReader(object):
+    """Proxies a process's stdout, counting what is read from it directly rather than through communicate."""
+
+    def __init__(self, pipe, record):
+        self._pipe = pipe
+        self._record = record
+
+    def _count(self, data):
+        self._record.bytes_read += len(data)
+        return data
+
+    def read(self, *args):
+        return self._count(self._pipe.read(*args))
+
+    def readline(self, *args):
+        return self._count(self._pipe.readline(*args))
+
+    def readlines(self, *args):
+        return [self._count(line) for line in self._pipe.readlines(*args)]
+
+    def __iter__(self):
+        return iter(self.readline, '')
+
+    def __getattr__(self, name):
+        return getattr(self._pipe, name)
+
+
+class _TracedProcess(object):
+    """Proxies a Popen object, finishing its record when the process is waited on."""
+
+    def __init__(self, proc, record):
+        self._proc = proc
+        self._record = record
+        self.stdout = _CountingReader(proc.stdout, record) if proc.stdout else None
+
+    def communicate(self, *args, **kwargs):
+        outputs = self._proc.communicate(*args, **kwargs)
+        self._record.finish(self._proc.returncode, *outputs)
+        return outputs
+
+    def wait(self):
+        returncode = self._proc.wait()
+        self._record.finish(returncode)
+        return returncode
+
+    def poll(self):
+        returncode = self._proc.poll()
+        if returncode is not None:
+            self._record.finish(returncode)
+        return returncode
+
+    def __getattr__(self, name):
+        return getattr(self._proc, name)
+
+
+def _start(argv):
+    record = _Record(argv)
+    _records.append(record)
+    return record
+
+
+def is_tracing():
+    """Returns whether spawned processes are being recorded."""
+
+    return _tracing
+
+
+def trace():
+    """Start recording spawned processes and print a summary at exit."""
+
+    global _tracing
+    if not _tracing:
+        _tracing = True
+        atexit.register(print_summary)
+
+
+def trace_if_requested(argv=None):
+    """Start tracing if GIT_COMMANDS_TRACE is set or --trace was given.
+
+    The --trace flag is removed from argv so argument parsers never see it. Anything after a '--' delimiter is left
+    alone.
+
+    :param list argv: the arguments to check and modify (default: sys.argv)
+    """
+
+    argv = sys.argv if argv is None else argv
+    delimiter_index = argv.index('--') if '--' in argv else len(argv)
+    flagged = TRACE_FLAG in argv[:delimiter_index]
+    if flagged:
+        argv.remove(TRACE_FLAG)
+
+    if flagged or os.environ.get(TRACE_ENVIRONMENT_VARIABLE, '').lower() in ('1', 'true', 'yes', 'on'):
+        trace()
+
+
+def call(args, **kwargs):
+    """Run a command and return its exit code. See subprocess.call."""
+
+    if not _tracing:
+        return subprocess.call(args, **kwargs)
+
+    record = _start(args)
+    try:
+        returncode = subprocess.call(args, **kwargs)
+    except OSError:
+        record.finish(None)
+        raise
+    record.finish(returncode)
+    return returncode
+
+
+def check_output(args, **kwargs):
+    """Run a command and return its output. See subprocess.check_output."""
+
+    if not _tracing:
+        return subprocess.check_output(args, **kwargs)
+
+    record = _start(args)
+    try:
+        output = subprocess.check_output(args, **kwargs)
+    except subprocess.CalledProcessError as error:
+        record.finish(error.returncode, error.output)
+        raise
+    except OSError:
+        record.finish(None)
+        raise
+    record.finish(0, output)
+    return output
+
+
+def popen(args, **kwargs):
+    """Start a command. See subprocess.Popen.
+
+    :return: the Popen object, wrapped so waiting on it completes its record when tracing
+    """
+
+    if not _tracing:
+        return subprocess.Popen(args, **kwargs)
+
+    record = _start(args)
+    try:
+        proc = subprocess.Popen(args, **kwargs)
+    except OSError:
+        record.finish(None)
+        raise
+    return _TracedProcess(proc, record)
+
+
+def summary():
+    """Returns a summary of the recorded processes, slowest first.
+
+    :return str: the summary
+    """
+
+    groups = {}
+    for record in _records:
+        group = groups.setdefault(record.name, {'calls': 0, 'elapsed': 0.0, 'max': 0.0, 'bytes': 0, 'failures': 0})
+        group['calls'] += 1
+        group['elapsed'] += record.elapsed
+        group['max'] = max(group['max'], record.elapsed)
+        group['bytes'] += record.bytes_read
+        group['failures'] += 1 if record.returncode else 0
+
+    total = sum(record.elapsed for record in _records)
+    lines = ['git-commands trace: {} processes, {:.1f} ms'.format(len(_records), total * 1000)]
+    lines.append('{:>7} {:>10} {:>10} {:>10} {:>7}  {}'.format('calls', 'total ms', 'max ms', 'bytes', 'failed', 'command'))
+    for name, group in sorted(groups.iteritems(), key=lambda item: item[1]['elapsed'], reverse=True):
+        lines.append('{:>7} {:>10.1f} {:>10.1f} {:>10} {:>7}  {}'.format(
+            group['calls'], group['elapsed'] * 1000, group['max'] * 1000, group['bytes'], group['failures'], name
+        ))
+
+    lines.append('slowest:')
+    for record in sorted(_records, key=lambda r: r.elapsed, reverse=True)[:_SLOWEST_COUNT]:
+        lines.append('{:>10.1f} ms  exit {:<4} {:>10} B  {}'.format(
+            record.elapsed * 1000,
+            record.returncode if record.returncode is not None else '-',
+            record.bytes_read,
+            subprocess.list2cmdline(record.argv)
+        ))
+    return os.linesep.join(lines)
+
+
+def print_summary():
+    """Print the summary of recorded processes to stderr."""
+
+    if _records:
+        sys.stderr.write(summary() + os.linesep)
 
 
 def swallow(command):
@@ -10,7 +255,7 @@ def swallow(command):
     :param list command: command to execute
     """
     with open(os.devnull, 'w') as devnull:
-        subprocess.call(command, stdout=devnull, stderr=subprocess.STDOUT)
+        call(command, stdout=devnull, stderr=subprocess.STDOUT)
 
 
 def stdout(command):
@@ -19,6 +264,6 @@ def stdout(command):
     :param list command: command to execute
     """
     with open(os.devnull, 'w') as devnull:
-        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=devnull)
+        proc = popen(command, stdout=subprocess.PIPE, stderr=devnull)
         command_stdout = proc.communicate()[0]
     return command_stdout
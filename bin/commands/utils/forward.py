@@ -0,0 +1,194 @@
+"""Forward a command to a running git-commands-daemon instead of running it in this process.
+
+The request is a single line of JSON written to the daemon's socket:
+
+    {"command": "git-state", "argv": ["git-state", "--prompt"], "cwd": "/path/to/repo", "env": {...}}
+
+and the response a series of frames, each a one byte stream, a four byte big-endian length, and that many bytes. A
+STARTED frame says the daemon is running the command, frames on the STDOUT and STDERR streams are written as they
+arrive, and an EXIT frame ends the response with the command's exit status. A connection closed before the command
+started means the daemon couldn't run it, so it's run here instead.
+
+Only output that isn't going to a terminal is forwarded since coloring, paging, and the terminal's size all depend on
+it. Nothing is forwarded while tracing so the trace covers the process that prints it.
+
+This is imported by every entry point before anything else, so it imports socket and json only once a daemon's socket
+exists.
+"""
+
+import os
+import struct
+import sys
+
+DISABLE_ENVIRONMENT_VARIABLE = 'GIT_COMMANDS_DAEMON'
+SOCKET_ENVIRONMENT_VARIABLE = 'GIT_COMMANDS_DAEMON_SOCKET'
+
+STARTED = 's'
+STDOUT = 'o'
+STDERR = 'e'
+EXIT = 'x'
+
+_HEADER = struct.Struct('>cI')
+_FALSE_VALUES = ('0', 'false', 'no', 'off')
+
+# mirror execute.trace_if_requested without importing it
+_TRACE_ENVIRONMENT_VARIABLE = 'GIT_COMMANDS_TRACE'
+_TRACE_FLAG = '--trace'
+
+
+class DaemonUnavailable(Exception):
+    """Raised when a command can't be forwarded and should be run in-process."""
+
+
+def socket_path():
+    """Returns where the daemon listens, $GIT_COMMANDS_DAEMON_SOCKET if set.
+
+    :return str: the path of the socket, in $XDG_RUNTIME_DIR, $TMPDIR, or /tmp and named for the user
+    """
+
+    configured = os.environ.get(SOCKET_ENVIRONMENT_VARIABLE)
+    if configured:
+        return configured
+    directory = os.environ.get('XDG_RUNTIME_DIR') or os.environ.get('TMPDIR') or '/tmp'
+    return os.path.join(directory, 'git-commands-{}.sock'.format(os.getuid()))
+
+
+def write_frame(connection, stream, data):
+    """Send a frame.
+
+    :param socket.socket connection: the connection
+    :param str stream: STARTED, STDOUT, STDERR, or EXIT
+    :param str data: the frame's contents
+    """
+
+    connection.sendall(_HEADER.pack(stream, len(data)) + data)
+
+
+def _read_exactly(connection, size):
+    chunks = []
+    while size:
+        chunk = connection.recv(min(size, 64 * 1024))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+
+def read_frame(connection):
+    """Receive a frame.
+
+    :param socket.socket connection: the connection
+
+    :return tuple: the stream and contents or None if the connection closed
+    """
+
+    header = _read_exactly(connection, _HEADER.size)
+    if header is None:
+        return None
+    stream, size = _HEADER.unpack(header)
+    data = _read_exactly(connection, size) if size else ''
+    return None if data is None else (stream, data)
+
+
+def _should_forward(argv):
+    if os.environ.get(DISABLE_ENVIRONMENT_VARIABLE, '').lower() in _FALSE_VALUES:
+        return False
+    if os.environ.get(_TRACE_ENVIRONMENT_VARIABLE, '').lower() in ('1', 'true', 'yes', 'on'):
+        return False
+    delimiter_index = argv.index('--') if '--' in argv else len(argv)
+    if _TRACE_FLAG in argv[:delimiter_index]:
+        return False
+    return not sys.stdout.isatty()
+
+
+def _connect(path):
+    """Connect to the daemon, only if its socket belongs to this user so nobody else is sent the environment."""
+
+    try:
+        if os.stat(path).st_uid != os.getuid():
+            raise DaemonUnavailable('{0!r} belongs to another user'.format(path))
+    except OSError:
+        raise DaemonUnavailable('no daemon at {0!r}'.format(path))
+
+    import socket
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(path)
+    except socket.error:
+        connection.close()
+        raise DaemonUnavailable('no daemon listening at {0!r}'.format(path))
+    return connection
+
+
+def request(argv, path=None):
+    """Run a command in the daemon, writing its output here as it arrives.
+
+    :param list argv: the command's arguments, starting with its name
+    :param str path: the daemon's socket (default: socket_path())
+
+    :return int: the command's exit status
+
+    :raise DaemonUnavailable: if the daemon isn't running or didn't run the command
+    """
+
+    connection = _connect(path or socket_path())
+
+    import json
+    import socket
+    try:
+        line = json.dumps({
+            'command': os.path.basename(argv[0]),
+            'argv': argv,
+            'cwd': os.getcwd(),
+            'env': dict(os.environ)
+        }) + '\n'
+    except (OSError, UnicodeDecodeError):
+        connection.close()
+        raise DaemonUnavailable('cannot describe the request')  # a deleted working directory or undecodable values
+
+    outputs = {STDOUT: sys.stdout, STDERR: sys.stderr}
+    started = False
+    try:
+        connection.sendall(line)
+        while True:
+            frame = read_frame(connection)
+            if frame is None:
+                break
+
+            stream, data = frame
+            if stream == EXIT:
+                return int(data)
+            elif stream == STARTED:
+                started = True
+            else:
+                outputs[stream].write(data)
+                outputs[stream].flush()
+    except socket.error:
+        pass
+    finally:
+        connection.close()
+
+    # once it started, running the command again here could repeat what it did
+    if not started:
+        raise DaemonUnavailable('the daemon did not run {0!r}'.format(argv[0]))
+    sys.stderr.write('error: git-commands-daemon stopped before {} finished\n'.format(os.path.basename(argv[0])))
+    return 1
+
+
+def to_daemon(argv=None):
+    """Exit with the status of the command run by a daemon, or return so it can be run in-process.
+
+    :param list argv: the command's arguments (default: sys.argv)
+    """
+
+    argv = sys.argv if argv is None else argv
+    if not _should_forward(argv):
+        return
+    try:
+        status = request(argv)
+    except DaemonUnavailable:
+        return
+    except IOError:
+        status = 1  # whatever reads the output stopped reading
+    sys.exit(status)
@@ -1,5 +1,8 @@
 """A collection of common git actions."""
 
+import atexit
+import collections
+import fcntl
 import os
 import re
 import sys
@@ -7,7 +10,7 @@ import sys
 import subprocess
 from subprocess import PIPE, STDOUT
 
-import directories, messages
+import directories, execute, gitconfig, messages, refs
 
 
 class GitException(Exception):  # pragma: no cover
@@ -18,6 +21,94 @@ class GitException(Exception):  # pragma: no cover
         return repr(self.message)
 
 
+class _BatchCheckUnavailable(Exception):
+    """Raised when an object query cannot be answered by the batch check coprocess."""
+
+
+class _BatchCheck(object):
+    """A lazily started `git cat-file --batch-check` coprocess answering object queries over a single pipe.
+
+    The coprocess is bound to the working directory it was started in and is restarted if the directory changes.
+    """
+
+    def __init__(self):
+        self._proc = None
+        self._cwd = None
+
+    def _process(self):
+        try:
+            cwd = os.getcwd()
+        except OSError:
+            raise _BatchCheckUnavailable()  # the working directory no longer exists
+        if self._proc is not None and (self._cwd != cwd or self._proc.poll() is not None):
+            self.close()
+
+        if self._proc is None:
+            try:
+                with open(os.devnull, 'w') as dev_null:
+                    self._proc = execute.popen(
+                        ['git', 'cat-file', '--batch-check'], stdin=PIPE, stdout=PIPE, stderr=dev_null
+                    )
+            except OSError:
+                raise _BatchCheckUnavailable()
+            self._cwd = cwd
+
+            # keep later child processes from inheriting the pipes and holding the coprocess open
+            for pipe in (self._proc.stdin, self._proc.stdout):
+                flags = fcntl.fcntl(pipe.fileno(), fcntl.F_GETFD)
+                fcntl.fcntl(pipe.fileno(), fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+        return self._proc
+
+    def query(self, object_):
+        """Query the type and SHA1 of an object.
+
+        :param str object_: a git object
+
+        :return tuple: the (SHA1, type) of the object or None if the object does not exist
+
+        :raise _BatchCheckUnavailable: if the object cannot be queried using the coprocess
+        """
+
+        # the batch protocol is line based and cannot represent every object name
+        if not object_ or '\n' in object_ or object_ != object_.strip():
+            raise _BatchCheckUnavailable()
+
+        proc = self._process()
+        try:
+            proc.stdin.write(object_ + '\n')
+            proc.stdin.flush()
+            response = proc.stdout.readline()
+        except (IOError, OSError):
+            response = None
+
+        if not response:
+            # the coprocess died, most likely because this isn't a repository
+            self.close()
+            raise _BatchCheckUnavailable()
+
+        # a found object is '<sha1> <type> <size>' while the rest echo the name, which may hold spaces, followed by
+        # 'missing' or 'ambiguous'
+        response = response.rstrip('\n').rsplit(' ', 2)
+        if len(response) != 3 or not response[2].isdigit():
+            return None
+        return response[0], response[1]
+
+    def close(self):
+        """Stop the coprocess if it is running."""
+
+        proc, self._proc = self._proc, None
+        if proc is not None:
+            try:
+                proc.stdin.close()
+                proc.wait()
+            except (IOError, OSError):  # pragma: no cover
+                pass
+
+
+_batch_check = _BatchCheck()
+atexit.register(_batch_check.close)
+
+
 def is_valid_reference(reference):
     """Determines if a reference is valid.
 
@@ -28,7 +119,12 @@ def is_valid_reference(reference):
 
     assert isinstance(reference, str), "'reference' must be a str. Given: " + type(reference).__name__
 
-    show_ref_proc = subprocess.Popen(['git', 'show-ref', '--quiet', reference])
+    try:
+        return bool(refs.store().matching(reference))
+    except refs.RefsUnavailable:
+        pass
+
+    show_ref_proc = execute.popen(['git', 'show-ref', '--quiet', reference])
     show_ref_proc.communicate()
     return not show_ref_proc.returncode
 
@@ -43,10 +139,27 @@ def is_commit(object_):
 
     assert isinstance(object_, str), "'object' must be a str. Given: " + type(object_).__name__
 
+    return object_type(object_) == 'commit'
+
+
+def object_type(object_):
+    """Returns the type of an object.
+
+    :param str object_: a git object
+
+    :return str: the object type (commit, tree, blob, or tag) or None if the object does not exist
+    """
+
+    try:
+        object_info = _batch_check.query(object_)
+        return object_info[1] if object_info else None
+    except _BatchCheckUnavailable:
+        pass
+
     with open(os.devnull, 'w') as dev_null:
-        cat_file_proc = subprocess.Popen(['git', 'cat-file', '-t', object_], stdout=PIPE, stderr=dev_null)
-        object_type = cat_file_proc.communicate()[0].strip()
-        return not cat_file_proc.returncode and object_type == 'commit'
+        cat_file_proc = execute.popen(['git', 'cat-file', '-t', object_], stdout=PIPE, stderr=dev_null)
+        type_ = cat_file_proc.communicate()[0].strip()
+        return type_ if not cat_file_proc.returncode and type_ else None
 
 
 def is_detached():
@@ -58,7 +171,12 @@ def is_detached():
 def symbolic_ref(object_):
     """Returns symbolic ref"""
 
-    symbolic_proc = subprocess.Popen(
+    try:
+        return refs.store().symbolic_target(object_) or ''
+    except refs.RefsUnavailable:
+        pass
+
+    symbolic_proc = execute.popen(
         ['git', 'symbolic-ref', '--quiet', object_], stdout=subprocess.PIPE, stderr=subprocess.PIPE
     )
     revolved_symbolic_ref = symbolic_proc.communicate()[0]
@@ -77,8 +195,13 @@ def is_ref(object_):
 
     assert isinstance(object_, str), "'object' must be a str. Given: " + type(object_).__name__
 
+    try:
+        return bool(refs.store().matching(object_))
+    except refs.RefsUnavailable:
+        pass
+
     with open(os.devnull, 'w') as dev_null:
-        return not subprocess.call(('git', 'show-ref', object_), stdout=dev_null, stderr=dev_null)
+        return not execute.call(('git', 'show-ref', object_), stdout=dev_null, stderr=dev_null)
 
 
 def is_ref_ambiguous(ref, limit=None):
@@ -102,12 +225,18 @@ def is_ref_ambiguous(ref, limit=None):
     if not is_ref(ref):
         raise GitException('{0!r} is not a ref'.format(ref))
 
+    try:
+        prefixes = tuple('refs/{}/'.format(l) for l in limit) if limit else ('refs/',)
+        return len(refs.store().matching(ref, prefixes)) > 1
+    except refs.RefsUnavailable:
+        pass
+
     with open(os.devnull, 'w') as dev_null:
         show_ref_command = ['git', 'show-ref']
         if limit:
             show_ref_command += ['--' + l for l in limit]
         show_ref_command += [ref]
-        show_ref_proc = subprocess.Popen(show_ref_command, stdout=PIPE, stderr=dev_null)
+        show_ref_proc = execute.popen(show_ref_command, stdout=PIPE, stderr=dev_null)
         return len(show_ref_proc.communicate()[0].splitlines()) > 1
 
 
@@ -131,7 +260,83 @@ def symbolic_full_name(ref):
     :return str: the symbolic full name
     """
 
-    return subprocess.check_output(('git', 'rev-parse', '--symbolic-full-name', ref)).strip()
+    return execute.check_output(('git', 'rev-parse', '--symbolic-full-name', ref)).strip()
+
+
+class Classification(collections.namedtuple('Classification', 'name sha type refs symbolic_full_name')):
+    """What a name refers to.
+
+    :ivar str name: the classified name
+    :ivar str sha: the object the name resolves to or None
+    :ivar str type: the type of that object or None
+    :ivar dict refs: namespace (heads, tags, remotes, ...) to the full names of refs matching the name like `git show-ref`
+    :ivar str symbolic_full_name: the full name of the ref the name expands to or None if it isn't exactly one ref
+    """
+
+    __slots__ = ()
+
+    @property
+    def is_commit(self):
+        return self.type == 'commit'
+
+    @property
+    def is_ref(self):
+        return bool(self.refs)
+
+    @property
+    def is_ambiguous(self):
+        """Whether the name matches more than one branch or tag."""
+
+        return len(self.refs.get('heads', []) + self.refs.get('tags', [])) > 1
+
+
+def _classify_refs(name):
+    """Returns the refs matching a name and its symbolic full name asking git."""
+
+    with open(os.devnull, 'w') as dev_null:
+        show_ref_proc = execute.popen(['git', 'show-ref', name], stdout=PIPE, stderr=dev_null)
+        matches = [line.split(' ')[1] for line in show_ref_proc.communicate()[0].splitlines()]
+        if not matches:
+            return matches, None
+
+        rev_parse_proc = execute.popen(['git', 'rev-parse', '--symbolic-full-name', name], stdout=PIPE, stderr=dev_null)
+        symbolic_full_name = rev_parse_proc.communicate()[0].strip()
+        return matches, symbolic_full_name if not rev_parse_proc.returncode and symbolic_full_name else None
+
+
+def classify(name):
+    """Classifies a name in a single pass.
+
+    This answers what is_commit, is_ref, is_ref_ambiguous, symbolic_full_name, and resolve_sha1 would without running
+    each of them.
+
+    :param str name: a commit-ish or ref name
+
+    :return Classification: what the name refers to
+    """
+
+    assert isinstance(name, str), "'name' must be a str. Given: " + type(name).__name__
+
+    try:
+        ref_store = refs.store()
+        matches = [refname for refname, _ in ref_store.matching(name)]
+        expanded = ref_store.expand(name)
+        symbolic_full_name = expanded[0] if len(expanded) == 1 else None
+    except refs.RefsUnavailable:
+        matches, symbolic_full_name = _classify_refs(name)
+
+    try:
+        object_info = _batch_check.query(name)
+    except _BatchCheckUnavailable:
+        sha = resolve_sha1(name)
+        object_info = (sha, object_type(sha)) if sha else None
+
+    refs_by_namespace = {}
+    for refname in matches:
+        refs_by_namespace.setdefault(refname.split('/')[1], []).append(refname)
+
+    sha, type_ = object_info or (None, None)
+    return Classification(name, sha, type_, refs_by_namespace, symbolic_full_name)
 
 
 def current_branch():
@@ -140,9 +345,18 @@ def current_branch():
     :return str or unicode: the name of the current branch
     """
 
-    if not os.listdir('.git/refs/heads'):
+    try:
+        ref_store = refs.store()
+        if not ref_store.has_branches():
+            return None
+        head = ref_store.symbolic_target('HEAD')
+        return ref_store.shorten(head) if head else 'HEAD'
+    except refs.RefsUnavailable:
+        pass
+
+    if not execute.check_output(('git', 'for-each-ref', '--count=1', 'refs/heads')):
         return None
-    return subprocess.check_output(('git', 'rev-parse', '--abbrev-ref', 'HEAD')).strip()
+    return execute.check_output(('git', 'rev-parse', '--abbrev-ref', 'HEAD')).strip()
 
 
 def deleted_files():
@@ -151,7 +365,7 @@ def deleted_files():
     :return list: a list of deleted file paths
     """
 
-    all_files = subprocess.check_output(['git', 'status', '--short', '--porcelain'])
+    all_files = execute.check_output(['git', 'status', '--short', '--porcelain'])
     return [match.group(1) for match in re.finditer('^(?:D\s|\sD)\s(.*)', all_files, re.MULTILINE)]
 
 
@@ -162,7 +376,7 @@ def is_empty_repository():
     """
 
     with open(os.devnull, 'w') as devnull:
-        log_proc = subprocess.Popen(['git', 'log', '--oneline', '-1'], stdout=devnull, stderr=devnull)
+        log_proc = execute.popen(['git', 'log', '--oneline', '-1'], stdout=devnull, stderr=devnull)
         log_proc.wait()
         return log_proc.returncode != 0
 
@@ -175,7 +389,13 @@ def resolve_sha1(revision):
     :return str: SHA1
     """
 
-    rev_proc = subprocess.Popen(['git', 'rev-parse', '--verify', '--quiet', revision], stdout=subprocess.PIPE)
+    try:
+        object_info = _batch_check.query(revision)
+        return object_info[0] if object_info else None
+    except _BatchCheckUnavailable:
+        pass
+
+    rev_proc = execute.popen(['git', 'rev-parse', '--verify', '--quiet', revision], stdout=subprocess.PIPE)
     sha1 = rev_proc.communicate()[0].strip()
     if not sha1:
         return None
@@ -225,9 +445,12 @@ def get_config_value(key, default=None, config=None, file_=None, as_type=str):
     if not hasattr(as_type, '__call__') and not hasattr(as_type, '__bases__'):
         raise Exception('{} is not callable'.format(as_type))
 
-    command = _get_command(key, config, file_)
-    proc = subprocess.Popen(command, stdout=PIPE, stderr=STDOUT)
-    value = proc.communicate()[0].strip()
+    try:
+        value = (gitconfig.get(key, config=config, file_=file_) or '').strip()
+    except gitconfig.ConfigUnavailable:
+        command = _get_command(key, config, file_)
+        proc = execute.popen(command, stdout=PIPE, stderr=STDOUT)
+        value = proc.communicate()[0].strip()
 
     if not value:
         return default
@@ -0,0 +1,97 @@
+"""Parse git color values, such as `color.status.added`, into ANSI escape sequences the way git does."""
+
+RESET = '\033[m'
+
+# the colors git-state's own headers use, the same sequences as colorama's Fore without importing it
+GREEN = '\033[32m'
+DEFAULT = '\033[39m'
+
+_NAMES = ('black', 'red', 'green', 'yellow', 'blue', 'magenta', 'cyan', 'white')
+_ATTRIBUTES = {'bold': 1, 'dim': 2, 'italic': 3, 'ul': 4, 'blink': 5, 'reverse': 7, 'strike': 9}
+
+
+class InvalidColor(ValueError):
+    pass
+
+
+def _parse_attribute(word):
+    """Returns the SGR code of an attribute word or None."""
+
+    if word == 'reset':
+        return 0
+
+    negate = word.startswith('no')
+    name = word[3:] if word.startswith('no-') else word[2:] if negate else word
+    if name not in _ATTRIBUTES:
+        return None
+    code = _ATTRIBUTES[name]
+    if negate:
+        return 22 if code in (1, 2) else 20 + code
+    return code
+
+
+def _parse_color(word, background):
+    """Returns the SGR parameters of a color word, '' for normal, or None if the word isn't a color."""
+
+    base = 40 if background else 30
+    if word == 'normal':
+        return ''
+    if word == 'default':
+        return str(base + 9)
+    if word in _NAMES:
+        return str(base + _NAMES.index(word))
+    if word.startswith('bright') and word[len('bright'):] in _NAMES:
+        return str(base + 60 + _NAMES.index(word[len('bright'):]))
+    if word.startswith('#') and len(word) == 7:
+        try:
+            rgb = [int(word[i:i + 2], 16) for i in (1, 3, 5)]
+        except ValueError:
+            return None
+        return '{};2;{};{};{}'.format(base + 8, *rgb)
+    try:
+        value = int(word)
+    except ValueError:
+        return None
+    if value == -1:
+        return ''
+    if 0 <= value <= 7:
+        return str(base + value)
+    if 8 <= value <= 15:
+        return str(base + 60 + value - 8)
+    if 16 <= value <= 255:
+        return '{};5;{}'.format(base + 8, value)
+    return None
+
+
+def parse(value):
+    """Parse a git color value.
+
+    :param str value: a value such as 'bold red', 'ul #ff0000 blue', or '208'
+
+    :return str: the escape sequence, empty if the value sets nothing
+
+    :raise InvalidColor: if the value isn't a valid color
+    """
+
+    attributes = set()
+    colors = []
+    for word in value.split():
+        color = _parse_color(word, background=len(colors) == 1)
+        if color is not None and len(colors) < 2:
+            colors.append(color)
+            continue
+
+        attribute = _parse_attribute(word)
+        if attribute is None:
+            raise InvalidColor('invalid color value: {}'.format(value))
+        attributes.add(attribute)
+
+    # like git, reset is written as an empty parameter
+    parameters = [str(code) if code else '' for code in sorted(attributes)] + [color for color in colors if color]
+    return '\033[{}m'.format(';'.join(parameters)) if parameters else ''
+
+
+def colorize(text, color):
+    """Wrap text in a color like git's color_fprintf, leaving it alone if the color is empty."""
+
+    return color + text + RESET if color else text
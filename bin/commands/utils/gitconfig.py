@@ -0,0 +1,538 @@
+"""An in-process reader for git configuration files.
+
+Files are parsed once per process and re-parsed only when their mtime, inode, or size changes. Lookups follow the same
+sources, precedence, and include rules as `git config`. Anything this reader cannot answer exactly raises
+ConfigUnavailable so callers can fall back to `git config` itself.
+"""
+
+import os
+import re
+import shlex
+
+import directories
+
+_MAX_INCLUDE_DEPTH = 10
+_TRUE_VALUES = ('1', 'true', 'yes', 'on')
+_ESCAPES = {'n': '\n', 't': '\t', 'b': '\b'}
+
+# path -> (stat signature, entries)
+_files = {}
+
+# view key -> _ConfigView
+_views = {}
+
+
+class ConfigUnavailable(Exception):
+    """Raised when a lookup cannot be answered without `git config`."""
+
+
+class _ConfigView(object):
+    """The merged entries of a set of config files along with what is needed to tell when they become stale."""
+
+    def __init__(self):
+        self.entries = []
+        self.values = {}
+        self.signatures = {}
+
+    def add(self, key, value):
+        self.entries.append((key, value))
+        self.values.setdefault(key, []).append(value)
+
+    def watch(self, path):
+        self.signatures[path] = _stat_signature(path)
+
+    def is_current(self):
+        return all(_stat_signature(path) == signature for path, signature in self.signatures.iteritems())
+
+
+def _stat_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime, stat.st_ino, stat.st_size, stat.st_dev
+
+
+def _read(path):
+    """Return the entries of a config file, parsing it only if it changed since it was last read.
+
+    :param str or unicode path: path to a config file
+
+    :return list: (key, value) entries or None if the file does not exist
+    """
+
+    signature = _stat_signature(path)
+    if signature is None:
+        return None
+
+    cached = _files.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    try:
+        with open(path) as config_file:
+            contents = config_file.read()
+    except (IOError, OSError):
+        raise ConfigUnavailable('unable to read {}'.format(path))
+
+    entries = _parse(contents)
+    _files[path] = (signature, entries)
+    return entries
+
+
+def _parse(contents):
+    """Parse the contents of a config file.
+
+    :param str contents: config file contents
+
+    :return list: (key, value) entries in file order. Keys without a value have a value of None.
+
+    :raise ConfigUnavailable: if the contents are malformed
+    """
+
+    contents = contents.replace('\r\n', '\n')
+    if contents.startswith('\xef\xbb\xbf'):
+        contents = contents[3:]  # byte order mark
+
+    entries = []
+    section = None
+    index = 0
+    length = len(contents)
+    while index < length:
+        char = contents[index]
+        if char.isspace():
+            index += 1
+        elif char in '#;':
+            index = _skip_line(contents, index)
+        elif char == '[':
+            section, index = _parse_section(contents, index + 1)
+        elif char.isalpha() and section is not None:
+            name_end = index
+            while name_end < length and (contents[name_end].isalnum() or contents[name_end] == '-'):
+                name_end += 1
+            key = section + '.' + contents[index:name_end].lower()
+
+            index = name_end
+            while index < length and contents[index] in ' \t':
+                index += 1
+
+            if index >= length or contents[index] == '\n':
+                entries.append((key, None))
+                index += 1
+            elif contents[index] == '=':
+                value, index = _parse_value(contents, index + 1)
+                entries.append((key, value))
+            else:
+                raise ConfigUnavailable('bad config line')
+        else:
+            raise ConfigUnavailable('bad config line')
+    return entries
+
+
+def _skip_line(contents, index):
+    newline = contents.find('\n', index)
+    return len(contents) if newline == -1 else newline + 1
+
+
+def _parse_section(contents, index):
+    """Parse a section header starting just after its opening bracket."""
+
+    length = len(contents)
+    name = []
+    while index < length:
+        char = contents[index]
+        index += 1
+        if char == ']':
+            return ''.join(name), index
+        elif char.isspace():
+            return _parse_subsection(contents, index, ''.join(name))
+        elif not char.isalnum() and char not in '-.':
+            break
+        name.append(char.lower())
+    raise ConfigUnavailable('bad section header')
+
+
+def _parse_subsection(contents, index, section):
+    length = len(contents)
+    while index < length and contents[index].isspace():
+        index += 1
+    if index >= length or contents[index] != '"':
+        raise ConfigUnavailable('bad section header')
+    index += 1
+
+    subsection = []
+    while index < length:
+        char = contents[index]
+        index += 1
+        if char == '\n':
+            break
+        elif char == '"':
+            if index < length and contents[index] == ']':
+                return section + '.' + ''.join(subsection), index + 1
+            break
+        elif char == '\\':
+            if index >= length or contents[index] == '\n':
+                break
+            char = contents[index]
+            index += 1
+        subsection.append(char)
+    raise ConfigUnavailable('bad section header')
+
+
+def _parse_value(contents, index):
+    """Parse a value the same way git does: unquoted whitespace collapses, comments are dropped, and escapes apply."""
+
+    length = len(contents)
+    value = []
+    pending_spaces = 0
+    in_quote = False
+    in_comment = False
+    while True:
+        char = contents[index] if index < length else '\n'
+        index += 1
+        if char == '\n':
+            if in_quote:
+                raise ConfigUnavailable('unterminated quote')
+            return ''.join(value), index
+        elif in_comment:
+            continue
+        elif char.isspace() and not in_quote:
+            if value:
+                pending_spaces += 1
+            continue
+        elif not in_quote and char in '#;':
+            in_comment = True
+            continue
+
+        if pending_spaces:
+            value.append(' ' * pending_spaces)
+            pending_spaces = 0
+        if char == '\\':
+            char = contents[index] if index < length else ''
+            index += 1
+            if char == '\n':
+                continue
+            elif char in ('\\', '"'):
+                value.append(char)
+            elif char in _ESCAPES:
+                value.append(_ESCAPES[char])
+            else:
+                raise ConfigUnavailable('bad escape')
+        elif char == '"':
+            in_quote = not in_quote
+        else:
+            value.append(char)
+
+
+def canonical_key(key):
+    """Canonicalize a key: section and name are case insensitive while a subsection is not.
+
+    :param str or unicode key: a config key
+
+    :return str or unicode: the canonical key or None if the key is invalid
+    """
+
+    first, last = key.find('.'), key.rfind('.')
+    if first <= 0 or last == len(key) - 1:
+        return None
+    return key[:first].lower() + key[first:last] + key[last:].lower()
+
+
+def _wildmatch(pattern, text, ignore_case=False):
+    """Match a path against a wildmatch pattern where '*' stops at slashes and '**' does not."""
+
+    regex = []
+    index = 0
+    while index < len(pattern):
+        if pattern.startswith('**/', index) and (index == 0 or pattern[index - 1] == '/'):
+            regex.append('(?:.*/)?')
+            index += 3
+        elif pattern.startswith('**', index):
+            regex.append('.*')
+            index += 2
+        elif pattern[index] == '*':
+            regex.append('[^/]*')
+            index += 1
+        elif pattern[index] == '?':
+            regex.append('[^/]')
+            index += 1
+        elif pattern[index] == '[' and pattern.find(']', index + 2) != -1:
+            end = pattern.find(']', index + 2)
+            char_class = pattern[index + 1:end].replace('\\', '\\\\')
+            if char_class.startswith('!'):
+                char_class = '^' + char_class[1:]
+            regex.append('[' + char_class + ']')
+            index = end + 1
+        elif pattern[index] == '\\' and index + 1 < len(pattern):
+            regex.append(re.escape(pattern[index + 1]))
+            index += 2
+        else:
+            regex.append(re.escape(pattern[index]))
+            index += 1
+    return re.match('^' + ''.join(regex) + '$', text, re.IGNORECASE if ignore_case else 0) is not None
+
+
+class _Reader(object):
+    """Builds a _ConfigView from config files, following includes."""
+
+    def __init__(self, view, git_dir):
+        self._view = view
+        self._git_dir = git_dir
+
+    def read_file(self, path, include, depth=0):
+        self._view.watch(path)
+        entries = _read(path)
+        for key, value in entries or []:
+            self._view.add(key, value)
+            if include:
+                self._include(key, value, path, depth)
+
+    def read_entries(self, entries):
+        for key, value in entries:
+            self._view.add(key, value)
+            if value is not None and key == 'include.path' and os.path.isabs(os.path.expanduser(value)):
+                self._include(key, value, None, 0)
+
+    def _include(self, key, value, path, depth):
+        if value is None:
+            return
+        elif key == 'include.path':
+            pass
+        elif key.startswith('includeif.') and key.endswith('.path'):
+            if not self._condition_applies(key[len('includeif.'):-len('.path')], path):
+                return
+        else:
+            return
+
+        if depth >= _MAX_INCLUDE_DEPTH:
+            raise ConfigUnavailable('exceeded maximum include depth')
+
+        include_path = os.path.expanduser(value)
+        if not os.path.isabs(include_path):
+            if path is None:
+                return
+            include_path = os.path.join(os.path.dirname(path), include_path)
+        self.read_file(include_path, True, depth + 1)
+
+    def _condition_applies(self, condition, path):
+        if condition.startswith('gitdir:'):
+            return self._gitdir_matches(condition[len('gitdir:'):], path, False)
+        elif condition.startswith('gitdir/i:'):
+            return self._gitdir_matches(condition[len('gitdir/i:'):], path, True)
+        elif condition.startswith('onbranch:'):
+            return self._branch_matches(condition[len('onbranch:'):])
+        raise ConfigUnavailable('unsupported include condition {0!r}'.format(condition))
+
+    def _gitdir_matches(self, pattern, path, ignore_case):
+        if not self._git_dir:
+            return False
+
+        if pattern.startswith('./'):
+            if path is None:
+                raise ConfigUnavailable('relative gitdir condition outside of a file')
+            pattern = os.path.join(os.path.dirname(os.path.realpath(path)), pattern[2:])
+        pattern = os.path.expanduser(pattern)
+        if not os.path.isabs(pattern) and not pattern.startswith('**/'):
+            pattern = '**/' + pattern
+        if pattern.endswith('/'):
+            pattern += '**'
+
+        git_dirs = (self._git_dir, os.path.realpath(self._git_dir))
+        return any(_wildmatch(pattern, git_dir, ignore_case) for git_dir in git_dirs)
+
+    def _branch_matches(self, pattern):
+        if not self._git_dir:
+            return False
+
+        head_path = os.path.join(self._git_dir, 'HEAD')
+        self._view.watch(head_path)
+        try:
+            with open(head_path) as head_file:
+                head = head_file.read().strip()
+        except (IOError, OSError):
+            return False
+        if not head.startswith('ref: refs/heads/'):
+            return False
+
+        if pattern.endswith('/'):
+            pattern += '**'
+        return _wildmatch(pattern, head[len('ref: refs/heads/'):])
+
+
+def _env_bool(name):
+    return os.environ.get(name, '').lower() in _TRUE_VALUES
+
+
+def _system_path():
+    if 'GIT_CONFIG_SYSTEM' in os.environ:
+        return os.environ['GIT_CONFIG_SYSTEM']
+
+    # git looks for the system config relative to its install prefix
+    for path in os.environ.get('PATH', '').split(os.pathsep):
+        git_path = os.path.join(path, 'git')
+        if os.path.isfile(git_path) and os.access(git_path, os.X_OK):
+            prefix = os.path.dirname(os.path.dirname(os.path.realpath(git_path)))
+            return '/etc/gitconfig' if prefix == '/usr' else os.path.join(prefix, 'etc', 'gitconfig')
+    return '/etc/gitconfig'
+
+
+def _global_paths():
+    if 'GIT_CONFIG_GLOBAL' in os.environ:
+        return [os.environ['GIT_CONFIG_GLOBAL']] if os.environ['GIT_CONFIG_GLOBAL'] else []
+
+    paths = []
+    xdg_config_home = os.environ.get('XDG_CONFIG_HOME')
+    home = os.environ.get('HOME')
+    if xdg_config_home:
+        paths.append(os.path.join(xdg_config_home, 'git', 'config'))
+    elif home:
+        paths.append(os.path.join(home, '.config', 'git', 'config'))
+    if home:
+        paths.append(os.path.join(home, '.gitconfig'))
+    return paths
+
+
+def _global_path():
+    """Returns the single file `git config --global` reads."""
+
+    paths = _global_paths()
+    if len(paths) == 2 and not os.path.exists(paths[1]) and os.path.exists(paths[0]):
+        return paths[0]
+    return paths[-1] if paths else None
+
+
+def _command_line_entries():
+    """Returns entries given through `git -c` which git passes along in the environment."""
+
+    entries = []
+    try:
+        parameters = shlex.split(os.environ.get('GIT_CONFIG_PARAMETERS', ''))
+    except ValueError:
+        raise ConfigUnavailable('malformed GIT_CONFIG_PARAMETERS')
+    for parameter in parameters:
+        key, separator, value = parameter.partition('=')
+        entries.append((key, value if separator else None))
+
+    count = os.environ.get('GIT_CONFIG_COUNT')
+    if count:
+        try:
+            for i in range(int(count)):
+                entries.append((os.environ['GIT_CONFIG_KEY_{}'.format(i)], os.environ['GIT_CONFIG_VALUE_{}'.format(i)]))
+        except (KeyError, ValueError):
+            raise ConfigUnavailable('malformed GIT_CONFIG_COUNT')
+
+    canonical_entries = []
+    for key, value in entries:
+        canonical = canonical_key(key)
+        if canonical is None:
+            raise ConfigUnavailable('invalid key {0!r}'.format(key))
+        canonical_entries.append((canonical, value))
+    return canonical_entries
+
+
+def _view_key(config, file_, git_dir):
+    environment = tuple(
+        (name, value) for name, value in sorted(os.environ.iteritems())
+        if name.startswith('GIT_CONFIG') or name in ('HOME', 'XDG_CONFIG_HOME', 'PATH')
+    )
+    try:
+        cwd = os.getcwd()
+    except OSError:
+        cwd = None
+    return config, file_, git_dir, cwd, environment
+
+
+def _load_view(config, file_):
+    if config not in (None, 'system', 'global', 'local', 'file'):
+        raise ConfigUnavailable('unknown config {0!r}'.format(config))
+
+    git_dir = directories.git_directory()
+    view_key = _view_key(config, file_, git_dir)
+    view = _views.get(view_key)
+    if view is not None and view.is_current():
+        return view
+
+    view = _ConfigView()
+    reader = _Reader(view, git_dir)
+    if config is None and os.environ.get('GIT_CONFIG'):
+        reader.read_file(os.environ['GIT_CONFIG'], False)
+    elif config is None:
+        if not _env_bool('GIT_CONFIG_NOSYSTEM'):
+            reader.read_file(_system_path(), True)
+        for path in _global_paths():
+            reader.read_file(path, True)
+        if git_dir:
+            local_path = os.path.join(directories.common_directory(git_dir), 'config')
+            reader.read_file(local_path, True)
+            worktree_config = (view.values.get('extensions.worktreeconfig') or [None])[-1]
+            if worktree_config is not None and worktree_config.lower() in _TRUE_VALUES:
+                reader.read_file(os.path.join(git_dir, 'config.worktree'), True)
+        reader.read_entries(_command_line_entries())
+    elif config == 'system':
+        reader.read_file(_system_path(), False)
+    elif config == 'global':
+        global_path = _global_path()
+        if global_path:
+            reader.read_file(global_path, False)
+    elif config == 'local':
+        if git_dir:
+            reader.read_file(os.path.join(directories.common_directory(git_dir), 'config'), False)
+    elif file_ is not None:
+        reader.read_file(os.path.abspath(file_), False)
+
+    _views[view_key] = view
+    return view
+
+
+def get_all(key, config=None, file_=None):
+    """Get all values for a key in precedence order, lowest first.
+
+    :param str or unicode key: the key
+    :param str or unicode config: the config to limit to (system, global, local, or file)
+    :param str or unicode file_: path to a config file when config is 'file'
+
+    :return list: the values. Keys without a value are returned as empty strings, matching `git config`.
+
+    :raise ConfigUnavailable: if the lookup cannot be answered in-process
+    """
+
+    key = canonical_key(key)
+    if key is None:
+        raise ConfigUnavailable('invalid key')
+    return [value if value is not None else '' for value in _load_view(config, file_).values.get(key, [])]
+
+
+def get(key, config=None, file_=None):
+    """Get the effective value for a key.
+
+    :param str or unicode key: the key
+    :param str or unicode config: the config to limit to (system, global, local, or file)
+    :param str or unicode file_: path to a config file when config is 'file'
+
+    :return str or unicode: the last value for the key or None if it isn't set
+
+    :raise ConfigUnavailable: if the lookup cannot be answered in-process
+    """
+
+    values = get_all(key, config=config, file_=file_)
+    return values[-1] if values else None
+
+
+def get_regexp(pattern, config=None, file_=None):
+    """Get all entries whose canonical key matches a regular expression, in precedence order.
+
+    :param str or unicode pattern: a regular expression searched for in each key
+    :param str or unicode config: the config to limit to (system, global, local, or file)
+    :param str or unicode file_: path to a config file when config is 'file'
+
+    :return list: (key, value) entries
+
+    :raise ConfigUnavailable: if the lookup cannot be answered in-process
+    """
+
+    regex = re.compile(pattern)
+    return [
+        (key, value if value is not None else '')
+        for key, value in _load_view(config, file_).entries
+        if regex.search(key)
+    ]
@@ -0,0 +1,120 @@
+"""Run independent work concurrently on a bounded number of threads."""
+
+import sys
+import threading
+import time
+
+# how often a waiting caller wakes so it can still be interrupted
+_JOIN_INTERVAL = 0.1
+
+# yielded by imap in place of the result of a function that didn't finish in time
+LATE = object()
+
+
+def call_all(functions, max_workers):
+    """Call functions concurrently and return their results in order.
+
+    Work is mostly waiting on child processes so threads are enough to overlap it. If any function raises, the
+    exception of the first one to fail in call order is re-raised in the caller's thread once all have finished. This
+    includes SystemExit from messages.error.
+
+    :param list functions: callables taking no arguments
+    :param int max_workers: the most functions to run at once
+
+    :return list: the result of each function
+    """
+
+    if len(functions) <= 1 or max_workers <= 1:
+        return [function() for function in functions]
+
+    results = [None] * len(functions)
+    errors = [None] * len(functions)
+    indices = iter(range(len(functions)))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(indices, None)
+            if i is None:
+                return
+            try:
+                results[i] = functions[i]()
+            except BaseException:
+                errors[i] = sys.exc_info()[1]
+
+    threads = [threading.Thread(target=worker) for _ in range(min(max_workers, len(functions)))]
+    for thread in threads:
+        thread.daemon = True  # never keep the process alive after the caller is interrupted
+        thread.start()
+    for thread in threads:
+        while thread.is_alive():
+            thread.join(_JOIN_INTERVAL)
+
+    for error in errors:
+        if error is not None:
+            raise error
+    return results
+
+
+def imap(functions, max_workers, deadline=None):
+    """Call functions concurrently, yielding their results in order as soon as each is available.
+
+    Unlike call_all, the exception of a function that fails is raised as soon as its result is reached. Closing the
+    generator keeps any function that hasn't started from being called.
+
+    :param list functions: callables taking no arguments
+    :param int max_workers: the most functions to run at once
+    :param float deadline: when, as a time.time() value, to stop waiting. LATE is yielded for every function that
+        hasn't finished by then, which is left running.
+
+    :return generator: the result of each function
+    """
+
+    if deadline is None and (len(functions) <= 1 or max_workers <= 1):
+        for function in functions:
+            yield function()
+        return
+
+    results = [None] * len(functions)
+    errors = [None] * len(functions)
+    finished = [False] * len(functions)
+    indices = iter(range(len(functions)))
+    condition = threading.Condition()
+    stopped = []
+
+    def worker():
+        while True:
+            with condition:
+                i = None if stopped else next(indices, None)
+            if i is None:
+                return
+            try:
+                result, error = functions[i](), None
+            except BaseException:
+                result, error = None, sys.exc_info()[1]
+            with condition:
+                results[i], errors[i], finished[i] = result, error, True
+                condition.notify_all()
+
+    for _ in range(max(1, min(max_workers, len(functions)))):
+        thread = threading.Thread(target=worker)
+        thread.daemon = True  # never keep the process alive after the caller is interrupted
+        thread.start()
+
+    try:
+        for i in range(len(functions)):
+            with condition:
+                while not finished[i]:
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    condition.wait(_JOIN_INTERVAL if remaining is None else min(_JOIN_INTERVAL, remaining))
+                result, error = (results[i], errors[i]) if finished[i] else (LATE, None)
+                results[i] = None  # the caller holds it now
+            if error is not None:
+                raise error
+            yield result
+    finally:
+        with condition:
+            stopped.append(True)
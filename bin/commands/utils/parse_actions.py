@@ -25,11 +25,14 @@ def append_list(*args):
     class AppendList(argparse.Action):
         """Appends a value to the destination list.
 
-        This is different from action='append' in that the value is not from the command line.
+        This is different from action='append' in that the value is not from the command line. A lazy default, or a
+        lazy const stored by an earlier option, is resolved before appending to it.
         """
 
         def __call__(self, parser, namespace, values, option_string=None):
             current_values = getattr(namespace, self.dest)
+            if isinstance(current_values, LazyDefault):
+                current_values = list(current_values.compute())
             [current_values.append(v) for v in args or []]
             [current_values.append(v) for v in values or []]
             setattr(namespace, self.dest, current_values)
@@ -72,3 +75,30 @@ def dict_set(delimiter):
                 result[key] += [value]
             setattr(namespace, self.dest, result)
     return DictSet
+
+
+class LazyDefault(object):
+    """A default, or const, computed only if it ends up in the parsed arguments.
+
+    Defaults that read config are wrapped in one so building a parser, printing help, or running a sub-command that
+    doesn't use them never reads config. Call resolve_defaults on the parsed arguments to compute them.
+
+    :param callable compute: takes no arguments and returns the value
+    """
+
+    def __init__(self, compute):
+        self.compute = compute
+
+
+def resolve_defaults(namespace):
+    """Replace any lazy defaults in parsed arguments with their values.
+
+    :param argparse.Namespace namespace: the parsed arguments
+
+    :return argparse.Namespace: the same arguments
+    """
+
+    for dest, value in vars(namespace).items():
+        if isinstance(value, LazyDefault):
+            setattr(namespace, dest, value.compute())
+    return namespace
@@ -1,6 +1,3 @@
-import enum
-
-
 def as_bool(value):
     """Returns whether the input is a string representation of a boolean.
 
@@ -20,6 +17,7 @@ def as_bool(value):
 
 
 def as_enum(enum_type):
+    import enum  # most values aren't enums
     assert type(enum_type) == enum.EnumMeta, "'enum_type' must be an {!r}. Given {!r}".format(
         enum.Enum,
         type(enum_type)
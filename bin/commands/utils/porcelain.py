@@ -0,0 +1,266 @@
+"""A streaming parser for `git status --porcelain=v2 --branch -z`.
+
+A single status scan answers both the branch header and the list of changed paths. Output is read in chunks and
+parsed into compact records as it arrives rather than held as one large string.
+"""
+
+import collections
+import subprocess
+import threading
+
+import execute
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class Branch(collections.namedtuple('Branch', 'oid head upstream gone ahead behind')):
+    """The branch header.
+
+    :ivar str oid: the commit HEAD points to or None before the first commit
+    :ivar str head: the current branch or None when detached
+    :ivar str upstream: the short name of the upstream or None if none is configured
+    :ivar bool gone: whether the upstream is configured but no longer exists
+    :ivar int ahead: commits ahead of the upstream or None if unknown, e.g. when status.aheadBehind is false
+    :ivar int behind: commits behind the upstream or None if unknown
+    """
+
+    __slots__ = ()
+
+
+class Entry(collections.namedtuple('Entry', 'kind index worktree submodule path original_path')):
+    """A changed path.
+
+    :ivar str kind: ordinary, renamed, unmerged, untracked, or ignored
+    :ivar str index: the status letter of the index, ' ' when unchanged
+    :ivar str worktree: the status letter of the working tree, ' ' when unchanged
+    :ivar str submodule: the submodule state, 'N...' for anything that isn't a submodule
+    :ivar str path: the path relative to the repository root
+    :ivar str original_path: the path before a rename or copy or None
+    """
+
+    __slots__ = ()
+
+
+class Status(collections.namedtuple('Status', 'branch entries collapsed summary')):
+    """A status scan.
+
+    :ivar Branch branch: the branch header
+    :ivar list entries: the changed paths in the order git listed them, empty when summarized
+    :ivar bool collapsed: whether untracked files are listed by directory because listing each was given up
+    :ivar Summary summary: counts of the changed paths when there were too many to keep or None
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, branch, entries, collapsed=False, summary=None):
+        return super(Status, cls).__new__(cls, branch, entries, collapsed, summary)
+
+
+class Summary(object):
+    """Counts of changed paths by their short format status and top-level directory.
+
+    :ivar dict counts: (status, directory) -> paths, where status is the two letters of the short format and directory
+        is the top-level directory with a trailing slash or './' for paths in the root
+    :ivar int total: the paths counted
+    """
+
+    __slots__ = ('counts', 'total')
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+
+    def add(self, entry):
+        """Count an entry.
+
+        :param Entry entry: the changed path
+        """
+
+        directory, separator, _ = entry.path.partition('/')
+        key = (entry.index + entry.worktree, directory + '/' if separator else './')
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.total += 1
+
+    def most_common(self, limit=None):
+        """Returns the largest groups first.
+
+        :param int limit: the most groups to return or None for all of them
+
+        :return list: ((status, directory), paths) pairs
+        """
+
+        groups = sorted(self.counts.iteritems(), key=lambda group: (-group[1], group[0][1], group[0][0]))
+        return groups if limit is None else groups[:limit]
+
+
+class ScanLimitExceeded(Exception):
+    """Raised when a scan lists more untracked files or runs longer than allowed."""
+
+_NO_BRANCH = Branch(None, None, None, False, None, None)
+
+# fields before the path in each kind of entry line
+_FIELD_COUNTS = {'1': 8, '2': 9, 'u': 10}
+_KINDS = {'1': 'ordinary', '2': 'renamed', 'u': 'unmerged', '?': 'untracked', '!': 'ignored'}
+
+
+def _records(chunks):
+    """Yield NUL-terminated records from chunks of output, joining records split across chunks."""
+
+    partial = ''
+    for chunk in chunks:
+        records = (partial + chunk).split('\0')
+        partial = records.pop()
+        for record in records:
+            yield record
+    if partial:
+        yield partial
+
+
+def _branch(branch, line):
+    key, _, value = line[2:].partition(' ')
+    if key == 'branch.oid':
+        return branch._replace(oid=None if value == '(initial)' else value)
+    elif key == 'branch.head':
+        return branch._replace(head=None if value == '(detached)' else value)
+    elif key == 'branch.upstream':
+        return branch._replace(upstream=value, gone=True)  # until a branch.ab header says otherwise
+    elif key == 'branch.ab':
+        ahead, behind = value.split()
+        return branch._replace(gone=False, ahead=_count(ahead), behind=_count(behind))
+    return branch  # headers added by later versions of git
+
+
+def _count(value):
+    return None if value[1:] == '?' else int(value[1:])
+
+
+def _parse(chunks):
+    """Yield the branch header once every header line is read, then each entry as it's read."""
+
+    branch = _NO_BRANCH
+    headers_read = False
+    records = _records(chunks)
+    for record in records:
+        if not record:
+            continue
+
+        kind = record[0]
+        if kind == '#':
+            branch = _branch(branch, record)
+            continue
+        if not headers_read:
+            headers_read = True
+            yield branch
+
+        if kind in _FIELD_COUNTS:
+            fields = record.split(' ', _FIELD_COUNTS[kind])
+            xy, submodule, path = fields[1], fields[2], fields[-1]
+            original_path = next(records, None) if kind == '2' else None
+            yield Entry(_KINDS[kind], xy[0].replace('.', ' '), xy[1].replace('.', ' '), submodule, path, original_path)
+        elif kind in _KINDS:
+            yield Entry(_KINDS[kind], kind, kind, 'N...', record[2:], None)
+
+    if not headers_read:
+        yield branch
+
+
+def parse(chunks, untracked_limit=None, summary_threshold=None):
+    """Parse porcelain v2 status output.
+
+    Entries are kept until there are more than summary_threshold of them. They're then only counted so memory no longer
+    grows with the number of changed paths.
+
+    :param iterable chunks: the output in one or more pieces
+    :param int untracked_limit: the most untracked files to accept or None for no limit
+    :param int summary_threshold: the most entries to keep before summarizing them or None to keep every entry
+
+    :return Status: the branch header and the entries in the order git listed them, or their summary
+
+    :raise ScanLimitExceeded: if more than untracked_limit untracked files are listed
+    """
+
+    parsed = _parse(chunks)
+    branch = next(parsed)
+    entries = []
+    summary = None
+    untracked = 0
+    for entry in parsed:
+        if entry.kind == 'untracked':
+            untracked += 1
+            if untracked_limit is not None and untracked > untracked_limit:
+                raise ScanLimitExceeded('more than {} untracked files'.format(untracked_limit))
+
+        if summary is not None:
+            summary.add(entry)
+            continue
+        entries.append(entry)
+        if summary_threshold is not None and len(entries) > summary_threshold:
+            summary = Summary()
+            for kept in entries:
+                summary.add(kept)
+            entries = []
+    return Status(branch, entries, summary=summary)
+
+
+def _give_up(proc, expired):
+    expired.set()
+    try:
+        proc.kill()
+    except OSError:
+        pass  # already exited
+
+
+def _scan(untracked_files, ahead_behind, untracked_limit=None, timeout=None, summary_threshold=None):
+    """Run one `git status` and parse its output, giving up once it crosses either limit."""
+
+    command = ['git', 'status', '--porcelain=v2', '--branch', '-z', '--untracked-files=' + untracked_files]
+    command += [] if ahead_behind else ['--no-ahead-behind']
+    proc = execute.popen(command, stdout=subprocess.PIPE)
+
+    expired = threading.Event()
+    timer = threading.Timer(timeout, _give_up, [proc, expired]) if timeout else None
+    if timer:
+        timer.daemon = True
+        timer.start()
+    try:
+        result = parse(iter(lambda: proc.stdout.read(_CHUNK_SIZE), ''), untracked_limit, summary_threshold)
+    except ScanLimitExceeded:
+        _give_up(proc, expired)
+        proc.wait()
+        raise
+    finally:
+        if timer:
+            timer.cancel()
+            timer.join()  # so it can't kill anything once the process is reaped
+
+    if proc.wait():
+        if expired.is_set():
+            raise ScanLimitExceeded('longer than {} seconds'.format(timeout))
+        raise subprocess.CalledProcessError(proc.returncode, command)
+    return result
+
+
+def status(untracked_files='all', ahead_behind=True, untracked_limit=None, timeout=None, summary_threshold=None):
+    """Run a single status scan.
+
+    With auto, untracked files are listed individually unless the scan lists more than untracked_limit of them or runs
+    longer than timeout seconds. It's then given up and untracked files are listed by directory like with normal, which
+    is also what core.untrackedCache speeds up.
+
+    :param str untracked_files: how to show untracked files (all, normal, no, or auto)
+    :param bool ahead_behind: whether to count commits ahead and behind the upstream or only tell if they differ
+    :param int untracked_limit: with auto, the most untracked files to list individually or None for no limit
+    :param float timeout: with auto, the most seconds to spend listing untracked files individually or None for no limit
+    :param int summary_threshold: the most entries to list before summarizing them or None to never summarize
+
+    :return Status: the branch header and entries
+
+    :raise CalledProcessError: if git fails
+    """
+
+    if untracked_files != 'auto':
+        return _scan(untracked_files, ahead_behind, summary_threshold=summary_threshold)
+    try:
+        return _scan('all', ahead_behind, untracked_limit, timeout, summary_threshold)
+    except ScanLimitExceeded:
+        return _scan('normal', ahead_behind, summary_threshold=summary_threshold)._replace(collapsed=True)
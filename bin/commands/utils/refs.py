@@ -0,0 +1,309 @@
+"""An in-process reader for refs stored by the files backend.
+
+HEAD and loose refs are read directly from the git directory. packed-refs is memory-mapped and, since git writes it
+sorted, binary searched so a lookup touches only a handful of pages even with tens of thousands of packed refs. Anything
+this reader cannot answer exactly, such as a repository using the reftable backend, raises RefsUnavailable so callers
+can fall back to git itself.
+"""
+
+import mmap
+import os
+import re
+
+import directories
+
+_MAX_SYMREF_DEPTH = 5
+_OBJECT_NAME = re.compile('^(?:[0-9a-f]{40}|[0-9a-f]{64})$')
+_ROOT_REF = re.compile('^[A-Z_]+$')
+_INVALID_REFNAME = re.compile(r'[\x00-\x20\x7f~^:?*\[\\]|\.\.|@\{|//|/\.|\.lock(?:/|$)|^/|/$|^\.|\.$')
+_PER_WORKTREE_PREFIXES = ('refs/worktree/', 'refs/bisect/', 'refs/rewritten/')
+
+# the rules `git rev-parse` uses to expand a short name into a ref, in order
+_REV_PARSE_RULES = ('{}', 'refs/{}', 'refs/tags/{}', 'refs/heads/{}', 'refs/remotes/{}', 'refs/remotes/{}/HEAD')
+
+# path -> _PackedRefs
+_packed = {}
+
+
+class RefsUnavailable(Exception):
+    """Raised when a ref lookup cannot be answered without git."""
+
+
+def _stat_signature(stat):
+    return stat.st_mtime, stat.st_ino, stat.st_size, stat.st_dev
+
+
+def _is_valid_refname(refname):
+    return bool(_ROOT_REF.match(refname)) or (refname.startswith('refs/') and not _INVALID_REFNAME.search(refname))
+
+
+class _PackedRefs(object):
+    """A memory-mapped view of a packed-refs file.
+
+    Each record is a "<sha> <refname>" line optionally followed by a "^<sha>" line holding the peeled value of a tag.
+    """
+
+    def __init__(self, path):
+        self._map = None
+        self._start = 0
+        self.sorted = False
+
+        with open(path, 'rb') as packed_file:
+            stat = os.fstat(packed_file.fileno())
+            self.signature = _stat_signature(stat)
+            if stat.st_size:
+                self._map = mmap.mmap(packed_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._map is None:
+            return
+        if self._map[-1] != '\n':
+            raise RefsUnavailable('packed-refs is truncated')
+        if self._map[0] == '#':
+            header_end = self._map.find('\n')
+            self.sorted = 'sorted' in self._map[:header_end].split()
+            self._start = header_end + 1
+
+    def _record(self, start):
+        """Returns the refname and sha of the record at an offset along with the offset of the next record."""
+
+        end = self._map.find('\n', start)
+        space = self._map.find(' ', start, end)
+        if space == -1:
+            raise RefsUnavailable('malformed packed-refs record')
+
+        next_start = end + 1
+        if self._map[next_start:next_start + 1] == '^':
+            next_start = self._map.find('\n', next_start) + 1
+        return self._map[space + 1:end], self._map[start:space], next_start
+
+    def _record_start(self, position):
+        """Returns the offset of the record containing an offset."""
+
+        while True:
+            start = self._map.rfind('\n', self._start, position) + 1 or self._start
+            if self._map[start] != '^':
+                return start
+            position = start - 1
+
+    def get(self, refname):
+        """Returns the sha of a packed ref or None if it isn't packed."""
+
+        if self._map is None:
+            return None
+
+        if not self.sorted:
+            position = self._map.find(' ' + refname + '\n', self._start)
+            return self._record(self._record_start(position))[1] if position != -1 else None
+
+        low, high = self._start, len(self._map)
+        while low < high:
+            start = self._record_start((low + high) // 2)
+            name, sha, next_start = self._record(start)
+            if name == refname:
+                return sha
+            elif name < refname:
+                low = next_start
+            else:
+                high = start
+        return None
+
+    def has_prefix(self, prefix):
+        """Returns whether any packed ref starts with a prefix."""
+
+        return self._map is not None and self._map.find(' ' + prefix, self._start) != -1
+
+    def matching(self, pattern):
+        """Yields the packed refs whose name is a pattern or ends with '/' followed by the pattern."""
+
+        if self._map is None:
+            return
+
+        for needle in (' ' + pattern + '\n', '/' + pattern + '\n'):
+            position = self._map.find(needle, self._start)
+            while position != -1:
+                name, sha, _ = self._record(self._record_start(position))
+                yield name, sha
+                position = self._map.find(needle, position + 1)
+
+
+def _packed_refs(path):
+    """Returns the view of a packed-refs file, mapping it again only if it changed since it was last mapped."""
+
+    try:
+        signature = _stat_signature(os.stat(path))
+    except OSError:
+        _packed.pop(path, None)
+        return None
+
+    packed = _packed.get(path)
+    if packed is None or packed.signature != signature:
+        try:
+            packed = _PackedRefs(path)
+        except (IOError, OSError, ValueError):
+            raise RefsUnavailable('cannot read {0!r}'.format(path))
+        _packed[path] = packed
+    return packed
+
+
+class RefStore(object):
+    """The refs of a repository as seen from one of its worktrees."""
+
+    def __init__(self, git_dir):
+        self.git_dir = git_dir
+        self.common_dir = directories.common_directory(git_dir)
+        if os.path.isdir(os.path.join(self.common_dir, 'reftable')):
+            raise RefsUnavailable('the reftable backend is not supported')
+
+    def _path(self, refname):
+        if _ROOT_REF.match(refname) or refname.startswith(_PER_WORKTREE_PREFIXES):
+            return os.path.join(self.git_dir, refname)
+        return os.path.join(self.common_dir, refname)
+
+    def _packed(self):
+        return _packed_refs(os.path.join(self.common_dir, 'packed-refs'))
+
+    def _read_loose(self, refname):
+        try:
+            with open(self._path(refname)) as ref_file:
+                contents = ref_file.read(4096).strip()
+        except (IOError, OSError):
+            return None  # missing or a directory of other refs
+
+        if contents.startswith('ref:'):
+            return contents[len('ref:'):].strip(), None
+        sha = contents.split()[0] if contents else ''
+        if not _OBJECT_NAME.match(sha):
+            raise RefsUnavailable('{0!r} is not a valid ref'.format(refname))
+        return None, sha
+
+    def _loose_refnames(self, prefix):
+        """Yields the names of loose refs starting with a prefix, which must end with '/'."""
+
+        for root in set([self.common_dir, self.git_dir]):
+            for directory, _, file_names in os.walk(os.path.join(root, prefix)):
+                relative = os.path.relpath(directory, root).replace(os.sep, '/')
+                for file_name in file_names:
+                    refname = relative + '/' + file_name
+                    # a linked worktree has its own refs for some namespaces and shares the rest
+                    if _is_valid_refname(refname) and self._path(refname) == os.path.join(root, refname):
+                        yield refname
+
+    def read(self, refname):
+        """Reads a single ref without following symbolic refs.
+
+        :param str refname: the full name of the ref
+
+        :return tuple: (symbolic target, sha) where only one is set or both are None if the ref doesn't exist
+        """
+
+        if not _is_valid_refname(refname):
+            return None, None
+
+        loose = self._read_loose(refname)
+        if loose:
+            return loose
+
+        packed = self._packed() if refname.startswith('refs/') else None
+        return None, packed.get(refname) if packed else None
+
+    def symbolic_target(self, refname):
+        """Returns the ref a symbolic ref points to or None if it isn't symbolic."""
+
+        return self.read(refname)[0]
+
+    def _follow(self, refname):
+        """Returns the name and sha of the ref a ref ends at after following symbolic refs or (None, None)."""
+
+        for _ in range(_MAX_SYMREF_DEPTH):
+            target, sha = self.read(refname)
+            if target is None:
+                return (refname, sha) if sha else (None, None)
+            refname = target
+        return None, None
+
+    def resolve(self, refname):
+        """Returns the sha a ref points to, following symbolic refs, or None if it doesn't resolve."""
+
+        return self._follow(refname)[1]
+
+    def expand(self, name):
+        """Returns the full names of every ref a short name can refer to, the way `git rev-parse` expands it.
+
+        Symbolic refs are followed so 'HEAD' expands to the current branch.
+
+        :param str name: a short or full ref name
+
+        :return list: full ref names in `git rev-parse` precedence order. More than one means the name is ambiguous.
+        """
+
+        expanded = []
+        for rule in _REV_PARSE_RULES:
+            refname = self._follow(rule.format(name))[0]
+            if refname:
+                expanded.append(refname)
+        return expanded
+
+    def has_branches(self):
+        """Returns whether any branch exists."""
+
+        packed = self._packed()
+        if packed and packed.has_prefix('refs/heads/'):
+            return True
+        return any(self.resolve(refname) for refname in self._loose_refnames('refs/heads/'))
+
+    def matching(self, pattern, prefixes=('refs/',)):
+        """Returns the refs a `git show-ref` pattern matches.
+
+        A pattern matches a ref when it is the full name of the ref or the full name ends with '/' followed by it.
+
+        :param str pattern: the pattern
+        :param tuple prefixes: the namespaces to search, each ending with '/'
+
+        :return list: sorted (refname, sha) tuples
+        """
+
+        if not pattern or ' ' in pattern or '\n' in pattern:
+            return []
+
+        matches = {}
+        packed = self._packed()
+        if packed:
+            for refname, sha in packed.matching(pattern):
+                if refname.startswith(prefixes):
+                    matches[refname] = sha
+
+        # loose refs take precedence over packed ones
+        for prefix in prefixes:
+            for refname in self._loose_refnames(prefix):
+                if refname == pattern or refname.endswith('/' + pattern):
+                    matches[refname] = self.resolve(refname)
+
+        return sorted((refname, sha) for refname, sha in matches.iteritems() if sha)
+
+    def shorten(self, refname):
+        """Returns the shortest unambiguous name of a ref the way `git rev-parse --abbrev-ref` does."""
+
+        for i in range(len(_REV_PARSE_RULES) - 1, 0, -1):
+            prefix, _, suffix = _REV_PARSE_RULES[i].partition('{}')
+            if not (refname.startswith(prefix) and refname.endswith(suffix)) or len(refname) <= len(prefix + suffix):
+                continue
+
+            short_name = refname[len(prefix):len(refname) - len(suffix)]
+            others = [rule.format(short_name) for j, rule in enumerate(_REV_PARSE_RULES) if j != i]
+            if not any(self.resolve(other) for other in others):
+                return short_name
+        return refname
+
+
+def store():
+    """Returns the ref store for the current directory.
+
+    :return RefStore: the ref store
+
+    :raise RefsUnavailable: if not within a repository or the repository's refs cannot be read in-process
+    """
+
+    git_dir = directories.git_directory()
+    if git_dir is None:
+        raise RefsUnavailable('not a git repository')
+    return RefStore(git_dir)
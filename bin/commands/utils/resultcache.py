@@ -0,0 +1,237 @@
+"""An on-disk cache of command output keyed by the repository state the output depends on.
+
+Each entry is a file in the git directory named by a hash of the command and a fingerprint of what its output depends
+on, its basis. Changing the basis changes the key, so a stale entry is never read again and just ages out. A hit
+refreshes the entry's modification time. Once the cache grows past its size limit, the least recently used entries are
+evicted.
+"""
+
+import collections
+import hashlib
+import os
+import time
+
+import directories, refs
+
+BASES = ('head', 'index', 'refs', 'worktree')
+DEFAULT_MAX_SIZE = 1024 * 1024
+
+_DIRECTORY = os.path.join('git-state', 'cache')
+_TTL_PREFIX = 'ttl='
+
+# the most changed paths kept to fingerprint the working tree before only counting them
+_WORKTREE_SUMMARY_THRESHOLD = 1000
+
+
+class Basis(collections.namedtuple('Basis', 'bases ttl')):
+    """What a cached result depends on.
+
+    :ivar tuple bases: the parts of the repository the result depends on, a sorted subset of BASES
+    :ivar float ttl: seconds a result stays fresh or None if it doesn't expire
+    """
+
+    __slots__ = ()
+
+
+def parse_basis(value):
+    """Parse a basis such as 'head,index' or 'refs ttl=300'.
+
+    :param str value: comma or space separated bases and an optional ttl=<seconds>
+
+    :return Basis: the basis
+
+    :raise ValueError: if the value names an unknown basis or an invalid ttl
+    """
+
+    bases = set()
+    ttl = None
+    for token in value.replace(',', ' ').lower().split():
+        if token.startswith(_TTL_PREFIX):
+            ttl = float(token[len(_TTL_PREFIX):])
+            if ttl <= 0:
+                raise ValueError('{0!r} is not a positive ttl'.format(token))
+        elif token in BASES:
+            bases.add(token)
+        else:
+            raise ValueError('{0!r} is not a cache basis'.format(token))
+
+    if not bases and ttl is None:
+        raise ValueError('{0!r} has no cache basis'.format(value))
+    return Basis(tuple(sorted(bases)), ttl)
+
+
+def _signature(path):
+    try:
+        stat = os.lstat(path)
+    except OSError:
+        return None
+    return stat.st_mtime, stat.st_ino, stat.st_size
+
+
+def _refs_signature(store):
+    """Returns a signature that changes whenever a ref is created, updated, or deleted.
+
+    Git writes a loose ref to a lock file and renames it into place, which updates the modification time of the
+    directory holding it, so the refs directories are stat-ed rather than every ref read.
+    """
+
+    signatures = [_signature(os.path.join(store.git_dir, 'HEAD')), _signature(os.path.join(store.common_dir, 'packed-refs'))]
+    for root in sorted(set([store.git_dir, store.common_dir])):
+        for directory, subdirectories, _ in os.walk(os.path.join(root, 'refs')):
+            subdirectories.sort()
+            signatures.append((directory, _signature(directory)))
+    return signatures
+
+
+def fingerprint(bases, context, scan=None):
+    """Returns a fingerprint of parts of the repository.
+
+    The worktree basis implies HEAD and the index since the status of the working tree is relative to them. Its changed
+    paths are taken from a status scan, so a caller also showing the status should pass the scan it shows to share it.
+    When that scan summarized the paths their counts stand in for them, so a further edit to an already changed path
+    goes unnoticed.
+
+    :param tuple bases: the parts of the repository, see BASES
+    :param RepoContext context: facts about the current repository
+    :param callable scan: takes no arguments and returns the status scan, by default every untracked file is listed
+
+    :return str: the fingerprint or None if it cannot be taken in-process
+    """
+
+    parts = []
+    try:
+        store = refs.store() if bases else None
+        if 'head' in bases or 'worktree' in bases:
+            parts.append(('head', store.symbolic_target('HEAD'), store.resolve('HEAD')))
+        if 'index' in bases or 'worktree' in bases:
+            parts.append(('index', _signature(os.path.join(store.git_dir, 'index'))))
+        if 'refs' in bases:
+            parts.append(('refs', _refs_signature(store)))
+    except refs.RefsUnavailable:
+        return None
+
+    if 'worktree' in bases:
+        # changed paths are stat-ed so further edits to an already modified file are noticed
+        status = scan() if scan else context.status('all', summary_threshold=_WORKTREE_SUMMARY_THRESHOLD)
+        if status.summary:
+            parts.append(('worktree', sorted(status.summary.counts.iteritems())))
+        else:
+            parts.append(('worktree', [(entry, _signature(entry.path)) for entry in status.entries]))
+    return hashlib.sha1(repr(parts)).hexdigest()
+
+
+def key(command, basis, fingerprint_):
+    """Returns the key of a command's result.
+
+    :param list command: the command
+    :param Basis basis: what the result depends on
+    :param str fingerprint_: the fingerprint of the basis
+
+    :return str: the key
+    """
+
+    return hashlib.sha1(repr((command, basis, fingerprint_))).hexdigest()
+
+
+class ResultCache(object):
+    """Cached results stored one per file.
+
+    Errors reading or writing the cache are never fatal: an unreadable entry is a miss and an unwritable one is skipped.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self._stored = False
+
+    def _path(self, key_):
+        return os.path.join(self.directory, key_)
+
+    def get(self, key_, ttl=None):
+        """Returns a cached result.
+
+        :param str key_: the key of the result
+        :param float ttl: seconds the result stays fresh or None if it doesn't expire
+
+        :return str: the result or None if it isn't cached or has expired
+        """
+
+        cached = self.get_with_age(key_)
+        if cached is None or (ttl is not None and cached[1] > ttl):
+            return None
+        return cached[0]
+
+    def get_with_age(self, key_):
+        """Returns a cached result however long ago it was cached.
+
+        :param str key_: the key of the result
+
+        :return tuple: the result and seconds since it was cached, or None if it isn't cached
+        """
+
+        path = self._path(key_)
+        try:
+            with open(path, 'rb') as entry:
+                created = float(entry.readline())
+                result = entry.read()
+            os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            return None
+        return result, max(0.0, time.time() - created)
+
+    def put(self, key_, result):
+        """Cache a result.
+
+        :param str key_: the key of the result
+        :param str result: the result
+        """
+
+        import tempfile  # imports random and hashing modules that only writing a result needs
+
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            descriptor, temporary = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+            with os.fdopen(descriptor, 'wb') as entry:
+                entry.write('{!r}\n'.format(time.time()))
+                entry.write(result)
+            os.rename(temporary, self._path(key_))
+        except (IOError, OSError):
+            return
+        self._stored = True
+
+    def evict(self):
+        """Remove the least recently used results until the cache is within its size limit."""
+
+        if not self._stored:
+            return
+
+        entries = []
+        try:
+            for name in os.listdir(self.directory):
+                stat = os.stat(self._path(name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        except OSError:
+            return
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, name in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                continue
+            size -= entry_size
+
+
+def open_(max_size=DEFAULT_MAX_SIZE):
+    """Returns the cache of the current repository.
+
+    :param int max_size: the most bytes the cache may hold
+
+    :return ResultCache: the cache or None if not within a repository
+    """
+
+    git_dir = directories.git_directory()
+    return ResultCache(os.path.join(git_dir, _DIRECTORY), max_size) if git_dir else None
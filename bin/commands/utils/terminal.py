@@ -0,0 +1,116 @@
+"""The terminal standard output is attached to, and the pager.
+
+The size of the terminal is read with the TIOCGWINSZ ioctl and the screen is cleared with ANSI sequences so neither
+forks a process. The pager is chosen the way git chooses it: GIT_PAGER, then core.pager, then PAGER, then less.
+"""
+
+import fcntl
+import os
+import struct
+import sys
+import termios
+from subprocess import PIPE
+
+import execute
+import git
+
+CLEAR_SCREEN = '\033[H\033[2J'
+CLEAR_FROM_LINE = '\033[{};1H\033[J'
+
+_DEFAULT_PAGER = 'less'
+
+# what git sets for the pager unless the environment already has them
+_PAGER_ENVIRONMENT = {'LESS': 'FRX', 'LV': '-c'}
+
+
+def is_terminal(stream=None):
+    """Returns whether a stream is attached to a terminal.
+
+    :param file stream: the stream (default: standard output)
+    """
+
+    stream = stream or sys.stdout
+    try:
+        return stream.isatty()
+    except (AttributeError, ValueError):
+        return False  # replaced with something that isn't a file or closed
+
+
+def size(stream=None):
+    """Returns the size of the terminal a stream is attached to.
+
+    Python 2 has no shutil.get_terminal_size so this asks the terminal directly, falling back to the COLUMNS and LINES
+    environment variables.
+
+    :param file stream: the stream (default: standard output)
+
+    :return tuple: (columns, lines) or None if the size is unknown
+    """
+
+    stream = stream or sys.stdout
+    try:
+        lines, columns = struct.unpack('hh', fcntl.ioctl(stream.fileno(), termios.TIOCGWINSZ, '\0' * 4))
+        if lines > 0:
+            return columns, lines
+    except (AttributeError, IOError, ValueError):
+        pass  # not a terminal or not backed by a descriptor
+
+    try:
+        return int(os.environ['COLUMNS']), int(os.environ['LINES'])
+    except (KeyError, ValueError):
+        return None
+
+
+def lines(stream=None):
+    """Returns the number of lines in the terminal a stream is attached to or None if unknown.
+
+    :param file stream: the stream (default: standard output)
+    """
+
+    terminal_size = size(stream)
+    return terminal_size[1] if terminal_size else None
+
+
+def clear(stream=None):
+    """Clear the screen.
+
+    :param file stream: the stream (default: standard output)
+    """
+
+    stream = stream or sys.stdout
+    stream.write(CLEAR_SCREEN)
+    stream.flush()
+
+
+def pager_command():
+    """Returns the pager to use or None if paging is disabled, such as with core.pager=cat.
+
+    :return str: a shell command
+    """
+
+    command = os.environ.get('GIT_PAGER')
+    if command is None:
+        command = git.get_config_value('core.pager')
+    if command is None:
+        command = os.environ.get('PAGER', _DEFAULT_PAGER)
+
+    command = command.strip()
+    return command if command and command != 'cat' else None
+
+
+def pager(command=None):
+    """Start a pager reading from a pipe.
+
+    :param str command: the pager (default: pager_command())
+
+    :return Popen: the pager, its stdin a pipe, or None if paging is disabled
+    """
+
+    command = command or pager_command()
+    if not command:
+        return None
+
+    environment = os.environ.copy()
+    for name, value in _PAGER_ENVIRONMENT.iteritems():
+        environment.setdefault(name, value)
+    return execute.popen(command, shell=True, stdin=PIPE, env=environment)
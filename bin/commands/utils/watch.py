@@ -0,0 +1,319 @@
+"""Wait for changes to a repository.
+
+Changes are reported as the inputs they affect:
+
+- config: the repository's config
+- head: HEAD
+- index: the index
+- refs: any ref, loose or packed
+- worktree: any path in the working tree
+
+inotify is used through ctypes where the C library provides it. Otherwise, or if the system runs out of inotify watches,
+the repository is polled instead. ctypes is only imported once something is watched since loading it is slow.
+"""
+
+import errno
+import hashlib
+import os
+import select
+import struct
+import sys
+import time
+
+import directories
+
+INPUTS = ('config', 'head', 'index', 'refs', 'worktree')
+
+# report a burst of changes, such as a checkout, once it has been quiet this long
+_DEBOUNCE = 0.1
+# but never hold a steady stream of changes back for longer than this
+_MAX_DELAY = 1.0
+_POLL_INTERVAL = 1.0
+
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_MASK = (
+    _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE |
+    _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR
+)
+
+# struct inotify_event without its trailing name
+_EVENT = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+# files in a git directory -> the input they hold
+_GIT_FILES = {'HEAD': 'head', 'index': 'index', 'config': 'config', 'packed-refs': 'refs'}
+
+
+class WatchUnavailable(Exception):
+    """Raised when inotify cannot watch a repository."""
+
+
+def _encode(path):
+    return path.encode(sys.getfilesystemencoding()) if isinstance(path, unicode) else path
+
+
+class _Layout(object):
+    """Where the inputs of a repository live, leaving out the working tree unless it's watched."""
+
+    def __init__(self, root, worktree=True):
+        self.root = os.path.abspath(root)
+        self.worktree = worktree
+        self.git_dir = directories.git_directory(self.root)
+        self.common_dir = directories.common_directory(self.git_dir)
+        self.git_dirs = sorted(set([self.git_dir, self.common_dir]))
+
+    def classify(self, path):
+        """Returns the input a path belongs to or None if changes to it don't matter.
+
+        :param str path: an absolute path
+
+        :return str: the input
+        """
+
+        for git_dir in self.git_dirs:
+            if path.startswith(git_dir + os.sep):
+                relative = path[len(git_dir) + 1:]
+                if relative.endswith('.lock'):
+                    return None  # only the rename into place matters
+                elif relative.startswith('refs' + os.sep):
+                    return 'refs'
+                return _GIT_FILES.get(relative)
+
+        if self.worktree and (path == self.root or path.startswith(self.root + os.sep)):
+            relative = os.path.relpath(path, self.root)
+            return None if '.git' in relative.split(os.sep) else 'worktree'
+        return None
+
+    def walk(self, top):
+        """Yields every directory under top, skipping any git directories."""
+
+        for directory, subdirectories, _ in os.walk(top):
+            subdirectories[:] = sorted(name for name in subdirectories if name != '.git')
+            yield directory
+
+
+class _Watcher(object):
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _libc():
+    import ctypes
+
+    # the C library is already loaded into the interpreter
+    libc = ctypes.CDLL(None, use_errno=True)
+    try:
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except AttributeError:
+        raise WatchUnavailable('inotify is not available')
+    return libc
+
+
+class _InotifyWatcher(_Watcher):
+    """Watches every directory of the working tree along with the git directory and its refs."""
+
+    def __init__(self, layout):
+        import ctypes
+
+        self._layout = layout
+        self._libc = _libc()
+        self._get_errno = ctypes.get_errno
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise WatchUnavailable(os.strerror(self._get_errno()))
+        self._directories = {}
+
+        try:
+            if layout.worktree:
+                self._watch_tree(layout.root)
+            for git_dir in layout.git_dirs:
+                self._watch(git_dir)
+                self._watch_tree(os.path.join(git_dir, 'refs'))
+        except WatchUnavailable:
+            self.close()
+            raise
+
+    def _watch(self, directory):
+        descriptor = self._libc.inotify_add_watch(self._fd, _encode(directory), _MASK)
+        if descriptor >= 0:
+            self._directories[descriptor] = directory
+            return
+
+        error = self._get_errno()
+        if error not in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+            raise WatchUnavailable(os.strerror(error))  # usually ENOSPC after running out of watches
+
+    def _watch_tree(self, top):
+        for directory in self._layout.walk(top):
+            self._watch(directory)
+
+    def _read(self, timeout):
+        """Returns the inputs changed by the events that arrive within a timeout or None if none arrive."""
+
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return None
+
+        try:
+            data = os.read(self._fd, _READ_SIZE)
+        except OSError as error:
+            if error.errno in (errno.EAGAIN, errno.EINTR):
+                return set()
+            raise
+
+        changed = set()
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            descriptor, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip('\0')
+            offset += _EVENT.size + length
+
+            if mask & _IN_Q_OVERFLOW:
+                changed.update(INPUTS)  # events were dropped so anything may have changed
+                continue
+            elif mask & _IN_IGNORED:
+                self._directories.pop(descriptor, None)
+                continue
+
+            directory = self._directories.get(descriptor)
+            if directory is None:
+                continue
+            path = os.path.join(directory, name) if name else directory
+            input_ = self._layout.classify(path)
+            if input_ is None:
+                continue
+
+            changed.add(input_)
+            if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO) and input_ in ('refs', 'worktree'):
+                try:
+                    self._watch_tree(path)
+                except WatchUnavailable:
+                    pass  # anything below it goes unnoticed but the directory itself was reported
+        return changed
+
+    def wait(self, timeout=None):
+        """Wait for changes.
+
+        :param float timeout: seconds to wait or None to wait until something changes
+
+        :return set: the inputs that changed, empty if the timeout passed first
+        """
+
+        deadline = None if timeout is None else time.time() + timeout
+        changed = set()
+        while not changed:
+            remaining = None if deadline is None else max(0, deadline - time.time())
+            events = self._read(remaining)
+            if events is None:
+                return changed
+            changed |= events
+
+        settled = time.time() + _MAX_DELAY
+        while time.time() < settled:
+            events = self._read(max(0, min(_DEBOUNCE, settled - time.time())))
+            if events is None:
+                break
+            changed |= events
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class _PollingWatcher(_Watcher):
+    """Compares the stat data of every input on an interval."""
+
+    def __init__(self, layout):
+        self._layout = layout
+        self._snapshot = self._take()
+
+    def _take(self):
+        """Returns a digest of each input."""
+
+        digests = dict((input_, hashlib.sha1()) for input_ in INPUTS)
+        for git_dir in self._layout.git_dirs:
+            for name, input_ in sorted(_GIT_FILES.iteritems()):
+                digests[input_].update(repr(_signature(os.path.join(git_dir, name))))
+            for directory, _, file_names in os.walk(os.path.join(git_dir, 'refs')):
+                for name in sorted(file_names):
+                    digests['refs'].update(repr((directory, name, _signature(os.path.join(directory, name)))))
+
+        worktree = self._layout.walk(self._layout.root) if self._layout.worktree else []
+        for directory in worktree:
+            try:
+                names = sorted(os.listdir(directory))
+            except OSError:
+                continue  # removed since it was walked
+            for name in names:
+                if name != '.git':
+                    digests['worktree'].update(repr((directory, name, _signature(os.path.join(directory, name)))))
+        return dict((input_, digest.digest()) for input_, digest in digests.iteritems())
+
+    def wait(self, timeout=None):
+        """Wait for changes.
+
+        :param float timeout: seconds to wait or None to wait until something changes
+
+        :return set: the inputs that changed, empty if the timeout passed first
+        """
+
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            interval = _POLL_INTERVAL if deadline is None else max(0, min(_POLL_INTERVAL, deadline - time.time()))
+            time.sleep(interval)
+
+            snapshot = self._take()
+            changed = set(input_ for input_ in INPUTS if snapshot[input_] != self._snapshot[input_])
+            self._snapshot = snapshot
+            if changed or (deadline is not None and time.time() >= deadline):
+                return changed
+
+
+def _signature(path):
+    try:
+        stat = os.lstat(path)
+    except OSError:
+        return None
+    return stat.st_mtime, stat.st_ino, stat.st_size, stat.st_mode
+
+
+def watch(root=None, worktree=True):
+    """Returns a watcher for a repository, using inotify when it's available and polling otherwise.
+
+    Watchers can be used as context managers to release what they hold.
+
+    :param str root: the top level of the working tree (default: the current directory)
+    :param bool worktree: whether to watch the working tree, which is every directory in it, or only the git directory
+
+    :return: an object with a wait(timeout=None) method returning the set of inputs that changed
+    """
+
+    layout = _Layout(root or os.getcwd(), worktree)
+    try:
+        return _InotifyWatcher(layout)
+    except WatchUnavailable:
+        return _PollingWatcher(layout)
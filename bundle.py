@@ -0,0 +1,155 @@
+#! /usr/bin/env python
+"""Build git-commands into a single precompiled zip application.
+
+    python bundle.py --output build/git-commands.pyz
+
+The archive holds bytecode only: the commands package and every git-* entry point, the latter as modules of an
+_entrypoints package. Its __main__ runs the entry point named by how the archive was invoked, so each command is
+installed as a link to it, see `make install-bundle`. Modules are found in the archive's index rather than by scanning
+directories, and with no sources inside there's nothing to check for staleness or compile, so nothing is ever written
+next to it. Entries are stored uncompressed since decompressing them would cost more than reading them does.
+
+Bytecode is specific to the version of Python that compiled it, so the archive has to be built by the Python that will
+run it. It isn't built with -O since some commands check their arguments with assert.
+"""
+
+from __future__ import print_function
+
+import argparse
+import imp
+import marshal
+import os
+import struct
+import sys
+import zipfile
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+_BIN = os.path.join(_ROOT, 'bin')
+_PACKAGE = 'commands'
+_ENTRY_POINTS = '_entrypoints'
+
+_SHEBANG = '#! /usr/bin/env python\n'
+
+# a fixed timestamp so building the same sources produces the same archive
+_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+_MAIN = '''import os
+import sys
+
+import _entrypoints
+
+_entrypoints.run(os.path.basename(sys.argv[0]))
+'''
+
+_ENTRY_POINTS_INIT = '''"""The bundled git-* entry points, compiled but not imported until one is run."""
+
+import os
+import zipimport
+
+from commands.utils import messages
+
+# command name -> module name
+COMMANDS = {commands!r}
+
+_DIRECTORY = os.path.dirname(__file__)
+_importer = zipimport.zipimporter(_DIRECTORY)
+
+
+def code(name):
+    """Returns the compiled entry point of a command."""
+
+    return _importer.get_code(__name__ + '.' + COMMANDS[name])
+
+
+def run(name):
+    """Run the entry point of a command the way running its script would."""
+
+    if name not in COMMANDS:
+        messages.error('{{0!r}} is not a command, link to the bundle as one of: {{1}}'.format(name, ', '.join(sorted(COMMANDS))))
+    exec code(name) in {{'__name__': '__main__', '__file__': os.path.join(_DIRECTORY, name)}}
+'''
+
+
+def _pyc(source, filename):
+    """Compile source to the contents of a .pyc file.
+
+    :param str source: the source
+    :param str filename: the name tracebacks show
+
+    :return str: the magic number, a zero timestamp (only checked against a source that isn't in the archive), and the code
+    """
+
+    code = compile(source, filename, 'exec', dont_inherit=True)
+    return imp.get_magic() + struct.pack('<I', 0) + marshal.dumps(code)
+
+
+def _modules():
+    """Yields the archive name and source file of every module in the commands package."""
+
+    for directory, subdirectories, files in os.walk(os.path.join(_BIN, _PACKAGE)):
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.endswith('.py'):
+                path = os.path.join(directory, name)
+                yield os.path.relpath(path, _BIN), path
+
+
+def _entry_points():
+    """Returns the command name and script of every git-* entry point."""
+
+    names = sorted(name for name in os.listdir(_BIN) if name.startswith('git-') and os.path.isfile(os.path.join(_BIN, name)))
+    return [(name, os.path.join(_BIN, name)) for name in names]
+
+
+def build(output):
+    """Write the bundle.
+
+    :param str output: where to write it
+
+    :return int: how many modules it holds
+    """
+
+    def add(name, contents):
+        archive.writestr(zipfile.ZipInfo(name, _DATE_TIME), contents)
+
+    directory = os.path.dirname(output)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    count = 0
+    with open(output, 'wb') as bundle:
+        bundle.write(_SHEBANG)
+        archive = zipfile.ZipFile(bundle, 'w', zipfile.ZIP_STORED)
+
+        for name, path in _modules():
+            with open(path) as source:
+                add(name[:-len('.py')] + '.pyc', _pyc(source.read(), name))
+            count += 1
+
+        commands = {}
+        for name, path in _entry_points():
+            commands[name] = name.replace('-', '_')
+            with open(path) as source:
+                add('{}/{}.pyc'.format(_ENTRY_POINTS, commands[name]), _pyc(source.read(), name))
+            count += 1
+
+        add(_ENTRY_POINTS + '/__init__.pyc', _pyc(_ENTRY_POINTS_INIT.format(commands=commands), _ENTRY_POINTS + '/__init__.py'))
+        add('__main__.pyc', _pyc(_MAIN, '__main__.py'))
+        archive.close()
+
+    os.chmod(output, 0o755)
+    return count + 2
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build git-commands into a single precompiled zip application.')
+    parser.add_argument('--output', default=os.path.join(_ROOT, 'build', 'git-commands.pyz'), help='where to write the bundle')
+    args = parser.parse_args(argv)
+
+    count = build(args.output)
+    print('{} modules compiled into {}'.format(count, args.output), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import git
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestBundle(unittest.TestCase):
+
+    def setUp(self):
+        self.dirpath = os.path.realpath(tempfile.mkdtemp())
+        self.bundle = os.path.join(self.dirpath, 'bin', 'git-commands.pyz')
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call([sys.executable, os.path.join(_ROOT, 'bundle.py'), '--output', self.bundle], stderr=devnull)
+        for name in ('git-state', 'git-unknown'):
+            os.symlink('git-commands.pyz', os.path.join(self.dirpath, 'bin', name))
+
+        self.repo_path = os.path.join(self.dirpath, 'repo')
+        repo = git.Repo.init(self.repo_path)
+        repo.config_writer('repository').set_value('color', 'ui', 'never').release()
+        open(os.path.join(self.repo_path, 'README.md'), 'w').close()
+
+        self.env = os.environ.copy()
+        self.env['GIT_COMMANDS_DAEMON'] = '0'
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def _run(self, *argv):
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(self.dirpath, 'bin', argv[0])] + list(argv[1:]),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=self.repo_path,
+            env=self.env
+        )
+        stdout, stderr = proc.communicate()
+        return proc.returncode, stdout, stderr
+
+    def test_bundle(self):
+
+        # expect
+        self.assertEqual(self._run('git-state', '--prompt', '{branch}{untracked: ?}'), (0, 'master ?1\n', ''))
+        self.assertEqual(self._run('git-state', '--no-page'), (0, '# status (master)\n?? README.md\n', ''))
+
+        # then: nothing is compiled beside it
+        self.assertEqual(sorted(os.listdir(os.path.join(self.dirpath, 'bin'))), ['git-commands.pyz', 'git-state', 'git-unknown'])
+
+    def test_bundle_unknownCommand(self):
+
+        # when
+        returncode, stdout, stderr = self._run('git-unknown')
+
+        # then
+        self.assertEqual(returncode, 1)
+        self.assertRegexpMatches(stderr, "^error: 'git-unknown' is not a command, link to the bundle as one of: git-abandon, git-changes, ")
@@ -0,0 +1,130 @@
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+import git
+
+
+class TestGitCommandsDaemon(unittest.TestCase):
+
+    def _wait_for_socket(self):
+        deadline = time.time() + 10
+        while not os.path.exists(self.socket_path) and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertTrue(os.path.exists(self.socket_path), 'the daemon did not start')
+
+    def _run(self, command, cwd=None):
+        proc = subprocess.Popen(
+            shlex.split(command), stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd or self.dirpath, env=self.env
+        )
+        stdout, stderr = proc.communicate()
+        return proc.returncode, stdout, stderr
+
+    def setUp(self):
+        self.dirpath = os.path.realpath(tempfile.mkdtemp())
+        self.socket_path = os.path.join(self.dirpath, 'daemon.sock')
+        self.env = os.environ.copy()
+        self.env['GIT_COMMANDS_DAEMON_SOCKET'] = self.socket_path
+        self.env.pop('GIT_COMMANDS_TRACE', None)
+
+        self.repo_path = os.path.join(self.dirpath, 'repo')
+        repo = git.Repo.init(self.repo_path)
+        repo.config_writer('repository').set_value('color', 'ui', 'never').release()
+        open(os.path.join(self.repo_path, 'README.md'), 'w').close()
+
+        self.log = tempfile.TemporaryFile()
+        self.daemon = subprocess.Popen(['git-commands-daemon', '--verbose'], stdout=self.log, stderr=self.log, env=self.env)
+        self._wait_for_socket()
+
+    def tearDown(self):
+        if self.daemon.poll() is None:
+            self.daemon.terminate()
+            self.daemon.wait()
+        self.log.close()
+        shutil.rmtree(self.dirpath)
+
+    def _stop(self):
+        self.daemon.terminate()
+        self.daemon.wait()
+        self.log.seek(0)
+        return self.log.read()
+
+    def test_daemon(self):
+
+        # when
+        prompt = self._run("git state --prompt '{branch}{untracked: ?}'", cwd=self.repo_path)
+        view = self._run('git state', cwd=self.repo_path)
+        outside = self._run('git state')
+
+        # then
+        self.assertEqual(prompt, (0, 'master ?1\n', ''))
+        self.assertEqual(view, (0, '# status (master)\n?? README.md\n', ''))
+        self.assertEqual(outside, (1, '', "error: '{}' not a git repository\n".format(self.dirpath)))
+
+        # then: every command ran in the daemon, which removes its socket once stopped
+        log = self._stop()
+        self.assertEqual(log.count('git-state --prompt'), 1)
+        self.assertEqual(log.count('git-state ('), 2)
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_daemon_seesChanges(self):
+
+        # given
+        self.assertEqual(self._run('git state --prompt {branch}', cwd=self.repo_path)[1], 'master\n')
+
+        # when
+        subprocess.call(['git', 'symbolic-ref', 'HEAD', 'refs/heads/feature'], cwd=self.repo_path)
+
+        # then
+        self.assertEqual(self._run('git state --prompt {branch}', cwd=self.repo_path)[1], 'feature\n')
+
+    def test_daemon_keepsPersistentExtensions(self):
+
+        # given: an extension answering with how many requests it has seen, which only runs once there are commits
+        subprocess.call(['git', '-c', 'user.name=name', '-c', 'user.email=email', 'commit', '--allow-empty', '-qm', 'initial'], cwd=self.repo_path)
+        script = os.path.join(self.dirpath, 'count.py')
+        with open(script, 'w') as count:
+            count.write('''import json, os, sys
+seen = 0
+for line in iter(sys.stdin.readline, ''):
+    seen += 1
+    output = '{} {}\\n'.format(os.getpid(), seen)
+    sys.stdout.write(json.dumps({'id': json.loads(line)['id'], 'status': 0, 'output': output}) + '\\n')
+    sys.stdout.flush()
+''')
+        subprocess.call(['git', 'config', 'git-state.extensions.count.command', sys.executable + ' ' + script], cwd=self.repo_path)
+        subprocess.call(['git', 'config', 'git-state.extensions.count.protocol', 'persistent'], cwd=self.repo_path)
+
+        # when
+        first = self._run('git state --no-show status', cwd=self.repo_path)
+        second = self._run('git state --no-show status', cwd=self.repo_path)
+
+        # then: the second request is answered by the extension the first started
+        pid = first[1].splitlines()[1].split()[0]
+        self.assertEqual(first, (0, '# count\n{} 1\n'.format(pid), ''))
+        self.assertEqual(second, (0, '# count\n{} 2\n'.format(pid), ''))
+
+    def test_daemon_disabled(self):
+
+        # given
+        self.env['GIT_COMMANDS_DAEMON'] = '0'
+
+        # when
+        result = self._run('git state --prompt {branch}', cwd=self.repo_path)
+
+        # then: run in-process
+        self.assertEqual(result, (0, 'master\n', ''))
+        self.assertNotIn('git-state', self._stop())
+
+    def test_daemon_alreadyRunning(self):
+
+        # expect
+        self.assertEqual(
+            self._run('git-commands-daemon'),
+            (1, '', "error: a daemon is already listening on '{}'\n".format(self.socket_path))
+        )
@@ -210,3 +210,24 @@ class TestGitReindex(unittest.TestCase):
         # expect
         self.assertTrue(self._output('git reindex -h'.split()))
         self.assertTrue(self._output('git reindex --help'.split()))
+
+    def test_reindex_renamedFileAndSpecialCharacters(self):
+
+        # setup:
+        # RM NOTES.md
+        # AM *[x] 1.txt
+        subprocess.call('git mv README.md NOTES.md'.split())
+        with open('*[x] 1.txt', 'w') as a_file:
+            a_file.write('special\n')
+        with open('x.txt', 'w') as a_file:
+            a_file.write('matched by the glob if it were one\n')
+        subprocess.call(['git', 'add', '--', ':(literal)*[x] 1.txt'])
+        with open('NOTES.md', 'a') as a_file:
+            a_file.write('notes\n')
+        with open('*[x] 1.txt', 'a') as a_file:
+            a_file.write('special2\n')
+
+        reindex_result = self._reindex()
+
+        self.assertFalse(reindex_result)
+        self.assertEqual('A  "*[x] 1.txt"\nR  README.md -> NOTES.md\n?? x.txt\n', self._status())
@@ -1,7 +1,10 @@
 import os
+import re
 import shutil
 import subprocess
+import sys
 import tempfile
+import time
 import unittest
 
 import git
@@ -27,6 +30,21 @@ class TestState(unittest.TestCase):
         self.assertRegexpMatches(self._output('git state -v'), '^git-state \\d+\\.\\d+\\.\\d+$')
         self.assertRegexpMatches(self._output('git state --version'), '^git-state \\d+\\.\\d+\\.\\d+$')
 
+    def test_state_infoUsage_startsNoProcesses(self):
+
+        # given: outside of a repository
+        env = os.environ.copy()
+        env['GIT_COMMANDS_TRACE'] = '1'
+
+        for command in ('git-state -h', 'git-state -v', 'git-state extensions -h', 'git-state view -h'):
+            # when
+            proc = subprocess.Popen(command.split(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+            stderr = proc.communicate()[1]
+
+            # then
+            self.assertEqual(proc.returncode, 0)
+            self.assertNotIn('git-commands trace', stderr)
+
     def test_state_help(self):
 
         # expect
@@ -144,6 +162,120 @@ nothing to commit, working directory is clean
         # expect
         self.assertFalse(self._output('git state'))
 
+    def test_state_view_untrackedFilesAuto(self):
+
+        # given: an initial commit and more untracked files than the limit
+        subprocess.call('touch README.md'.split())
+        subprocess.call('git add -A'.split())
+        subprocess.call(['git', 'commit', '--quiet', '-m', 'Initial commit'])
+        os.mkdir('build')
+        for name in ('a', 'b', 'c'):
+            open(os.path.join('build', name), 'w').close()
+        self._output('git config git-state.status.untracked-files auto')
+
+        # expect: each file while under the limit
+        self.assertEqual(self._output('git state'), '''# status (master)
+?? build/a
+?? build/b
+?? build/c
+''')
+
+        # expect: the directory once over it
+        self._output('git config git-state.status.untracked-limit 2')
+        self.assertEqual(self._output('git state'), '''# status (master) untracked files collapsed
+?? build/
+''')
+
+    def test_state_view_summary(self):
+
+        # given: an initial commit and changes in a few directories
+        subprocess.call('touch README.md'.split())
+        subprocess.call('git add -A'.split())
+        subprocess.call(['git', 'commit', '--quiet', '-m', 'Initial commit'])
+        os.mkdir('gen')
+        for name in ('a', 'b', 'c'):
+            open(os.path.join('gen', name), 'w').close()
+        with open('README.md', 'w') as a_file:
+            a_file.write('readme\n')
+
+        # expect
+        self.assertEqual(self._output('git state --summary'), '''# status (master) 4 paths summarized
+?? gen/ (3)
+ M ./ (1)
+''')
+
+        # expect: past the configured threshold unless told not to summarize
+        self._output('git config git-state.status.summary-threshold 3')
+        self._output('git config git-state.status.summary-limit 1')
+        self.assertEqual(self._output('git state'), '''# status (master) 4 paths summarized
+?? gen/ (3)
+... 1 more group (1 paths)
+''')
+        self.assertEqual(self._output('git state --no-summary'), '''# status (master)
+ M README.md
+?? gen/a
+?? gen/b
+?? gen/c
+''')
+
+    def test_state_view_prompt(self):
+
+        # given: an initial commit, a staged file and an untracked directory
+        subprocess.call('touch README.md'.split())
+        subprocess.call('git add -A'.split())
+        subprocess.call(['git', 'commit', '--quiet', '-m', 'Initial commit'])
+        subprocess.call('git checkout --quiet -b feature'.split())
+        subprocess.call(['git', 'commit', '--quiet', '--allow-empty', '-m', 'Feature commit'])
+        with open('CHANGELOG.md', 'w') as a_file:
+            a_file.write('changes\n')
+        subprocess.call('git add CHANGELOG.md'.split())
+        os.mkdir('gen')
+        for name in ('a', 'b'):
+            open(os.path.join('gen', name), 'w').close()
+
+        # expect
+        self.assertEqual(self._output('git state --prompt'), 'feature +1 ?1 ^1\n')
+        self.assertEqual(self._output('git state --prompt {branch}:{staged}:{unstaged}'), 'feature:1:0\n')
+
+        # expect: the configured format is the default
+        self._output('git config git-state.prompt.format [{branch}]')
+        self.assertEqual(self._output('git state --prompt'), '[feature]\n')
+
+    def test_state_view_prompt_fromSubdirectory(self):
+
+        # given
+        subprocess.call('touch README.md'.split())
+        subprocess.call('git add -A'.split())
+        subprocess.call(['git', 'commit', '--quiet', '-m', 'Initial commit'])
+        os.makedirs(os.path.join('sub', 'nested'))
+        open(os.path.join('sub', 'nested', 'new.txt'), 'w').close()
+        os.chdir(os.path.join('sub', 'nested'))
+
+        # expect
+        self.assertEqual(self._output('git state --prompt {branch}:{untracked}'), 'master:1\n')
+
+    def test_state_view_prompt_notAGitRepository(self):
+
+        # given
+        os.chdir(tempfile.gettempdir())
+
+        # expect
+        self.assertEqual(self._output('git state --prompt'), '')
+
+    def test_state_view_untrackedFilesNo(self):
+
+        # given: an initial commit and an untracked file
+        subprocess.call('touch README.md'.split())
+        subprocess.call('git add -A'.split())
+        subprocess.call(['git', 'commit', '--quiet', '-m', 'Initial commit'])
+        subprocess.call('touch untracked.txt'.split())
+        self._output('git config git-state.status.untracked-files no')
+
+        # expect
+        self.assertEqual(self._output('git state'), '''# status (master)
+nothing to commit, working directory is clean
+''')
+
 
 class TestStateViewWithExtension(unittest.TestCase):
 
@@ -305,6 +437,10 @@ nothing to commit, working directory is clean
         self.assertEqual(self._output(['git', 'state', '--show-all', '--no-show', 'log']), expected)
         self.assertEqual(self._output(['git', 'state', '--no-show', 'log', '--show-all']), expected)
 
+        # expect: combined with show, in either order
+        self.assertEqual(self._output(['git', 'state', '--show-all', '-s', 'log']), expected)
+        self.assertEqual(self._output(['git', 'state', '-s', 'log', '--show-all']), expected)
+
     def test_state_viewWithExtension_showExtensionUsingFlag(self):
 
         # given
@@ -487,6 +623,212 @@ nothing to commit, working directory is clean
         self.assertEqual(self._output('git state --pretty'), expected)
         self.assertEqual(self._output('git state -p'), expected)
 
+    def test_state_viewWithExtension_timeout(self):
+
+        # given
+        self._output(['git', 'config', 'git-state.extensions.slow.command', "sh -c 'echo started; sleep 10'"])
+        self._output('git config git-state.extensions.slow.color false')
+        self._output('git config git-state.extensions.slow.timeout 0.5')
+
+        # when
+        start = time.time()
+        output = self._output('git state --order status log slow')
+
+        # then
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(output, '''# status (master)
+nothing to commit, working directory is clean
+# log
+{}
+# slow (timed out after 0.5s)
+started
+'''.format(self.full_log))
+
+    def test_state_viewWithExtension_persistent(self):
+
+        # given: an extension answering each request as a JSON line with its arguments
+        with open('echo.py', 'w') as script:
+            script.write('''import json, sys
+for line in iter(sys.stdin.readline, ''):
+    request = json.loads(line)
+    output = ' '.join(request['arguments']) + '\\n'
+    sys.stdout.write(json.dumps({'id': request['id'], 'status': 0, 'output': output}) + '\\n')
+    sys.stdout.flush()
+''')
+        self._output(['git', 'config', 'git-state.extensions.echo.command', sys.executable + ' echo.py'])
+        self._output('git config git-state.extensions.echo.protocol persistent')
+        self._output('git config git-state.extensions.echo.options -10')
+
+        # expect
+        self.assertEqual(self._output('git state --no-show status log'), '''# echo
+-10 --color=never
+''')
+
+    def test_state_viewWithExtension_module(self):
+
+        # given: a function on the python path
+        with open('sections.py', 'w') as module:
+            module.write("""def branch(context, options, show_color, format_):
+    return ' '.join([context.status().branch.head] + options) + '\\n'
+""")
+        self._output('git config git-state.extensions.branch.module sections:branch')
+        self._output('git config git-state.extensions.branch.options -1')
+        self._output('git config git-state.extensions.missing.module nosuchmodule:section')
+        env = os.environ.copy()
+        env['PYTHONPATH'] = self.dirpath
+
+        # when
+        proc = subprocess.Popen('git state --no-show status log'.split(), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
+        output = proc.communicate()[0]
+
+        # then: an import failure is shown as the section
+        self.assertEqual(output, """# branch
+master -1
+# missing
+nosuchmodule:section: ImportError: No module named nosuchmodule
+""")
+
+    def test_state_viewWithExtension_budget(self):
+
+        # given
+        self._output(['git', 'config', 'git-state.extensions.slow.command', "sh -c 'sleep 1; echo done'"])
+        self._output('git config git-state.extensions.slow.color false')
+        claim = os.path.join('.git', 'git-state', 'refresh')
+
+        # when: the first is pending and refreshed in the background
+        start = time.time()
+        pending = self._output('git state --budget 300 --order slow --no-show status log')
+        elapsed = time.time() - start
+        while os.path.exists(claim) and time.time() - start < 10:
+            time.sleep(0.1)
+
+        # then: the next shows what the refresh found
+        self.assertLess(elapsed, 0.9)
+        self.assertEqual(pending, '# slow (pending)\n')
+        self.assertRegexpMatches(
+            self._output('git state --budget 300 --order slow --no-show status log'),
+            '^# slow \\(stale, \\d+s old\\)\ndone\n$'
+        )
+
+    def test_state_viewWithExtension_runsConcurrently(self):
+
+        # given
+        for extension in ('one', 'two', 'three'):
+            self._output(['git', 'config', 'git-state.extensions.{}.command'.format(extension), "sh -c 'sleep 1; echo done'"])
+            self._output('git config git-state.extensions.{}.color false'.format(extension))
+
+        # when
+        start = time.time()
+        output = self._output('git state --order status log one two three')
+
+        # then
+        self.assertLess(time.time() - start, 2.5)
+        self.assertEqual(output, '''# status (master)
+nothing to commit, working directory is clean
+# log
+{}
+# one
+done
+# two
+done
+# three
+done
+'''.format(self.full_log))
+
+    def test_state_viewWithExtension_cached(self):
+
+        # given: an extension counting its runs somewhere that doesn't change the working tree
+        self._output(['git', 'config', 'git-state.extensions.runs.command', "sh -c 'echo >> .git/runs; wc -l < .git/runs'"])
+        self._output('git config git-state.extensions.runs.color false')
+        self._output('git config git-state.extensions.runs.cache head')
+
+        # when
+        first = self._output('git state --no-show status log')
+        second = self._output('git state --no-show status log')
+        subprocess.call(['git', 'commit', '--quiet', '--allow-empty', '-m', 'Another commit'])
+        third = self._output('git state --no-show status log')
+
+        # then
+        self.assertEqual(first, '# runs\n1\n')
+        self.assertEqual(second, '# runs\n1\n')
+        self.assertEqual(third, '# runs\n2\n')
+
+    def test_state_viewWithExtension_cachedOnWorktree_scansStatusOnce(self):
+
+        # given
+        self._output('git config git-state.extensions.log.cache worktree')
+        self._output('git config git-state.status.untracked-files normal')
+        with open('README.md', 'a') as a_file:
+            a_file.write('edited\n')
+
+        # when
+        output = self._output('git state --trace')
+
+        # then: the fingerprint shares the status section's scan
+        self.assertIn(' M README.md', output)
+        self.assertEqual(re.search(r'^ +(\d+) .* git status$', output, re.MULTILINE).group(1), '1')
+
+    def test_state_viewWithExtension_watch(self):
+
+        # given
+        self._output(['git', 'config', 'git-state.extensions.branch.command', 'git rev-parse --abbrev-ref HEAD'])
+        self._output('git config git-state.extensions.branch.color false')
+        self._output('git config git-state.extensions.branch.cache head')
+        env = os.environ.copy()
+        env['GIT_CONFIG'] = self.dirpath + '/.git/config'
+        proc = subprocess.Popen('git state --watch --no-show log'.split(), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
+
+        def read_state(lines):
+            return ''.join(proc.stdout.readline() for _ in range(lines))
+
+        try:
+            # when
+            initial = read_state(4)
+            with open('README.md', 'a') as a_file:
+                a_file.write('changed\n')
+            modified = read_state(4)
+            subprocess.call(['git', 'checkout', '--quiet', '-b', 'feature'])
+            checked_out = read_state(4)
+        finally:
+            proc.kill()
+            proc.wait()
+
+        # then
+        self.assertEqual(initial, '''# status (master)
+nothing to commit, working directory is clean
+# branch
+master
+''')
+        self.assertEqual(modified, '''# status (master)
+ M README.md
+# branch
+master
+''')
+        self.assertEqual(checked_out, '''# status (feature)
+ M README.md
+# branch
+feature
+''')
+
+    def test_state_viewWithExtension_readerExitsEarly(self):
+
+        # given
+        self._output(['git', 'config', 'git-state.extensions.first.command', 'echo first'])
+        self._output(['git', 'config', 'git-state.extensions.slow.command', "sh -c 'sleep 30; echo slow'"])
+        self._output('git config git-state.extensions.first.color false')
+        self._output('git config git-state.extensions.slow.color false')
+        proc = subprocess.Popen('git state --no-show status log --order first slow'.split(), stdout=subprocess.PIPE)
+        start = time.time()
+
+        # when: the reader goes away before the slow extension finishes
+        first = proc.stdout.readline() + proc.stdout.readline()
+        proc.stdout.close()
+        proc.wait()
+
+        # then
+        self.assertEqual(first, '# first\nfirst\n')
+        self.assertLess(time.time() - start, 10)
+
 
 class TestStateExtensions(unittest.TestCase):
 
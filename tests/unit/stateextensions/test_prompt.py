@@ -0,0 +1,249 @@
+import mock
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from bin.commands.stateextensions import prompt
+from bin.commands.utils import porcelain, refs, resultcache
+
+_BRANCH = porcelain.Branch('1' * 40, 'master', 'origin/master', False, 2, 0)
+
+
+def _entry(kind, index, worktree, path):
+    return porcelain.Entry(kind, index, worktree, 'N...', path, None)
+
+
+def _summary(*entries):
+    summary = porcelain.Summary()
+    for entry in entries:
+        summary.add(entry)
+    return summary
+
+
+def _config(values):
+    return lambda key, default=None, config=None, as_type=str: values.get(key, default)
+
+
+class TestPromptFields(unittest.TestCase):
+
+    def test_fields(self):
+        self.assertEqual(prompt.fields('{branch} {ahead: >}{{literal}}'), set(['branch', 'ahead']))
+        self.assertEqual(prompt.fields(prompt.DEFAULT_FORMAT), set(prompt.FIELDS))
+
+    @mock.patch('bin.commands.utils.messages.error', side_effect=SystemExit)
+    def test_fields_invalid(self, mock_error):
+
+        # when
+        with self.assertRaises(SystemExit):
+            prompt.fields('{branch')
+
+        # then
+        mock_error.assert_called_once_with("invalid prompt format '{branch': unmatched '{' in format")
+
+    def test_formatter(self):
+
+        # expect: a spec is shown before a value and left out with it
+        self.assertEqual(prompt._FORMATTER.format('{branch}{ahead: >}{behind: <}', branch='master', ahead=2, behind=0), 'master >2')
+        self.assertEqual(prompt._FORMATTER.format('{ahead}/{behind}', ahead=2, behind=0), '2/0')
+
+
+class TestPromptValues(unittest.TestCase):
+
+    def test_counts(self):
+
+        # given
+        scan = porcelain.Status(_BRANCH, [], summary=_summary(
+            _entry('ordinary', 'M', ' ', 'staged.txt'),
+            _entry('ordinary', 'M', 'M', 'src/both.py'),
+            _entry('ordinary', ' ', 'D', 'src/deleted.py'),
+            _entry('unmerged', 'U', 'U', 'conflict.txt'),
+            _entry('untracked', '?', '?', 'new/')
+        ))
+
+        # expect
+        self.assertEqual(prompt._counts(scan), {'staged': 2, 'unstaged': 2, 'untracked': 1, 'conflicts': 1})
+        self.assertEqual(prompt._counts(porcelain.Status(_BRANCH, [])), {'staged': 0, 'unstaged': 0, 'untracked': 0, 'conflicts': 0})
+
+    @mock.patch('bin.commands.stateextensions.prompt._count_changes', return_value=3)
+    def test_values(self, mock_countchanges):
+
+        # given
+        context = mock.Mock()
+        context.status.return_value = porcelain.Status(_BRANCH, [], summary=_summary(_entry('ordinary', 'A', ' ', 'new.txt')))
+
+        # when
+        values = prompt._values(set(['branch', 'ahead', 'staged', 'changes']), context, 'master', 'refs/heads/develop')
+
+        # then: untracked files aren't listed when they aren't used
+        self.assertEqual(values, {
+            'branch': 'master',
+            'ahead': 2,
+            'behind': 0,
+            'staged': 1,
+            'unstaged': 0,
+            'untracked': 0,
+            'conflicts': 0,
+            'changes': 3
+        })
+        context.status.assert_called_once_with('no', summary_threshold=0)
+        mock_countchanges.assert_called_once_with('refs/heads/develop')
+
+    @mock.patch('bin.commands.stateextensions.prompt._count_changes')
+    def test_values_branchOnly(self, mock_countchanges):
+
+        # given
+        context = mock.Mock()
+
+        # when
+        values = prompt._values(set(['branch']), context, 'master', None)
+
+        # then: nothing is run
+        self.assertEqual(values['branch'], 'master')
+        context.status.assert_not_called()
+        mock_countchanges.assert_not_called()
+
+    @mock.patch('bin.commands.utils.git.get_config_value')
+    def test_association(self, mock_getconfigvalue):
+
+        # given
+        mock_getconfigvalue.side_effect = _config({'git-changes.associations.feature.with': 'refs/heads/develop'})
+
+        # expect
+        self.assertEqual(prompt._association('feature'), 'refs/heads/develop')
+        self.assertEqual(prompt._association('other'), 'refs/heads/master')
+        self.assertEqual(prompt._association(''), 'refs/heads/master')
+
+    @mock.patch('subprocess.Popen')
+    def test_countChanges(self, mock_popen):
+
+        # given
+        mock_popen.return_value.communicate.return_value = ('4\n', None)
+        mock_popen.return_value.returncode = 0
+
+        # expect
+        self.assertEqual(prompt._count_changes('refs/heads/master'), 4)
+        mock_popen.assert_called_once_with(
+            ['git', 'rev-list', '--count', 'refs/heads/master..HEAD'], stdout=subprocess.PIPE, stderr=mock.ANY
+        )
+
+    @mock.patch('subprocess.Popen')
+    def test_countChanges_unknownAssociation(self, mock_popen):
+
+        # given
+        mock_popen.return_value.communicate.return_value = ('', None)
+        mock_popen.return_value.returncode = 128
+
+        # expect
+        self.assertEqual(prompt._count_changes('refs/heads/gone'), 0)
+
+    @mock.patch('bin.commands.utils.refs.store')
+    def test_branch(self, mock_store):
+
+        # given
+        mock_store.return_value.symbolic_target.return_value = 'refs/heads/feature'
+        mock_store.return_value.shorten.return_value = 'feature'
+
+        # expect
+        self.assertEqual(prompt._branch(mock.Mock()), 'feature')
+        mock_store.return_value.shorten.assert_called_once_with('refs/heads/feature')
+
+    @mock.patch('bin.commands.utils.refs.store')
+    def test_branch_detached(self, mock_store):
+
+        # given
+        mock_store.return_value.symbolic_target.return_value = None
+        mock_store.return_value.resolve.return_value = 'abcdef1234' + '0' * 30
+
+        # expect
+        self.assertEqual(prompt._branch(mock.Mock()), 'abcdef1')
+
+    @mock.patch('bin.commands.utils.refs.store', side_effect=refs.RefsUnavailable)
+    def test_branch_refsUnavailable(self, mock_store):
+
+        # given
+        context = mock.Mock()
+        context.current_branch.return_value = 'master'
+
+        # expect
+        self.assertEqual(prompt._branch(context), 'master')
+
+
+class TestPromptRender(unittest.TestCase):
+
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.cache = resultcache.ResultCache(os.path.join(self.dirpath, 'cache'))
+        self.context = mock.Mock()
+        self.context.status.return_value = porcelain.Status(_BRANCH, [])
+
+        patchers = [
+            mock.patch('bin.commands.utils.resultcache.open_', return_value=self.cache),
+            mock.patch('bin.commands.utils.resultcache.fingerprint', return_value='fingerprint'),
+            mock.patch('bin.commands.stateextensions.prompt._branch', return_value='master'),
+            mock.patch('bin.commands.utils.git.get_config_value', side_effect=_config({}))
+        ]
+        self.mock_opencache, self.mock_fingerprint, _, _ = [patcher.start() for patcher in patchers]
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def test_render(self):
+
+        # when
+        first = prompt.render('{branch}{ahead: >}{behind: <}', self.context)
+        second = prompt.render('{branch}{ahead: >}{behind: <}', self.context)
+
+        # then: the second is cached
+        self.assertEqual((first, second), ('master >2', 'master >2'))
+        self.context.status.assert_called_once_with('no', summary_threshold=0)
+        self.mock_fingerprint.assert_called_with(('head', 'index', 'refs'), self.context)
+
+    def test_render_fingerprintChanged(self):
+
+        # when
+        prompt.render('{ahead}', self.context)
+        self.mock_fingerprint.return_value = 'changed'
+        prompt.render('{ahead}', self.context)
+
+        # then
+        self.assertEqual(self.context.status.call_count, 2)
+
+    def test_render_pathCountsExpire(self):
+
+        # given
+        prompt.render('{untracked}', self.context)
+
+        # when
+        with mock.patch('time.time', return_value=resultcache.time.time() + prompt._DEFAULT_TTL + 1):
+            prompt.render('{untracked}', self.context)
+
+        # then
+        self.assertEqual(self.context.status.call_args_list, [mock.call('normal', summary_threshold=0)] * 2)
+
+    def test_render_notCachedWithoutFingerprint(self):
+
+        # given
+        self.mock_fingerprint.return_value = None
+
+        # when
+        prompt.render('{ahead}', self.context)
+        prompt.render('{ahead}', self.context)
+
+        # then
+        self.assertEqual(self.context.status.call_count, 2)
+
+    @mock.patch('bin.commands.utils.messages.error', side_effect=SystemExit)
+    def test_render_unknownField(self, mock_error):
+
+        # when
+        with self.assertRaises(SystemExit):
+            prompt.render('{branch} {stashes}', self.context)
+
+        # then
+        mock_error.assert_called_once_with(
+            "unknown prompt field 'stashes'. Use any of: branch, ahead, behind, staged, unstaged, untracked, conflicts, changes"
+        )
@@ -0,0 +1,147 @@
+import mock
+import subprocess
+import unittest
+
+from bin.commands.stateextensions import registry
+from bin.commands.utils import gitconfig, resultcache
+
+
+class TestExtensionRegistry(unittest.TestCase):
+
+    def test_registry(self):
+
+        # given
+        extensions = registry.ExtensionRegistry([
+            ('git-state.extensions.log.command', 'git log --oneline'),
+            ('git-state.extensions.log.options', '-10'),
+            ('git-state.status.show-clean-message', 'false'),
+            ('git-state.extensions.changes.command', 'git changes'),
+            ('git-state.extensions.log.options', '--graph'),
+            ('git-state.extensions.log.name', 'the log'),
+            ('git-state.extensions.log.show', 'no'),
+            ('git-state.extensions.log.color', 'false'),
+            ('git-state.extensions.log.timeout', '2.5'),
+            ('git-state.extensions.log.cache', 'head ttl=60'),
+            ('git-state.extensions.log.protocol', 'persistent'),
+            ('git-state.extensions.my.dotted.command', 'echo dotted'),
+            ('git-state.extensions.changes.module', 'changes.state:section'),
+            ('git-state.order', 'status|log')
+        ])
+
+        # then
+        self.assertEqual(extensions.keys(), ['log', 'changes', 'my.dotted'])
+        self.assertEqual(len(extensions), 3)
+        self.assertIn('changes', extensions)
+        self.assertNotIn('status', extensions)
+        self.assertIsNone(extensions.get('status'))
+        self.assertEqual(extensions.order, ['status', 'log'])
+
+        log = extensions.get('log')
+        self.assertEqual(log.key, 'log')
+        self.assertEqual(log.command, 'git log --oneline')
+        self.assertEqual(log.name, 'the log')
+        self.assertEqual(log.options, ['-10', '--graph'])
+        self.assertFalse(log.show)
+        self.assertFalse(log.color)
+        self.assertEqual(log.timeout, 2.5)
+        self.assertEqual(log.cache, resultcache.Basis(('head',), 60.0))
+        self.assertEqual(log.protocol, 'persistent')
+        self.assertEqual(log.entries[:2], [('command', 'git log --oneline'), ('options', '-10')])
+        self.assertIsNone(log.module)
+        self.assertEqual(extensions.get('changes').module, 'changes.state:section')
+
+    def test_registry_defaults(self):
+
+        # given
+        changes = registry.ExtensionRegistry([('git-state.extensions.changes.command', 'git changes')]).get('changes')
+
+        # then
+        self.assertEqual(changes.name, 'changes')
+        self.assertEqual(changes.options, [])
+        self.assertTrue(changes.show)
+        self.assertTrue(changes.color)
+        self.assertIsNone(changes.timeout)
+        self.assertIsNone(changes.cache)
+        self.assertEqual(changes.protocol, 'oneshot')
+        self.assertEqual(registry.ExtensionRegistry([]).order, [])
+
+    def test_registry_lastValueWins(self):
+
+        # given
+        extensions = registry.ExtensionRegistry([
+            ('git-state.extensions.log.show', 'false'),
+            ('git-state.extensions.log.show', 'true')
+        ])
+
+        # expect
+        self.assertTrue(extensions.get('log').show)
+
+    @mock.patch('bin.commands.utils.messages.error', side_effect=SystemExit)
+    def test_registry_invalidValue(self, mock_error):
+
+        # given: an invalid value only fails when it's used
+        log = registry.ExtensionRegistry([('git-state.extensions.log.timeout', 'soon')]).get('log')
+
+        # when
+        with self.assertRaises(SystemExit):
+            log.timeout
+
+        # then
+        mock_error.assert_called_once_with(
+            "Cannot parse value 'soon' for key 'git-state.extensions.log.timeout' using format 'float'"
+        )
+
+    @mock.patch('bin.commands.utils.messages.error', side_effect=SystemExit)
+    def test_registry_invalidProtocol(self, mock_error):
+
+        # given
+        log = registry.ExtensionRegistry([('git-state.extensions.log.protocol', 'forever')]).get('log')
+
+        # when
+        with self.assertRaises(SystemExit):
+            log.protocol
+
+        # then
+        mock_error.assert_called_once_with(
+            "invalid value 'forever' for git-state.extensions.log.protocol. Use one of: oneshot, persistent"
+        )
+
+
+class TestRegistryLoad(unittest.TestCase):
+
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
+    @mock.patch('subprocess.Popen')
+    def test_load(self, mock_popen, mock_getregexp):
+
+        # given
+        mock_getregexp.return_value = [('git-state.extensions.log.command', 'git log')]
+
+        # when
+        extensions = registry.load()
+
+        # then
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_popen.assert_not_called()
+        self.assertEqual(extensions.keys(), ['log'])
+
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp', side_effect=gitconfig.ConfigUnavailable)
+    @mock.patch('subprocess.Popen')
+    def test_load_fallsBackToGitConfig(self, mock_popen, mock_getregexp):
+
+        # given
+        mock_popen.return_value.communicate.return_value = [
+            'git-state.extensions.log.command\ngit log\0git-state.extensions.log.options\n-1\n-2\0git-state.extensions.log.show\0',
+            None
+        ]
+
+        # when
+        extensions = registry.load()
+
+        # then
+        mock_popen.assert_called_once_with(
+            ['git', 'config', '--null', '--get-regexp', '^git-state\\.'], stdout=subprocess.PIPE
+        )
+        log = extensions.get('log')
+        self.assertEqual(log.command, 'git log')
+        self.assertEqual(log.options, ['-1\n-2'])
+        self.assertTrue(log.show)
@@ -5,6 +5,15 @@ import unittest
 from colorama import Fore
 
 from bin.commands.stateextensions import status
+from bin.commands.utils import porcelain
+from bin.commands.utils.context import RepoContext
+
+_NO_COLORS = dict((slot, '') for slot in status._COLOR_SLOTS)
+_BRANCH = porcelain.Branch('1' * 40, 'master', None, False, None, None)
+
+
+def _entry(kind, index, worktree, path, original_path=None, submodule='N...'):
+    return porcelain.Entry(kind, index, worktree, submodule, path, original_path)
 
 
 class TestStatus(unittest.TestCase):
@@ -23,109 +32,388 @@ class TestStatus(unittest.TestCase):
             '{no_color}({green}master{no_color})'.format(no_color=Fore.RESET, green=Fore.GREEN)
         )
 
-    @mock.patch('subprocess.check_output', return_value='the full title\n')
-    @mock.patch('re.match')
-    def test_accent_notNewRepository(self, mock_rematch, mock_checkoutput):
+    @mock.patch('bin.commands.utils.git.get_config_value', side_effect=lambda key, default=None, as_type=str: default)
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_accent_notNewRepository(self, mock_status, mock_getconfigvalue):
 
         # setup
-        mock_match = mock.Mock()
-        mock_match.group = mock.Mock()
-        mock_match.group.return_value = 'the short title'
-        mock_rematch.return_value = mock_match
+        mock_status.return_value = porcelain.Status(_BRANCH._replace(upstream='origin/master', ahead=1, behind=0), [])
 
         # when
-        show_color = 'always'
-        actual_status = status.accent(new_repository=False, show_color=show_color)
+        actual_status = status.accent(new_repository=False, show_color='always')
 
         # then
-        self.assertEqual(actual_status, '{}({})'.format(Fore.RESET, 'the short title'))
-
-        mock_checkoutput.assert_called_once_with(
-            ('git', '-c', 'color.status=' + show_color, 'status', '--branch', '--short')
+        self.assertEqual(
+            actual_status,
+            '{}(\x1b[32mmaster\x1b[m...\x1b[31morigin/master\x1b[m [ahead \x1b[32m1\x1b[m])'.format(Fore.RESET)
         )
-        mock_rematch.assert_called_once_with('.*##.*? (.*)', 'the full title')
-        mock_match.group.assert_called_once_with(1)
+        mock_status.assert_called_once_with('all', True, summary_threshold=1000)
 
-    @mock.patch('subprocess.check_output', return_value='the full title\n')
-    @mock.patch('re.match')
-    def test_accent_notNewRepository_butNotPassedInAsArgument(self, mock_rematch, mock_checkoutput):
+    @mock.patch('bin.commands.utils.git.get_config_value', side_effect=lambda key, default=None, as_type=str: default)
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_accent_notNewRepository_butNotPassedInAsArgument(self, mock_status, mock_getconfigvalue):
 
         # setup
-        mock_match = mock.Mock()
-        mock_match.group = mock.Mock()
-        mock_match.group.return_value = 'the short title'
-        mock_rematch.return_value = mock_match
+        mock_status.return_value = porcelain.Status(_BRANCH, [])
 
         # when
-        show_color = 'always'
-        actual_status = status.accent(show_color=show_color)
+        actual_status = status.accent(show_color='never')
 
         # then
-        self.assertEqual(actual_status, '{}({})'.format(Fore.RESET, 'the short title'))
+        self.assertEqual(actual_status, '{}(master)'.format(Fore.RESET))
+        mock_status.assert_called_once_with('all', True, summary_threshold=1000)
 
-        mock_checkoutput.assert_called_once_with(
-            ('git', '-c', 'color.status=' + show_color, 'status', '--branch', '--short')
-        )
-        mock_rematch.assert_called_once_with('.*##.*? (.*)', 'the full title')
-        mock_match.group.assert_called_once_with(1)
+    @mock.patch('bin.commands.utils.git.get_config_value', side_effect=lambda key, default=None, as_type=str: default)
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_get_newRepository(self, mock_status, mock_getconfigvalue):
 
-    @mock.patch('subprocess.check_output', return_value='the status')
-    def test_get_newRepository(self, mock_checkoutput):
+        # setup
+        mock_status.return_value = porcelain.Status(_BRANCH._replace(oid=None), [_entry('untracked', '?', '?', 'dir/')])
 
         # when
-        show_color = 'always'
-        actual_status = status.get(new_repository=True, show_color=show_color)
+        actual_status = status.get(new_repository=True, show_color='never')
 
         # then
-        self.assertEqual(actual_status, 'the status')
-        mock_checkoutput.assert_called_once_with(['git', '-c', 'color.status=' + show_color, 'status', '--short'])
+        self.assertEqual(actual_status, '?? dir/\n')
+        mock_status.assert_called_once_with('normal', True, summary_threshold=1000)
+
+    @mock.patch('bin.commands.utils.git.get_config_value', side_effect=lambda key, default=None, as_type=str: default)
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_get_newRepository_repositoryIsEmpty(self, mock_status, mock_getconfigvalue):
 
-    @mock.patch('subprocess.check_output', return_value='')
-    def test_get_newRepository_repositoryIsEmpty(self, mock_checkoutput):
+        # setup
+        mock_status.return_value = porcelain.Status(_BRANCH._replace(oid=None), [])
 
         # when
-        show_color = 'always'
-        actual_status = status.get(new_repository=True, show_color=show_color)
+        actual_status = status.get(new_repository=True, show_color='always')
 
         # then
         self.assertEqual(actual_status, 'nothing to commit, repository is empty' + os.linesep)
-        mock_checkoutput.assert_called_once_with(['git', '-c', 'color.status=' + show_color, 'status', '--short'])
+        mock_status.assert_called_once_with('normal', True, summary_threshold=1000)
 
-    @mock.patch('subprocess.check_output', return_value='the status')
-    def test_get_notNewRepository(self, mock_checkoutput):
+    @mock.patch('bin.commands.utils.git.get_config_value', side_effect=lambda key, default=None, as_type=str: default)
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_get_notNewRepository(self, mock_status, mock_getconfigvalue):
+
+        # setup
+        mock_status.return_value = porcelain.Status(_BRANCH, [
+            _entry('ordinary', 'M', 'M', 'both.txt'),
+            _entry('untracked', '?', '?', 'new.txt')
+        ])
 
         # when
-        show_color = 'auto'
-        actual_status = status.get(show_color=show_color)
+        actual_status = status.get(show_color='always')
 
         # then
-        self.assertEqual(actual_status, 'the status')
-        mock_checkoutput.assert_called_once_with(
-            ['git', '-c', 'color.status=' + show_color, 'status', '--short', '--untracked-files=all']
-        )
+        self.assertEqual(actual_status, '\x1b[32mM\x1b[m\x1b[31mM\x1b[m both.txt\n\x1b[31m??\x1b[m new.txt\n')
+        mock_status.assert_called_once_with('all', True, summary_threshold=1000)
 
-    @mock.patch('subprocess.check_output', return_value='')
-    def test_get_notNewRepository_noStatus_andShowCleanMessage(self, mock_checkoutput):
+    @mock.patch('bin.commands.utils.git.get_config_value', side_effect=lambda key, default=None, as_type=str: default)
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_get_notNewRepository_noStatus_andShowCleanMessage(self, mock_status, mock_getconfigvalue):
+
+        # setup
+        mock_status.return_value = porcelain.Status(_BRANCH, [])
 
         # when
-        show_color = 'auto'
-        actual_status = status.get(show_color=show_color, show_clean_message=True)
+        actual_status = status.get(show_color='auto', show_clean_message=True)
 
         # then
         self.assertEqual(actual_status, 'nothing to commit, working directory is clean' + os.linesep)
-        mock_checkoutput.assert_called_once_with(
-            ['git', '-c', 'color.status=' + show_color, 'status', '--short', '--untracked-files=all']
-        )
 
-    @mock.patch('subprocess.check_output', return_value='')
-    def test_get_notNewRepository_noStatus_andNoShowCleanMessage(self, mock_checkoutput):
+    @mock.patch('bin.commands.utils.git.get_config_value', side_effect=lambda key, default=None, as_type=str: default)
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_get_notNewRepository_noStatus_andNoShowCleanMessage(self, mock_status, mock_getconfigvalue):
+
+        # setup
+        mock_status.return_value = porcelain.Status(_BRANCH, [])
 
         # when
-        show_color = 'auto'
-        actual_status = status.get(show_color=show_color, show_clean_message=False)
+        actual_status = status.get(show_color='auto', show_clean_message=False)
 
         # then
         self.assertEqual(actual_status, '')
-        mock_checkoutput.assert_called_once_with(
-            ['git', '-c', 'color.status=' + show_color, 'status', '--short', '--untracked-files=all']
+
+    @mock.patch('bin.commands.utils.git.get_config_value', side_effect=lambda key, default=None, as_type=str: default)
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_getAndAccent_shareOneScan(self, mock_status, mock_getconfigvalue):
+
+        # setup
+        mock_status.return_value = porcelain.Status(_BRANCH, [])
+        context = RepoContext()
+
+        # when
+        status.get(show_color='never', context=context)
+        status.accent(show_color='never', context=context)
+
+        # then
+        mock_status.assert_called_once_with('all', True, summary_threshold=1000)
+
+    @mock.patch('bin.commands.utils.git.get_config_value')
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_scan_aheadBehindDisabled(self, mock_status, mock_getconfigvalue):
+
+        # setup
+        mock_getconfigvalue.side_effect = [1000, 'all', False]
+
+        # when
+        status.scan(None, False)
+
+        # then
+        mock_getconfigvalue.assert_has_calls([
+            mock.call('git-state.status.untracked-files', default='all'),
+            mock.call('status.aheadBehind', default=True, as_type=mock.ANY)
+        ])
+        mock_status.assert_called_once_with('all', False, summary_threshold=1000)
+
+    @mock.patch('bin.commands.utils.git.get_config_value')
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_scan_untrackedFiles(self, mock_status, mock_getconfigvalue):
+
+        for untracked_files in ('all', 'normal', 'no'):
+
+            # setup
+            mock_getconfigvalue.side_effect = [1000, untracked_files, True]
+            mock_status.reset_mock()
+
+            # when
+            status.scan(None, False)
+
+            # then
+            mock_status.assert_called_once_with(untracked_files, True, summary_threshold=1000)
+
+    @mock.patch('bin.commands.utils.git.get_config_value')
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_scan_untrackedFilesAuto(self, mock_status, mock_getconfigvalue):
+
+        # setup
+        mock_getconfigvalue.side_effect = [1000, 'auto', 500, 2.5, True]
+
+        # when
+        status.scan(None, False)
+
+        # then
+        mock_getconfigvalue.assert_has_calls([
+            mock.call('git-state.status.untracked-files', default='all'),
+            mock.call('git-state.status.untracked-limit', default=1000, as_type=int),
+            mock.call('git-state.status.untracked-timeout', default=1.0, as_type=float)
+        ])
+        mock_status.assert_called_once_with('auto', True, untracked_limit=500, timeout=2.5, summary_threshold=1000)
+
+    @mock.patch('bin.commands.utils.git.get_config_value', return_value='some')
+    @mock.patch('bin.commands.utils.messages.error', side_effect=SystemExit)
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_scan_untrackedFilesInvalid(self, mock_status, mock_error, mock_getconfigvalue):
+
+        # when
+        with self.assertRaises(SystemExit):
+            status.scan(None, False)
+
+        # then
+        mock_error.assert_called_once_with(
+            "invalid value 'some' for git-state.status.untracked-files. Use one of: all, normal, no, auto"
+        )
+        mock_status.assert_not_called()
+
+    @mock.patch('bin.commands.utils.git.get_config_value', return_value='normal')
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_scan_newRepository(self, mock_status, mock_getconfigvalue):
+
+        # when
+        status.scan(None, True)
+
+        # then
+        mock_status.assert_called_once_with('normal', mock.ANY, summary_threshold=mock.ANY)
+        self.assertNotIn(mock.call('git-state.status.untracked-files', default='all'), mock_getconfigvalue.call_args_list)
+
+    @mock.patch('bin.commands.utils.git.get_config_value', side_effect=lambda key, default=None, as_type=str: default)
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_accent_collapsed(self, mock_status, mock_getconfigvalue):
+
+        # setup
+        mock_status.return_value = porcelain.Status(_BRANCH, [_entry('untracked', '?', '?', 'build/')], collapsed=True)
+
+        # when
+        actual_accent = status.accent(show_color='never', context=RepoContext())
+
+        # then
+        self.assertEqual(actual_accent, Fore.RESET + '(master) untracked files collapsed')
+
+    @mock.patch('bin.commands.utils.git.get_config_value', side_effect=lambda key, default=None, as_type=str: default)
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_getAndAccent_summarized(self, mock_status, mock_getconfigvalue):
+
+        # setup
+        summary = porcelain.Summary()
+        for path in ('gen/a', 'gen/b', 'src/c'):
+            summary.add(_entry('untracked', '?', '?', path))
+        mock_status.return_value = porcelain.Status(_BRANCH, [], summary=summary)
+        context = RepoContext()
+
+        # when
+        actual_status = status.get(show_color='never', context=context, summary=True)
+        actual_accent = status.accent(show_color='never', context=context, summary=True)
+
+        # then
+        self.assertEqual(actual_status, '?? gen/ (2)\n?? src/ (1)\n')
+        self.assertEqual(actual_accent, Fore.RESET + '(master) 3 paths summarized')
+        mock_status.assert_called_once_with('all', True, summary_threshold=0)
+
+    @mock.patch('bin.commands.utils.git.get_config_value')
+    def test_summaryThreshold(self, mock_getconfigvalue):
+
+        # expect: flags win over config
+        self.assertEqual(status._summary_threshold(True), 0)
+        self.assertIsNone(status._summary_threshold(False))
+        mock_getconfigvalue.assert_not_called()
+
+        # expect: a threshold that isn't positive never summarizes
+        mock_getconfigvalue.return_value = 500
+        self.assertEqual(status._summary_threshold(None), 500)
+        mock_getconfigvalue.return_value = 0
+        self.assertIsNone(status._summary_threshold(None))
+        mock_getconfigvalue.assert_called_with('git-state.status.summary-threshold', default=1000, as_type=int)
+
+    def test_summaryFormat(self):
+
+        # given
+        summary = porcelain.Summary()
+        for _ in range(3):
+            summary.add(_entry('ordinary', ' ', 'M', 'src/file'))
+        summary.add(_entry('ordinary', 'A', ' ', 'src/new'))
+        summary.add(_entry('unmerged', 'U', 'U', 'README.md'))
+        summary.add(_entry('untracked', '?', '?', 'with space/file'))
+        colors = dict((slot, '<' + slot + '>') for slot in status._COLOR_SLOTS)
+
+        # when
+        output = status._summary_format(summary, colors, True, limit=3)
+
+        # then
+        self.assertEqual(output, '\n'.join([
+            ' <changed>M\x1b[m src/ (3)',
+            '<unmerged>UU\x1b[m ./ (1)',
+            '<updated>A\x1b[m  src/ (1)',
+            '... 1 more group (1 paths)',
+            ''
+        ]))
+
+
+class TestStatusColors(unittest.TestCase):
+
+    def test_colors_never(self):
+        self.assertEqual(status._colors('never'), _NO_COLORS)
+
+    @mock.patch('bin.commands.utils.git.get_config_value')
+    def test_colors_always(self, mock_getconfigvalue):
+
+        # setup
+        config = {'color.status.header': 'bold', 'color.status.added': 'blue'}
+        mock_getconfigvalue.side_effect = lambda key: config.get(key)
+
+        # when
+        colors = status._colors('always')
+
+        # then
+        self.assertEqual(colors['header'], '\x1b[1m')
+        self.assertEqual(colors['updated'], '\x1b[34m')
+        self.assertEqual(colors['changed'], '\x1b[31m')
+        self.assertEqual(colors['localbranch'], '\x1b[32m')
+
+    @mock.patch('bin.commands.utils.git.get_config_value', return_value='not a color')
+    @mock.patch('bin.commands.utils.messages.error')
+    def test_colors_invalid(self, mock_error, mock_getconfigvalue):
+
+        # when
+        status._colors('always')
+
+        # then
+        mock_error.assert_called_with('invalid color value: not a color')
+
+
+class TestStatusShortFormat(unittest.TestCase):
+
+    def test_shortFormat(self):
+
+        # given
+        entries = [
+            _entry('ordinary', 'M', ' ', 'staged.txt'),
+            _entry('ordinary', ' ', 'D', 'deleted.txt'),
+            _entry('renamed', 'R', 'M', 'new.txt', original_path='old.txt'),
+            _entry('unmerged', 'U', 'U', 'conflict.txt'),
+            _entry('untracked', '?', '?', 'untracked.txt'),
+            _entry('ignored', '!', '!', 'ignored.txt')
+        ]
+
+        # when
+        output = status._short_format(entries, _NO_COLORS, True)
+
+        # then
+        self.assertEqual(output, '''M  staged.txt
+ D deleted.txt
+RM old.txt -> new.txt
+UU conflict.txt
+?? untracked.txt
+''')
+
+    def test_shortFormat_quoting(self):
+
+        # given
+        entries = [
+            _entry('untracked', '?', '?', 'with space'),
+            _entry('untracked', '?', '?', 'tab\there'),
+            _entry('untracked', '?', '?', 'q"uote\\'),
+            _entry('untracked', '?', '?', 'uni\xc3\xa9')
+        ]
+
+        # expect
+        self.assertEqual(status._short_format(entries, _NO_COLORS, True), '''?? "with space"
+?? "tab\\there"
+?? "q\\"uote\\\\"
+?? "uni\\303\\251"
+''')
+        self.assertEqual(status._short_format(entries[3:], _NO_COLORS, False), '?? uni\xc3\xa9\n')
+
+    def test_shortFormat_submodules(self):
+
+        # given
+        entries = [
+            _entry('ordinary', ' ', 'M', 'commits', submodule='SC..'),
+            _entry('ordinary', ' ', 'M', 'modified', submodule='S.M.'),
+            _entry('ordinary', ' ', 'M', 'untracked', submodule='S..U'),
+            _entry('ordinary', 'A', ' ', 'added', submodule='S...')
+        ]
+
+        # expect
+        self.assertEqual(status._short_format(entries, _NO_COLORS, True), ''' M commits
+ m modified
+ ? untracked
+A  added
+''')
+
+
+class TestStatusBranchHeader(unittest.TestCase):
+
+    def test_branchHeader(self):
+
+        # given
+        tracking = _BRANCH._replace(upstream='origin/master', ahead=0, behind=0)
+
+        # expect
+        self.assertEqual(status._branch_header(_BRANCH, _NO_COLORS), 'master')
+        self.assertEqual(status._branch_header(_BRANCH._replace(oid=None), _NO_COLORS), 'No commits yet on master')
+        self.assertEqual(status._branch_header(_BRANCH._replace(head=None), _NO_COLORS), 'HEAD (no branch)')
+        self.assertEqual(status._branch_header(tracking, _NO_COLORS), 'master...origin/master')
+        self.assertEqual(status._branch_header(tracking._replace(ahead=2), _NO_COLORS), 'master...origin/master [ahead 2]')
+        self.assertEqual(status._branch_header(tracking._replace(behind=3), _NO_COLORS), 'master...origin/master [behind 3]')
+        self.assertEqual(
+            status._branch_header(tracking._replace(ahead=2, behind=3), _NO_COLORS),
+            'master...origin/master [ahead 2, behind 3]'
+        )
+        self.assertEqual(
+            status._branch_header(tracking._replace(ahead=None, behind=None), _NO_COLORS),
+            'master...origin/master [different]'
+        )
+        self.assertEqual(
+            status._branch_header(tracking._replace(gone=True, ahead=None, behind=None), _NO_COLORS),
+            'master...origin/master [gone]'
         )
@@ -4,6 +4,14 @@ import unittest
 
 import testutils
 from bin.commands import changes, upstream
+from bin.commands.utils import git
+
+_COMMIT = git.Classification('commit-ish', 'abc123', 'commit', {}, None)
+_NOT_A_COMMIT = git.Classification('commit-ish', None, None, {}, None)
+_REF = git.Classification('commit-ish', 'abc123', 'commit', {'heads': ['refs/heads/commit-ish']}, 'refs/heads/commit-ish')
+_AMBIGUOUS_REF = git.Classification(
+    'commit-ish', 'abc123', 'commit', {'heads': ['refs/heads/commit-ish'], 'tags': ['refs/tags/commit-ish']}, None
+)
 
 
 class TestChangesAssociate(unittest.TestCase):
@@ -11,9 +19,7 @@ class TestChangesAssociate(unittest.TestCase):
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.utils.git.is_detached', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref_ambiguous', return_value=False)
-    @mock.patch('bin.commands.utils.git.symbolic_full_name')
+    @mock.patch('bin.commands.utils.git.classify', return_value=_REF)
     @mock.patch('bin.commands.utils.git.current_branch')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -22,9 +28,7 @@ class TestChangesAssociate(unittest.TestCase):
             mock_info,
             mock_call,
             mock_currentbranch,
-            mock_symbolicfullname,
-            mock_isrefambiguous,
-            mock_isref,
+            mock_classify,
             mock_isdetached,
             mock_isemptyrepository,
             mock_isgitrepository
@@ -33,11 +37,10 @@ class TestChangesAssociate(unittest.TestCase):
         # setup
         cur_branch = 'cur-branch'
         mock_currentbranch.return_value = cur_branch
-        fullname = 'fullname'
-        mock_symbolicfullname.return_value = fullname
+        fullname = 'refs/heads/commit-ish'
 
         # when
-        committish = 'c123'
+        committish = 'commit-ish'
         quiet = True
         changes.associate(committish, quiet=quiet)
 
@@ -45,9 +48,7 @@ class TestChangesAssociate(unittest.TestCase):
         mock_isgitrepository.assert_called_once()
         mock_isemptyrepository.assert_called_once_with()
         mock_isdetached.assert_called_once()
-        mock_isref.assert_called_once_with(committish)
-        mock_isrefambiguous.assert_called_once_with(committish, limit=('heads', 'tags'))
-        mock_symbolicfullname.assert_called_once_with(committish)
+        mock_classify.assert_called_once_with(committish)
         mock_currentbranch.assert_called_once()
         mock_call.assert_called_once_with(
             ['git', 'config', '--local', 'git-changes.associations.' + cur_branch + '.with', fullname]
@@ -57,26 +58,19 @@ class TestChangesAssociate(unittest.TestCase):
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.utils.git.is_detached', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref_ambiguous', return_value=True)
-    @mock.patch('subprocess.check_output')
+    @mock.patch('bin.commands.utils.git.classify', return_value=_AMBIGUOUS_REF)
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
     def test_associate_isRef_isAmbiguous(
             self,
             mock_error,
-            mock_checkoutput,
-            mock_isrefambiguous,
-            mock_isref,
+            mock_classify,
             mock_isdetached,
             mock_isemptyrepository,
             mock_isgitrepository
     ):
 
         # given
-        committish = 'abc123'
-        ref_names = ['refs/heads/master', 'refs/tags/master']
-        refs = '\n'.join(['84f9c10be201690f30252c0c6ef1504fad68251d ' + r for r in ref_names]) + '\n'
-        mock_checkoutput.return_value = refs
+        committish = 'commit-ish'
 
         # when
         try:
@@ -89,18 +83,15 @@ class TestChangesAssociate(unittest.TestCase):
         mock_isgitrepository.assert_called_once()
         mock_isemptyrepository.assert_called_once_with()
         mock_isdetached.assert_called_once_with()
-        mock_isref.assert_called_once_with(committish)
-        mock_isrefambiguous.assert_called_once_with(committish, limit=('heads', 'tags'))
-        mock_checkoutput.assert_called_once_with(('git', 'show-ref', '--tags', '--heads', committish))
+        mock_classify.assert_called_once_with(committish)
         mock_error.assert_called_once_with(
-            '{0!r} is an ambiguous ref. Use one of:\n{1}'.format(committish, '\n'.join(ref_names))
+            "'commit-ish' is an ambiguous ref. Use one of:\nrefs/heads/commit-ish\nrefs/tags/commit-ish"
         )
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.utils.git.is_detached', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
-    @mock.patch('bin.commands.utils.git.resolve_sha1')
+    @mock.patch('bin.commands.utils.git.classify')
     @mock.patch('bin.commands.utils.git.current_branch')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -109,8 +100,7 @@ class TestChangesAssociate(unittest.TestCase):
             mock_info,
             mock_call,
             mock_currentbranch,
-            mock_resolvesha1,
-            mock_isref,
+            mock_classify,
             mock_isdetached,
             mock_isemptyrepository,
             mock_isgitrepository
@@ -120,7 +110,7 @@ class TestChangesAssociate(unittest.TestCase):
         cur_branch = 'cur-branch'
         mock_currentbranch.return_value = cur_branch
         resolved_sha1 = 'sha123'
-        mock_resolvesha1.return_value = resolved_sha1
+        mock_classify.return_value = git.Classification('c123', resolved_sha1, 'commit', {}, None)
 
         # when
         committish = 'c123'
@@ -131,8 +121,7 @@ class TestChangesAssociate(unittest.TestCase):
         mock_isgitrepository.assert_called_once_with()
         mock_isemptyrepository.assert_called_once_with()
         mock_isdetached.assert_called_once_with()
-        mock_isref.assert_called_once_with(committish)
-        mock_resolvesha1.assert_called_once_with(committish)
+        mock_classify.assert_called_once_with(committish)
         mock_currentbranch.assert_called_once()
         mock_call.assert_called_once_with(
             ['git', 'config', '--local', 'git-changes.associations.' + cur_branch + '.with', resolved_sha1]
@@ -142,14 +131,37 @@ class TestChangesAssociate(unittest.TestCase):
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.utils.git.is_detached', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
-    @mock.patch('bin.commands.utils.git.resolve_sha1', return_value=None)
+    @mock.patch('bin.commands.utils.git.current_branch', return_value='cur-branch')
+    @mock.patch('bin.commands.utils.git.classify')
+    @mock.patch('subprocess.call')
+    def test_associate_refWithoutFullName(
+            self,
+            mock_call,
+            mock_classify,
+            mock_currentbranch,
+            mock_isdetached,
+            mock_isemptyrepository,
+            mock_isgitrepository
+    ):
+
+        # given
+        mock_classify.return_value = git.Classification('x', 'sha123', 'commit', {'heads': ['refs/heads/feature/x']}, None)
+
+        # when
+        changes.associate('x', quiet=True)
+
+        # then
+        mock_call.assert_called_once_with(['git', 'config', '--local', 'git-changes.associations.cur-branch.with', 'sha123'])
+
+    @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
+    @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
+    @mock.patch('bin.commands.utils.git.is_detached', return_value=False)
+    @mock.patch('bin.commands.utils.git.classify', return_value=_NOT_A_COMMIT)
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
     def test_associate_notARef_invalidRevision(
             self,
             mock_error,
-            mock_resolvesha1,
-            mock_isref,
+            mock_classify,
             mock_isdetached,
             mock_isemptyrepository,
             mock_isgitrepository
@@ -168,8 +180,7 @@ class TestChangesAssociate(unittest.TestCase):
         mock_isgitrepository.assert_called_once_with()
         mock_isemptyrepository.assert_called_once_with()
         mock_isdetached.assert_called_once_with()
-        mock_isref.assert_called_once_with(committish)
-        mock_resolvesha1.assert_called_once_with(committish)
+        mock_classify.assert_called_once_with(committish)
         mock_error.assert_called_once_with('{} is not a valid revision'.format(committish))
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=False)
@@ -247,8 +258,8 @@ class TestChangesAssociateUpstream(unittest.TestCase):
         # then
         mock_isgitrepository.assert_called_once_with()
         mock_currentbranch.assert_called_once_with()
-        mock_upstream.assert_called_once_with(current_branch, include_remote=upstream.IncludeRemote.NONE_LOCAL)
-        mock_associate.assert_called_once_with(upstream_branch, quiet)
+        mock_upstream.assert_called_once_with(current_branch, include_remote=upstream.IncludeRemote.NONE_LOCAL, context=mock.ANY)
+        mock_associate.assert_called_once_with(upstream_branch, quiet, context=mock.ANY)
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.current_branch')
@@ -347,7 +358,7 @@ class TestChangesPruneAssociations(unittest.TestCase):
         # then
         mock_checkoutput.assert_called_once_with(('git', 'show-ref', '--heads'))
         mock_getassociatedbranches.assert_called_once()
-        mock_unassociate.assert_called_once_with('develop')
+        mock_unassociate.assert_called_once_with('develop', context=None)
         mock_info.assert_called_once_with("Removed association 'develop'", quiet)
 
     @mock.patch('subprocess.check_output')
@@ -394,8 +405,8 @@ class TestChangesPruneAssociations(unittest.TestCase):
         mock_checkoutput.assert_called_once_with(('git', 'show-ref', '--heads'))
         mock_getassociatedbranches.assert_called_once()
         mock_unassociate.assert_has_calls([
-            mock.call('develop'),
-            mock.call('master')
+            mock.call('develop', context=None),
+            mock.call('master', context=None)
         ])
         mock_info.assert_has_calls([
             mock.call("Removed association 'develop'", quiet),
@@ -430,7 +441,7 @@ class TestChangesUnassociate(unittest.TestCase):
         mock_isgitrepository.assert_called_once_with()
         mock_isemptyrepository.assert_called_once_with()
         mock_currentbranch.assert_not_called()
-        mock_getassociation.assert_called_once_with(branch)
+        mock_getassociation.assert_called_once_with(branch, context=mock.ANY)
         mock_call.assert_called_once_with(
             ['git', 'config', '--local', '--remove-section', 'git-changes.associations.' + branch]
         )
@@ -510,7 +521,7 @@ class TestChangesUnassociate(unittest.TestCase):
         mock_isgitrepository.assert_called_once_with()
         mock_isemptyrepository.assert_called_once_with()
         mock_currentbranch.assert_called_once_with()
-        mock_getassociation.assert_called_once_with(current_branch)
+        mock_getassociation.assert_called_once_with(current_branch, context=mock.ANY)
         mock_call.assert_called_once_with(
             ['git', 'config', '--local', '--remove-section', 'git-changes.associations.' + current_branch]
         )
@@ -563,7 +574,7 @@ class TestChangesUnassociate(unittest.TestCase):
         # then
         mock_isgitrepository.assert_called_once_with()
         mock_isemptyrepository.assert_called_once_with()
-        mock_pruneassociations.assert_called_once_with(cleanup, quiet, dry_run)
+        mock_pruneassociations.assert_called_once_with(cleanup, quiet, dry_run, context=mock.ANY)
 
     def test_unassociate_cleanup_invalidtype(self):
 
@@ -593,7 +604,7 @@ class TestChangesUnassociate(unittest.TestCase):
         mock_isgitrepository.assert_called_once_with()
         mock_isemptyrepository.assert_called_once_with()
         mock_currentbranch.assert_not_called()
-        mock_getassociation.assert_called_once_with(branch)
+        mock_getassociation.assert_called_once_with(branch, context=mock.ANY)
         mock_call.assert_not_called()
 
 
@@ -814,9 +825,9 @@ class TestChangesChanges(unittest.TestCase):
         mock_getcwd.assert_called_once_with()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_commit', return_value=False)
+    @mock.patch('bin.commands.utils.git.classify', return_value=_NOT_A_COMMIT)
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
-    def test_changes_notacommit(self, mock_error, mock_iscommit, mock_isgitrepository):
+    def test_changes_notacommit(self, mock_error, mock_classify, mock_isgitrepository):
 
         # when
         committish = 'commit-ish'
@@ -828,13 +839,11 @@ class TestChangesChanges(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_iscommit.assert_called_once_with(committish)
+        mock_classify.assert_called_once_with(committish)
         mock_error.assert_called_once_with('{0!r} is not a valid commit'.format(committish))
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_ref_ambiguous')
+    @mock.patch('bin.commands.utils.git.classify', return_value=_COMMIT)
     @mock.patch('bin.commands.utils.git.get_config_value')
     @mock.patch('subprocess.check_output')
     @mock.patch('subprocess.call')
@@ -843,9 +852,7 @@ class TestChangesChanges(unittest.TestCase):
             mock_call,
             mock_checkoutput,
             mock_getconfigvalue,
-            mock_isrefambiguous,
-            mock_isref,
-            mock_iscommit,
+            mock_classify,
             mock_isgitrepository
     ):
 
@@ -856,9 +863,7 @@ class TestChangesChanges(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_iscommit.assert_called_once_with(committish)
-        mock_isref.assert_called_once_with(committish)
-        mock_isrefambiguous.assert_not_called()
+        mock_classify.assert_called_once_with(committish)
         mock_getconfigvalue.assert_not_called()
         mock_call.assert_called_once_with(
             ['git', 'log', '--no-decorate', '--oneline', '{}..HEAD'.format(committish), '--color=' + color_when]
@@ -866,9 +871,7 @@ class TestChangesChanges(unittest.TestCase):
         mock_checkoutput.assert_not_called()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_ref_ambiguous')
+    @mock.patch('bin.commands.utils.git.classify', return_value=_COMMIT)
     @mock.patch('bin.commands.utils.git.get_config_value')
     @mock.patch('subprocess.check_output')
     @mock.patch('subprocess.call')
@@ -877,9 +880,7 @@ class TestChangesChanges(unittest.TestCase):
             mock_call,
             mock_checkoutput,
             mock_getconfigvalue,
-            mock_isrefambiguous,
-            mock_isref,
-            mock_iscommit,
+            mock_classify,
             mock_isgitrepository
     ):
 
@@ -891,9 +892,7 @@ class TestChangesChanges(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_iscommit.assert_called_once_with(committish)
-        mock_isref.assert_called_once_with(committish)
-        mock_isrefambiguous.assert_not_called()
+        mock_classify.assert_called_once_with(committish)
         mock_getconfigvalue.assert_not_called()
         mock_call.assert_called_once_with(
             ['git', 'log', '--no-decorate', '--oneline', '{}..HEAD'.format(committish), '--color=' + color_when, '--', ' '.join(files)]
@@ -901,9 +900,7 @@ class TestChangesChanges(unittest.TestCase):
         mock_checkoutput.assert_not_called()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref_ambiguous', return_value=False)
+    @mock.patch('bin.commands.utils.git.classify', return_value=_REF)
     @mock.patch('bin.commands.utils.git.get_config_value')
     @mock.patch('subprocess.check_output')
     @mock.patch('subprocess.call')
@@ -912,9 +909,7 @@ class TestChangesChanges(unittest.TestCase):
             mock_call,
             mock_checkoutput,
             mock_getconfigvalue,
-            mock_isrefambiguous,
-            mock_isref,
-            mock_iscommit,
+            mock_classify,
             mock_isgitrepository
     ):
 
@@ -925,9 +920,7 @@ class TestChangesChanges(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_iscommit.assert_called_once_with(committish)
-        mock_isref.assert_called_once_with(committish)
-        mock_isrefambiguous.assert_called_once_with(committish, limit=('heads', 'tags'))
+        mock_classify.assert_called_once_with(committish)
         mock_getconfigvalue.assert_not_called()
         mock_call.assert_called_once_with(
             ['git', 'log', '--no-decorate', '--oneline', '{}..HEAD'.format(committish), '--color=' + color_when]
@@ -935,18 +928,9 @@ class TestChangesChanges(unittest.TestCase):
         mock_checkoutput.assert_not_called()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref_ambiguous', return_value=True)
-    @mock.patch('subprocess.check_output')
+    @mock.patch('bin.commands.utils.git.classify', return_value=_AMBIGUOUS_REF)
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
-    def test_changes_isrefandisambiguous(
-            self, mock_error, mock_checkoutput, mock_isrefambiguous, mock_isref, mock_iscommit, mock_isgitrepository
-    ):
-        # setup
-        ref_names = ['refs/heads/master', 'refs/tags/mtag']
-        refs = '\n'.join(['84f9c10be201690f30252c0c6ef1504fad68251d ' + r for r in ref_names]) + '\n'
-        mock_checkoutput.return_value = refs
+    def test_changes_isrefandisambiguous(self, mock_error, mock_classify, mock_isgitrepository):
 
         # when
         committish = 'commit-ish'
@@ -958,22 +942,18 @@ class TestChangesChanges(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_iscommit.assert_called_once_with(committish)
-        mock_isref.assert_called_once_with(committish)
-        mock_isrefambiguous.assert_called_once_with(committish, limit=('heads', 'tags'))
-        mock_checkoutput.assert_called_once_with(('git', 'show-ref', '--tags', '--heads', committish))
+        mock_classify.assert_called_once_with(committish)
         mock_error.assert_called_once_with(
-            '{0!r} is an ambiguous ref. Use one of:\n{1}'.format(committish, '\n'.join(ref_names))
+            "'commit-ish' is an ambiguous ref. Use one of:\nrefs/heads/commit-ish\nrefs/tags/commit-ish"
         )
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
+    @mock.patch('bin.commands.utils.git.classify', return_value=_COMMIT)
     @mock.patch('bin.commands.utils.git.get_config_value')
     @mock.patch('bin.commands.utils.git.resolve_coloring', return_value='always')
     @mock.patch('subprocess.call')
     def test_changes_color(
-            self, mock_call, mock_resolvecoloring, mock_getconfigvalue, mock_isref, mock_iscommit, mock_isgitrepository
+            self, mock_call, mock_resolvecoloring, mock_getconfigvalue, mock_classify, mock_isgitrepository
     ):
 
         # when
@@ -986,11 +966,10 @@ class TestChangesChanges(unittest.TestCase):
         mock_call.assert_called_once_with(['git', 'log', '--no-decorate', '--oneline', 'HEAD..HEAD', '--color=always'])
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
+    @mock.patch('bin.commands.utils.git.classify', return_value=_COMMIT)
     @mock.patch('bin.commands.utils.git.resolve_coloring')
     @mock.patch('subprocess.call')
-    def test_changes_details_diff(self, mock_call, mock_resolvecoloring, mock_isref, mock_iscommit, mock_isgitrepository):
+    def test_changes_details_diff(self, mock_call, mock_resolvecoloring, mock_classify, mock_isgitrepository):
 
         # given
         committish = 'commit-ish'
@@ -1002,16 +981,14 @@ class TestChangesChanges(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_iscommit.assert_called_once_with(committish)
-        mock_isref.assert_called_once_with(committish)
+        mock_classify.assert_called_once_with(committish)
         mock_call.assert_called_once_with(['git', 'diff', '--color={}'.format(color_when), committish + '...HEAD'])
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
+    @mock.patch('bin.commands.utils.git.classify', return_value=_COMMIT)
     @mock.patch('bin.commands.utils.git.resolve_coloring')
     @mock.patch('subprocess.call')
-    def test_changes_details_diff_withFiles(self, mock_call, mock_resolvecoloring, mock_isref, mock_iscommit,
+    def test_changes_details_diff_withFiles(self, mock_call, mock_resolvecoloring, mock_classify,
                                   mock_isgitrepository):
 
         # given
@@ -1025,16 +1002,14 @@ class TestChangesChanges(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_iscommit.assert_called_once_with(committish)
-        mock_isref.assert_called_once_with(committish)
+        mock_classify.assert_called_once_with(committish)
         mock_call.assert_called_once_with(['git', 'diff', '--color={}'.format(color_when), committish + '...HEAD', '--', ' '.join(files)])
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
+    @mock.patch('bin.commands.utils.git.classify', return_value=_COMMIT)
     @mock.patch('bin.commands.utils.git.resolve_coloring')
     @mock.patch('subprocess.call')
-    def test_changes_details_stat(self, mock_call, mock_resolvecoloring, mock_isref, mock_iscommit, mock_isgitrepository):
+    def test_changes_details_stat(self, mock_call, mock_resolvecoloring, mock_classify, mock_isgitrepository):
 
         # given
         committish = 'commit-ish'
@@ -1046,18 +1021,16 @@ class TestChangesChanges(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_iscommit.assert_called_once_with(committish)
-        mock_isref.assert_called_once_with(committish)
+        mock_classify.assert_called_once_with(committish)
         mock_call.assert_called_once_with(
             ['git', 'diff', '--color={}'.format(color_when), '--stat', committish + '...HEAD']
         )
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
+    @mock.patch('bin.commands.utils.git.classify', return_value=_COMMIT)
     @mock.patch('bin.commands.utils.git.resolve_coloring')
     @mock.patch('subprocess.call')
-    def test_changes_details_stat_withFiles(self, mock_call, mock_resolvecoloring, mock_isref, mock_iscommit, mock_isgitrepository):
+    def test_changes_details_stat_withFiles(self, mock_call, mock_resolvecoloring, mock_classify, mock_isgitrepository):
 
         # given
         committish = 'commit-ish'
@@ -1070,19 +1043,17 @@ class TestChangesChanges(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_iscommit.assert_called_once_with(committish)
-        mock_isref.assert_called_once_with(committish)
+        mock_classify.assert_called_once_with(committish)
         mock_call.assert_called_once_with(
             ['git', 'diff', '--color={}'.format(color_when), '--stat', committish + '...HEAD', '--', ' '.join(files)]
         )
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
+    @mock.patch('bin.commands.utils.git.classify', return_value=_COMMIT)
     @mock.patch('bin.commands.utils.git.resolve_coloring')
     @mock.patch('subprocess.check_output')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_changes_details_count(self, mock_info, mock_checkoutput, mock_resolvecoloring, mock_isref, mock_iscommit, mock_isgitrepository):
+    def test_changes_details_count(self, mock_info, mock_checkoutput, mock_resolvecoloring, mock_classify, mock_isgitrepository):
 
         # given
         committish = 'commit-ish'
@@ -1096,18 +1067,16 @@ class TestChangesChanges(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_iscommit.assert_called_once_with(committish)
-        mock_isref.assert_called_once_with(committish)
+        mock_classify.assert_called_once_with(committish)
         mock_checkoutput.assert_called_once_with(['git', 'log', '--no-decorate', '--oneline', '{}..HEAD'.format(committish)])
         mock_info.assert_called_once_with(str(len(log)))
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
+    @mock.patch('bin.commands.utils.git.classify', return_value=_COMMIT)
     @mock.patch('bin.commands.utils.git.resolve_coloring')
     @mock.patch('subprocess.check_output')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_changes_details_count_withFiles(self, mock_info, mock_checkoutput, mock_resolvecoloring, mock_isref, mock_iscommit, mock_isgitrepository):
+    def test_changes_details_count_withFiles(self, mock_info, mock_checkoutput, mock_resolvecoloring, mock_classify, mock_isgitrepository):
 
         # given
         committish = 'commit-ish'
@@ -1122,19 +1091,17 @@ class TestChangesChanges(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_iscommit.assert_called_once_with(committish)
-        mock_isref.assert_called_once_with(committish)
+        mock_classify.assert_called_once_with(committish)
         mock_checkoutput.assert_called_once_with(
             ['git', 'log', '--no-decorate', '--oneline', '{}..HEAD'.format(committish), '--', ' '.join(files)])
         mock_info.assert_called_once_with(str(len(log)))
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
+    @mock.patch('bin.commands.utils.git.classify', return_value=_COMMIT)
     @mock.patch('bin.commands.utils.git.resolve_coloring')
     @mock.patch('subprocess.check_output')
     @mock.patch('subprocess.call')
-    def test_changes_details_inverse_log(self, mock_call, mock_checkoutput, mock_resolvecoloring, mock_isref, mock_iscommit, mock_isgitrepository):
+    def test_changes_details_inverse_log(self, mock_call, mock_checkoutput, mock_resolvecoloring, mock_classify, mock_isgitrepository):
 
         # given
         committish = 'commit-ish'
@@ -1148,18 +1115,16 @@ class TestChangesChanges(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_iscommit.assert_called_once_with(committish)
-        mock_isref.assert_called_once_with(committish)
+        mock_classify.assert_called_once_with(committish)
         mock_checkoutput.assert_called_once_with(['git', 'merge-base', committish, 'HEAD'])
         mock_call.assert_called_once_with(['git', 'log', '--no-decorate', '--oneline', '-10', merge_base, '--color=' + color_when])
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
+    @mock.patch('bin.commands.utils.git.classify', return_value=_COMMIT)
     @mock.patch('bin.commands.utils.git.resolve_coloring')
     @mock.patch('subprocess.check_output')
     @mock.patch('subprocess.call')
-    def test_changes_details_inverse_log_withFiles(self, mock_call, mock_checkoutput, mock_resolvecoloring, mock_isref, mock_iscommit, mock_isgitrepository):
+    def test_changes_details_inverse_log_withFiles(self, mock_call, mock_checkoutput, mock_resolvecoloring, mock_classify, mock_isgitrepository):
 
         # given
         committish = 'commit-ish'
@@ -1174,16 +1139,13 @@ class TestChangesChanges(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_iscommit.assert_called_once_with(committish)
-        mock_isref.assert_called_once_with(committish)
+        mock_classify.assert_called_once_with(committish)
         mock_checkoutput.assert_called_once_with(['git', 'merge-base', committish, 'HEAD'])
         mock_call.assert_called_once_with(['git', 'log', '--no-decorate', '--oneline', '-10', merge_base, '--color=' + color_when, '--', ' '.join(files)])
 
     # same as a previous test but explicitly sets to log mode
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_ref_ambiguous')
+    @mock.patch('bin.commands.utils.git.classify', return_value=_COMMIT)
     @mock.patch('bin.commands.utils.git.get_config_value')
     @mock.patch('subprocess.check_output')
     @mock.patch('subprocess.call')
@@ -1192,9 +1154,7 @@ class TestChangesChanges(unittest.TestCase):
             mock_call,
             mock_checkoutput,
             mock_getconfigvalue,
-            mock_isrefambiguous,
-            mock_isref,
-            mock_iscommit,
+            mock_classify,
             mock_isgitrepository
     ):
 
@@ -1205,9 +1165,7 @@ class TestChangesChanges(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_iscommit.assert_called_once_with(committish)
-        mock_isref.assert_called_once_with(committish)
-        mock_isrefambiguous.assert_not_called()
+        mock_classify.assert_called_once_with(committish)
         mock_getconfigvalue.assert_not_called()
         mock_call.assert_called_once_with(
             ['git', 'log', '--no-decorate', '--oneline', '{}..HEAD'.format(committish), '--color=' + color_when]
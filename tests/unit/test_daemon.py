@@ -0,0 +1,443 @@
+import json
+import mock
+import os
+import select
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+from bin.commands import daemon
+from bin.commands.utils import forward
+
+
+def _script(directory, name, body):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as script:
+        script.write(body)
+    return path
+
+
+class _Command(object):
+
+    def __init__(self, main):
+        self.main = main
+
+
+class TestDaemonLoadCommands(unittest.TestCase):
+
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def test_loadCommands(self):
+
+        # given
+        _script(self.dirpath, 'git-one', "#! /usr/bin/env python\n\ndef main():\n    return 'one'\n")
+        _script(self.dirpath, 'git-nomain', 'VALUE = 1\n')
+        _script(self.dirpath, 'git-commands-daemon', 'def main():\n    pass\n')
+        _script(self.dirpath, 'other', 'def main():\n    pass\n')
+        os.mkdir(os.path.join(self.dirpath, 'git-directory'))
+
+        # when
+        commands = daemon.load_commands(self.dirpath, exclude=('git-commands-daemon',))
+
+        # then
+        self.assertEqual(commands.keys(), ['git-one'])
+        self.assertEqual(commands['git-one'].main(), 'one')
+        self.assertEqual(commands['git-one'].__file__, os.path.join(self.dirpath, 'git-one'))
+        self.assertEqual(sorted(os.listdir(self.dirpath)), ['git-commands-daemon', 'git-directory', 'git-nomain', 'git-one', 'other'])
+
+
+    def test_loadCommands_bundle(self):
+
+        # given: run from within a bundle's archive
+        entrypoints = mock.Mock(COMMANDS={'git-one': 'git_one', 'git-commands-daemon': 'git_commands_daemon'})
+        entrypoints.code.side_effect = lambda name: compile('def main():\n    return {!r}\n'.format(name), name, 'exec')
+        directory = os.path.join(self.dirpath, 'git-commands.pyz', '_entrypoints')
+
+        # when
+        with mock.patch.dict('sys.modules', {'_entrypoints': entrypoints}):
+            commands = daemon.load_commands(directory, exclude=('git-commands-daemon',))
+
+        # then
+        self.assertEqual(commands.keys(), ['git-one'])
+        self.assertEqual(commands['git-one'].main(), 'git-one')
+        self.assertEqual(commands['git-one'].__file__, os.path.join(directory, 'git-one'))
+
+
+class TestDaemonCall(unittest.TestCase):
+
+    def _exit(self, code):
+        def main():
+            raise SystemExit(code)
+        return main
+
+    @mock.patch('sys.stderr')
+    def test_call(self, mock_stderr):
+        self.assertEqual(daemon._call(lambda: None), 0)
+        self.assertEqual(daemon._call(self._exit(None)), 0)
+        self.assertEqual(daemon._call(self._exit(2)), 2)
+        self.assertEqual(daemon._call(self._exit('a message')), 1)
+        mock_stderr.write.assert_called_once_with('a message\n')
+
+    @mock.patch('traceback.print_exc')
+    def test_call_raises(self, mock_printexc):
+
+        # when
+        status = daemon._call(lambda: {}['missing'])
+
+        # then
+        self.assertEqual(status, 1)
+        mock_printexc.assert_called_once_with()
+
+    def test_encode(self):
+        self.assertEqual(
+            daemon._encode({u'argv': [u'git-state', u'caf\xe9'], u'cwd': u'/repo'}),
+            {'argv': ['git-state', 'caf\xc3\xa9'], 'cwd': '/repo'}
+        )
+
+
+class TestDaemonRepositories(unittest.TestCase):
+
+    def setUp(self):
+        self.dirpath = os.path.realpath(tempfile.mkdtemp())
+        os.chdir(self.dirpath)
+        for name in ('one', 'two', 'three'):
+            os.makedirs(os.path.join(self.dirpath, name, '.git', 'objects'))
+            _script(self.dirpath, os.path.join(name, '.git', 'HEAD'), 'ref: refs/heads/master\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def _path(self, name):
+        return os.path.join(self.dirpath, name)
+
+    @mock.patch('bin.commands.daemon._read_repository')
+    @mock.patch('bin.commands.utils.watch.watch')
+    def test_warm(self, mock_watch, mock_readrepository):
+
+        # given
+        repositories = daemon._Repositories(limit=2)
+        cwd = os.getcwd()
+        seen = []
+        mock_readrepository.side_effect = lambda: seen.append((os.getcwd(), os.environ.get('GIT_COMMANDS_TEST')))
+        mock_watch.return_value.wait.side_effect = lambda timeout: time.sleep(0.01) or set()
+
+        # when
+        repositories.warm(self._path('one'), {'GIT_COMMANDS_TEST': 'one'})
+        repositories.warm(self._path('two'), {'GIT_COMMANDS_TEST': 'two'})
+        repositories.warm(self._path('one'), {'GIT_COMMANDS_TEST': 'one'})
+        repositories.warm(self._path('three'), {'GIT_COMMANDS_TEST': 'three'})
+        repositories.warm(self.dirpath, {})
+        repositories.close()
+
+        # then: read within each request's directory and environment, watching only the most recent
+        self.assertEqual(seen, [
+            (self._path('one'), 'one'),
+            (self._path('two'), 'two'),
+            (self._path('one'), 'one'),
+            (self._path('three'), 'three'),
+            (self.dirpath, None)
+        ])
+        self.assertEqual(mock_watch.call_args_list, [mock.call(worktree=False)] * 3)
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertNotIn('GIT_COMMANDS_TEST', os.environ)
+
+    @mock.patch('bin.commands.daemon._read_repository')
+    @mock.patch('bin.commands.utils.watch.watch')
+    def test_refresh(self, mock_watch, mock_readrepository):
+
+        # given: a change to HEAD and then to the working tree
+        changes = iter([set(['head']), set(['worktree'])])
+        waited = threading.Event()
+
+        def wait(timeout):
+            change = next(changes, None)
+            if change is None:
+                waited.set()
+                time.sleep(0.01)
+                return set()
+            return change
+        mock_watch.return_value.wait.side_effect = wait
+
+        repositories = daemon._Repositories()
+        repositories.warm(self._path('one'), {})
+        waited.wait(5)
+
+        # when
+        repositories.refresh()
+        repositories.refresh()
+        repositories.close()
+
+        # then: read once for the request and once for the change
+        self.assertEqual(mock_readrepository.call_count, 2)
+
+    @mock.patch('bin.commands.daemon._read_repository')
+    @mock.patch('bin.commands.utils.watch.watch')
+    def test_request(self, mock_watch, mock_readrepository):
+
+        # given
+        mock_watch.return_value.wait.side_effect = lambda timeout: time.sleep(0.01) or set()
+        seen = []
+        mock_readrepository.side_effect = lambda: seen.append(os.getcwd())
+        repositories = daemon._Repositories()
+
+        # when: asked for from a thread serving a child
+        repositories.request(self._path('one'), {})
+        readable = select.select([repositories], [], [], 5)[0]
+        repositories.refresh()
+        repositories.refresh()
+        repositories.close()
+
+        # then: only read once the main thread gets to it
+        self.assertEqual(readable, [repositories])
+        self.assertEqual(seen, [self._path('one')])
+
+    @mock.patch('bin.commands.utils.coprocess.Pool')
+    @mock.patch('bin.commands.daemon._read_repository')
+    @mock.patch('bin.commands.utils.watch.watch')
+    def test_pool(self, mock_watch, mock_readrepository, mock_pool):
+
+        # given
+        mock_watch.return_value.wait.side_effect = lambda timeout: time.sleep(0.01) or set()
+        mock_pool.side_effect = lambda: mock.Mock()
+        repositories = daemon._Repositories(limit=1)
+        repositories.warm(self._path('one'), {})
+        one = repositories.pool(self._path('one/.git'))
+
+        # when
+        same = repositories.pool(self._path('one/.git'))
+        repositories.warm(self._path('two'), {})
+        two = repositories.pool(self._path('two/.git'))
+
+        # then: kept while the repository is watched and stopped once it isn't
+        self.assertIs(same, one)
+        one.close.assert_called_once_with()
+        two.close.assert_not_called()
+        repositories.close()
+        two.close.assert_called_once_with()
+
+
+class TestDaemonHandle(unittest.TestCase):
+
+    def setUp(self):
+        self.client, self.server = socket.socketpair()
+        self.repositories = mock.Mock()
+        self.dirpath = os.path.realpath(tempfile.mkdtemp())
+
+    def tearDown(self):
+        self.client.close()
+        self.server.close()
+        shutil.rmtree(self.dirpath)
+
+    def _send(self, request):
+        self.client.sendall(json.dumps(request) + '\n')
+
+    def _frames(self):
+        frames = []
+        while True:
+            frame = forward.read_frame(self.client)
+            if frame is None:
+                return frames
+            frames.append(frame)
+
+    def _handle(self, commands):
+        pid = daemon._handle(self.server, mock.Mock(), commands, self.repositories, False)
+        self.server.close()
+        frames = self._frames()
+        os.waitpid(pid, 0)
+        return frames
+
+    def test_handle(self):
+
+        # given
+        def main():
+            import subprocess
+            import sys
+            print 'from', sys.argv[1:], os.getcwd(), os.environ['GIT_COMMANDS_TEST']
+            sys.stdout.flush()
+            subprocess.call(['sh', '-c', 'echo from a child >&2'])
+            sys.exit(3)
+
+        environment = {'GIT_COMMANDS_TEST': 'value', 'PATH': os.environ['PATH']}
+        self._send({'command': 'git-test', 'argv': ['git-test', '--flag'], 'cwd': self.dirpath, 'env': environment})
+
+        # when
+        frames = self._handle({'git-test': _Command(main)})
+
+        # then: not in a repository so there's nothing to read ahead
+        self.assertEqual(frames, [
+            ('s', ''),
+            ('o', "from ['--flag'] {} value\n".format(self.dirpath)),
+            ('e', 'from a child\n'),
+            ('x', '3')
+        ])
+        self.repositories.request.assert_not_called()
+
+    def test_handle_repository(self):
+
+        # given
+        os.makedirs(os.path.join(self.dirpath, '.git', 'objects'))
+        _script(self.dirpath, os.path.join('.git', 'HEAD'), 'ref: refs/heads/master\n')
+        requested = threading.Event()
+        self.repositories.request.side_effect = lambda directory, environment: requested.set()
+        self._send({'command': 'git-test', 'argv': ['git-test'], 'cwd': self.dirpath, 'env': {'GIT_COMMANDS_TEST': 'value'}})
+
+        # when
+        frames = self._handle({'git-test': _Command(lambda: None)})
+
+        # then: the daemon reads the repository ahead of later requests
+        self.assertEqual(frames, [('s', ''), ('x', '0')])
+        self.assertTrue(requested.wait(5))
+        self.repositories.request.assert_called_once_with(self.dirpath, {'GIT_COMMANDS_TEST': 'value'})
+
+    def test_handle_unknownCommand(self):
+
+        # given
+        self._send({'command': 'git-unknown', 'argv': ['git-unknown'], 'cwd': '/', 'env': {}})
+
+        # expect: closed without starting so the client runs it instead
+        self.assertEqual(self._handle({}), [])
+
+    def test_handle_notJson(self):
+
+        # given
+        self.client.sendall('not json\n')
+
+        # expect
+        self.assertEqual(self._handle({}), [])
+
+    def test_handle_missingDirectory(self):
+
+        # given
+        self._send({'command': 'git-test', 'argv': ['git-test'], 'cwd': '/missing', 'env': {}})
+
+        # expect
+        self.assertEqual(self._handle({'git-test': _Command(None)}), [])
+
+
+class TestDaemonSharedPool(unittest.TestCase):
+
+    def setUp(self):
+        self.child, self.daemon_end = socket.socketpair()
+        self.repositories = mock.Mock()
+        self.pool = self.repositories.pool.return_value
+        self.server = threading.Thread(target=daemon._serve, args=(self.daemon_end, self.repositories))
+        self.server.daemon = True
+        self.server.start()
+        self.child.sendall(json.dumps({'directory': '/repo/sub', 'environment': {'PATH': '/bin'}, 'git_dir': '/repo/.git'}) + '\n')
+
+    def tearDown(self):
+        # the channel's reader still holds the child's end, so closing it alone wouldn't end the daemon's side
+        try:
+            self.child.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.child.close()
+        self.server.join(5)
+        self.daemon_end.close()
+
+    def test_request(self):
+
+        # given
+        self.pool.get.return_value.request.side_effect = lambda arguments, timeout: (' '.join(arguments), False, True)
+        shared = daemon._SharedPool(self.child)
+
+        # when
+        with shared as pool:
+            coprocess_ = pool.get(['extension', '--flag'], '/repo/sub')
+            first = coprocess_.request(['-1', '--color=never'], 5)
+            second = coprocess_.request(['-2'])
+
+        # then: answered by the daemon's coprocess for the repository
+        self.assertEqual(coprocess_.command, ['extension', '--flag'])
+        self.assertEqual(first, ('-1 --color=never', False, True))
+        self.assertEqual(second, ('-2', False, True))
+        self.repositories.request.assert_called_once_with('/repo/sub', {'PATH': '/bin'})
+        self.repositories.pool.assert_called_with('/repo/.git')
+        self.pool.get.assert_called_with(['extension', '--flag'], '/repo/sub', {'PATH': '/bin'})
+        self.pool.get.return_value.request.assert_has_calls([mock.call(['-1', '--color=never'], 5), mock.call(['-2'], None)])
+        self.pool.close.assert_not_called()
+
+    def test_request_concurrent(self):
+
+        # given: a coprocess that only answers once another has been asked
+        asked = threading.Event()
+        slow, fast = mock.Mock(), mock.Mock()
+        slow.request.side_effect = lambda arguments, timeout: asked.wait(5) and ('slow', False, True)
+        fast.request.side_effect = lambda arguments, timeout: asked.set() or ('fast', False, True)
+        self.pool.get.side_effect = lambda command, directory, environment: slow if command == ['slow'] else fast
+        shared = daemon._SharedPool(self.child)
+        results = []
+        waiting = threading.Thread(target=lambda: results.append(shared.get(['slow'], '/repo').request([])))
+        waiting.start()
+
+        # when
+        fast_result = shared.get(['fast'], '/repo').request([])
+        waiting.join(5)
+
+        # then
+        self.assertEqual((fast_result, results), (('fast', False, True), [('slow', False, True)]))
+
+    def test_request_cannotStart(self):
+
+        # given
+        self.pool.get.return_value.request.side_effect = OSError(2, 'No such file or directory')
+
+        # expect
+        self.assertEqual(
+            daemon._SharedPool(self.child).get(['missing'], '/repo').request([]),
+            ('missing: No such file or directory\n', False, False)
+        )
+
+    def test_request_daemonStopped(self):
+
+        # given
+        shared = daemon._SharedPool(self.child)
+        self.daemon_end.shutdown(socket.SHUT_RDWR)
+
+        # expect
+        self.assertEqual(shared.get(['extension'], '/repo').request([]), ('', False, False))
+
+
+class TestDaemonListen(unittest.TestCase):
+
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.path = os.path.join(self.dirpath, 'daemon.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def test_listen(self):
+
+        # given: a socket left behind
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.path)
+        stale.close()
+
+        # when
+        listener = daemon._listen(self.path)
+
+        # then: only this user may connect
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        listener.close()
+
+    @mock.patch('bin.commands.utils.messages.error', side_effect=SystemExit)
+    def test_listen_alreadyListening(self, mock_error):
+
+        # given
+        listener = daemon._listen(self.path)
+
+        # when
+        with self.assertRaises(SystemExit):
+            daemon._listen(self.path)
+
+        # then
+        mock_error.assert_called_once_with('a daemon is already listening on {0!r}'.format(self.path))
+        listener.close()
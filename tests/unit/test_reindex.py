@@ -9,72 +9,78 @@ class TestReindex(unittest.TestCase):
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('subprocess.check_output')
-    @mock.patch('bin.commands.utils.git.deleted_files', return_value=['file3'])
-    @mock.patch('subprocess.call')
-    def test_reindex_noneDeleted(self, mock_call, mock_deletedfiles, mock_checkoutput, mock_isgitrepository):
+    @mock.patch('subprocess.Popen')
+    def test_reindex(self, mock_popen, mock_checkoutput, mock_isgitrepository):
 
         # setup
-        files = ['file1', 'file2']
-        mock_checkoutput.return_value = '\n'.join(files) + '\n'
+        mock_checkoutput.return_value = 'M  file1\0MM file2\0A  dir/file 3\0'
 
         # when
         reindex.reindex()
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_checkoutput.assert_called_once_with('git diff --name-only --cached'.split())
-        mock_call.assert_called_once_with(['git', 'add', '--'] + files)
+        mock_checkoutput.assert_called_once_with(['git', 'status', '--porcelain', '-z', '--untracked-files=no'])
+        mock_popen.assert_called_once_with(
+            ['git', '--literal-pathspecs', 'add', '--pathspec-from-file=-', '--pathspec-file-nul'], stdin=mock.ANY
+        )
+        mock_popen.return_value.communicate.assert_called_once_with(input='file1\0file2\0dir/file 3')
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('subprocess.check_output')
-    @mock.patch('bin.commands.utils.git.deleted_files')
-    @mock.patch('subprocess.call')
-    def test_reindex_someDeleted(self, mock_call, mock_deletedfiles, mock_checkoutput, mock_isgitrepository):
+    @mock.patch('subprocess.Popen')
+    def test_reindex_someDeleted(self, mock_popen, mock_checkoutput, mock_isgitrepository):
 
         # setup
-        files = ['file1', 'file2', 'file3']
-        mock_checkoutput.return_value = '\n'.join(files) + '\n'
-        mock_deletedfiles.return_value = ['file2']
+        mock_checkoutput.return_value = 'M  file1\0D  file2\0MD file3\0 M file4\0A  file5\0'
 
         # when
         reindex.reindex()
 
         # then
-        mock_isgitrepository.assert_called_once_with()
-        mock_checkoutput.assert_called_once_with('git diff --name-only --cached'.split())
-        mock_call.assert_called_once_with(['git', 'add', '--', 'file1', 'file3'])
+        mock_popen.return_value.communicate.assert_called_once_with(input='file1\0file3\0file5')
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('subprocess.check_output')
-    @mock.patch('bin.commands.utils.git.deleted_files')
-    @mock.patch('subprocess.call')
-    def test_reindex_allDeleted(self, mock_call, mock_deletedfiles, mock_checkoutput, mock_isgitrepository):
+    @mock.patch('subprocess.Popen')
+    def test_reindex_renamed(self, mock_popen, mock_checkoutput, mock_isgitrepository):
 
         # setup
-        files = ['file1', 'file2']
-        mock_checkoutput.return_value = '\n'.join(files) + '\n'
-        mock_deletedfiles.return_value = files
+        mock_checkoutput.return_value = 'R  new\0old\0RM other new\0other old\0'
 
         # when
         reindex.reindex()
 
         # then
-        mock_isgitrepository.assert_called_once_with()
-        mock_checkoutput.assert_called_once_with('git diff --name-only --cached'.split())
-        mock_call.assert_not_called()
+        mock_popen.return_value.communicate.assert_called_once_with(input='new\0other new')
+
+    @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
+    @mock.patch('subprocess.check_output')
+    @mock.patch('subprocess.Popen')
+    def test_reindex_allDeleted(self, mock_popen, mock_checkoutput, mock_isgitrepository):
+
+        # setup
+        mock_checkoutput.return_value = 'D  file1\0 D file2\0'
+
+        # when
+        reindex.reindex()
+
+        # then
+        mock_checkoutput.assert_called_once_with(['git', 'status', '--porcelain', '-z', '--untracked-files=no'])
+        mock_popen.assert_not_called()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('subprocess.check_output', return_value = '')
-    @mock.patch('subprocess.call')
-    def test_reindex_noFilesToIndex(self, mock_call, mock_checkoutput, mock_isgitrepository):
+    @mock.patch('subprocess.check_output', return_value='')
+    @mock.patch('subprocess.Popen')
+    def test_reindex_noFilesToIndex(self, mock_popen, mock_checkoutput, mock_isgitrepository):
 
         # when
         reindex.reindex()
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_checkoutput.assert_called_once_with('git diff --name-only --cached'.split())
-        mock_call.assert_not_called()
+        mock_checkoutput.assert_called_once_with(['git', 'status', '--porcelain', '-z', '--untracked-files=no'])
+        mock_popen.assert_not_called()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=False)
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
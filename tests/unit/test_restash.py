@@ -1,5 +1,4 @@
 import mock
-import os
 import unittest
 from subprocess import PIPE
 
@@ -208,15 +207,8 @@ class TestRestash(unittest.TestCase):
         mock_isvalidstash.assert_called_once_with(stash)
         mock_error.assert_called_once_with('{} is not a valid stash reference'.format(stash))
 
-    @mock.patch('subprocess.Popen')
-    def test_isValidStash(self, mock_popen):
-
-        # setup
-        mock_wait = mock.Mock()
-        mock_process = mock.Mock()
-        mock_process.wait = mock_wait
-        mock_process.returncode = 0
-        mock_popen.return_value = mock_process
+    @mock.patch('bin.commands.utils.git.object_type', return_value='commit')
+    def test_isValidStash(self, mock_objecttype):
 
         # when
         stash = 'stash@{2}'
@@ -224,10 +216,18 @@ class TestRestash(unittest.TestCase):
 
         # then
         self.assertEqual(is_valid_stash, True)
-        mock_popen.assert_called_once_with(('git', 'cat-file', '-t', stash), stdout=mock.ANY, stderr=mock.ANY)
-        self.assertEqual(mock_popen.call_args[1]['stdout'].name, os.devnull)
-        self.assertEqual(mock_popen.call_args[1]['stderr'].name, os.devnull)
-        mock_wait.assert_called_once_with()
+        mock_objecttype.assert_called_once_with(stash)
+
+    @mock.patch('bin.commands.utils.git.object_type', return_value=None)
+    def test_isValidStash_doesNotExist(self, mock_objecttype):
+
+        # when
+        stash = 'stash@{2}'
+        is_valid_stash = restash._is_valid_stash(stash)
+
+        # then
+        self.assertEqual(is_valid_stash, False)
+        mock_objecttype.assert_called_once_with(stash)
 
     @mock.patch('subprocess.Popen')
     def test_isValidStash_failsRegex(self, mock_popen):
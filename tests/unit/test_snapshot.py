@@ -2,6 +2,7 @@ import mock
 import unittest
 
 from bin.commands import snapshot
+from bin.commands.utils.context import RepoContext
 
 
 class TestSnapshotSnapshot(unittest.TestCase):
@@ -173,14 +174,14 @@ class TestSnapshotSnapshot(unittest.TestCase):
 
 class TestSnapshotStashBuffer(unittest.TestCase):
 
-    @mock.patch('subprocess.check_output', return_value='\n')
+    @mock.patch('subprocess.check_output', return_value='')
     def test_snapshot_stashBuffer_noPreviousStashes(self, mock_checkoutput):
 
         # when
-        snapshot._stash_buffer(False)
+        snapshot._stash_buffer(False, RepoContext())
 
         # then
-        mock_checkoutput.assert_called_once_with(('git', 'stash', 'list'))
+        mock_checkoutput.assert_called_once_with(['git', 'stash', 'list'])
 
     @mock.patch('subprocess.check_output')
     @mock.patch('time.strftime')
@@ -191,11 +192,11 @@ class TestSnapshotStashBuffer(unittest.TestCase):
         mock_strftime.return_value = 'time0'
 
         # when
-        snapshot._stash_buffer(True)
+        snapshot._stash_buffer(True, RepoContext())
 
         # then
         mock_checkoutput.assert_has_calls([
-            mock.call(('git', 'stash', 'list')),
+            mock.call(['git', 'stash', 'list']),
             mock.call(('git', 'show', '-s', '--format=%ci', 'stash@{0}'))
         ])
         mock_strftime.assert_called_once_with('%Y-%m-%d %H:%M:%S %z')
@@ -211,11 +212,11 @@ class TestSnapshotStashBuffer(unittest.TestCase):
         quiet = True
 
         # when
-        snapshot._stash_buffer(quiet)
+        snapshot._stash_buffer(quiet, RepoContext())
 
         # then
         mock_checkoutput.assert_has_calls([
-            mock.call(('git', 'stash', 'list')),
+            mock.call(['git', 'stash', 'list']),
             mock.call(('git', 'show', '-s', '--format=%ci', 'stash@{0}'))
         ])
         mock_strftime.assert_called_with('%Y-%m-%d %H:%M:%S %z')
@@ -1,6 +1,13 @@
+import errno
 import mock
 import os
+import shutil
+import signal
 import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
 
 import colorama
@@ -175,7 +182,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -184,7 +191,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
@@ -208,8 +215,8 @@ class TestStateState(unittest.TestCase):
         mock_statustitle.return_value = 'status title'
         mock_statusaccent.return_value = 'status accent'
         mock_printsection.return_value = 'status section\n'
-        mock_getconfigvalue.side_effect = [True, []]
-        mock_list.return_value = ''
+        mock_getconfigvalue.side_effect = [True]
+        mock_getregexp.return_value = []
 
         # when
         state.state(**kwargs)
@@ -225,13 +232,10 @@ class TestStateState(unittest.TestCase):
             show_empty=True,
             color='never'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].func_name, 'as_bool')
-        mock_list.assert_called_once_with(limit_to='sections')
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
         mock_info.assert_called_once_with('status section')
         mock_call.assert_not_called()
 
@@ -239,7 +243,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -248,7 +252,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_isemptyrepository,
             mock_getconfigvalue,
@@ -265,8 +269,8 @@ class TestStateState(unittest.TestCase):
             'show_empty': True
         }
 
-        mock_getconfigvalue.side_effect = [True, []]
-        mock_list.return_value = ''
+        mock_getconfigvalue.side_effect = [True]
+        mock_getregexp.return_value = []
 
         # when
         state.state(**kwargs)
@@ -275,11 +279,8 @@ class TestStateState(unittest.TestCase):
         mock_isgitrepository.assert_called_once_with()
         mock_isemptyrepository.assert_called_once_with()
         mock_printsection.assert_not_called()
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
-        mock_list.assert_called_once_with(limit_to='sections')
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
+        mock_getregexp.assert_called_once_with('^git-state\\.')
         mock_checkoutput.assert_not_called()
         mock_info.assert_not_called()
         mock_call.assert_not_called()
@@ -301,6 +302,36 @@ class TestStateState(unittest.TestCase):
         mock_error.assert_called_once_with("'/working/dir' not a git repository")
         mock_getcwd.assert_called_once_with()
 
+    @mock.patch('bin.commands.utils.directories.git_directory', return_value='/repo/.git')
+    @mock.patch('bin.commands.stateextensions.prompt.render', return_value='master +1')
+    @mock.patch('bin.commands.utils.messages.info')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
+    @mock.patch('bin.commands.state._print_section')
+    def test_state_prompt(self, mock_printsection, mock_getregexp, mock_info, mock_render, mock_gitdirectory):
+
+        # when
+        state.state(prompt='{branch}{staged: +}', show_color='always', budget=100)
+
+        # then: no sections are run
+        mock_render.assert_called_once_with('{branch}{staged: +}', mock.ANY)
+        mock_info.assert_called_once_with('master +1')
+        mock_getregexp.assert_not_called()
+        mock_printsection.assert_not_called()
+
+    @mock.patch('bin.commands.utils.directories.git_directory', return_value=None)
+    @mock.patch('bin.commands.stateextensions.prompt.render')
+    @mock.patch('bin.commands.utils.messages.info')
+    @mock.patch('bin.commands.utils.messages.error')
+    def test_state_prompt_notAGitRepository(self, mock_error, mock_info, mock_render, mock_gitdirectory):
+
+        # when
+        state.state(prompt='{branch}')
+
+        # then: a prompt stays quiet
+        mock_render.assert_not_called()
+        mock_info.assert_not_called()
+        mock_error.assert_not_called()
+
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.resolve_coloring')
     @mock.patch('colorama.init')
@@ -310,7 +341,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -319,7 +350,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
@@ -346,8 +377,8 @@ class TestStateState(unittest.TestCase):
         mock_statustitle.return_value = 'status title'
         mock_statusaccent.return_value = 'status accent'
         mock_printsection.return_value = 'status section\n'
-        mock_getconfigvalue.side_effect = [True, []]
-        mock_list.return_value = ''
+        mock_getconfigvalue.side_effect = [True]
+        mock_getregexp.return_value = []
 
         # when
         state.state(**kwargs)
@@ -355,6 +386,7 @@ class TestStateState(unittest.TestCase):
         # then
         mock_statusget.assert_called_once_with(
             clear=False,
+            context=mock.ANY,
             format_='compact',
             ignore_extensions=[],
             show_clean_message=True,
@@ -365,7 +397,7 @@ class TestStateState(unittest.TestCase):
         mock_resolvecoloring.assert_called_once_with('always')
         mock_init.assert_called_once_with(strip=True)
         mock_isemptyrepository.assert_called_once_with()
-        mock_list.return_value = ''
+        mock_getregexp.return_value = []
         mock_printsection.assert_called_once_with(
             mock_statustitle.return_value,
             mock_statusaccent.return_value,
@@ -374,13 +406,10 @@ class TestStateState(unittest.TestCase):
             show_empty=True,
             color='never'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].func_name, 'as_bool')
-        mock_list.assert_called_once_with(limit_to='sections')
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
         mock_info.assert_called_once_with('status section')
         mock_call.assert_not_called()
 
@@ -393,7 +422,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -402,7 +431,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
@@ -424,13 +453,13 @@ class TestStateState(unittest.TestCase):
             'show_empty': True
         }
 
-        mock_list.return_value = ''
+        mock_getregexp.return_value = []
         mock_resolvecoloring.return_value = 'always'
         mock_statusget.return_value = 'status output'
         mock_statustitle.return_value = 'status title'
         mock_statusaccent.return_value = 'status accent'
         mock_printsection.return_value = 'status section\n'
-        mock_getconfigvalue.side_effect = [True, []]
+        mock_getconfigvalue.side_effect = [True]
 
         # when
         state.state(**kwargs)
@@ -438,6 +467,7 @@ class TestStateState(unittest.TestCase):
         # then
         mock_statusget.assert_called_once_with(
             clear=False,
+            context=mock.ANY,
             format_='compact',
             ignore_extensions=[],
             show_clean_message=True,
@@ -456,13 +486,10 @@ class TestStateState(unittest.TestCase):
             show_empty=True,
             color='always'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].func_name, 'as_bool')
-        mock_list.assert_called_once_with(limit_to='sections')
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
         mock_info.assert_called_once_with('status section')
         mock_call.assert_not_called()
 
@@ -473,7 +500,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_', return_return='')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -482,7 +509,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
@@ -507,7 +534,8 @@ class TestStateState(unittest.TestCase):
         mock_statustitle.return_value = 'status title'
         mock_statusaccent.return_value = 'status accent'
         mock_printsection.return_value = 'section output\n'
-        mock_getconfigvalue.side_effect = [True, []]
+        mock_getregexp.return_value = []
+        mock_getconfigvalue.side_effect = [True]
 
         # when
         state.state(**kwargs)
@@ -523,12 +551,9 @@ class TestStateState(unittest.TestCase):
             show_empty=True,
             color='never'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
-        mock_list.assert_not_called()
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
         mock_info.assert_called_once_with('section output')
         mock_call.assert_not_called()
 
@@ -539,7 +564,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_', return_return='')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -548,7 +573,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
@@ -573,7 +598,8 @@ class TestStateState(unittest.TestCase):
         mock_statustitle.return_value = 'status title'
         mock_statusaccent.return_value = 'status accent'
         mock_printsection.return_value = 'section output\n'
-        mock_getconfigvalue.side_effect = [True, []]
+        mock_getregexp.return_value = []
+        mock_getconfigvalue.side_effect = [True]
 
         # when
         state.state(**kwargs)
@@ -582,11 +608,8 @@ class TestStateState(unittest.TestCase):
         mock_isgitrepository.assert_called_once_with()
         mock_isemptyrepository.assert_called_once_with()
         mock_printsection.assert_not_called()
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
-        mock_list.assert_not_called()
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
+        mock_getregexp.assert_called_once_with('^git-state\\.')
         mock_checkoutput.assert_not_called()
         mock_info.assert_not_called()
         mock_call.assert_not_called()
@@ -595,7 +618,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -606,7 +629,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_isemptyrepository,
             mock_getconfigvalue,
@@ -625,8 +648,11 @@ class TestStateState(unittest.TestCase):
         changes_command = 'changes command'
         changes_name = 'changes'
         changes_output = 'the changes'
-        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, [], True, []]
-        mock_list.return_value = 'git-state.extensions.changes'
+        mock_getconfigvalue.side_effect = [True]
+        mock_getregexp.return_value = [
+            ('git-state.extensions.changes.command', changes_command),
+            ('git-state.extensions.changes.name', changes_name)
+        ]
         mock_proc = mock.Mock()
         mock_proc.communicate.return_value = [changes_output, None]
         mock_proc.returncode = 0
@@ -646,21 +672,14 @@ class TestStateState(unittest.TestCase):
             show_empty=None,
             color='never'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.show', default=True, as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.command'),
-            mock.call('git-state.extensions.changes.name', default='changes'),
-            mock.call('git-state.extensions.changes.options', default=[], as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.color', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
-        mock_list.assert_called_once_with(limit_to='sections')
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
         mock_info.assert_called_once_with('final changes output')
         mock_call.assert_not_called()
         mock_popen.assert_called_once_with(
-            ['changes', 'command', '--color=never'], stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            ['changes', 'command', '--color=never'], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            preexec_fn=os.setsid
         )
         mock_proc.communicate.assert_called_once_with()
 
@@ -668,7 +687,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -679,7 +698,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_isemptyrepository,
             mock_getconfigvalue,
@@ -698,8 +717,12 @@ class TestStateState(unittest.TestCase):
         changes_command = 'changes command'
         changes_name = 'changes'
         changes_output = 'the changes'
-        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, [], False, []]
-        mock_list.return_value = 'git-state.extensions.changes'
+        mock_getconfigvalue.side_effect = [True]
+        mock_getregexp.return_value = [
+            ('git-state.extensions.changes.command', changes_command),
+            ('git-state.extensions.changes.name', changes_name),
+            ('git-state.extensions.changes.color', 'false')
+        ]
         mock_proc = mock.Mock()
         mock_proc.communicate.return_value = [changes_output, None]
         mock_proc.returncode = 0
@@ -719,21 +742,14 @@ class TestStateState(unittest.TestCase):
             show_empty=None,
             color='never'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.show', default=True, as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.command'),
-            mock.call('git-state.extensions.changes.name', default='changes'),
-            mock.call('git-state.extensions.changes.options', default=[], as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.color', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
-        mock_list.assert_called_once_with(limit_to='sections')
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
         mock_info.assert_called_once_with('final changes output')
         mock_call.assert_not_called()
         mock_popen.assert_called_once_with(
-            ['changes', 'command'], stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            ['changes', 'command'], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            preexec_fn=os.setsid
         )
         mock_proc.communicate.assert_called_once_with()
 
@@ -741,7 +757,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -752,7 +768,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_isemptyrepository,
             mock_getconfigvalue,
@@ -771,8 +787,11 @@ class TestStateState(unittest.TestCase):
         changes_command = 'changes command'
         changes_name = 'changes'
         changes_output = 'the changes'
-        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, [], True, []]
-        mock_list.return_value = 'git-state.extensions.changes'
+        mock_getconfigvalue.side_effect = [True]
+        mock_getregexp.return_value = [
+            ('git-state.extensions.changes.command', changes_command),
+            ('git-state.extensions.changes.name', changes_name)
+        ]
         mock_proc = mock.Mock()
         mock_proc.communicate.return_value = [changes_output, None]
         mock_proc.returncode = 0
@@ -792,21 +811,14 @@ class TestStateState(unittest.TestCase):
             show_empty=None,
             color='never'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.show', default=True, as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.command'),
-            mock.call('git-state.extensions.changes.name', default='changes'),
-            mock.call('git-state.extensions.changes.options', default=[], as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.color', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
-        mock_list.assert_called_once_with(limit_to='sections')
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
         mock_info.assert_called_once_with('final changes output')
         mock_call.assert_not_called()
         mock_popen.assert_called_once_with(
-            ['changes', 'command', '--option1', '-o', '1 2', '--color=never'], stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            ['changes', 'command', '--option1', '-o', '1 2', '--color=never'], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            preexec_fn=os.setsid
         )
         mock_proc.communicate.assert_called_once_with()
 
@@ -814,7 +826,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -825,7 +837,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_isemptyrepository,
             mock_getconfigvalue,
@@ -844,8 +856,12 @@ class TestStateState(unittest.TestCase):
         changes_command = 'changes command'
         changes_name = 'changes'
         changes_output = 'the changes'
-        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, ['--option1 -o "1 2"'], True, []]
-        mock_list.return_value = 'git-state.extensions.changes'
+        mock_getconfigvalue.side_effect = [True]
+        mock_getregexp.return_value = [
+            ('git-state.extensions.changes.command', changes_command),
+            ('git-state.extensions.changes.name', changes_name),
+            ('git-state.extensions.changes.options', '--option1 -o "1 2"')
+        ]
         mock_proc = mock.Mock()
         mock_proc.communicate.return_value = [changes_output, None]
         mock_proc.returncode = 0
@@ -865,22 +881,15 @@ class TestStateState(unittest.TestCase):
             show_empty=None,
             color='never'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.show', default=True, as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.command'),
-            mock.call('git-state.extensions.changes.name', default='changes'),
-            mock.call('git-state.extensions.changes.options', default=[], as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.color', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
-        mock_list.assert_called_once_with(limit_to='sections')
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
         mock_info.assert_called_once_with('final changes output')
         mock_call.assert_not_called()
         mock_popen.assert_called_once_with(
             ['changes', 'command', '--option1', '-o', '1 2', '--color=never'], stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+            stderr=subprocess.PIPE,
+            preexec_fn=os.setsid
         )
         mock_proc.communicate.assert_called_once_with()
 
@@ -888,7 +897,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -899,7 +908,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_isemptyrepository,
             mock_getconfigvalue,
@@ -918,8 +927,12 @@ class TestStateState(unittest.TestCase):
         changes_command = 'changes command'
         changes_name = 'changes'
         changes_output = 'the changes'
-        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, ['--option2 true'], True, []]
-        mock_list.return_value = 'git-state.extensions.changes'
+        mock_getconfigvalue.side_effect = [True]
+        mock_getregexp.return_value = [
+            ('git-state.extensions.changes.command', changes_command),
+            ('git-state.extensions.changes.name', changes_name),
+            ('git-state.extensions.changes.options', '--option2 true')
+        ]
         mock_proc = mock.Mock()
         mock_proc.communicate.return_value = [changes_output, None]
         mock_proc.returncode = 0
@@ -939,22 +952,15 @@ class TestStateState(unittest.TestCase):
             show_empty=None,
             color='never'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.show', default=True, as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.command'),
-            mock.call('git-state.extensions.changes.name', default='changes'),
-            mock.call('git-state.extensions.changes.options', default=[], as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.color', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
-        mock_list.assert_called_once_with(limit_to='sections')
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
         mock_info.assert_called_once_with('final changes output')
         mock_call.assert_not_called()
         mock_popen.assert_called_once_with(
             ['changes', 'command', '--option2', 'true', '--option1', '-o', '1 2', '--color=never'], stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+            stderr=subprocess.PIPE,
+            preexec_fn=os.setsid
         )
         mock_proc.communicate.assert_called_once_with()
 
@@ -962,7 +968,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -973,7 +979,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_isemptyrepository,
             mock_getconfigvalue,
@@ -989,8 +995,8 @@ class TestStateState(unittest.TestCase):
             'ignore_extensions': ['changes', 'status'],
             'options': {}
         }
-        mock_getconfigvalue.side_effect = [True, []]
-        mock_list.return_value = 'git-state.extentions.changes'
+        mock_getconfigvalue.side_effect = [True]
+        mock_getregexp.return_value = [('git-state.extensions.changes.command', 'changes command')]
 
         # when
         state.state(**kwargs)
@@ -999,11 +1005,8 @@ class TestStateState(unittest.TestCase):
         mock_isgitrepository.assert_called_once_with()
         mock_isemptyrepository.assert_called_once_with()
         mock_printsection.assert_not_called()
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
-        mock_list.assert_called_once_with(limit_to='sections')
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
+        mock_getregexp.assert_called_once_with('^git-state\\.')
         mock_checkoutput.assert_not_called()
         mock_info.assert_not_called()
         mock_call.assert_not_called()
@@ -1013,7 +1016,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -1024,7 +1027,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_isemptyrepository,
             mock_getconfigvalue,
@@ -1040,8 +1043,11 @@ class TestStateState(unittest.TestCase):
             'ignore_extensions': ['status'],
             'options': {}
         }
-        mock_getconfigvalue.side_effect = [True, False, []]
-        mock_list.return_value = 'git-state.extensions.changes'
+        mock_getconfigvalue.side_effect = [True]
+        mock_getregexp.return_value = [
+            ('git-state.extensions.changes.command', 'changes command'),
+            ('git-state.extensions.changes.show', 'false')
+        ]
 
         # when
         state.state(**kwargs)
@@ -1050,12 +1056,8 @@ class TestStateState(unittest.TestCase):
         mock_isgitrepository.assert_called_once_with()
         mock_isemptyrepository.assert_called_once_with()
         mock_printsection.assert_not_called()
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.show', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
-        mock_list.assert_called_once_with(limit_to='sections')
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
+        mock_getregexp.assert_called_once_with('^git-state\\.')
         mock_checkoutput.assert_not_called()
         mock_info.assert_not_called()
         mock_call.assert_not_called()
@@ -1065,7 +1067,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -1076,7 +1078,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_isemptyrepository,
             mock_getconfigvalue,
@@ -1096,8 +1098,12 @@ class TestStateState(unittest.TestCase):
         changes_command = 'changes command'
         changes_name = 'changes'
         changes_output = 'the changes'
-        mock_getconfigvalue.side_effect = [True, changes_command, changes_name, [], True, []]
-        mock_list.return_value = 'git-state.extensions.changes'
+        mock_getconfigvalue.side_effect = [True]
+        mock_getregexp.return_value = [
+            ('git-state.extensions.changes.command', changes_command),
+            ('git-state.extensions.changes.name', changes_name),
+            ('git-state.extensions.changes.show', 'false')
+        ]
         mock_proc = mock.Mock()
         mock_proc.communicate.return_value = [changes_output, None]
         mock_proc.returncode = 0
@@ -1117,20 +1123,14 @@ class TestStateState(unittest.TestCase):
             show_empty=None,
             color='never'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.command'),
-            mock.call('git-state.extensions.changes.name', default='changes'),
-            mock.call('git-state.extensions.changes.options', default=[], as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.color', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
-        mock_list.assert_called_once_with(limit_to='sections')
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
         mock_info.assert_called_once_with('final changes output')
         mock_call.assert_not_called()
         mock_popen.assert_called_once_with(
-            ['changes', 'command', '--color=never'], stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            ['changes', 'command', '--color=never'], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            preexec_fn=os.setsid
         )
         mock_proc.communicate.assert_called_once_with()
 
@@ -1141,7 +1141,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -1152,7 +1152,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
@@ -1176,12 +1176,16 @@ class TestStateState(unittest.TestCase):
         mock_statusget.return_value = 'status output'
         mock_statustitle.return_value = 'status'
         mock_statusaccent.return_value = 'status accent'
-        mock_printsection.side_effect = ['status section\n', 'changes section\n']
+        mock_printsection.side_effect = ['changes section\n', 'status section\n']
         changes_command = 'changes command'
         changes_name = 'changes'
         changes_output = 'the changes'
-        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, [], True, ['changes', 'status']]
-        mock_list.return_value = 'git-state.extensions.changes'
+        mock_getconfigvalue.side_effect = [True]
+        mock_getregexp.return_value = [
+            ('git-state.extensions.changes.command', changes_command),
+            ('git-state.extensions.changes.name', changes_name),
+            ('git-state.order', 'changes|status')
+        ]
         mock_proc = mock.Mock()
         mock_proc.communicate.return_value = [changes_output, None]
         mock_proc.returncode = 0
@@ -1195,39 +1199,33 @@ class TestStateState(unittest.TestCase):
         mock_isemptyrepository.assert_called_once_with()
         mock_printsection.assert_has_calls([
             mock.call(
-                mock_statustitle.return_value,
-                mock_statusaccent.return_value,
-                mock_statusget.return_value,
-                format_,
+                title=changes_name,
+                text=changes_output,
+                format_=format_,
                 show_empty=True,
                 color='never'
             ),
             mock.call(
-                title=changes_name,
-                text=changes_output,
-                format_=format_,
+                mock_statustitle.return_value,
+                mock_statusaccent.return_value,
+                mock_statusget.return_value,
+                format_,
                 show_empty=True,
                 color='never'
             )
         ])
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.show', default=True, as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.command'),
-            mock.call('git-state.extensions.changes.name', default='changes'),
-            mock.call('git-state.extensions.changes.options', default=[], as_type=mock.ANY),
-            mock.call('git-state.extensions.changes.color', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].func_name, 'as_bool')
-        mock_list.assert_called_once_with(limit_to='sections')
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
-        mock_info.assert_called_once_with('changes section\nstatus section')
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
+        mock_info.assert_has_calls([mock.call('changes section'), mock.call('status section')])
+        self.assertEqual(mock_info.call_count, 2)
         mock_call.assert_not_called()
         mock_popen.assert_called_once_with(
             ['changes', 'command', '--color=never'],
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+            stderr=subprocess.PIPE,
+            preexec_fn=os.setsid
         )
         mock_proc.communicate.assert_called_once_with()
 
@@ -1238,7 +1236,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -1247,7 +1245,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
@@ -1271,8 +1269,8 @@ class TestStateState(unittest.TestCase):
         mock_statustitle.return_value = 'status'
         mock_statusaccent.return_value = 'status accent'
         mock_printsection.side_effect = ['status section\n']
-        mock_getconfigvalue.side_effect = [True, ['status', 'unknown']]
-        mock_list.return_value = ''
+        mock_getconfigvalue.side_effect = [True]
+        mock_getregexp.return_value = [('git-state.order', 'status|unknown')]
 
         # when
         state.state(**kwargs)
@@ -1288,13 +1286,10 @@ class TestStateState(unittest.TestCase):
             show_empty=True,
             color='never'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].func_name, 'as_bool')
-        mock_list.assert_called_once_with(limit_to='sections')
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
         mock_info.assert_called_once_with('status section')
         mock_call.assert_not_called()
 
@@ -1305,18 +1300,26 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='1')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
     @mock.patch('subprocess.Popen')
+    @mock.patch('sys.stdout.isatty', return_value=True)
+    @mock.patch('bin.commands.state._cancel_when_closed')
+    @mock.patch('bin.commands.utils.terminal.lines', return_value=1)
+    @mock.patch('bin.commands.utils.terminal.pager_command', return_value='less')
     def test_state_pageOutput(
             self,
+            mock_pagercommand,
+            mock_lines,
+            mock_cancelwhenclosed,
+            mock_isatty,
             mock_popen,
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
@@ -1336,15 +1339,14 @@ class TestStateState(unittest.TestCase):
             'show_empty': True
         }
 
-        mock_list.return_value = ''
+        mock_getregexp.return_value = []
         mock_statusget.return_value = 'status output'
         mock_statustitle.return_value = 'status title'
         mock_statusaccent.return_value = 'status accent'
         mock_printsection.return_value = 'status section\ntwo\nthree\nfour\nfive\n'
-        mock_getconfigvalue.side_effect = [True, []]
-        mock_echo = mock.Mock()
-        mock_echo.stdout = 'mock out'
-        mock_popen.return_value = mock_echo
+        mock_getconfigvalue.side_effect = [True]
+        mock_pager = mock.Mock()
+        mock_popen.return_value = mock_pager
 
         # when
         state.state(**kwargs)
@@ -1360,17 +1362,18 @@ class TestStateState(unittest.TestCase):
             show_empty=True,
             color='never'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].func_name, 'as_bool')
-        mock_list.assert_called_once_with(limit_to='sections')
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
+        mock_lines.assert_called_once_with()
         mock_info.assert_not_called()
-        mock_call.assert_called_once_with(['less', '-r'], stdin=mock_echo.stdout)
-        mock_popen.assert_called_once_with(['echo', 'status section\ntwo\nthree\nfour\nfive'], stdout=subprocess.PIPE)
-        mock_echo.wait.assert_called_once_with()
+        mock_call.assert_not_called()
+        mock_popen.assert_called_once_with('less', shell=True, stdin=subprocess.PIPE, env=mock.ANY)
+        mock_cancelwhenclosed.assert_called_once_with(mock_pager.stdin, mock.ANY)
+        mock_pager.stdin.write.assert_called_once_with('status section\ntwo\nthree\nfour\nfive\n')
+        mock_pager.stdin.close.assert_called_once_with()
+        mock_pager.wait.assert_called_once_with()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
@@ -1379,14 +1382,14 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='1')
     @mock.patch('bin.commands.utils.messages.info')
     def test_state_doNotPageOutputEvenIfTooLarge(
             self,
             mock_info,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
@@ -1407,12 +1410,12 @@ class TestStateState(unittest.TestCase):
             'show_empty': True
         }
 
-        mock_list.return_value = ''
+        mock_getregexp.return_value = []
         mock_statusget.return_value = 'status output'
         mock_statustitle.return_value = 'status title'
         mock_statusaccent.return_value = 'status accent'
         mock_printsection.return_value = 'status section\ntwo\nthree\nfour\nfive\n'
-        mock_getconfigvalue.side_effect = [True, []]
+        mock_getconfigvalue.side_effect = [True]
 
         # when
         state.state(**kwargs)
@@ -1428,13 +1431,10 @@ class TestStateState(unittest.TestCase):
             show_empty=True,
             color='never'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].func_name, 'as_bool')
-        mock_list.assert_called_once_with(limit_to='sections')
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
         mock_info.assert_called_once_with('status section\ntwo\nthree\nfour\nfive')
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
@@ -1445,18 +1445,22 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
     @mock.patch('sys.stdout.isatty', return_value=True)
+    @mock.patch('bin.commands.utils.terminal.lines', return_value=100)
+    @mock.patch('bin.commands.utils.terminal.clear')
     def test_state_clear(
             self,
+            mock_clear,
+            mock_lines,
             mock_isatty,
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
@@ -1477,12 +1481,12 @@ class TestStateState(unittest.TestCase):
             'show_empty': True
         }
 
-        mock_list.return_value = ''
+        mock_getregexp.return_value = []
         mock_statusget.return_value = 'status output'
         mock_statustitle.return_value = 'status title'
         mock_statusaccent.return_value = 'status accent'
         mock_printsection.return_value = 'status section\n'
-        mock_getconfigvalue.side_effect = [True, []]
+        mock_getconfigvalue.side_effect = [True]
 
         # when
         state.state(**kwargs)
@@ -1499,15 +1503,14 @@ class TestStateState(unittest.TestCase):
             show_empty=True,
             color='never'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].func_name, 'as_bool')
-        mock_list.assert_called_once_with(limit_to='sections')
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
+        mock_lines.assert_called_once_with()
         mock_info.assert_called_once_with('status section')
-        mock_call.assert_called_once_with('clear')
+        mock_clear.assert_called_once_with()
+        mock_call.assert_not_called()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
@@ -1516,7 +1519,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -1527,7 +1530,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
@@ -1547,12 +1550,12 @@ class TestStateState(unittest.TestCase):
             'show_empty': True
         }
 
-        mock_list.return_value = ''
+        mock_getregexp.return_value = []
         mock_statusget.return_value = 'status output'
         mock_statustitle.return_value = 'status title'
         mock_statusaccent.return_value = 'status accent'
         mock_printsection.return_value = 'status section\n'
-        mock_getconfigvalue.side_effect = [True, []]
+        mock_getconfigvalue.side_effect = [True]
 
         # when
         state.state(**kwargs)
@@ -1568,14 +1571,10 @@ class TestStateState(unittest.TestCase):
             show_empty=True,
             color='never'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].func_name, 'as_bool')
-        mock_list.assert_called_once_with(limit_to='sections'
-        )
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
         mock_info.assert_called_once_with('status section')
         mock_call.assert_not_called()
 
@@ -1586,7 +1585,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('subprocess.check_output', return_value='100')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -1595,7 +1594,7 @@ class TestStateState(unittest.TestCase):
             mock_info,
             mock_call,
             mock_checkoutput,
-            mock_list,
+            mock_getregexp,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
@@ -1615,12 +1614,12 @@ class TestStateState(unittest.TestCase):
             'show_empty': True
         }
 
-        mock_list.return_value = ''
+        mock_getregexp.return_value = []
         mock_statusget.return_value = 'status output'
         mock_statustitle.return_value = 'status title'
         mock_statusaccent.return_value = 'status accent'
         mock_printsection.return_value = 'status section\n'
-        mock_getconfigvalue.side_effect = [True, []]
+        mock_getconfigvalue.side_effect = [True]
 
         # when
         state.state(**kwargs)
@@ -1636,31 +1635,25 @@ class TestStateState(unittest.TestCase):
             show_empty=True,
             color='never'
         )
-        mock_getconfigvalue.assert_has_calls([
-            mock.call('git-state.status.show-clean-message', default=True, as_type=mock.ANY),
-            mock.call('git-state.order', default=[], as_type=mock.ANY)
-        ])
+        mock_getconfigvalue.assert_called_once_with('git-state.status.show-clean-message', default=True, as_type=mock.ANY)
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].func_name, 'as_bool')
-        mock_list.assert_called_once_with(limit_to='sections')
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_getregexp.assert_called_once_with('^git-state\\.')
+        mock_checkoutput.assert_not_called()
         mock_info.assert_called_once_with('status section')
         mock_call.assert_not_called()
 
 
 class TestStateExtensionExists(unittest.TestCase):
 
-    @mock.patch('bin.commands.settings.list_')
-    def test_state_extensionExists(self, mock_list):
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
+    def test_state_extensionExists(self, mock_getregexp):
 
         # given
-        mock_list.return_value = '1'
+        mock_getregexp.return_value = [('git-state.extensions.log.command', 'git log')]
 
-        # when
-        exists = state._extension_exists('log')
-
-        # then
-        mock_list.assert_called_once_with('git-state.extensions.log', count=True)
-        self.assertTrue(exists)
+        # expect
+        self.assertTrue(state._extension_exists('log'))
+        self.assertFalse(state._extension_exists('changes'))
 
 
 class TestStateEditExtension(unittest.TestCase):
@@ -1725,6 +1718,18 @@ class TestStateEditExtension(unittest.TestCase):
         mock_call.assert_called_once_with(['git', 'config', '--local', 'git-state.extensions.log.command', 'git log'])
         mock_info.assert_called_once_with('Extension log updated')
 
+    @mock.patch('bin.commands.state._extension_exists', return_value=True)
+    @mock.patch('subprocess.call')
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_state_editExtension_onlyModule(self, mock_info, mock_call, mock_extension_exists):
+
+        # when
+        state.edit_extension('log', module='log.state:section', color=None)
+
+        # then
+        mock_call.assert_called_once_with(['git', 'config', '--local', 'git-state.extensions.log.module', 'log.state:section'])
+        mock_info.assert_called_once_with('Extension log updated')
+
     @mock.patch('bin.commands.state._extension_exists')
     @mock.patch('subprocess.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -1792,33 +1797,35 @@ class TestStateEditExtension(unittest.TestCase):
 
 class TestStateGetExtensions(unittest.TestCase):
 
-    @mock.patch('bin.commands.settings.list_')
-    def test_state_getExtensions(self, mock_list):
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
+    def test_state_getExtensions(self, mock_getregexp):
 
         # given
-        mock_list.return_value = '''git-state.extensions.log
-git-state.extensions.changes'''
+        mock_getregexp.return_value = [
+            ('git-state.extensions.log.command', 'git log'),
+            ('git-state.order', 'log|changes'),
+            ('git-state.extensions.changes.command', 'git changes'),
+            ('git-state.extensions.log.show', 'false')
+        ]
 
         # when
         extensions = state.get_extensions()
 
         # then
-        mock_list.assert_called_once_with(limit_to='sections')
-
+        mock_getregexp.assert_called_once_with('^git-state\\.')
         self.assertEqual(extensions, ['log', 'changes'])
 
-    @mock.patch('bin.commands.settings.list_')
-    def test_state_getExtensions_noExtensionsExist(self, mock_list):
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
+    def test_state_getExtensions_noExtensionsExist(self, mock_getregexp):
 
         # given
-        mock_list.return_value = ''
+        mock_getregexp.return_value = []
 
         # when
         extensions = state.get_extensions()
 
         # then
-        mock_list.assert_called_once_with(limit_to='sections')
-
+        mock_getregexp.assert_called_once_with('^git-state\\.')
         self.assertEqual(extensions, [])
 
 
@@ -1857,46 +1864,52 @@ stashes''')
 
 class TestStatePrintExtensionConfig(unittest.TestCase):
 
-    @mock.patch('bin.commands.settings.list_')
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_state_printExtensionConfig(self, mock_info, mock_list):
+    def test_state_printExtensionConfig(self, mock_info, mock_getregexp):
 
         # given
-        mock_list.return_value = 'config'
+        mock_getregexp.return_value = [
+            ('git-state.extensions.log.command', 'git log'),
+            ('git-state.extensions.changes.command', 'git changes'),
+            ('git-state.extensions.log.options', '-10'),
+            ('git-state.extensions.log.options', '--oneline')
+        ]
 
         # when
         state.print_extension_config('log')
 
         # then
-        mock_list.assert_called_once_with(section='git-state.extensions.log', format_='pretty')
-        mock_info.assert_called_once_with('config')
-
-    @mock.patch('bin.commands.settings.list_')
+        mock_info.assert_called_once_with(os.linesep.join([
+            '[git-state "extensions.log"]',
+            '    command = git log',
+            '    options = -10',
+            '    options = --oneline'
+        ]))
+
+    @mock.patch('bin.commands.utils.gitconfig.get_regexp', return_value=[])
     @mock.patch('bin.commands.utils.messages.info')
-    def test_state_printExtensionConfig_extensionDoesNotExist(self, mock_info, mock_list):
-
-        # given
-        mock_list.return_value = ''
+    def test_state_printExtensionConfig_extensionDoesNotExist(self, mock_info, mock_getregexp):
 
         # when
         state.print_extension_config('log')
 
         # then
-        mock_list.assert_called_once_with(section='git-state.extensions.log', format_='pretty')
         mock_info.assert_not_called()
 
 
 class TestStateRunExtension(unittest.TestCase):
 
     @mock.patch('colorama.init')
-    @mock.patch('bin.commands.state._extension_exists')
+    @mock.patch('bin.commands.stateextensions.registry.load')
     @mock.patch('bin.commands.state._run_extension')
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.state._print_sections')
-    def test_state_runExtension(self, mock_print_sections, mock_print_section, mock_run_extension, mock_extension_exists, mock_init):
+    def test_state_runExtension(self, mock_print_sections, mock_print_section, mock_run_extension, mock_load, mock_init):
 
         # given
-        mock_extension_exists.return_value = True
+        extension = mock.Mock()
+        mock_load.return_value.get.return_value = extension
         log_name = 'the log'
         log_text = 'log text'
         mock_run_extension.return_value = (log_name, log_text)
@@ -1908,32 +1921,626 @@ class TestStateRunExtension(unittest.TestCase):
 
         # then
         mock_init.assert_called_once_with(strip=True)
-        mock_extension_exists.assert_called_once_with('log')
-        mock_run_extension.assert_called_once_with('log', {}, 'never')
+        mock_load.return_value.get.assert_called_once_with('log')
+        mock_run_extension.assert_called_once_with(extension, {}, 'never')
         mock_print_section.assert_called_once_with(log_name, text=log_text, show_empty=True, color='never')
         mock_print_sections.assert_called_once_with({log_name: section_text})
 
     @mock.patch('colorama.init')
-    @mock.patch('bin.commands.state._extension_exists')
+    @mock.patch('bin.commands.stateextensions.registry.load')
     @mock.patch('bin.commands.state._run_extension')
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.state._print_sections')
-    def test_state_runExtension_extensionDoesNotExist(self, mock_print_sections, mock_print_section, mock_run_extension, mock_extension_exists, mock_init):
+    def test_state_runExtension_extensionDoesNotExist(self, mock_print_sections, mock_print_section, mock_run_extension, mock_load, mock_init):
 
         # given
-        mock_extension_exists.return_value = False
+        mock_load.return_value.get.return_value = None
 
         # when
         state.run_extension('log')
 
         # then
         mock_init.assert_called_once_with(strip=True)
-        mock_extension_exists.assert_called_once_with('log')
+        mock_load.return_value.get.assert_called_once_with('log')
         mock_run_extension.assert_not_called()
         mock_print_section.assert_not_called()
         mock_print_sections.assert_not_called()
 
 
+class TestStateCached(unittest.TestCase):
+
+    def test_state_cached_hit(self):
+
+        # given
+        cache = mock.Mock()
+        cache.get.return_value = 'cached output'
+        run = mock.Mock()
+
+        # when
+        result = state._cached(cache, 'key', 60, run)
+
+        # then
+        self.assertEqual(result, ('cached output', False, True))
+        cache.get.assert_called_once_with('key', 60)
+        cache.put.assert_not_called()
+        run.assert_not_called()
+
+    def test_state_cached_miss(self):
+
+        # given
+        cache = mock.Mock()
+        cache.get.return_value = None
+        run = mock.Mock(return_value=('output', False, True))
+
+        # when
+        result = state._cached(cache, 'key', None, run)
+
+        # then
+        self.assertEqual(result, ('output', False, True))
+        run.assert_called_once_with()
+        cache.put.assert_called_once_with('key', 'output')
+
+    def test_state_cached_failuresAreNotCached(self):
+
+        # given
+        cache = mock.Mock()
+        cache.get.return_value = None
+
+        # when
+        result = state._cached(cache, 'key', None, mock.Mock(return_value=('error', False, False)))
+
+        # then
+        self.assertEqual(result, ('error', False, False))
+        cache.put.assert_not_called()
+
+
+class TestStateModule(unittest.TestCase):
+
+    def test_state_callModule(self):
+
+        # given
+        context = mock.Mock()
+
+        # when
+        result = state._call_module('tests.unit.testutils:state_section', context, ['-1'], 'never', 'compact')
+
+        # then
+        self.assertEqual(result, ("-1 never compact\n", False, True))
+
+    def test_state_callModule_unicode(self):
+        self.assertEqual(
+            state._call_module('tests.unit.testutils:unicode_state_section', None, [], 'never', 'compact'),
+            ('caf\xc3\xa9\n', False, True)
+        )
+
+    def test_state_callModule_importFailures(self):
+
+        # expect: shown as the section
+        self.assertEqual(
+            state._call_module('tests.unit.nosuchmodule:section', None, [], 'never', 'compact'),
+            ('tests.unit.nosuchmodule:section: ImportError: No module named nosuchmodule\n', False, False)
+        )
+        self.assertEqual(
+            state._call_module('tests.unit.testutils:missing', None, [], 'never', 'compact'),
+            ("tests.unit.testutils:missing: ImportError: 'tests.unit.testutils' has no attribute 'missing'\n", False, False)
+        )
+        self.assertEqual(
+            state._call_module('tests.unit.testutils', None, [], 'never', 'compact'),
+            ("tests.unit.testutils: ImportError: 'tests.unit.testutils' is not of the form package.module:function\n", False, False)
+        )
+
+    def test_state_callModule_raises(self):
+        self.assertEqual(
+            state._call_module('tests.unit.testutils:failing_state_section', None, [], 'never', 'compact'),
+            ('tests.unit.testutils:failing_state_section: ValueError: no section\n', False, False)
+        )
+
+    @mock.patch('sys.stderr')
+    def test_state_callModule_exits(self, mock_stderr):
+        self.assertEqual(
+            state._call_module('tests.unit.testutils:exiting_state_section', None, [], 'never', 'compact'),
+            ('tests.unit.testutils:exiting_state_section: SystemExit: 1\n', False, False)
+        )
+
+    @mock.patch('subprocess.Popen')
+    def test_state_jobs_module(self, mock_popen):
+
+        # given
+        context = mock.Mock()
+        context.is_empty_repository.return_value = False
+        registry_ = state.registry.ExtensionRegistry([
+            ('git-state.extensions.mine.module', 'tests.unit.testutils:state_section'),
+            ('git-state.extensions.mine.options', '-1'),
+            ('git-state.extensions.mine.timeout', '1')
+        ])
+
+        # when
+        jobs, _ = state._jobs(
+            context,
+            registry_,
+            show_color='never',
+            format_='pretty',
+            options={'mine': ['-2']},
+            ignore_extensions=['status']
+        )
+
+        # then: called in-process and never timed out
+        self.assertEqual([(job.name, job.timeout) for job in jobs], [('mine', None)])
+        self.assertEqual(jobs[0].run(), ('-1 -2 never pretty\n', False, True))
+        mock_popen.assert_not_called()
+
+
+class TestStateCoprocess(unittest.TestCase):
+
+    def test_state_coprocess(self):
+
+        # given
+        coprocesses = mock.Mock()
+        extension = mock.Mock(command='extension --flag', protocol='persistent')
+
+        # when
+        coprocess_ = state._coprocess(extension, coprocesses)
+
+        # then
+        self.assertIs(coprocess_, coprocesses.get.return_value)
+        coprocesses.get.assert_called_once_with(['extension', '--flag'])
+
+    def test_state_coprocess_oneshot(self):
+
+        # given
+        coprocesses = mock.Mock()
+
+        # expect
+        self.assertIsNone(state._coprocess(mock.Mock(protocol='oneshot'), coprocesses))
+        coprocesses.get.assert_not_called()
+
+    @mock.patch('subprocess.Popen')
+    def test_state_executeExtension_persistent(self, mock_popen):
+
+        # given
+        coprocess_ = mock.Mock(command=['extension', '--flag'])
+        coprocess_.request.return_value = ('output', False, True)
+
+        # when
+        result = state._execute_extension(['extension', '--flag', '-10', '--color=never'], 2, coprocess_=coprocess_)
+
+        # then: only what varies between renders is sent
+        self.assertEqual(result, ('output', False, True))
+        coprocess_.request.assert_called_once_with(['-10', '--color=never'], 2)
+        mock_popen.assert_not_called()
+
+class TestStateWatch(unittest.TestCase):
+
+    def _job(self, name, inputs=None, ttl=None, result=None):
+        return state._Job(name, None, mock.Mock(return_value=result), inputs, ttl)
+
+    def test_state_isStale(self):
+
+        # given
+        status_job = self._job(None, inputs=state._STATUS_INPUTS)
+        head_job = self._job('head', inputs=frozenset(['head']))
+        any_job = self._job('any')
+        ttl_job = self._job('ttl', inputs=frozenset(['refs']), ttl=10)
+
+        # expect
+        self.assertTrue(state._is_stale(status_job, set(['worktree'])))
+        self.assertFalse(state._is_stale(status_job, set(['config'])))
+        self.assertFalse(state._is_stale(head_job, set(['index', 'worktree'])))
+        self.assertTrue(state._is_stale(head_job, set(['head'])))
+        self.assertTrue(state._is_stale(any_job, set(['index'])))
+        self.assertFalse(state._is_stale(any_job, set()))
+        self.assertTrue(state._is_stale(ttl_job, set()))
+
+    def test_state_inputs(self):
+        self.assertIsNone(state._inputs(None))
+        self.assertIsNone(state._inputs(state.resultcache.Basis((), 60)))
+        self.assertEqual(
+            state._inputs(state.resultcache.Basis(('refs', 'worktree'), None)),
+            frozenset(['head', 'index', 'refs', 'worktree'])
+        )
+
+    @mock.patch('bin.commands.state._print_section', side_effect=lambda title, **kwargs: title + ' section\n')
+    def test_state_sections_reusesUnchanged(self, mock_printsection):
+
+        # given
+        head_job = self._job('head', inputs=frozenset(['head']), result=('head output', False, True))
+        index_job = self._job('index', inputs=frozenset(['index']), result=('index output', False, True))
+        previous = {'head': 'previous head\n', 'index': 'previous index\n'}
+
+        # when
+        sections = state._sections([head_job, index_job], 'compact', False, 'never', previous, set(['index']))
+
+        # then
+        self.assertEqual(sections.items(), [('head', 'previous head\n'), ('index', 'index section\n')])
+        head_job.run.assert_not_called()
+        index_job.run.assert_called_once_with()
+
+    @mock.patch('bin.commands.state._print_section', side_effect=lambda title, **kwargs: title + ' section\n')
+    def test_state_sections_configChanged(self, mock_printsection):
+
+        # given
+        head_job = self._job('head', inputs=frozenset(['head']), result=('head output', False, True))
+
+        # when
+        sections = state._sections([head_job], 'compact', False, 'never', {'head': 'previous head\n'}, set(['config']))
+
+        # then
+        self.assertEqual(sections.items(), [('head', 'head section\n')])
+
+    @mock.patch('sys.stdout')
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_state_redraw_notatty(self, mock_info, mock_stdout):
+
+        # given
+        mock_stdout.isatty.return_value = False
+
+        # when
+        state._redraw(None, 'one')
+        state._redraw('one', 'one')
+
+        # then
+        mock_info.assert_called_once_with('one')
+
+    @mock.patch('sys.stdout')
+    @mock.patch('bin.commands.utils.terminal.lines', return_value=10)
+    def test_state_redraw_fromFirstChangedLine(self, mock_lines, mock_stdout):
+
+        # given
+        mock_stdout.isatty.return_value = True
+
+        # when
+        state._redraw(None, 'one\ntwo')
+        state._redraw('one\ntwo', 'one\nthree\nfour')
+        state._redraw('one\nthree\nfour', 'one\nthree\nfour')
+
+        # then
+        mock_stdout.write.assert_has_calls([
+            mock.call('\033[H\033[2Jone\ntwo' + os.linesep),
+            mock.call('\033[2;1H\033[J' + 'three' + os.linesep + 'four' + os.linesep)
+        ])
+        self.assertEqual(mock_stdout.write.call_count, 2)
+
+    @mock.patch('sys.stdout')
+    @mock.patch('bin.commands.utils.terminal.lines', return_value=2)
+    def test_state_redraw_tallerThanTerminal(self, mock_lines, mock_stdout):
+
+        # given
+        mock_stdout.isatty.return_value = True
+
+        # when
+        state._redraw('one\ntwo', 'one\nthree')
+
+        # then
+        mock_stdout.write.assert_called_once_with('\033[H\033[2Jone\nthree' + os.linesep)
+
+
+class TestStateBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.cache = state.resultcache.ResultCache(os.path.join(self.dirpath, 'cache'))
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        shutil.rmtree(self.dirpath)
+
+    def _job(self, name, result):
+        return state._Job(name, None, mock.Mock(return_value=result), None, None)
+
+    def _slow_job(self, name):
+        return state._Job(name, None, lambda: self.release.wait(5), None, None)
+
+    def test_state_lastResults(self):
+
+        # given
+        last = state._LastResults(self.cache, 'never')
+        status_job = self._job(None, None)
+        extension_job = self._job('log', None)
+
+        # when
+        last.remember(status_job, 'status', ('## master\n', '(master)'))
+        last.remember(extension_job, 'log', ('the log\n', False, True))
+        last.remember(extension_job, 'failed', ('an error\n', False, False))
+
+        # then
+        self.assertEqual(last.recall(status_job, 'status')[0], ('## master\n', '(master)'))
+        self.assertEqual(last.recall(extension_job, 'log')[0], ('the log\n', False, True))
+        self.assertIsNone(last.recall(extension_job, 'failed'))
+        self.assertIsNone(state._LastResults(self.cache, 'always').recall(extension_job, 'log'))
+        self.assertIsNone(state._LastResults(None, 'never').recall(extension_job, 'log'))
+
+    @mock.patch('bin.commands.state._print_section', side_effect=lambda title, accent=None, text=None, *args, **kwargs: '{} {} {}'.format(title, accent, text))
+    def test_state_stream_deadline(self, mock_printsection):
+
+        # given
+        last = state._LastResults(self.cache, 'never')
+        last.remember(self._job('slow', None), 'slow', ('the last output\n', False, True))
+        fast_job = self._job('fast', ('fast output', False, True))
+        late = []
+
+        # when
+        with mock.patch('time.time', return_value=time.time() + 10):
+            stale = state._stale_accent(10)
+        with mock.patch('bin.commands.state._stale_accent', return_value='(stale)'):
+            sections = list(state._stream(
+                [fast_job, self._slow_job('slow'), self._slow_job('never run')],
+                [],
+                'compact',
+                False,
+                'never',
+                time.time() + 0.05,
+                last,
+                late
+            ))
+
+        # then
+        self.assertEqual(sections, [
+            'fast None fast output',
+            'slow (stale) the last output\n',
+            'never run {}(pending) None'.format(colorama.Fore.RESET)
+        ])
+        self.assertEqual(late, ['slow', 'never run'])
+        self.assertEqual(last.recall(fast_job, 'fast')[0], ('fast output', False, True))
+        self.assertEqual(stale, '{}(stale, 10s old)'.format(colorama.Fore.RESET))
+
+    def test_state_lateSection_status(self):
+
+        # given
+        last = mock.Mock()
+        last.recall.return_value = (('## master\n', '(master)'), 3)
+
+        # when
+        with mock.patch('bin.commands.state._print_section') as mock_printsection:
+            state._late_section(self._job(None, None), 'status', last, 'compact', False, 'never')
+
+        # then: the accent is kept
+        mock_printsection.assert_called_once_with(
+            'status',
+            '(master) {}(stale, 3s old)'.format(colorama.Fore.RESET),
+            '## master\n',
+            'compact',
+            show_empty=False,
+            color='never'
+        )
+
+    def test_state_claimRefresh(self):
+
+        # given
+        claim = os.path.join(self.dirpath, 'git-state', 'refresh')
+
+        # expect
+        self.assertTrue(state._claim_refresh(claim))
+        self.assertFalse(state._claim_refresh(claim))
+        state._release_refresh(claim)
+        self.assertTrue(state._claim_refresh(claim))
+
+        # and: an abandoned claim is taken over
+        abandoned = time.time() - state._REFRESH_CLAIM_AGE - 1
+        os.utime(claim, (abandoned, abandoned))
+        self.assertTrue(state._claim_refresh(claim))
+        self.assertFalse(state._claim_refresh(claim))
+
+    @mock.patch('bin.commands.state._claim_refresh', return_value=True)
+    @mock.patch('bin.commands.state._refresh_claim', return_value='/repo/.git/git-state/refresh')
+    @mock.patch('subprocess.Popen')
+    def test_state_refreshInBackground(self, mock_popen, mock_refreshclaim, mock_claimrefresh):
+
+        # when
+        with mock.patch.object(sys, 'argv', ['/bin/git-state', '--budget', '100']):
+            state._refresh_in_background(['slow', 'status'], show_color='always', options={'slow': ['-1']}, summary=False)
+
+        # then
+        mock_claimrefresh.assert_called_once_with('/repo/.git/git-state/refresh')
+        mock_popen.assert_called_once_with(
+            [
+                sys.executable, '/bin/git-state', 'view', '--color', 'always', '--refresh', 'slow', 'status',
+                '--options', 'slow:-1', '--no-summary'
+            ],
+            stdin=mock.ANY,
+            stdout=mock.ANY,
+            stderr=mock.ANY,
+            preexec_fn=os.setsid,
+            close_fds=True
+        )
+
+    @mock.patch('bin.commands.state._claim_refresh', return_value=False)
+    @mock.patch('bin.commands.state._refresh_claim', return_value='/repo/.git/git-state/refresh')
+    @mock.patch('subprocess.Popen')
+    def test_state_refreshInBackground_alreadyRefreshing(self, mock_popen, mock_refreshclaim, mock_claimrefresh):
+
+        # when
+        state._refresh_in_background(['slow'], show_color='never')
+
+        # then
+        mock_popen.assert_not_called()
+
+    @mock.patch('bin.commands.stateextensions.registry.load')
+    @mock.patch('bin.commands.state._jobs')
+    @mock.patch('bin.commands.state._open_cache')
+    @mock.patch('bin.commands.state._refresh_claim')
+    def test_state_refresh(self, mock_refreshclaim, mock_opencache, mock_jobs, mock_load):
+
+        # given
+        claim = os.path.join(self.dirpath, 'refresh')
+        state._claim_refresh(claim)
+        mock_refreshclaim.return_value = claim
+        mock_opencache.return_value = self.cache
+        mock_load.return_value.keys.return_value = ['slow', 'other']
+        mock_jobs.return_value = [self._job('slow', ('slow output', False, True)), self._job('other', None)], None
+
+        # when
+        state._refresh(mock.Mock(), ['slow'], show_color='never', show_extensions=[])
+
+        # then: only the late sections run, even if hidden, and the claim is released
+        self.assertEqual(mock_jobs.call_args[1]['show_extensions'], ['slow', 'other', 'status'])
+        mock_jobs.return_value[0][1].run.assert_not_called()
+        self.assertEqual(state._LastResults(self.cache, 'never').recall(self._job('slow', None), 'slow')[0], ('slow output', False, True))
+        self.assertFalse(os.path.exists(claim))
+
+    @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
+    @mock.patch('bin.commands.utils.git.get_config_value', return_value=True)
+    @mock.patch('bin.commands.stateextensions.registry.load')
+    @mock.patch('bin.commands.state._jobs')
+    @mock.patch('bin.commands.state._open_cache', return_value=None)
+    @mock.patch('bin.commands.state._refresh_in_background')
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_state_budget(self, mock_info, mock_refreshinbackground, mock_opencache, mock_jobs, mock_load, mock_getconfigvalue, mock_isgitrepository):
+
+        # given
+        mock_load.return_value.order = []
+        mock_jobs.return_value = [self._slow_job('slow')], None
+
+        # when
+        state.state(show_color='never', format_='compact', show_empty=False, clear=False, page=False, budget=50)
+
+        # then
+        mock_info.assert_called_once_with('# {0}slow {0}(pending){0}'.format(colorama.Fore.RESET))
+        mock_refreshinbackground.assert_called_once_with(['slow'], show_color='never', format_='compact', show_empty=False, clear=False,
+                                                         page=False, show_clean_message=True)
+
+
+class TestStateStreamSections(unittest.TestCase):
+
+    @mock.patch('sys.stdout.isatty', return_value=False)
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_streamSections_printsEachAsItIsReady(self, mock_info, mock_isatty):
+
+        # given
+        printed = []
+
+        def sections():
+            yield 'one\n'
+            printed.append(mock_info.call_count)
+            yield ''
+            yield 'two\n'
+
+        # when
+        result = state._stream_sections(sections(), page=True)
+
+        # then
+        self.assertTrue(result)
+        self.assertEqual(printed, [1])
+        mock_info.assert_has_calls([mock.call('one'), mock.call('two')])
+
+    @mock.patch('sys.stdout.isatty', return_value=True)
+    @mock.patch('bin.commands.utils.terminal.lines', return_value=2)
+    @mock.patch('bin.commands.utils.terminal.pager')
+    @mock.patch('bin.commands.utils.messages.info')
+    @mock.patch('bin.commands.state._cancel_when_closed')
+    def test_streamSections_pagesOnceTooLong(self, mock_cancelwhenclosed, mock_info, mock_pager, mock_lines, mock_isatty):
+
+        # given
+        pager = mock_pager.return_value
+        cancel = mock.Mock()
+
+        # when
+        result = state._stream_sections(iter(['one\n', 'two\n', 'three\n']), page=True, cancel=cancel)
+
+        # then
+        self.assertTrue(result)
+        mock_info.assert_not_called()
+        mock_cancelwhenclosed.assert_called_once_with(pager.stdin, cancel)
+        pager.stdin.write.assert_has_calls([mock.call('one\ntwo\n'), mock.call('three\n')])
+        pager.stdin.close.assert_called_once_with()
+        pager.wait.assert_called_once_with()
+
+    @mock.patch('sys.stdout.isatty', return_value=True)
+    @mock.patch('bin.commands.utils.terminal.lines', return_value=2)
+    @mock.patch('bin.commands.utils.terminal.pager')
+    @mock.patch('bin.commands.state._cancel_when_closed')
+    def test_streamSections_pagerExitsEarly(self, mock_cancelwhenclosed, mock_pager, mock_lines, mock_isatty):
+
+        # given
+        pager = mock_pager.return_value
+        pager.stdin.write.side_effect = [None, IOError(errno.EPIPE, 'Broken pipe')]
+        remaining = []
+
+        def sections():
+            yield 'one\ntwo\n'
+            yield 'three\n'
+            remaining.append(True)
+            yield 'four\n'
+
+        # when
+        result = state._stream_sections(sections(), page=True)
+
+        # then
+        self.assertFalse(result)
+        self.assertEqual(remaining, [])
+        pager.wait.assert_called_once_with()
+
+    @mock.patch('sys.stdout.isatty', return_value=True)
+    @mock.patch('bin.commands.utils.terminal.lines', return_value=2)
+    @mock.patch('bin.commands.utils.terminal.pager', return_value=None)
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_streamSections_pagingDisabled(self, mock_info, mock_pager, mock_lines, mock_isatty):
+
+        # when
+        result = state._stream_sections(iter(['one\n', 'two\n', 'three\n']), page=True)
+
+        # then
+        self.assertTrue(result)
+        mock_pager.assert_called_once_with()
+        mock_info.assert_has_calls([mock.call('one\ntwo'), mock.call('three')])
+
+    @mock.patch('sys.stdout.isatty', return_value=False)
+    @mock.patch('bin.commands.utils.messages.info', side_effect=IOError(errno.EIO, 'I/O error'))
+    def test_streamSections_otherErrorsRaise(self, mock_info, mock_isatty):
+        with self.assertRaises(IOError):
+            state._stream_sections(iter(['one\n']))
+
+
+class TestStateProcesses(unittest.TestCase):
+
+    @mock.patch('subprocess.Popen')
+    @mock.patch('os.killpg')
+    def test_processes_cancel(self, mock_killpg, mock_popen):
+
+        # given
+        processes = state._Processes()
+        running = mock.Mock(pid=1)
+        grouped = mock.Mock(pid=2)
+        done = mock.Mock(pid=3)
+        mock_popen.side_effect = [running, grouped, done]
+        processes.popen(['one'])
+        processes.popen(['two'], group=True)
+        processes.finished(processes.popen(['three']))
+
+        # when
+        processes.cancel()
+
+        # then
+        running.kill.assert_called_once_with()
+        mock_killpg.assert_called_once_with(2, signal.SIGKILL)
+        done.kill.assert_not_called()
+
+    @mock.patch('subprocess.Popen')
+    def test_processes_popenAfterCancel(self, mock_popen):
+
+        # given
+        processes = state._Processes()
+        processes.cancel()
+
+        # when
+        proc = processes.popen(['one'], stdout=subprocess.PIPE)
+
+        # then
+        mock_popen.assert_called_once_with(['one'], stdout=subprocess.PIPE)
+        proc.kill.assert_called_once_with()
+
+    @mock.patch('subprocess.Popen')
+    def test_processes_killAlreadyExited(self, mock_popen):
+
+        # given
+        processes = state._Processes()
+        mock_popen.return_value.kill.side_effect = OSError(errno.ESRCH, 'No such process')
+        processes.popen(['one'])
+
+        # expect no error
+        processes.cancel()
+
+
 class TestStateDeleteExtension(unittest.TestCase):
 
     @mock.patch('bin.commands.state._extension_exists')
@@ -1,4 +1,24 @@
+from bin.commands.utils import messages
+
+
 def and_exit(*args, **kwargs):
     exit_ = kwargs.get('exit_', True)
     if exit_:
         raise SystemExit('exited')
+
+
+def state_section(context, options, show_color, format_):
+    """An in-process git-state extension."""
+    return ' '.join(options + [show_color, format_]) + '\n'
+
+
+def unicode_state_section(**kwargs):
+    return u'caf\xe9\n'
+
+
+def failing_state_section(**kwargs):
+    raise ValueError('no section')
+
+
+def exiting_state_section(**kwargs):
+    messages.error('no section')
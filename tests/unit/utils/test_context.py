@@ -0,0 +1,161 @@
+import mock
+import unittest
+
+from bin.commands.utils import context
+
+
+class TestRepoContextMemoize(unittest.TestCase):
+
+    def test_memoize(self):
+
+        # given
+        repo_context = context.RepoContext()
+        compute = mock.Mock(return_value='value')
+
+        # when
+        first = repo_context.memoize('fact', compute)
+        second = repo_context.memoize('fact', compute)
+
+        # then
+        self.assertEqual(first, 'value')
+        self.assertEqual(second, 'value')
+        compute.assert_called_once_with()
+
+    def test_memoize_falsyValuesAreRemembered(self):
+
+        # given
+        repo_context = context.RepoContext()
+        compute = mock.Mock(return_value=None)
+
+        # when
+        repo_context.memoize('fact', compute)
+        repo_context.memoize('fact', compute)
+
+        # then
+        compute.assert_called_once_with()
+
+
+class TestRepoContextInvalidate(unittest.TestCase):
+
+    def test_invalidate(self):
+
+        # given
+        repo_context = context.RepoContext()
+        repo_context.memoize('one', lambda: 1)
+        repo_context.memoize('two', lambda: 2)
+
+        # when
+        repo_context.invalidate('one')
+
+        # then
+        self.assertEqual(repo_context.memoize('one', lambda: 'recomputed'), 'recomputed')
+        self.assertEqual(repo_context.memoize('two', lambda: 'recomputed'), 2)
+
+    def test_invalidate_group(self):
+
+        # given
+        repo_context = context.RepoContext()
+        repo_context.memoize(('association', 'master'), lambda: 'origin/master')
+        repo_context.memoize(('association', 'develop'), lambda: 'master')
+        repo_context.memoize('current_branch', lambda: 'master')
+
+        # when
+        repo_context.invalidate('association')
+
+        # then
+        self.assertEqual(repo_context.memoize(('association', 'master'), lambda: None), None)
+        self.assertEqual(repo_context.memoize(('association', 'develop'), lambda: None), None)
+        self.assertEqual(repo_context.memoize('current_branch', lambda: None), 'master')
+
+    def test_invalidate_all(self):
+
+        # given
+        repo_context = context.RepoContext()
+        repo_context.memoize('one', lambda: 1)
+        repo_context.memoize(('two', 'x'), lambda: 2)
+
+        # when
+        repo_context.invalidate()
+
+        # then
+        self.assertEqual(repo_context.memoize('one', lambda: None), None)
+        self.assertEqual(repo_context.memoize(('two', 'x'), lambda: None), None)
+
+
+class TestRepoContextFacts(unittest.TestCase):
+
+    @mock.patch('bin.commands.utils.directories.git_directory', return_value='/repo/.git')
+    @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
+    @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
+    @mock.patch('bin.commands.utils.git.current_branch', return_value='master')
+    @mock.patch('bin.commands.utils.git.is_detached', return_value=False)
+    def test_facts(self, mock_isdetached, mock_currentbranch, mock_isemptyrepository, mock_isgitrepository, mock_gitdirectory):
+
+        # given
+        repo_context = context.RepoContext()
+
+        # when
+        for _ in range(2):
+            self.assertTrue(repo_context.is_git_repository())
+            self.assertEqual(repo_context.git_directory(), '/repo/.git')
+            self.assertFalse(repo_context.is_empty_repository())
+            self.assertEqual(repo_context.current_branch(), 'master')
+            self.assertFalse(repo_context.is_detached())
+
+        # then
+        mock_isgitrepository.assert_called_once_with()
+        mock_gitdirectory.assert_called_once_with()
+        mock_isemptyrepository.assert_called_once_with()
+        mock_currentbranch.assert_called_once_with()
+        mock_isdetached.assert_called_once_with()
+
+    @mock.patch('subprocess.check_output', return_value='stash@{0}: WIP on master: 1234567 one\nstash@{1}: On master: two\n')
+    def test_stashes(self, mock_checkoutput):
+
+        # given
+        repo_context = context.RepoContext()
+
+        # when
+        repo_context.stashes()
+        stashes = repo_context.stashes()
+
+        # then
+        self.assertEqual(stashes, ['stash@{0}: WIP on master: 1234567 one', 'stash@{1}: On master: two'])
+        mock_checkoutput.assert_called_once_with(['git', 'stash', 'list'])
+
+    @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=False)
+    @mock.patch('os.getcwd', return_value='/working/dir')
+    @mock.patch('bin.commands.utils.messages.error')
+    def test_exitIfNotGitRepository(self, mock_error, mock_getcwd, mock_isgitrepository):
+
+        # when
+        context.RepoContext().exit_if_not_git_repository()
+
+        # then
+        mock_error.assert_called_once_with("'/working/dir' not a git repository")
+
+    @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_status(self, mock_status, mock_getconfigvalue):
+
+        # given
+        repo_context = context.RepoContext()
+
+        # when
+        repo_context.status('normal')
+        status = repo_context.status('normal')
+
+        # then
+        self.assertEqual(status, mock_status.return_value)
+        mock_getconfigvalue.assert_called_once_with('status.aheadBehind', default=True, as_type=mock.ANY)
+        mock_status.assert_called_once_with('normal', False)
+
+    @mock.patch('bin.commands.utils.git.get_config_value', return_value=True)
+    @mock.patch('bin.commands.utils.porcelain.status')
+    def test_status_auto(self, mock_status, mock_getconfigvalue):
+
+        # when
+        context.RepoContext().status('auto', untracked_limit=10, timeout=0.5)
+
+        # then
+        mock_status.assert_called_once_with('auto', True, untracked_limit=10, timeout=0.5)
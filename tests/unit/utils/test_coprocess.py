@@ -0,0 +1,206 @@
+import json
+import mock
+import os
+import signal
+import subprocess
+import threading
+import unittest
+from StringIO import StringIO
+
+from bin.commands.utils import coprocess
+
+
+def _proc(*lines):
+    proc = mock.Mock()
+    proc.pid = 123
+    proc.stdout.readline.side_effect = list(lines)
+    proc.poll.return_value = 0
+    return proc
+
+
+def _response(id_, output, status=0):
+    return json.dumps({'id': id_, 'status': status, 'output': output}) + '\n'
+
+
+@mock.patch('os.killpg')
+@mock.patch('tempfile.TemporaryFile', side_effect=lambda: StringIO('a crash\n'))
+class TestCoprocess(unittest.TestCase):
+
+    @mock.patch('subprocess.Popen')
+    def test_request(self, mock_popen, mock_temporaryfile, mock_killpg):
+
+        # given
+        mock_popen.return_value = _proc(_response(1, 'first\n'), _response(2, 'second\n', status=1))
+        coprocess_ = coprocess.Coprocess(['extension'], '/repo')
+
+        # when
+        first = coprocess_.request(['--color=never'])
+        second = coprocess_.request([])
+
+        # then: started once
+        self.assertEqual(first, ('first\n', False, True))
+        self.assertEqual(second, ('second\n', False, False))
+        mock_popen.assert_called_once_with(
+            ['extension'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=mock.ANY,
+            cwd='/repo',
+            env=None,
+            close_fds=True,
+            preexec_fn=os.setsid
+        )
+        requests = [json.loads(c[0][0]) for c in mock_popen.return_value.stdin.write.call_args_list]
+        self.assertEqual(requests, [
+            {'id': 1, 'arguments': ['--color=never'], 'directory': '/repo'},
+            {'id': 2, 'arguments': [], 'directory': '/repo'}
+        ])
+        mock_killpg.assert_not_called()
+
+    @mock.patch('subprocess.Popen')
+    def test_request_skipsStaleResponses(self, mock_popen, mock_temporaryfile, mock_killpg):
+
+        # given
+        mock_popen.return_value = _proc(_response(0, 'stale\n'), _response(1, 'current\n'))
+
+        # expect
+        self.assertEqual(coprocess.Coprocess(['extension'], '/repo').request([]), ('current\n', False, True))
+
+    @mock.patch('subprocess.Popen')
+    def test_request_restartsAfterCrash(self, mock_popen, mock_temporaryfile, mock_killpg):
+
+        # given: the first process exits and the second answers
+        crashed = _proc('')
+        restarted = _proc(_response(2, 'output\n'))
+        mock_popen.side_effect = [crashed, restarted]
+        coprocess_ = coprocess.Coprocess(['extension'], '/repo')
+
+        # when
+        result = coprocess_.request([])
+
+        # then
+        self.assertEqual(result, ('output\n', False, True))
+        self.assertEqual(mock_popen.call_count, 2)
+        crashed.stdin.close.assert_called_once_with()
+        crashed.wait.assert_called_once_with()
+        mock_killpg.assert_called_once_with(123, signal.SIGKILL)
+
+    @mock.patch('subprocess.Popen')
+    def test_request_notJson(self, mock_popen, mock_temporaryfile, mock_killpg):
+
+        # given
+        mock_popen.side_effect = [_proc('not json\n'), _proc('')]
+
+        # when
+        result = coprocess.Coprocess(['extension'], '/repo').request([])
+
+        # then: what it wrote to stderr is shown
+        self.assertEqual(result, ('a crash\n', False, False))
+        self.assertEqual(mock_popen.call_count, 2)
+
+    @mock.patch('subprocess.Popen')
+    def test_request_timedOut(self, mock_popen, mock_temporaryfile, mock_killpg):
+
+        # given: a process that only stops once it's killed
+        killed = threading.Event()
+        proc = _proc()
+        proc.stdout.readline.side_effect = lambda: killed.wait(5) and ''
+        mock_popen.return_value = proc
+        mock_killpg.side_effect = lambda pid, signal_: killed.set()
+
+        # when
+        result = coprocess.Coprocess(['extension'], '/repo').request([], timeout=0.01)
+
+        # then: not restarted until the next request
+        self.assertEqual(result, ('', True, False))
+        mock_popen.assert_called_once()
+
+    @mock.patch('subprocess.Popen')
+    def test_stop_abandonsRequest(self, mock_popen, mock_temporaryfile, mock_killpg):
+
+        # given: a request waiting on a process that only answers once it's killed
+        killed = threading.Event()
+        proc = _proc()
+        proc.stdout.readline.side_effect = lambda: killed.wait(5) and ''
+        mock_popen.return_value = proc
+        mock_killpg.side_effect = lambda pid, signal_: killed.set()
+        coprocess_ = coprocess.Coprocess(['extension'], '/repo')
+        results = []
+        requesting = threading.Thread(target=lambda: results.append(coprocess_.request([])))
+        requesting.start()
+        while not proc.stdin.write.called:
+            killed.wait(0.01)
+
+        # when
+        coprocess_.stop()
+        requesting.join(5)
+
+        # then: not restarted
+        self.assertEqual(results, [('', False, False)])
+        mock_popen.assert_called_once()
+
+
+class TestCoprocessPool(unittest.TestCase):
+
+    @mock.patch('os.getcwd', return_value='/repo')
+    def test_get(self, mock_getcwd):
+
+        # given
+        pool = coprocess.Pool()
+
+        # when
+        first = pool.get(['extension'])
+
+        # then
+        self.assertIs(pool.get(['extension'], '/repo'), first)
+        self.assertIsNot(pool.get(['extension'], '/other'), first)
+        self.assertIsNot(pool.get(['other']), first)
+        self.assertEqual((first.command, first.directory, first.environment), (['extension'], '/repo', None))
+
+    def test_get_environment(self):
+
+        # given
+        pool = coprocess.Pool()
+
+        # when
+        first = pool.get(['extension'], '/repo', {'PATH': '/bin'})
+
+        # then: the environment is only used to create it
+        self.assertEqual(first.environment, {'PATH': '/bin'})
+        self.assertIs(pool.get(['extension'], '/repo', {'PATH': '/usr/bin'}), first)
+
+    def test_close(self):
+
+        # given
+        pool = coprocess.Pool()
+
+        # when
+        with mock.patch.object(coprocess.Coprocess, 'stop') as mock_stop:
+            with pool:
+                first = pool.get(['extension'], '/repo')
+                pool.get(['other'], '/repo')
+
+        # then: every coprocess is stopped and forgotten
+        self.assertEqual(mock_stop.call_count, 2)
+        self.assertIsNot(pool.get(['extension'], '/repo'), first)
+
+
+class TestCoprocessSharedPool(unittest.TestCase):
+
+    def tearDown(self):
+        coprocess.share(None)
+
+    def test_pool(self):
+        self.assertIsInstance(coprocess.pool(), coprocess.Pool)
+        self.assertIsNot(coprocess.pool(), coprocess.pool())
+
+    def test_pool_shared(self):
+
+        # given
+        shared = mock.Mock()
+
+        # when
+        coprocess.share(shared)
+
+        # then
+        self.assertIs(coprocess.pool(), shared)
@@ -1,5 +1,7 @@
 import os
 import mock
+import shutil
+import tempfile
 import unittest
 
 from bin.commands.utils import directories
@@ -80,3 +82,69 @@ class TestDirectories(unittest.TestCase):
         # then
         mock_is_git_repository.assert_called_once()
         mock_error.assert_called_once_with('{0!r} not a git repository'.format(directory))
+
+
+class TestDirectoriesGitDirectory(unittest.TestCase):
+
+    def setUp(self):
+        self.dirpath = os.path.realpath(tempfile.mkdtemp())
+        self.repo = os.path.join(self.dirpath, 'repo')
+        self.git_dir = os.path.join(self.repo, '.git')
+        os.makedirs(os.path.join(self.git_dir, 'objects'))
+        with open(os.path.join(self.git_dir, 'HEAD'), 'w') as head:
+            head.write('ref: refs/heads/master\n')
+
+        self.environ_patcher = mock.patch.dict('os.environ')
+        self.environ_patcher.start()
+        os.environ.pop('GIT_DIR', None)
+
+    def tearDown(self):
+        self.environ_patcher.stop()
+        shutil.rmtree(self.dirpath)
+
+    def test_gitDirectory(self):
+        self.assertEqual(directories.git_directory(self.repo), self.git_dir)
+
+    def test_gitDirectory_fromSubdirectory(self):
+
+        # given
+        subdirectory = os.path.join(self.repo, 'a', 'b')
+        os.makedirs(subdirectory)
+
+        # expect
+        self.assertEqual(directories.git_directory(subdirectory), self.git_dir)
+
+    def test_gitDirectory_notARepository(self):
+        self.assertIsNone(directories.git_directory(self.dirpath))
+
+    def test_gitDirectory_gitfile(self):
+
+        # given
+        worktree_git_dir = os.path.join(self.git_dir, 'worktrees', 'other')
+        os.makedirs(worktree_git_dir)
+        with open(os.path.join(worktree_git_dir, 'HEAD'), 'w') as head:
+            head.write('ref: refs/heads/other\n')
+        with open(os.path.join(worktree_git_dir, 'commondir'), 'w') as commondir:
+            commondir.write('../..\n')
+        worktree = os.path.join(self.dirpath, 'other')
+        os.makedirs(worktree)
+        with open(os.path.join(worktree, '.git'), 'w') as gitfile:
+            gitfile.write('gitdir: ' + worktree_git_dir + '\n')
+
+        # when
+        git_dir = directories.git_directory(worktree)
+
+        # then
+        self.assertEqual(git_dir, worktree_git_dir)
+        self.assertEqual(directories.common_directory(git_dir), self.git_dir)
+
+    def test_gitDirectory_gitDirEnvironment(self):
+
+        # given
+        os.environ['GIT_DIR'] = self.git_dir
+
+        # expect
+        self.assertEqual(directories.git_directory(self.dirpath), self.git_dir)
+
+    def test_commonDirectory_notAWorktree(self):
+        self.assertEqual(directories.common_directory(self.git_dir), self.git_dir)
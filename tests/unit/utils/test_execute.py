@@ -39,3 +39,189 @@ class TestExecute(unittest.TestCase):
         self.assertEqual(mock_popen.call_args[1]['stderr'].name, os.devnull)
 
         stdout == 'testing' + os.linesep
+
+
+class TestExecuteTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.tracing_patcher = mock.patch('bin.commands.utils.execute._tracing', True)
+        self.records_patcher = mock.patch('bin.commands.utils.execute._records', [])
+        self.tracing_patcher.start()
+        self.records_patcher.start()
+
+    def tearDown(self):
+        self.tracing_patcher.stop()
+        self.records_patcher.stop()
+
+    @mock.patch('subprocess.call', return_value=1)
+    def test_call(self, mock_call):
+
+        # when
+        returncode = execute.call(['git', 'add', 'file'], stdout=None)
+
+        # then
+        self.assertEqual(returncode, 1)
+        mock_call.assert_called_once_with(['git', 'add', 'file'], stdout=None)
+        record = execute._records[0]
+        self.assertEqual(record.argv, ['git', 'add', 'file'])
+        self.assertEqual(record.returncode, 1)
+        self.assertIsNotNone(record.end)
+
+    @mock.patch('subprocess.check_output', return_value='output')
+    def test_checkOutput(self, mock_checkoutput):
+
+        # when
+        output = execute.check_output(('git', 'stash', 'list'))
+
+        # then
+        self.assertEqual(output, 'output')
+        mock_checkoutput.assert_called_once_with(('git', 'stash', 'list'))
+        record = execute._records[0]
+        self.assertEqual(record.argv, ['git', 'stash', 'list'])
+        self.assertEqual(record.returncode, 0)
+        self.assertEqual(record.bytes_read, len('output'))
+
+    @mock.patch('subprocess.check_output')
+    def test_checkOutput_failed(self, mock_checkoutput):
+
+        # given
+        mock_checkoutput.side_effect = subprocess.CalledProcessError(128, 'git', output='fatal')
+
+        # when
+        with self.assertRaises(subprocess.CalledProcessError):
+            execute.check_output(['git', 'rev-parse', 'nope'])
+
+        # then
+        self.assertEqual(execute._records[0].returncode, 128)
+        self.assertEqual(execute._records[0].bytes_read, len('fatal'))
+
+    @mock.patch('subprocess.Popen')
+    def test_popen(self, mock_popen):
+
+        # given
+        mock_popen.return_value.communicate.return_value = ['out', 'err']
+        mock_popen.return_value.returncode = 0
+
+        # when
+        proc = execute.popen(['git', 'status'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.assertIsNone(execute._records[0].end)
+        outputs = proc.communicate()
+
+        # then
+        self.assertEqual(outputs, ['out', 'err'])
+        self.assertIs(proc.stdout.fileno, mock_popen.return_value.stdout.fileno)
+        mock_popen.assert_called_once_with(['git', 'status'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.assertEqual(execute._records[0].returncode, 0)
+        self.assertEqual(execute._records[0].bytes_read, 6)
+
+    def test_popen_streamed(self):
+
+        # given
+        proc = execute.popen(['printf', 'ab\\ncd\\nef\\n'], stdout=subprocess.PIPE)
+
+        # when
+        read = proc.stdout.read(1)
+        line = proc.stdout.readline()
+        rest = list(proc.stdout)
+        proc.wait()
+
+        # then
+        self.assertEqual((read, line, rest), ('a', 'b\n', ['cd\n', 'ef\n']))
+        self.assertEqual(execute._records[0].returncode, 0)
+        self.assertEqual(execute._records[0].bytes_read, 9)
+
+    @mock.patch('subprocess.Popen')
+    def test_popen_streamedWithoutPipe(self, mock_popen):
+
+        # given
+        mock_popen.return_value.stdout = None
+
+        # when
+        proc = execute.popen(['git', 'status'])
+
+        # then
+        self.assertIsNone(proc.stdout)
+
+    @mock.patch('subprocess.Popen')
+    def test_popen_notTracing(self, mock_popen):
+
+        # given
+        self.tracing_patcher.stop()
+        self.tracing_patcher = mock.patch('bin.commands.utils.execute._tracing', False)
+        self.tracing_patcher.start()
+
+        # when
+        proc = execute.popen(['git', 'status'])
+
+        # then
+        self.assertIs(proc, mock_popen.return_value)
+        self.assertEqual(execute._records, [])
+
+    def test_recordName(self):
+        self.assertEqual(execute._Record(['git', 'status', '--short']).name, 'git status')
+        self.assertEqual(execute._Record(['git', '-c', 'color.status=never', 'status']).name, 'git status')
+        self.assertEqual(execute._Record(['/usr/bin/tput', 'lines']).name, 'tput lines')
+        self.assertEqual(execute._Record('clear').name, 'clear')
+
+    @mock.patch('subprocess.check_output', return_value='x')
+    @mock.patch('subprocess.call', return_value=0)
+    def test_summary(self, mock_call, mock_checkoutput):
+
+        # given
+        execute.check_output(['git', 'stash', 'list'])
+        execute.check_output(['git', 'stash', 'list'])
+        execute.call(['git', 'status'])
+
+        # when
+        summary = execute.summary()
+
+        # then
+        lines = summary.splitlines()
+        self.assertRegexpMatches(lines[0], r'^git-commands trace: 3 processes, \d+\.\d ms$')
+        self.assertRegexpMatches(summary, r'\n\s+2\s+\S+\s+\S+\s+2\s+0  git stash\n')
+        self.assertRegexpMatches(summary, r'\n\s+1\s+\S+\s+\S+\s+0\s+0  git status\n')
+        self.assertIn('slowest:', lines)
+
+
+class TestExecuteTraceIfRequested(unittest.TestCase):
+
+    @mock.patch('bin.commands.utils.execute.trace')
+    @mock.patch.dict('os.environ', {}, clear=True)
+    def test_traceIfRequested_flag(self, mock_trace):
+
+        # given
+        argv = ['git-changes', 'view', '--trace', '--', '--trace']
+
+        # when
+        execute.trace_if_requested(argv)
+
+        # then
+        self.assertEqual(argv, ['git-changes', 'view', '--', '--trace'])
+        mock_trace.assert_called_once_with()
+
+    @mock.patch('bin.commands.utils.execute.trace')
+    @mock.patch.dict('os.environ', {'GIT_COMMANDS_TRACE': '1'})
+    def test_traceIfRequested_environment(self, mock_trace):
+
+        # given
+        argv = ['git-state']
+
+        # when
+        execute.trace_if_requested(argv)
+
+        # then
+        self.assertEqual(argv, ['git-state'])
+        mock_trace.assert_called_once_with()
+
+    @mock.patch('bin.commands.utils.execute.trace')
+    @mock.patch.dict('os.environ', {}, clear=True)
+    def test_traceIfRequested_notRequested(self, mock_trace):
+
+        # given
+        argv = ['git-state', '--', '--trace']
+
+        # when
+        execute.trace_if_requested(argv)
+
+        # then
+        mock_trace.assert_not_called()
@@ -0,0 +1,259 @@
+import json
+import mock
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+from StringIO import StringIO
+
+from bin.commands.utils import forward
+
+
+class _Daemon(object):
+    """Answers a single request with canned frames, keeping the request it was sent."""
+
+    def __init__(self, path, frames):
+        self.request = None
+        self._frames = frames
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(path)
+        self._listener.listen(1)
+        self._thread = threading.Thread(target=self._answer)
+        self._thread.start()
+
+    def _answer(self):
+        connection = self._listener.accept()[0]
+        self.request = json.loads(connection.makefile('r').readline())
+        for stream, data in self._frames:
+            forward.write_frame(connection, stream, data)
+        connection.close()
+
+    def close(self):
+        self._thread.join(5)
+        self._listener.close()
+
+
+class TestForwardFrames(unittest.TestCase):
+
+    def test_frames(self):
+
+        # given
+        sender, receiver = socket.socketpair()
+
+        # when
+        forward.write_frame(sender, forward.STDOUT, 'output\n')
+        forward.write_frame(sender, forward.EXIT, '0')
+        forward.write_frame(sender, forward.STARTED, '')
+        sender.close()
+
+        # then
+        self.assertEqual(forward.read_frame(receiver), ('o', 'output\n'))
+        self.assertEqual(forward.read_frame(receiver), ('x', '0'))
+        self.assertEqual(forward.read_frame(receiver), ('s', ''))
+        self.assertIsNone(forward.read_frame(receiver))
+        receiver.close()
+
+    def test_readFrame_truncated(self):
+
+        # given
+        sender, receiver = socket.socketpair()
+        sender.sendall('o\x00\x00\x00\x10short')
+        sender.close()
+
+        # expect
+        self.assertIsNone(forward.read_frame(receiver))
+        receiver.close()
+
+
+class TestForwardSocketPath(unittest.TestCase):
+
+    @mock.patch.dict('os.environ', {'GIT_COMMANDS_DAEMON_SOCKET': '/run/daemon.sock'})
+    def test_socketPath_configured(self):
+        self.assertEqual(forward.socket_path(), '/run/daemon.sock')
+
+    @mock.patch.dict('os.environ', {'XDG_RUNTIME_DIR': '/run/user/1000'})
+    @mock.patch('os.getuid', return_value=1000)
+    def test_socketPath_runtimeDirectory(self, mock_getuid):
+
+        # given
+        os.environ.pop('GIT_COMMANDS_DAEMON_SOCKET', None)
+
+        # expect
+        self.assertEqual(forward.socket_path(), '/run/user/1000/git-commands-1000.sock')
+
+    @mock.patch.dict('os.environ', {'TMPDIR': '/var/tmp'})
+    @mock.patch('os.getuid', return_value=1000)
+    def test_socketPath_tempDirectory(self, mock_getuid):
+
+        # given
+        os.environ.pop('GIT_COMMANDS_DAEMON_SOCKET', None)
+        os.environ.pop('XDG_RUNTIME_DIR', None)
+
+        # expect
+        self.assertEqual(forward.socket_path(), '/var/tmp/git-commands-1000.sock')
+
+    @mock.patch.dict('os.environ', {})
+    @mock.patch('os.getuid', return_value=1000)
+    def test_socketPath_default(self, mock_getuid):
+
+        # given
+        for name in ('GIT_COMMANDS_DAEMON_SOCKET', 'XDG_RUNTIME_DIR', 'TMPDIR'):
+            os.environ.pop(name, None)
+
+        # expect
+        self.assertEqual(forward.socket_path(), '/tmp/git-commands-1000.sock')
+
+
+class TestForwardRequest(unittest.TestCase):
+
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.path = os.path.join(self.dirpath, 'daemon.sock')
+        os.chdir(self.dirpath)
+        self.stdout = StringIO()
+        self.stderr = StringIO()
+        patchers = [mock.patch('sys.stdout', self.stdout), mock.patch('sys.stderr', self.stderr)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def test_request(self):
+
+        # given
+        daemon = _Daemon(self.path, [
+            (forward.STARTED, ''),
+            (forward.STDOUT, 'out\n'),
+            (forward.STDERR, 'err\n'),
+            (forward.EXIT, '3')
+        ])
+
+        # when
+        status = forward.request(['/bin/git-state', '--prompt'], self.path)
+        daemon.close()
+
+        # then
+        self.assertEqual(status, 3)
+        self.assertEqual((self.stdout.getvalue(), self.stderr.getvalue()), ('out\n', 'err\n'))
+        self.assertEqual(daemon.request['command'], 'git-state')
+        self.assertEqual(daemon.request['argv'], ['/bin/git-state', '--prompt'])
+        self.assertEqual(daemon.request['cwd'], os.getcwd())
+        self.assertEqual(daemon.request['env'], dict(os.environ))
+
+    def test_request_notStarted(self):
+
+        # given: a daemon that doesn't know the command
+        daemon = _Daemon(self.path, [])
+
+        # when
+        with self.assertRaises(forward.DaemonUnavailable):
+            forward.request(['git-unknown'], self.path)
+        daemon.close()
+
+    def test_request_stoppedAfterStarting(self):
+
+        # given
+        daemon = _Daemon(self.path, [(forward.STARTED, ''), (forward.STDOUT, 'partial')])
+
+        # when
+        status = forward.request(['git-state'], self.path)
+        daemon.close()
+
+        # then: not run again here
+        self.assertEqual(status, 1)
+        self.assertEqual(self.stdout.getvalue(), 'partial')
+        self.assertEqual(self.stderr.getvalue(), 'error: git-commands-daemon stopped before git-state finished\n')
+
+    def test_request_noDaemon(self):
+        with self.assertRaises(forward.DaemonUnavailable):
+            forward.request(['git-state'], self.path)
+
+    def test_request_staleSocket(self):
+
+        # given: a socket nothing listens on
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.path)
+        stale.close()
+
+        # expect
+        with self.assertRaises(forward.DaemonUnavailable):
+            forward.request(['git-state'], self.path)
+
+    @mock.patch('os.getuid', return_value=os.getuid() + 1)
+    def test_request_anotherUsersSocket(self, mock_getuid):
+
+        # given
+        daemon = _Daemon(self.path, [(forward.STARTED, ''), (forward.EXIT, '0')])
+
+        # when
+        with self.assertRaises(forward.DaemonUnavailable):
+            forward.request(['git-state'], self.path)
+
+        # then: never connected
+        self.assertIsNone(daemon.request)
+        socket.socket(socket.AF_UNIX, socket.SOCK_STREAM).connect(self.path)  # let it finish
+        daemon.close()
+
+
+class TestForwardToDaemon(unittest.TestCase):
+
+    def setUp(self):
+        patchers = [mock.patch.dict('os.environ'), mock.patch('sys.stdout')]
+        self.mock_environ, self.mock_stdout = [patcher.start() for patcher in patchers]
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+        self.mock_stdout.isatty.return_value = False
+        for name in ('GIT_COMMANDS_DAEMON', 'GIT_COMMANDS_TRACE'):
+            os.environ.pop(name, None)
+
+    @mock.patch('bin.commands.utils.forward.request', return_value=2)
+    def test_toDaemon(self, mock_request):
+
+        # when
+        with self.assertRaises(SystemExit) as context:
+            forward.to_daemon(['git-state', '--prompt'])
+
+        # then
+        self.assertEqual(context.exception.code, 2)
+        mock_request.assert_called_once_with(['git-state', '--prompt'])
+
+    @mock.patch('bin.commands.utils.forward.request', side_effect=forward.DaemonUnavailable)
+    def test_toDaemon_unavailable(self, mock_request):
+
+        # when
+        forward.to_daemon(['git-state'])
+
+        # then: returns to run in-process
+        mock_request.assert_called_once_with(['git-state'])
+
+    @mock.patch('bin.commands.utils.forward.request')
+    def test_toDaemon_notForwarded(self, mock_request):
+
+        # given
+        cases = [
+            ({'GIT_COMMANDS_DAEMON': '0'}, ['git-state'], False),
+            ({'GIT_COMMANDS_TRACE': '1'}, ['git-state'], False),
+            ({}, ['git-state', '--trace'], False),
+            ({}, ['git-state'], True)
+        ]
+
+        for environment, argv, isatty in cases:
+            with mock.patch.dict('os.environ', environment):
+                self.mock_stdout.isatty.return_value = isatty
+
+                # when
+                forward.to_daemon(argv)
+
+        # then
+        mock_request.assert_not_called()
+
+    @mock.patch('bin.commands.utils.forward.request', return_value=0)
+    def test_toDaemon_traceAfterDelimiter(self, mock_request):
+
+        # expect
+        with self.assertRaises(SystemExit):
+            forward.to_daemon(['git-snapshot', '--', '--trace'])
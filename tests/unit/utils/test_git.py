@@ -6,7 +6,7 @@ import unittest
 from subprocess import PIPE, STDOUT
 
 from .. import testutils
-from bin.commands.utils import git
+from bin.commands.utils import git, gitconfig, refs
 
 
 class TestGit(unittest.TestCase):
@@ -24,8 +24,9 @@ class TestGit(unittest.TestCase):
         git.validate_config = self._validate_config
         git.get_config_value = self._get_config_value
 
+    @mock.patch('bin.commands.utils.refs.store', side_effect=refs.RefsUnavailable)
     @mock.patch('subprocess.Popen')
-    def test_isValidReference(self, mock_popen):
+    def test_isValidReference_refsUnavailable(self, mock_popen, mock_store):
 
         # given
         reference = 'ref'
@@ -41,6 +42,28 @@ class TestGit(unittest.TestCase):
         mock_popen.assert_called_once_with(['git', 'show-ref', '--quiet', reference])
         mock_proc.communicate.assert_called_once()
 
+    @mock.patch('bin.commands.utils.refs.store')
+    def test_isValidReference(self, mock_store):
+
+        # given
+        mock_store.return_value.matching.return_value = [('refs/heads/ref', 'abc123')]
+
+        # when
+        is_valid = git.is_valid_reference('ref')
+
+        # then
+        self.assertTrue(is_valid)
+        mock_store.return_value.matching.assert_called_once_with('ref')
+
+    @mock.patch('bin.commands.utils.refs.store')
+    def test_isValidReference_notAReference(self, mock_store):
+
+        # given
+        mock_store.return_value.matching.return_value = []
+
+        # expect
+        self.assertFalse(git.is_valid_reference('ref'))
+
     def test_isValidReference_notAStr(self):
 
         # when
@@ -50,62 +73,44 @@ class TestGit(unittest.TestCase):
         # then
         self.assertEqual(context.exception.message, "'reference' must be a str. Given: int")
 
-    @mock.patch('subprocess.Popen')
-    def test_isCommit(self, mock_popen):
+    @mock.patch('bin.commands.utils.git.object_type', return_value='commit')
+    def test_isCommit(self, mock_objecttype):
 
         # given
         object_ = 'o123'
-        type_ = 'commit\n'
-        mock_proc = mock.Mock()
-        mock_proc.returncode = 0
-        mock_proc.communicate.return_value = [type_]
-        mock_popen.return_value = mock_proc
 
         # when
         is_commit = git.is_commit(object_)
 
         # then
         self.assertTrue(is_commit)
-        mock_popen.assert_called_once_with(['git', 'cat-file', '-t', object_], stdout=PIPE, stderr=mock.ANY)
-        mock_proc.communicate.assert_called_once()
+        mock_objecttype.assert_called_once_with(object_)
 
-    @mock.patch('subprocess.Popen')
-    def test_isCommit_notAnObject(self, mock_popen):
+    @mock.patch('bin.commands.utils.git.object_type', return_value=None)
+    def test_isCommit_notAnObject(self, mock_objecttype):
 
         # given
         object_ = 'o123'
-        type_ = 'commit\n'
-        mock_proc = mock.Mock()
-        mock_proc.returncode = 1
-        mock_proc.communicate.return_value = [type_]
-        mock_popen.return_value = mock_proc
 
         # when
         is_commit = git.is_commit(object_)
 
         # then
         self.assertFalse(is_commit)
-        mock_popen.assert_called_once_with(['git', 'cat-file', '-t', object_], stdout=PIPE, stderr=mock.ANY)
-        mock_proc.communicate.assert_called_once()
+        mock_objecttype.assert_called_once_with(object_)
 
-    @mock.patch('subprocess.Popen')
-    def test_isCommit_notACommit(self, mock_popen):
+    @mock.patch('bin.commands.utils.git.object_type', return_value='blob')
+    def test_isCommit_notACommit(self, mock_objecttype):
 
         # given
         object_ = 'o123'
-        type_ = 'blog\n'
-        mock_proc = mock.Mock()
-        mock_proc.returncode = 0
-        mock_proc.communicate.return_value = [type_]
-        mock_popen.return_value = mock_proc
 
         # when
         is_commit = git.is_commit(object_)
 
         # then
         self.assertFalse(is_commit)
-        mock_popen.assert_called_once_with(['git', 'cat-file', '-t', object_], stdout=PIPE, stderr=mock.ANY)
-        mock_proc.communicate.assert_called_once()
+        mock_objecttype.assert_called_once_with(object_)
 
     def test_isCommit_notAStr(self):
 
@@ -116,6 +121,69 @@ class TestGit(unittest.TestCase):
         # then
         self.assertEqual(context.exception.message, "'object' must be a str. Given: int")
 
+    @mock.patch('bin.commands.utils.git._batch_check')
+    def test_objectType(self, mock_batchcheck):
+
+        # given
+        object_ = 'o123'
+        mock_batchcheck.query.return_value = ('sha123', 'tree')
+
+        # when
+        object_type = git.object_type(object_)
+
+        # then
+        self.assertEqual(object_type, 'tree')
+        mock_batchcheck.query.assert_called_once_with(object_)
+
+    @mock.patch('bin.commands.utils.git._batch_check')
+    def test_objectType_notAnObject(self, mock_batchcheck):
+
+        # given
+        mock_batchcheck.query.return_value = None
+
+        # when
+        object_type = git.object_type('o123')
+
+        # then
+        self.assertIsNone(object_type)
+
+    @mock.patch('bin.commands.utils.git._batch_check')
+    @mock.patch('subprocess.Popen')
+    def test_objectType_batchCheckUnavailable(self, mock_popen, mock_batchcheck):
+
+        # given
+        object_ = 'o123'
+        mock_batchcheck.query.side_effect = git._BatchCheckUnavailable()
+        mock_proc = mock.Mock()
+        mock_proc.returncode = 0
+        mock_proc.communicate.return_value = ['commit\n']
+        mock_popen.return_value = mock_proc
+
+        # when
+        object_type = git.object_type(object_)
+
+        # then
+        self.assertEqual(object_type, 'commit')
+        mock_popen.assert_called_once_with(['git', 'cat-file', '-t', object_], stdout=PIPE, stderr=mock.ANY)
+        mock_proc.communicate.assert_called_once()
+
+    @mock.patch('bin.commands.utils.git._batch_check')
+    @mock.patch('subprocess.Popen')
+    def test_objectType_batchCheckUnavailable_notAnObject(self, mock_popen, mock_batchcheck):
+
+        # given
+        mock_batchcheck.query.side_effect = git._BatchCheckUnavailable()
+        mock_proc = mock.Mock()
+        mock_proc.returncode = 128
+        mock_proc.communicate.return_value = ['']
+        mock_popen.return_value = mock_proc
+
+        # when
+        object_type = git.object_type('o123')
+
+        # then
+        self.assertIsNone(object_type)
+
     @mock.patch('bin.commands.utils.git.symbolic_ref')
     def test_isDetached(self, mock_symbolicref):
 
@@ -129,8 +197,31 @@ class TestGit(unittest.TestCase):
         self.assertTrue(is_detached)
         mock_symbolicref.assert_called_once()
 
+    @mock.patch('bin.commands.utils.refs.store')
+    def test_symbolicRef(self, mock_store):
+
+        # given
+        mock_store.return_value.symbolic_target.return_value = 'refs/heads/master'
+
+        # when
+        actual_symbolic_ref = git.symbolic_ref('HEAD')
+
+        # then
+        self.assertEqual(actual_symbolic_ref, 'refs/heads/master')
+        mock_store.return_value.symbolic_target.assert_called_once_with('HEAD')
+
+    @mock.patch('bin.commands.utils.refs.store')
+    def test_symbolicRef_detachedHead(self, mock_store):
+
+        # given
+        mock_store.return_value.symbolic_target.return_value = None
+
+        # expect
+        self.assertEqual(git.symbolic_ref('HEAD'), '')
+
+    @mock.patch('bin.commands.utils.refs.store', side_effect=refs.RefsUnavailable)
     @mock.patch('subprocess.Popen')
-    def test_symbolicRef(self, mock_popen):
+    def test_symbolicRef_refsUnavailable(self, mock_popen, mock_store):
 
         # given
         object_ = 'xyz'
@@ -147,8 +238,9 @@ class TestGit(unittest.TestCase):
         mock_popen.assert_called_once_with(['git', 'symbolic-ref', '--quiet', object_], stdout=PIPE, stderr=PIPE)
         mock_proc.communicate.assert_called_once()
 
+    @mock.patch('bin.commands.utils.refs.store', side_effect=refs.RefsUnavailable)
     @mock.patch('subprocess.Popen')
-    def test_symbolicRef_detachedHead(self, mock_popen):
+    def test_symbolicRef_detachedHead_refsUnavailable(self, mock_popen, mock_store):
 
         # given
         object_ = 'xyz'
@@ -164,8 +256,22 @@ class TestGit(unittest.TestCase):
         mock_popen.assert_called_once_with(['git', 'symbolic-ref', '--quiet', object_], stdout=PIPE, stderr=PIPE)
         mock_proc.communicate.assert_called_once()
 
+    @mock.patch('bin.commands.utils.refs.store')
+    def test_isRef(self, mock_store):
+
+        # given
+        mock_store.return_value.matching.return_value = [('refs/tags/o123', 'abc123')]
+
+        # when
+        is_ref = git.is_ref('o123')
+
+        # then
+        self.assertTrue(is_ref)
+        mock_store.return_value.matching.assert_called_once_with('o123')
+
+    @mock.patch('bin.commands.utils.refs.store', side_effect=refs.RefsUnavailable)
     @mock.patch('subprocess.call', return_value=0)
-    def test_isRef(self, mock_call):
+    def test_isRef_refsUnavailable(self, mock_call, mock_store):
 
         # given
         object_ = 'o123'
@@ -186,9 +292,38 @@ class TestGit(unittest.TestCase):
         # then
         self.assertEqual(context.exception.message, "'object' must be a str. Given: int")
 
+    @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
+    @mock.patch('bin.commands.utils.refs.store')
+    def test_isRefAmbiguous(self, mock_store, mock_isref):
+
+        # given
+        mock_store.return_value.matching.return_value = [('refs/heads/ref', 'abc'), ('refs/tags/ref', 'def')]
+
+        # when
+        is_ambiguous = git.is_ref_ambiguous('ref')
+
+        # then
+        self.assertTrue(is_ambiguous)
+        mock_store.return_value.matching.assert_called_once_with('ref', ('refs/',))
+
+    @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
+    @mock.patch('bin.commands.utils.refs.store')
+    def test_isRefAmbiguous_limited(self, mock_store, mock_isref):
+
+        # given
+        mock_store.return_value.matching.return_value = [('refs/heads/ref', 'abc')]
+
+        # when
+        is_ambiguous = git.is_ref_ambiguous('ref', ['heads', 'tags'])
+
+        # then
+        self.assertFalse(is_ambiguous)
+        mock_store.return_value.matching.assert_called_once_with('ref', ('refs/heads/', 'refs/tags/'))
+
+    @mock.patch('bin.commands.utils.refs.store', side_effect=refs.RefsUnavailable)
     @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
     @mock.patch('subprocess.Popen')
-    def test_isRefAmbiguous(self, mock_popen, mock_isref):
+    def test_isRefAmbiguous_refsUnavailable(self, mock_popen, mock_isref, mock_store):
 
         # given
         ref = 'ref'
@@ -206,9 +341,10 @@ class TestGit(unittest.TestCase):
         mock_popen.assert_called_once_with(['git', 'show-ref', ref], stdout=PIPE, stderr=mock.ANY)
         mock_proc.communicate.assert_called_once()
 
+    @mock.patch('bin.commands.utils.refs.store', side_effect=refs.RefsUnavailable)
     @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
     @mock.patch('subprocess.Popen')
-    def test_isRefAmbiguous_notAmbiguous(self, mock_popen, mock_isref):
+    def test_isRefAmbiguous_notAmbiguous_refsUnavailable(self, mock_popen, mock_isref, mock_store):
 
         # given
         ref = 'ref'
@@ -240,9 +376,10 @@ class TestGit(unittest.TestCase):
         self.assertEqual(context.exception.message, "{0!r} is not a ref".format(ref))
         mock_isref.assert_called_once_with(ref)
 
+    @mock.patch('bin.commands.utils.refs.store', side_effect=refs.RefsUnavailable)
     @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
     @mock.patch('subprocess.Popen')
-    def test_isRefAmbiguous_limited_one_asStr(self, mock_popen, mock_isref):
+    def test_isRefAmbiguous_limited_one_asStr_refsUnavailable(self, mock_popen, mock_isref, mock_store):
 
         # given
         ref = 'ref'
@@ -261,9 +398,10 @@ class TestGit(unittest.TestCase):
         mock_popen.assert_called_once_with(['git', 'show-ref', '--heads', ref], stdout=PIPE, stderr=mock.ANY)
         mock_proc.communicate.assert_called_once()
 
+    @mock.patch('bin.commands.utils.refs.store', side_effect=refs.RefsUnavailable)
     @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
     @mock.patch('subprocess.Popen')
-    def test_isRefAmbiguous_limited_one_asList(self, mock_popen, mock_isref):
+    def test_isRefAmbiguous_limited_one_asList_refsUnavailable(self, mock_popen, mock_isref, mock_store):
 
         # given
         ref = 'ref'
@@ -282,9 +420,10 @@ class TestGit(unittest.TestCase):
         mock_popen.assert_called_once_with(['git', 'show-ref', '--heads', ref], stdout=PIPE, stderr=mock.ANY)
         mock_proc.communicate.assert_called_once()
 
+    @mock.patch('bin.commands.utils.refs.store', side_effect=refs.RefsUnavailable)
     @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
     @mock.patch('subprocess.Popen')
-    def test_isRefAmbiguous_limited_many(self, mock_popen, mock_isref):
+    def test_isRefAmbiguous_limited_many_refsUnavailable(self, mock_popen, mock_isref, mock_store):
 
         # given
         ref = 'ref'
@@ -345,47 +484,190 @@ class TestGit(unittest.TestCase):
         self.assertEqual(actual, expected)
         mock_checkoutput.assert_called_once_with(('git', 'rev-parse', '--symbolic-full-name', ref))
 
-    @mock.patch('os.listdir', return_value=['master'])
-    @mock.patch('subprocess.check_output')
-    def test_currentBranch(self, mock_checkoutput, mock_listdir):
+    @mock.patch('bin.commands.utils.refs.store')
+    @mock.patch('bin.commands.utils.git._batch_check')
+    def test_classify(self, mock_batchcheck, mock_store):
 
         # given
-        expected_branch = 'the-branch'
-        mock_checkoutput.return_value = expected_branch
+        mock_store.return_value.matching.return_value = [
+            ('refs/heads/feature/x', 'abc'), ('refs/heads/x', 'abc'), ('refs/tags/x', 'def')
+        ]
+        mock_store.return_value.expand.return_value = ['refs/tags/x', 'refs/heads/x']
+        mock_batchcheck.query.return_value = ('def', 'tag')
+
+        # when
+        classification = git.classify('x')
+
+        # then
+        self.assertEqual(classification.name, 'x')
+        self.assertEqual(classification.sha, 'def')
+        self.assertFalse(classification.is_commit)
+        self.assertTrue(classification.is_ref)
+        self.assertTrue(classification.is_ambiguous)
+        self.assertEqual(classification.refs, {'heads': ['refs/heads/feature/x', 'refs/heads/x'], 'tags': ['refs/tags/x']})
+        self.assertIsNone(classification.symbolic_full_name)
+        mock_store.return_value.matching.assert_called_once_with('x')
+        mock_store.return_value.expand.assert_called_once_with('x')
+        mock_batchcheck.query.assert_called_once_with('x')
+
+    @mock.patch('bin.commands.utils.refs.store')
+    @mock.patch('bin.commands.utils.git._batch_check')
+    def test_classify_singleRef(self, mock_batchcheck, mock_store):
+
+        # given
+        mock_store.return_value.matching.return_value = [('refs/heads/master', 'abc'), ('refs/remotes/origin/master', 'abc')]
+        mock_store.return_value.expand.return_value = ['refs/heads/master']
+        mock_batchcheck.query.return_value = ('abc', 'commit')
+
+        # when
+        classification = git.classify('master')
+
+        # then
+        self.assertTrue(classification.is_commit)
+        self.assertFalse(classification.is_ambiguous)
+        self.assertEqual(classification.symbolic_full_name, 'refs/heads/master')
+
+    @mock.patch('bin.commands.utils.refs.store')
+    @mock.patch('bin.commands.utils.git._batch_check')
+    def test_classify_notAnObject(self, mock_batchcheck, mock_store):
+
+        # given
+        mock_store.return_value.matching.return_value = []
+        mock_store.return_value.expand.return_value = []
+        mock_batchcheck.query.return_value = None
+
+        # when
+        classification = git.classify('nope')
+
+        # then
+        self.assertEqual(classification, git.Classification('nope', None, None, {}, None))
+        self.assertFalse(classification.is_commit)
+        self.assertFalse(classification.is_ref)
+
+    @mock.patch('bin.commands.utils.refs.store', side_effect=refs.RefsUnavailable)
+    @mock.patch('bin.commands.utils.git._batch_check')
+    @mock.patch('subprocess.Popen')
+    def test_classify_refsUnavailable(self, mock_popen, mock_batchcheck, mock_store):
+
+        # given
+        show_ref_proc = mock.Mock()
+        show_ref_proc.communicate.return_value = ['abc refs/heads/master\nabc refs/remotes/origin/master\n', None]
+        rev_parse_proc = mock.Mock(returncode=0)
+        rev_parse_proc.communicate.return_value = ['refs/heads/master\n', None]
+        mock_popen.side_effect = [show_ref_proc, rev_parse_proc]
+        mock_batchcheck.query.return_value = ('abc', 'commit')
+
+        # when
+        classification = git.classify('master')
+
+        # then
+        self.assertEqual(classification.refs, {'heads': ['refs/heads/master'], 'remotes': ['refs/remotes/origin/master']})
+        self.assertEqual(classification.symbolic_full_name, 'refs/heads/master')
+        mock_popen.assert_has_calls([
+            mock.call(['git', 'show-ref', 'master'], stdout=PIPE, stderr=mock.ANY),
+            mock.call(['git', 'rev-parse', '--symbolic-full-name', 'master'], stdout=PIPE, stderr=mock.ANY)
+        ], any_order=True)
+
+    @mock.patch('bin.commands.utils.refs.store')
+    @mock.patch('bin.commands.utils.git._batch_check')
+    @mock.patch('bin.commands.utils.git.resolve_sha1', return_value='abc')
+    @mock.patch('bin.commands.utils.git.object_type', return_value='commit')
+    def test_classify_batchCheckUnavailable(self, mock_objecttype, mock_resolvesha1, mock_batchcheck, mock_store):
+
+        # given
+        mock_store.return_value.matching.return_value = []
+        mock_store.return_value.expand.return_value = []
+        mock_batchcheck.query.side_effect = git._BatchCheckUnavailable
+
+        # when
+        classification = git.classify('HEAD~1')
+
+        # then
+        self.assertEqual(classification.sha, 'abc')
+        self.assertTrue(classification.is_commit)
+        mock_resolvesha1.assert_called_once_with('HEAD~1')
+        mock_objecttype.assert_called_once_with('abc')
+
+    def test_classify_notAStr(self):
+
+        # when
+        with self.assertRaises(AssertionError) as context:
+            git.classify(1)
+
+        # then
+        self.assertEqual(context.exception.message, "'name' must be a str. Given: int")
+
+    @mock.patch('bin.commands.utils.refs.store')
+    def test_currentBranch(self, mock_store):
+
+        # given
+        mock_store.return_value.has_branches.return_value = True
+        mock_store.return_value.symbolic_target.return_value = 'refs/heads/the-branch'
+        mock_store.return_value.shorten.return_value = 'the-branch'
 
         # when
         current_branch = git.current_branch()
 
         # then
-        self.assertEqual(current_branch, expected_branch)
-        mock_listdir.assert_called_once_with('.git/refs/heads')
-        mock_checkoutput.assert_called_once_with(('git', 'rev-parse', '--abbrev-ref', 'HEAD'))
+        self.assertEqual(current_branch, 'the-branch')
+        mock_store.return_value.symbolic_target.assert_called_once_with('HEAD')
+        mock_store.return_value.shorten.assert_called_once_with('refs/heads/the-branch')
+
+    @mock.patch('bin.commands.utils.refs.store')
+    def test_currentBranch_detached(self, mock_store):
+
+        # given
+        mock_store.return_value.has_branches.return_value = True
+        mock_store.return_value.symbolic_target.return_value = None
+
+        # when
+        current_branch = git.current_branch()
+
+        # then
+        self.assertEqual(current_branch, 'HEAD')
+        mock_store.return_value.shorten.assert_not_called()
+
+    @mock.patch('bin.commands.utils.refs.store')
+    def test_currentBranch_noHeads(self, mock_store):
+
+        # given
+        mock_store.return_value.has_branches.return_value = False
+
+        # when
+        current_branch = git.current_branch()
 
-    @mock.patch('os.listdir', return_value=['master'])
+        # then
+        self.assertIsNone(current_branch)
+        mock_store.return_value.symbolic_target.assert_not_called()
+
+    @mock.patch('bin.commands.utils.refs.store', side_effect=refs.RefsUnavailable)
     @mock.patch('subprocess.check_output')
-    def test_currentBranch_withTrailingWhitespace(self, mock_checkoutput, mock_listdir):
+    def test_currentBranch_refsUnavailable(self, mock_checkoutput, mock_store):
 
         # given
         expected_branch = 'the-branch'
-        mock_checkoutput.return_value = expected_branch + '   '
+        mock_checkoutput.side_effect = ['abc123 commit\trefs/heads/master\n', expected_branch + '   ']
 
         # when
         current_branch = git.current_branch()
 
         # then
         self.assertEqual(current_branch, expected_branch)
-        mock_listdir.assert_called_once_with('.git/refs/heads')
-        mock_checkoutput.assert_called_once_with(('git', 'rev-parse', '--abbrev-ref', 'HEAD'))
+        mock_checkoutput.assert_has_calls([
+            mock.call(('git', 'for-each-ref', '--count=1', 'refs/heads')),
+            mock.call(('git', 'rev-parse', '--abbrev-ref', 'HEAD'))
+        ])
 
-    @mock.patch('os.listdir', return_value=[])
-    def test_currentBranch_noHeads(self, mock_listdir):
+    @mock.patch('bin.commands.utils.refs.store', side_effect=refs.RefsUnavailable)
+    @mock.patch('subprocess.check_output', return_value='')
+    def test_currentBranch_refsUnavailable_noHeads(self, mock_checkoutput, mock_store):
 
         # when
         current_branch = git.current_branch()
 
         # then
-        self.assertFalse(current_branch)
-        mock_listdir.assert_called_once_with('.git/refs/heads')
+        self.assertIsNone(current_branch)
+        mock_checkoutput.assert_called_once_with(('git', 'for-each-ref', '--count=1', 'refs/heads'))
 
     @mock.patch('subprocess.check_output')
     def test_deletedFiles(self, mock_checkoutput):
@@ -423,12 +705,41 @@ MM modified.txt
         mock_popen.assert_called_once_with(['git', 'log', '--oneline', '-1'], stdout=mock.ANY, stderr=mock.ANY)
         mock_proc.wait.assert_called_once()
 
+    @mock.patch('bin.commands.utils.git._batch_check')
+    def test_resolveSha1(self, mock_batchcheck):
+
+        # given
+        revision = 'abc123'
+        expected = revision * 2
+        mock_batchcheck.query.return_value = (expected, 'commit')
+
+        # when
+        actual = git.resolve_sha1(revision)
+
+        # then
+        self.assertEqual(actual, expected)
+        mock_batchcheck.query.assert_called_once_with(revision)
+
+    @mock.patch('bin.commands.utils.git._batch_check')
+    def test_resolveSha1_invalid(self, mock_batchcheck):
+
+        # given
+        mock_batchcheck.query.return_value = None
+
+        # when
+        actual = git.resolve_sha1('abc123')
+
+        # then
+        self.assertIsNone(actual)
+
+    @mock.patch('bin.commands.utils.git._batch_check')
     @mock.patch('subprocess.Popen')
-    def test_resolveSha1(self, mock_popen):
+    def test_resolveSha1_batchCheckUnavailable(self, mock_popen, mock_batchcheck):
 
         # given
         revision = 'abc123'
         expected = revision * 2
+        mock_batchcheck.query.side_effect = git._BatchCheckUnavailable()
         mock_proc = mock.Mock()
         mock_proc.communicate.return_value = [expected + '\n', None]
         mock_popen.return_value = mock_proc
@@ -441,11 +752,13 @@ MM modified.txt
         mock_popen.assert_called_once_with(['git', 'rev-parse', '--verify', '--quiet', revision], stdout=PIPE)
         mock_proc.communicate.assert_called_once()
 
+    @mock.patch('bin.commands.utils.git._batch_check')
     @mock.patch('subprocess.Popen')
-    def test_resolveSha1_invalid(self, mock_popen):
+    def test_resolveSha1_batchCheckUnavailable_invalid(self, mock_popen, mock_batchcheck):
 
         # given
         revision = 'abc123'
+        mock_batchcheck.query.side_effect = git._BatchCheckUnavailable()
         mock_proc = mock.Mock()
         mock_proc.communicate.return_value = ['\n', None]
         mock_popen.return_value = mock_proc
@@ -535,15 +848,13 @@ MM modified.txt
         # )
 
     @mock.patch('bin.commands.utils.git.validate_config')
-    @mock.patch('subprocess.Popen')
-    def test_getConfigValue(self, mock_popen, mock_validateconfig):
+    @mock.patch('bin.commands.utils.gitconfig.get')
+    def test_getConfigValue(self, mock_get, mock_validateconfig):
 
         # given
         key = 'the key'
         value = 'the value'
-        mock_process = mock.Mock()
-        mock_popen.return_value = mock_process
-        mock_process.communicate.return_value = (value + os.linesep, None)
+        mock_get.return_value = value + os.linesep
 
         # when
         actual_value = git.get_config_value(key)
@@ -552,20 +863,17 @@ MM modified.txt
         self.assertEqual(actual_value, value)
 
         mock_validateconfig.assert_called_once()
-        mock_popen.assert_called_with(('git', 'config', key), stdout=PIPE, stderr=STDOUT)
-        mock_process.communicate.assert_called_once()
+        mock_get.assert_called_once_with(key, config=None, file_=None)
 
     @mock.patch('bin.commands.utils.git.validate_config')
-    @mock.patch('subprocess.Popen')
-    def test_getConfigValue_withDefault_noValueSoUseDefault(self, mock_popen, mock_validateconfig):
+    @mock.patch('bin.commands.utils.gitconfig.get')
+    def test_getConfigValue_withDefault_noValueSoUseDefault(self, mock_get, mock_validateconfig):
 
         # given
         key = 'the key'
         value = ''
         default = 'the default'
-        mock_process = mock.Mock()
-        mock_popen.return_value = mock_process
-        mock_process.communicate.return_value = (value + os.linesep, None)
+        mock_get.return_value = value + os.linesep
 
         # when
         actual_value = git.get_config_value(key, default=default)
@@ -574,19 +882,16 @@ MM modified.txt
         self.assertEqual(actual_value, default)
 
         mock_validateconfig.assert_called_once()
-        mock_popen.assert_called_with(('git', 'config', key), stdout=PIPE, stderr=STDOUT)
-        mock_process.communicate.assert_called_once()
+        mock_get.assert_called_once_with(key, config=None, file_=None)
 
     @mock.patch('bin.commands.utils.git.validate_config')
-    @mock.patch('subprocess.Popen')
-    def test_getConfigValue_withDefault_hasValueSoIgnoreDefault(self, mock_popen, mock_validateconfig):
+    @mock.patch('bin.commands.utils.gitconfig.get')
+    def test_getConfigValue_withDefault_hasValueSoIgnoreDefault(self, mock_get, mock_validateconfig):
 
         # given
         key = 'the key'
         value = 'the value'
-        mock_process = mock.Mock()
-        mock_popen.return_value = mock_process
-        mock_process.communicate.return_value = (value + os.linesep, None)
+        mock_get.return_value = value + os.linesep
 
         # when
         actual_value = git.get_config_value(key, default='the default')
@@ -595,19 +900,16 @@ MM modified.txt
         self.assertEqual(actual_value, value)
 
         mock_validateconfig.assert_called_once()
-        mock_popen.assert_called_with(('git', 'config', key), stdout=PIPE, stderr=STDOUT)
-        mock_process.communicate.assert_called_once()
+        mock_get.assert_called_once_with(key, config=None, file_=None)
 
     @mock.patch('bin.commands.utils.git.validate_config')
-    @mock.patch('subprocess.Popen')
-    def test_getConfigValue_withConfig(self, mock_popen, mock_validateconfig):
+    @mock.patch('bin.commands.utils.gitconfig.get')
+    def test_getConfigValue_withConfig(self, mock_get, mock_validateconfig):
 
         # given
         key = 'the key'
         value = 'the value'
-        mock_process = mock.Mock()
-        mock_popen.return_value = mock_process
-        mock_process.communicate.return_value = (value + os.linesep, None)
+        mock_get.return_value = value + os.linesep
 
         # when
         actual_value = git.get_config_value(key, config='global')
@@ -616,20 +918,17 @@ MM modified.txt
         self.assertEqual(actual_value, value)
 
         mock_validateconfig.assert_called_once()
-        mock_popen.assert_called_with(('git', 'config', '--global', key), stdout=PIPE, stderr=STDOUT)
-        mock_process.communicate.assert_called_once()
+        mock_get.assert_called_once_with(key, config='global', file_=None)
 
     @mock.patch('bin.commands.utils.git.validate_config')
-    @mock.patch('subprocess.Popen')
-    def test_getConfigValue_withFile(self, mock_popen, mock_validateconfig):
+    @mock.patch('bin.commands.utils.gitconfig.get')
+    def test_getConfigValue_withFile(self, mock_get, mock_validateconfig):
 
         # given
         key = 'the key'
         value = 'the value'
         file_path = '/path/to/config'
-        mock_process = mock.Mock()
-        mock_popen.return_value = mock_process
-        mock_process.communicate.return_value = (value + os.linesep, None)
+        mock_get.return_value = value + os.linesep
 
         # when
         actual_value = git.get_config_value(key, config='file', file_=file_path)
@@ -638,19 +937,16 @@ MM modified.txt
         self.assertEqual(actual_value, value)
 
         mock_validateconfig.assert_called_once()
-        mock_popen.assert_called_with(('git', 'config', '--file', file_path, key), stdout=PIPE, stderr=STDOUT)
-        mock_process.communicate.assert_called_once()
+        mock_get.assert_called_once_with(key, config='file', file_=file_path)
 
     @mock.patch('bin.commands.utils.git.validate_config')
-    @mock.patch('subprocess.Popen')
-    def test_getConfigValue_asType_hasCall(self, mock_popen, mock_validateconfig):
+    @mock.patch('bin.commands.utils.gitconfig.get')
+    def test_getConfigValue_asType_hasCall(self, mock_get, mock_validateconfig):
 
         # given
         key = 'the key'
         value = 'the value'
-        mock_process = mock.Mock()
-        mock_popen.return_value = mock_process
-        mock_process.communicate.return_value = (value + os.linesep, None)
+        mock_get.return_value = value + os.linesep
 
         # when
         actual_value = git.get_config_value(key, as_type=str)
@@ -659,20 +955,17 @@ MM modified.txt
         self.assertEqual(actual_value, value)
 
         mock_validateconfig.assert_called_once()
-        mock_popen.assert_called_with(('git', 'config', key), stdout=PIPE, stderr=STDOUT)
-        mock_process.communicate.assert_called_once()
+        mock_get.assert_called_once_with(key, config=None, file_=None)
 
     @mock.patch('bin.commands.utils.git.validate_config')
-    @mock.patch('subprocess.Popen')
-    def test_getConfigValue_asType_hasBases(self, mock_popen, mock_validateconfig):
+    @mock.patch('bin.commands.utils.gitconfig.get')
+    def test_getConfigValue_asType_hasBases(self, mock_get, mock_validateconfig):
 
         # given
         key = 'the key'
         value = 'the value'
         as_type = collections.namedtuple('AsType', ['v'])
-        mock_process = mock.Mock()
-        mock_popen.return_value = mock_process
-        mock_process.communicate.return_value = (value + os.linesep, None)
+        mock_get.return_value = value + os.linesep
 
         # when
         actual_value = git.get_config_value(key, as_type=as_type)
@@ -682,21 +975,18 @@ MM modified.txt
         self.assertEqual(actual_value.v, value)
 
         mock_validateconfig.assert_called_once()
-        mock_popen.assert_called_with(('git', 'config', key), stdout=PIPE, stderr=STDOUT)
-        mock_process.communicate.assert_called_once()
+        mock_get.assert_called_once_with(key, config=None, file_=None)
 
     @mock.patch('bin.commands.utils.git.validate_config')
-    @mock.patch('subprocess.Popen')
+    @mock.patch('bin.commands.utils.gitconfig.get')
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
-    def test_getConfigValue_asType_throwsException(self, mock_error, mock_popen, mock_validateconfig):
+    def test_getConfigValue_asType_throwsException(self, mock_error, mock_get, mock_validateconfig):
 
         # given
         key = 'the key'
         value = 'the value'
         as_type = TestGit
-        mock_process = mock.Mock()
-        mock_popen.return_value = mock_process
-        mock_process.communicate.return_value = (value + os.linesep, None)
+        mock_get.return_value = value + os.linesep
 
         # when
         try:
@@ -707,12 +997,44 @@ MM modified.txt
 
         # then
         mock_validateconfig.assert_called_once()
-        mock_popen.assert_called_with(('git', 'config', key), stdout=PIPE, stderr=STDOUT)
-        mock_process.communicate.assert_called_once()
+        mock_get.assert_called_once_with(key, config=None, file_=None)
         mock_error.assert_called_once_with(
             'Cannot parse value {0!r} for key {1!r} using format {2!r}'.format(value, key, as_type.__name__)
         )
 
+    @mock.patch('bin.commands.utils.git.validate_config')
+    @mock.patch('bin.commands.utils.gitconfig.get', return_value=None)
+    def test_getConfigValue_notSet(self, mock_get, mock_validateconfig):
+
+        # when
+        actual_value = git.get_config_value('the key', default='the default')
+
+        # then
+        self.assertEqual(actual_value, 'the default')
+
+    @mock.patch('bin.commands.utils.git.validate_config')
+    @mock.patch('bin.commands.utils.gitconfig.get')
+    @mock.patch('subprocess.Popen')
+    def test_getConfigValue_configUnavailable(self, mock_popen, mock_get, mock_validateconfig):
+
+        # given
+        key = 'the key'
+        value = 'the value'
+        mock_get.side_effect = gitconfig.ConfigUnavailable()
+        mock_process = mock.Mock()
+        mock_popen.return_value = mock_process
+        mock_process.communicate.return_value = (value + os.linesep, None)
+
+        # when
+        actual_value = git.get_config_value(key, config='global')
+
+        # then
+        self.assertEqual(actual_value, value)
+
+        mock_get.assert_called_once_with(key, config='global', file_=None)
+        mock_popen.assert_called_with(('git', 'config', '--global', key), stdout=PIPE, stderr=STDOUT)
+        mock_process.communicate.assert_called_once()
+
     @mock.patch('bin.commands.utils.git.validate_config')
     def test_getConfigValue_asType_notCallable(self, mock_validateconfig):
 
@@ -729,3 +1051,162 @@ MM modified.txt
             self.assertEqual(e.message, '{} is not callable'.format(as_type))
 
         mock_validateconfig.assert_called_once()
+
+
+class TestBatchCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.batch_check = git._BatchCheck()
+        self.getcwd_patcher = mock.patch('os.getcwd', return_value='/working/dir')
+        self.getcwd_patcher.start()
+
+    def tearDown(self):
+        self.getcwd_patcher.stop()
+
+    def _mock_process(self, mock_popen, *responses):
+        mock_proc = mock.Mock()
+        mock_proc.poll.return_value = None
+        mock_proc.stdin.fileno.return_value = 10
+        mock_proc.stdout.fileno.return_value = 11
+        mock_proc.stdout.readline.side_effect = list(responses)
+        mock_popen.return_value = mock_proc
+        return mock_proc
+
+    @mock.patch('fcntl.fcntl', return_value=0)
+    @mock.patch('subprocess.Popen')
+    def test_query(self, mock_popen, mock_fcntl):
+
+        # given
+        mock_proc = self._mock_process(mock_popen, 'abc123 commit 250\n')
+
+        # when
+        object_info = self.batch_check.query('HEAD')
+
+        # then
+        self.assertEqual(object_info, ('abc123', 'commit'))
+        mock_popen.assert_called_once_with(['git', 'cat-file', '--batch-check'], stdin=PIPE, stdout=PIPE, stderr=mock.ANY)
+        mock_proc.stdin.write.assert_called_once_with('HEAD\n')
+        mock_proc.stdin.flush.assert_called_once_with()
+
+    @mock.patch('fcntl.fcntl', return_value=0)
+    @mock.patch('subprocess.Popen')
+    def test_query_missing(self, mock_popen, mock_fcntl):
+
+        # given
+        self._mock_process(mock_popen, 'nope missing\n')
+
+        # when
+        object_info = self.batch_check.query('nope')
+
+        # then
+        self.assertIsNone(object_info)
+
+    @mock.patch('fcntl.fcntl', return_value=0)
+    @mock.patch('subprocess.Popen')
+    def test_query_missingWithSpace(self, mock_popen, mock_fcntl):
+
+        # given
+        self._mock_process(mock_popen, 'HEAD:a b missing\n')
+
+        # when
+        object_info = self.batch_check.query('HEAD:a b')
+
+        # then
+        self.assertIsNone(object_info)
+
+    @mock.patch('fcntl.fcntl', return_value=0)
+    @mock.patch('subprocess.Popen')
+    def test_query_ambiguous(self, mock_popen, mock_fcntl):
+
+        # given
+        self._mock_process(mock_popen, 'abc ambiguous\n')
+
+        # when
+        object_info = self.batch_check.query('abc')
+
+        # then
+        self.assertIsNone(object_info)
+
+    @mock.patch('fcntl.fcntl', return_value=0)
+    @mock.patch('subprocess.Popen')
+    def test_query_reusesProcess(self, mock_popen, mock_fcntl):
+
+        # given
+        mock_proc = self._mock_process(mock_popen, 'abc123 commit 250\n', 'def456 tree 32\n')
+
+        # when
+        first = self.batch_check.query('HEAD')
+        second = self.batch_check.query('HEAD^{tree}')
+
+        # then
+        self.assertEqual(first, ('abc123', 'commit'))
+        self.assertEqual(second, ('def456', 'tree'))
+        mock_popen.assert_called_once()
+        mock_proc.stdin.write.assert_has_calls([mock.call('HEAD\n'), mock.call('HEAD^{tree}\n')])
+
+    @mock.patch('fcntl.fcntl', return_value=0)
+    @mock.patch('subprocess.Popen')
+    def test_query_restartsWhenDirectoryChanges(self, mock_popen, mock_fcntl):
+
+        # given
+        mock_proc = self._mock_process(mock_popen, 'abc123 commit 250\n', 'def456 commit 250\n')
+
+        # when
+        with mock.patch('os.getcwd', return_value='/one'):
+            self.batch_check.query('HEAD')
+        with mock.patch('os.getcwd', return_value='/two'):
+            self.batch_check.query('HEAD')
+
+        # then
+        self.assertEqual(mock_popen.call_count, 2)
+        mock_proc.stdin.close.assert_called_once_with()
+        mock_proc.wait.assert_called_once_with()
+
+    @mock.patch('subprocess.Popen', side_effect=OSError())
+    def test_query_cannotStart(self, mock_popen):
+
+        # when
+        with self.assertRaises(git._BatchCheckUnavailable):
+            self.batch_check.query('HEAD')
+
+    @mock.patch('fcntl.fcntl', return_value=0)
+    @mock.patch('subprocess.Popen')
+    def test_query_processDied(self, mock_popen, mock_fcntl):
+
+        # given
+        mock_proc = self._mock_process(mock_popen)
+        mock_proc.stdin.write.side_effect = IOError()
+
+        # when
+        with self.assertRaises(git._BatchCheckUnavailable):
+            self.batch_check.query('HEAD')
+
+        # then
+        mock_proc.wait.assert_called_once_with()
+
+    @mock.patch('subprocess.Popen')
+    def test_query_unsupportedName(self, mock_popen):
+
+        # when
+        for name in ('', 'two\nlines', ' padded'):
+            with self.assertRaises(git._BatchCheckUnavailable):
+                self.batch_check.query(name)
+
+        # then
+        mock_popen.assert_not_called()
+
+    @mock.patch('subprocess.Popen')
+    def test_query_workingDirectoryRemoved(self, mock_popen):
+
+        # when
+        with mock.patch('os.getcwd', side_effect=OSError()):
+            with self.assertRaises(git._BatchCheckUnavailable):
+                self.batch_check.query('HEAD')
+
+        # then
+        mock_popen.assert_not_called()
+
+    def test_close_notStarted(self):
+
+        # expect no errors
+        self.batch_check.close()
@@ -0,0 +1,32 @@
+import unittest
+
+from bin.commands.utils import gitcolor
+
+
+class TestGitColorParse(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(gitcolor.parse('red'), '\x1b[31m')
+        self.assertEqual(gitcolor.parse('bold red'), '\x1b[1;31m')
+        self.assertEqual(gitcolor.parse('red bold blue'), '\x1b[1;31;44m')
+        self.assertEqual(gitcolor.parse('brightgreen'), '\x1b[92m')
+        self.assertEqual(gitcolor.parse('default'), '\x1b[39m')
+        self.assertEqual(gitcolor.parse('7 8'), '\x1b[37;100m')
+        self.assertEqual(gitcolor.parse('208'), '\x1b[38;5;208m')
+        self.assertEqual(gitcolor.parse('ul #ff0000 blue'), '\x1b[4;38;2;255;0;0;44m')
+        self.assertEqual(gitcolor.parse('normal red'), '\x1b[41m')
+        self.assertEqual(gitcolor.parse('no-ul reverse nobold'), '\x1b[7;22;24m')
+        self.assertEqual(gitcolor.parse('reset red'), '\x1b[;31m')
+
+    def test_parse_empty(self):
+        self.assertEqual(gitcolor.parse(''), '')
+        self.assertEqual(gitcolor.parse('normal'), '')
+
+    def test_parse_invalid(self):
+        for value in ('Red', 'red green blue', '256', '#12345', 'bright', 'ital'):
+            with self.assertRaises(gitcolor.InvalidColor):
+                gitcolor.parse(value)
+
+    def test_colorize(self):
+        self.assertEqual(gitcolor.colorize('text', '\x1b[31m'), '\x1b[31mtext\x1b[m')
+        self.assertEqual(gitcolor.colorize('text', ''), 'text')
@@ -0,0 +1,265 @@
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+
+from bin.commands.utils import gitconfig
+
+
+class TestGitConfigParse(unittest.TestCase):
+
+    def test_parse(self):
+
+        # given
+        contents = """# a comment
+[core]
+    bare = false
+[alpha "Sub.Sec"]
+    Key = value with   spaces  ; trailing comment
+"""
+
+        # when
+        entries = gitconfig._parse(contents)
+
+        # then
+        self.assertEqual(entries, [('core.bare', 'false'), ('alpha.Sub.Sec.key', 'value with   spaces')])
+
+    def test_parse_quotesAndEscapes(self):
+
+        # given
+        contents = '[a]\n    quoted = "  padded ; not a comment "\n    escaped = one\\ttwo\\\\three\\"four\\n\n'
+
+        # when
+        entries = gitconfig._parse(contents)
+
+        # then
+        self.assertEqual(entries, [('a.quoted', '  padded ; not a comment '), ('a.escaped', 'one\ttwo\\three"four\n')])
+
+    def test_parse_lineContinuation(self):
+
+        # when
+        entries = gitconfig._parse('[a]\n    b = one \\\ntwo\n')
+
+        # then
+        self.assertEqual(entries, [('a.b', 'one two')])
+
+    def test_parse_keyWithoutValue(self):
+
+        # when
+        entries = gitconfig._parse('[a]\n    b\n    c =\n')
+
+        # then
+        self.assertEqual(entries, [('a.b', None), ('a.c', '')])
+
+    def test_parse_deprecatedSubsectionSyntax(self):
+
+        # when
+        entries = gitconfig._parse('[Section.SubSection]\n    key = value\n')
+
+        # then
+        self.assertEqual(entries, [('section.subsection.key', 'value')])
+
+    def test_parse_entryOnHeaderLine(self):
+
+        # when
+        entries = gitconfig._parse('[a] b = c\n')
+
+        # then
+        self.assertEqual(entries, [('a.b', 'c')])
+
+    def test_parse_escapedSubsection(self):
+
+        # when
+        entries = gitconfig._parse('[a "b\\"c\\\\d"]\n    e = f\n')
+
+        # then
+        self.assertEqual(entries, [('a.b"c\\d.e', 'f')])
+
+    def test_parse_windowsLineEndings(self):
+
+        # when
+        entries = gitconfig._parse('[a]\r\n    b = c\r\n')
+
+        # then
+        self.assertEqual(entries, [('a.b', 'c')])
+
+    def test_parse_malformed(self):
+
+        for contents in ('[a\n', 'b = c\n', '[a]\n    b = "c\n', '[a]\n    b = \\q\n', '[a]\n    b c\n'):
+            with self.assertRaises(gitconfig.ConfigUnavailable):
+                gitconfig._parse(contents)
+
+
+class TestGitConfigCanonicalKey(unittest.TestCase):
+
+    def test_canonicalKey(self):
+        self.assertEqual(gitconfig.canonical_key('Section.Sub.Section.Key'), 'section.Sub.Section.key')
+
+    def test_canonicalKey_noSubsection(self):
+        self.assertEqual(gitconfig.canonical_key('Section.Key'), 'section.key')
+
+    def test_canonicalKey_invalid(self):
+        self.assertIsNone(gitconfig.canonical_key('nosection'))
+        self.assertIsNone(gitconfig.canonical_key('section.'))
+        self.assertIsNone(gitconfig.canonical_key('.key'))
+
+
+class TestGitConfigWildmatch(unittest.TestCase):
+
+    def test_wildmatch(self):
+        self.assertTrue(gitconfig._wildmatch('**/work/**', '/home/me/work/project/.git'))
+        self.assertTrue(gitconfig._wildmatch('/home/*/work/**', '/home/me/work/project/.git'))
+        self.assertFalse(gitconfig._wildmatch('/home/*/work/**', '/home/me/other/work/project/.git'))
+        self.assertTrue(gitconfig._wildmatch('feature/**', 'feature/a/b'))
+        self.assertTrue(gitconfig._wildmatch('ma?ter', 'master'))
+        self.assertTrue(gitconfig._wildmatch('[!x]aster', 'master'))
+        self.assertFalse(gitconfig._wildmatch('ma*', 'MASTER'))
+        self.assertTrue(gitconfig._wildmatch('ma*', 'MASTER', ignore_case=True))
+
+
+class TestGitConfigGet(unittest.TestCase):
+
+    def setUp(self):
+        self.dirpath = os.path.realpath(tempfile.mkdtemp())
+        self.home = os.path.join(self.dirpath, 'home')
+        self.repo = os.path.join(self.dirpath, 'repo')
+        os.makedirs(self.home)
+        os.makedirs(os.path.join(self.repo, '.git', 'objects'))
+        self._write(os.path.join(self.repo, '.git', 'HEAD'), 'ref: refs/heads/master\n')
+        self._write(os.path.join(self.repo, '.git', 'config'), '[core]\n    bare = false\n')
+
+        self.environ_patcher = mock.patch.dict('os.environ', {'HOME': self.home, 'GIT_CONFIG_NOSYSTEM': '1'})
+        self.environ_patcher.start()
+        for name in [name for name in os.environ if name.startswith('GIT_') and name != 'GIT_CONFIG_NOSYSTEM']:
+            del os.environ[name]
+        os.environ.pop('XDG_CONFIG_HOME', None)
+        os.chdir(self.repo)
+
+    def tearDown(self):
+        self.environ_patcher.stop()
+        shutil.rmtree(self.dirpath)
+
+    def _write(self, path, contents, mode='w'):
+        with open(path, mode) as config_file:
+            config_file.write(contents)
+
+    def test_get_precedence(self):
+
+        # given
+        self._write(os.path.join(self.home, '.gitconfig'), '[a]\n    b = global\n    c = global\n')
+        self._write(os.path.join(self.repo, '.git', 'config'), '[a]\n    b = local\n', mode='a')
+
+        # expect
+        self.assertEqual(gitconfig.get('a.b'), 'local')
+        self.assertEqual(gitconfig.get('A.C'), 'global')
+        self.assertEqual(gitconfig.get('a.b', config='global'), 'global')
+        self.assertEqual(gitconfig.get('a.b', config='local'), 'local')
+        self.assertEqual(gitconfig.get_all('a.b'), ['global', 'local'])
+        self.assertIsNone(gitconfig.get('a.missing'))
+
+    def test_get_fromSubdirectory(self):
+
+        # given
+        subdirectory = os.path.join(self.repo, 'sub', 'dir')
+        os.makedirs(subdirectory)
+        os.chdir(subdirectory)
+
+        # expect
+        self.assertEqual(gitconfig.get('core.bare'), 'false')
+
+    def test_get_outsideOfRepository(self):
+
+        # given
+        os.chdir(self.home)
+
+        # expect
+        self.assertIsNone(gitconfig.get('core.bare'))
+
+    def test_get_file(self):
+
+        # given
+        config_path = os.path.join(self.dirpath, 'custom')
+        self._write(config_path, '[a]\n    b = custom\n')
+
+        # expect
+        self.assertEqual(gitconfig.get('a.b', config='file', file_=config_path), 'custom')
+
+    def test_get_gitConfigEnvironment(self):
+
+        # given
+        config_path = os.path.join(self.dirpath, 'custom')
+        self._write(config_path, '[a]\n    b = custom\n')
+        os.environ['GIT_CONFIG'] = config_path
+
+        # expect
+        self.assertEqual(gitconfig.get('a.b'), 'custom')
+        self.assertIsNone(gitconfig.get('core.bare'))
+
+    def test_get_commandLine(self):
+
+        # given
+        os.environ['GIT_CONFIG_PARAMETERS'] = "'A.B=from command line' 'a.flag'"
+
+        # expect
+        self.assertEqual(gitconfig.get('a.b'), 'from command line')
+        self.assertEqual(gitconfig.get('a.flag'), '')
+
+    def test_get_reloadsChangedFiles(self):
+
+        # given
+        self.assertEqual(gitconfig.get('core.bare'), 'false')
+        self._write(os.path.join(self.repo, '.git', 'config'), '[core]\n    bare = true\n    other = value\n')
+
+        # expect
+        self.assertEqual(gitconfig.get('core.bare'), 'true')
+
+    def test_get_includes(self):
+
+        # given
+        self._write(os.path.join(self.home, 'included'), '[a]\n    b = included\n')
+        self._write(os.path.join(self.home, 'conditional'), '[a]\n    c = conditional\n')
+        self._write(os.path.join(self.home, 'branch'), '[a]\n    d = branch\n')
+        self._write(os.path.join(self.home, 'never'), '[a]\n    e = never\n')
+        self._write(os.path.join(self.home, '.gitconfig'), """[include]
+    path = included
+[includeIf "gitdir:repo/"]
+    path = conditional
+[includeIf "onbranch:mast*"]
+    path = branch
+[includeIf "gitdir:/elsewhere/"]
+    path = never
+""")
+
+        # expect
+        self.assertEqual(gitconfig.get('a.b'), 'included')
+        self.assertEqual(gitconfig.get('a.c'), 'conditional')
+        self.assertEqual(gitconfig.get('a.d'), 'branch')
+        self.assertIsNone(gitconfig.get('a.e'))
+        self.assertIsNone(gitconfig.get('a.b', config='global'))
+
+    def test_get_unsupportedIncludeCondition(self):
+
+        # given
+        self._write(os.path.join(self.home, '.gitconfig'), '[includeIf "hasconfig:remote.*.url:x"]\n    path = x\n')
+
+        # expect
+        with self.assertRaises(gitconfig.ConfigUnavailable):
+            gitconfig.get('a.b')
+
+    def test_get_invalidKey(self):
+
+        # expect
+        with self.assertRaises(gitconfig.ConfigUnavailable):
+            gitconfig.get('nosection')
+
+    def test_getRegexp(self):
+
+        # given
+        self._write(os.path.join(self.repo, '.git', 'config'), '[a "x"]\n    b = 1\n[a "y"]\n    b = 2\n', mode='a')
+
+        # when
+        entries = gitconfig.get_regexp('^a\\.')
+
+        # then
+        self.assertEqual(entries, [('a.x.b', '1'), ('a.y.b', '2')])
@@ -0,0 +1,149 @@
+import threading
+import time
+import unittest
+
+from bin.commands.utils import parallel
+
+
+class TestParallelCallAll(unittest.TestCase):
+
+    def test_callAll(self):
+
+        # when
+        results = parallel.call_all([lambda: 1, lambda: 2, lambda: 3], 2)
+
+        # then
+        self.assertEqual(results, [1, 2, 3])
+
+    def test_callAll_empty(self):
+        self.assertEqual(parallel.call_all([], 4), [])
+
+    def test_callAll_runsConcurrently(self):
+
+        # given: each function waits for the other so running them one at a time would time out
+        first, second = threading.Event(), threading.Event()
+
+        def wait_for(mine, other):
+            mine.set()
+            return other.wait(5) or other.is_set()
+
+        # when
+        results = parallel.call_all([lambda: wait_for(first, second), lambda: wait_for(second, first)], 2)
+
+        # then
+        self.assertEqual(results, [True, True])
+
+    def test_callAll_oneWorker(self):
+
+        # given
+        calls = []
+
+        # when
+        parallel.call_all([lambda: calls.append(threading.current_thread()) for _ in range(3)], 1)
+
+        # then
+        self.assertEqual(calls, [threading.current_thread()] * 3)
+
+    def test_callAll_raisesFirstError(self):
+
+        # given
+        finished = []
+
+        def fail(error):
+            raise error
+
+        # when
+        with self.assertRaises(SystemExit):
+            parallel.call_all([lambda: finished.append(1), lambda: fail(SystemExit(1)), lambda: fail(ValueError())], 3)
+
+        # then
+        self.assertEqual(finished, [1])
+
+
+class TestParallelImap(unittest.TestCase):
+
+    def test_imap(self):
+        self.assertEqual(list(parallel.imap([lambda: 1, lambda: 2, lambda: 3], 2)), [1, 2, 3])
+
+    def test_imap_oneWorker(self):
+        self.assertEqual(list(parallel.imap([lambda: 1, lambda: 2], 1)), [1, 2])
+
+    def test_imap_yieldsBeforeLaterFunctionsFinish(self):
+
+        # given
+        release = threading.Event()
+        results = parallel.imap([lambda: 1, lambda: release.wait(5) or release.is_set()], 2)
+
+        # when
+        first = next(results)
+
+        # then
+        self.assertEqual(first, 1)
+        release.set()
+        self.assertEqual(next(results), True)
+
+    def test_imap_raisesWhenReached(self):
+
+        # given
+        def fail():
+            raise ValueError('failed')
+
+        results = parallel.imap([lambda: 1, fail, lambda: 3], 2)
+
+        # then
+        self.assertEqual(next(results), 1)
+        with self.assertRaises(ValueError):
+            next(results)
+
+    def test_imap_closeStopsScheduling(self):
+
+        # given: both workers are busy with the second and third functions when the generator is closed
+        release = threading.Event()
+        started = []
+        done = []
+        called = []
+
+        def block():
+            started.append(True)
+            release.wait(5)
+            done.append(True)
+
+        results = parallel.imap([lambda: 1, block, block, lambda: called.append(4)], 2)
+        self.assertEqual(next(results), 1)
+        while len(started) < 2:
+            time.sleep(0.01)
+
+        # when
+        results.close()
+        release.set()
+
+        # then
+        while len(done) < 2:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        self.assertEqual(called, [])
+
+    def test_imap_deadline(self):
+
+        # given
+        release = threading.Event()
+        results = parallel.imap([lambda: 1, lambda: release.wait(5) or 2, lambda: 3], 1, deadline=time.time() + 0.05)
+
+        # when
+        yielded = list(results)
+        release.set()
+
+        # then: the rest are late since one worker is still busy with the second
+        self.assertEqual(yielded, [1, parallel.LATE, parallel.LATE])
+
+    def test_imap_deadlineAppliesToOneFunction(self):
+
+        # given
+        release = threading.Event()
+
+        # when
+        yielded = list(parallel.imap([lambda: release.wait(5)], 1, deadline=time.time()))
+        release.set()
+
+        # then
+        self.assertEqual(yielded, [parallel.LATE])
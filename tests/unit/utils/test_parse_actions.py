@@ -1,3 +1,5 @@
+import argparse
+import mock
 import unittest
 from argparse import Namespace
 
@@ -103,6 +105,17 @@ class TestAppendList(unittest.TestCase):
         # then
         self.assertEqual([value, value2], getattr(namespace, destination))
 
+    def test_appendList_lazyConst(self):
+
+        # given
+        parser = argparse.ArgumentParser()
+        parser.add_argument('--all', action='store_const', const=parse_actions.LazyDefault(lambda: ['a', 'b']), default=[], dest='d')
+        parser.add_argument('--show', nargs='+', action=parse_actions.append_list(), default=[], dest='d')
+
+        # expect
+        self.assertEqual(parse_actions.resolve_defaults(parser.parse_args(['--all', '--show', 'c'])).d, ['a', 'b', 'c'])
+        self.assertEqual(parse_actions.resolve_defaults(parser.parse_args(['--show', 'c', '--all'])).d, ['a', 'b'])
+
 
 class TestOptionalList(unittest.TestCase):
 
@@ -180,3 +193,48 @@ class TestDictSet(unittest.TestCase):
 
         # then
         self.assertEqual(getattr(namespace, destination), {})
+
+
+class TestLazyDefault(unittest.TestCase):
+
+    def test_resolveDefaults(self):
+
+        # given
+        compute = mock.Mock(return_value='computed')
+        unused = mock.Mock()
+        parser = argparse.ArgumentParser()
+        parser.add_argument('--format', default=parse_actions.LazyDefault(compute))
+        parser.add_argument('--all', action='store_const', const=parse_actions.LazyDefault(unused), default=[])
+        parser.add_argument('--color', default=parse_actions.LazyDefault(unused))
+
+        # when
+        namespace = parse_actions.resolve_defaults(parser.parse_args(['--color', 'never']))
+
+        # then
+        self.assertEqual(namespace.format, 'computed')
+        self.assertEqual(namespace.all, [])
+        self.assertEqual(namespace.color, 'never')
+        compute.assert_called_once_with()
+        unused.assert_not_called()
+
+    def test_resolveDefaults_const(self):
+
+        # given
+        parser = argparse.ArgumentParser()
+        parser.add_argument('--all', action='store_const', const=parse_actions.LazyDefault(lambda: ['a', 'b']), default=[])
+
+        # expect
+        self.assertEqual(parse_actions.resolve_defaults(parser.parse_args(['--all'])).all, ['a', 'b'])
+
+    def test_lazyDefault_notComputedWhenBuildingParser(self):
+
+        # given
+        compute = mock.Mock()
+        parser = argparse.ArgumentParser(prog='prog')
+        parser.add_argument('--format', default=parse_actions.LazyDefault(compute))
+
+        # when
+        parser.format_help()
+
+        # then
+        compute.assert_not_called()
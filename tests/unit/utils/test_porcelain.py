@@ -0,0 +1,189 @@
+import mock
+import subprocess
+import threading
+import unittest
+
+from bin.commands.utils import porcelain
+
+_OUTPUT = '\0'.join([
+    '# branch.oid ' + '1' * 40,
+    '# branch.head master',
+    '# branch.upstream origin/master',
+    '# branch.ab +1 -2',
+    '1 M. N... 100644 100644 100644 {0} {0} staged.txt'.format('2' * 40),
+    '1 .M N... 100644 100644 100644 {0} {0} with space.txt'.format('2' * 40),
+    '2 R. N... 100644 100644 100644 {0} {0} R100 new.txt'.format('2' * 40),
+    'old.txt',
+    'u UU N... 100644 100644 100644 100644 {0} {0} {0} conflict.txt'.format('2' * 40),
+    '? untracked.txt',
+    ''
+])
+
+
+class TestPorcelainParse(unittest.TestCase):
+
+    def test_parse(self):
+
+        # when
+        status = porcelain.parse([_OUTPUT])
+
+        # then
+        self.assertEqual(status.branch, porcelain.Branch('1' * 40, 'master', 'origin/master', False, 1, 2))
+        self.assertEqual(status.entries, [
+            porcelain.Entry('ordinary', 'M', ' ', 'N...', 'staged.txt', None),
+            porcelain.Entry('ordinary', ' ', 'M', 'N...', 'with space.txt', None),
+            porcelain.Entry('renamed', 'R', ' ', 'N...', 'new.txt', 'old.txt'),
+            porcelain.Entry('unmerged', 'U', 'U', 'N...', 'conflict.txt', None),
+            porcelain.Entry('untracked', '?', '?', 'N...', 'untracked.txt', None)
+        ])
+
+    def test_parse_splitAcrossChunks(self):
+
+        # given
+        chunks = [_OUTPUT[i:i + 7] for i in range(0, len(_OUTPUT), 7)]
+
+        # expect
+        self.assertEqual(porcelain.parse(chunks), porcelain.parse([_OUTPUT]))
+
+    def test_parse_branchHeaders(self):
+
+        # expect
+        self.assertEqual(
+            porcelain.parse(['# branch.oid (initial)\0# branch.head (detached)\0']).branch,
+            porcelain.Branch(None, None, None, False, None, None)
+        )
+        self.assertEqual(
+            porcelain.parse(['# branch.head master\0# branch.upstream origin/gone\0']).branch,
+            porcelain.Branch(None, 'master', 'origin/gone', True, None, None)
+        )
+        self.assertEqual(
+            porcelain.parse(['# branch.upstream origin/master\0# branch.ab +? -?\0# branch.future x\0']).branch,
+            porcelain.Branch(None, None, 'origin/master', False, None, None)
+        )
+
+    def test_parse_empty(self):
+        self.assertEqual(porcelain.parse(['']), porcelain.Status(porcelain.Branch(None, None, None, False, None, None), []))
+
+    def test_parse_summaryThreshold(self):
+
+        # when
+        kept = porcelain.parse(['# branch.head master\0? a\0? b\0'], summary_threshold=2)
+        summarized = porcelain.parse(['# branch.head master\0? a\0? b\0? dir/c\0'], summary_threshold=2)
+
+        # then
+        self.assertEqual([entry.path for entry in kept.entries], ['a', 'b'])
+        self.assertIsNone(kept.summary)
+        self.assertEqual(summarized.branch.head, 'master')
+        self.assertEqual(summarized.entries, [])
+        self.assertEqual(summarized.summary.total, 3)
+        self.assertEqual(summarized.summary.most_common(), [(('??', './'), 2), (('??', 'dir/'), 1)])
+
+    def test_summary(self):
+
+        # given
+        summary = porcelain.Summary()
+        for path in ('src/a', 'src/deep/b', 'gen/c', 'gen/d', 'root.txt'):
+            summary.add(porcelain.Entry('ordinary', ' ', 'M', 'N...', path, None))
+        summary.add(porcelain.Entry('renamed', 'R', ' ', 'N...', 'src/new', 'old'))
+
+        # then
+        self.assertEqual(summary.total, 6)
+        self.assertEqual(summary.most_common(2), [((' M', 'gen/'), 2), ((' M', 'src/'), 2)])
+        self.assertEqual(summary.most_common()[2:], [((' M', './'), 1), (('R ', 'src/'), 1)])
+
+    def test_parse_untrackedLimit(self):
+
+        # expect
+        self.assertEqual(len(porcelain.parse(['? a\0? b\0'], untracked_limit=2).entries), 2)
+        with self.assertRaises(porcelain.ScanLimitExceeded):
+            porcelain.parse(['? a\0? b\0? c\0'], untracked_limit=2)
+
+
+class TestPorcelainStatus(unittest.TestCase):
+
+    @mock.patch('subprocess.Popen')
+    def test_status(self, mock_popen):
+
+        # setup
+        mock_popen.return_value.stdout.read.side_effect = ['# branch.head master\0? a', '\0', '']
+        mock_popen.return_value.wait.return_value = 0
+
+        # when
+        status = porcelain.status('normal', ahead_behind=False)
+
+        # then
+        self.assertEqual(status.branch.head, 'master')
+        self.assertEqual([entry.path for entry in status.entries], ['a'])
+        mock_popen.assert_called_once_with(
+            ['git', 'status', '--porcelain=v2', '--branch', '-z', '--untracked-files=normal', '--no-ahead-behind'],
+            stdout=subprocess.PIPE
+        )
+
+    @mock.patch('subprocess.Popen')
+    def test_status_failed(self, mock_popen):
+
+        # setup
+        mock_popen.return_value.stdout.read.return_value = ''
+        mock_popen.return_value.wait.return_value = 128
+        mock_popen.return_value.returncode = 128
+
+        # expect
+        with self.assertRaises(subprocess.CalledProcessError):
+            porcelain.status()
+
+    @mock.patch('subprocess.Popen')
+    def test_status_auto(self, mock_popen):
+
+        # setup
+        mock_popen.return_value.stdout.read.side_effect = ['? a\0? b\0', '']
+        mock_popen.return_value.wait.return_value = 0
+
+        # when
+        status = porcelain.status('auto', untracked_limit=2)
+
+        # then
+        self.assertEqual([entry.path for entry in status.entries], ['a', 'b'])
+        self.assertFalse(status.collapsed)
+        mock_popen.assert_called_once_with(
+            ['git', 'status', '--porcelain=v2', '--branch', '-z', '--untracked-files=all'], stdout=subprocess.PIPE
+        )
+
+    @mock.patch('subprocess.Popen')
+    def test_status_auto_tooManyUntrackedFiles(self, mock_popen):
+
+        # setup
+        mock_popen.return_value.stdout.read.side_effect = ['? dir/a\0? dir/b\0? dir/c\0', '? dir/\0', '']
+        mock_popen.return_value.wait.return_value = 0
+
+        # when
+        status = porcelain.status('auto', untracked_limit=2)
+
+        # then
+        self.assertEqual([entry.path for entry in status.entries], ['dir/'])
+        self.assertTrue(status.collapsed)
+        mock_popen.return_value.kill.assert_called_once_with()
+        mock_popen.assert_has_calls([
+            mock.call(['git', 'status', '--porcelain=v2', '--branch', '-z', '--untracked-files=all'], stdout=subprocess.PIPE),
+            mock.call(['git', 'status', '--porcelain=v2', '--branch', '-z', '--untracked-files=normal'], stdout=subprocess.PIPE)
+        ], any_order=True)
+
+    def test_status_auto_timedOut(self):
+
+        # setup: a scan that only finishes once it's killed
+        slow = mock.Mock()
+        finished = threading.Event()
+        slow.stdout.read.side_effect = lambda size: finished.wait(5) and ''
+        slow.kill.side_effect = finished.set
+        slow.wait.return_value = -9
+        collapsed = mock.Mock()
+        collapsed.stdout.read.side_effect = ['? dir/\0', '']
+        collapsed.wait.return_value = 0
+
+        # when
+        with mock.patch('subprocess.Popen', side_effect=[slow, collapsed]):
+            status = porcelain.status('auto', timeout=0.01)
+
+        # then
+        self.assertEqual([entry.path for entry in status.entries], ['dir/'])
+        self.assertTrue(status.collapsed)
+        slow.kill.assert_called_once_with()
@@ -0,0 +1,303 @@
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+
+from bin.commands.utils import refs
+
+_SHA1 = '1' * 40
+_SHA2 = '2' * 40
+_SHA3 = '3' * 40
+
+
+class _RefsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dirpath = os.path.realpath(tempfile.mkdtemp())
+        self.repo = os.path.join(self.dirpath, 'repo')
+        self.git_dir = os.path.join(self.repo, '.git')
+        os.makedirs(os.path.join(self.git_dir, 'objects'))
+        os.makedirs(os.path.join(self.git_dir, 'refs', 'heads'))
+        self._write('HEAD', 'ref: refs/heads/master\n')
+
+        self.environ_patcher = mock.patch.dict('os.environ')
+        self.environ_patcher.start()
+        os.environ.pop('GIT_DIR', None)
+        os.chdir(self.repo)
+
+    def tearDown(self):
+        self.environ_patcher.stop()
+        shutil.rmtree(self.dirpath)
+
+    def _write(self, path, contents, git_dir=None):
+        path = os.path.join(git_dir or self.git_dir, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as ref_file:
+            ref_file.write(contents)
+
+    def _pack(self, *entries, **kwargs):
+        header = kwargs.get('header', '# pack-refs with: peeled fully-peeled sorted \n')
+        self._write('packed-refs', header + ''.join(entry + '\n' for entry in entries))
+
+
+class TestPackedRefs(_RefsTestCase):
+
+    def test_get(self):
+
+        # given
+        names = sorted('refs/heads/b{}'.format(i) for i in range(100))
+        entries = []
+        for name in names:
+            entries.append('{} {}'.format(_SHA1, name))
+            entries.append('^' + _SHA2)
+        self._pack(*entries)
+
+        # when
+        packed = refs._PackedRefs(os.path.join(self.git_dir, 'packed-refs'))
+
+        # then
+        self.assertTrue(packed.sorted)
+        for name in names:
+            self.assertEqual(packed.get(name), _SHA1)
+        self.assertIsNone(packed.get('refs/heads/a'))
+        self.assertIsNone(packed.get('refs/heads/b10a'))
+        self.assertIsNone(packed.get('refs/tags/z'))
+
+    def test_get_unsorted(self):
+
+        # given
+        self._pack('{} refs/tags/b'.format(_SHA1), '{} refs/heads/a'.format(_SHA2), header='# pack-refs with: peeled \n')
+
+        # when
+        packed = refs._PackedRefs(os.path.join(self.git_dir, 'packed-refs'))
+
+        # then
+        self.assertFalse(packed.sorted)
+        self.assertEqual(packed.get('refs/heads/a'), _SHA2)
+        self.assertEqual(packed.get('refs/tags/b'), _SHA1)
+        self.assertIsNone(packed.get('refs/heads/b'))
+
+    def test_get_emptyFile(self):
+
+        # given
+        self._write('packed-refs', '')
+
+        # when
+        packed = refs._PackedRefs(os.path.join(self.git_dir, 'packed-refs'))
+
+        # then
+        self.assertIsNone(packed.get('refs/heads/master'))
+        self.assertFalse(packed.has_prefix('refs/heads/'))
+        self.assertEqual(list(packed.matching('master')), [])
+
+    def test_truncated(self):
+
+        # given
+        self._write('packed-refs', '{} refs/heads/master'.format(_SHA1))
+
+        # expect
+        with self.assertRaises(refs.RefsUnavailable):
+            refs._PackedRefs(os.path.join(self.git_dir, 'packed-refs'))
+
+    def test_matching(self):
+
+        # given
+        self._pack(
+            '{} refs/heads/feature/x'.format(_SHA1),
+            '{} refs/heads/x'.format(_SHA1),
+            '{} refs/heads/xx'.format(_SHA1),
+            '{} refs/tags/x'.format(_SHA2),
+            '^' + _SHA3
+        )
+
+        # when
+        packed = refs._PackedRefs(os.path.join(self.git_dir, 'packed-refs'))
+
+        # then
+        self.assertEqual(
+            sorted(packed.matching('x')),
+            [('refs/heads/feature/x', _SHA1), ('refs/heads/x', _SHA1), ('refs/tags/x', _SHA2)]
+        )
+
+    def test_packedRefs_reloadsChangedFile(self):
+
+        # given
+        path = os.path.join(self.git_dir, 'packed-refs')
+        self._pack('{} refs/heads/master'.format(_SHA1))
+        first = refs._packed_refs(path)
+
+        # when
+        self._pack('{} refs/heads/master'.format(_SHA2), '{} refs/heads/other'.format(_SHA2))
+        second = refs._packed_refs(path)
+
+        # then
+        self.assertIs(refs._packed_refs(path), second)
+        self.assertIsNot(first, second)
+        self.assertEqual(second.get('refs/heads/master'), _SHA2)
+
+
+class TestRefStore(_RefsTestCase):
+
+    def test_read(self):
+
+        # given
+        self._write('refs/heads/master', _SHA1 + '\n')
+        self._pack('{} refs/heads/master'.format(_SHA2), '{} refs/tags/v1'.format(_SHA3))
+
+        # when
+        store = refs.store()
+
+        # then
+        self.assertEqual(store.read('HEAD'), ('refs/heads/master', None))
+        self.assertEqual(store.read('refs/heads/master'), (None, _SHA1))
+        self.assertEqual(store.read('refs/tags/v1'), (None, _SHA3))
+        self.assertEqual(store.read('refs/heads/missing'), (None, None))
+        self.assertEqual(store.read('refs/heads/../../HEAD'), (None, None))
+
+    def test_read_invalidRef(self):
+
+        # given
+        self._write('refs/heads/master', 'garbage\n')
+
+        # expect
+        with self.assertRaises(refs.RefsUnavailable):
+            refs.store().read('refs/heads/master')
+
+    def test_resolve(self):
+
+        # given
+        self._pack('{} refs/heads/master'.format(_SHA1))
+
+        # when
+        store = refs.store()
+
+        # then
+        self.assertEqual(store.resolve('HEAD'), _SHA1)
+        self.assertEqual(store.symbolic_target('HEAD'), 'refs/heads/master')
+        self.assertIsNone(store.symbolic_target('refs/heads/master'))
+
+    def test_resolve_unborn(self):
+
+        # expect
+        self.assertIsNone(refs.store().resolve('HEAD'))
+
+    def test_hasBranches(self):
+
+        # given
+        store = refs.store()
+        self.assertFalse(store.has_branches())
+
+        # when
+        self._write('refs/heads/feature/one', _SHA1 + '\n')
+
+        # then
+        self.assertTrue(store.has_branches())
+
+    def test_hasBranches_packed(self):
+
+        # given
+        self._pack('{} refs/heads/master'.format(_SHA1))
+
+        # expect
+        self.assertTrue(refs.store().has_branches())
+
+    def test_matching(self):
+
+        # given
+        self._pack('{} refs/heads/x'.format(_SHA1), '{} refs/tags/x'.format(_SHA1))
+        self._write('refs/heads/x', _SHA2 + '\n')
+        self._write('refs/remotes/origin/x', _SHA3 + '\n')
+        self._write('refs/remotes/origin/HEAD', 'ref: refs/remotes/origin/x\n')
+        self._write('refs/heads/dangling', 'ref: refs/heads/missing\n')
+
+        # when
+        store = refs.store()
+
+        # then
+        self.assertEqual(
+            store.matching('x'),
+            [('refs/heads/x', _SHA2), ('refs/remotes/origin/x', _SHA3), ('refs/tags/x', _SHA1)]
+        )
+        self.assertEqual(store.matching('x', ('refs/tags/',)), [('refs/tags/x', _SHA1)])
+        self.assertEqual(store.matching('origin/HEAD'), [('refs/remotes/origin/HEAD', _SHA3)])
+        self.assertEqual(store.matching('dangling'), [])
+        self.assertEqual(store.matching('y'), [])
+
+    def test_expand(self):
+
+        # given
+        self._write('refs/heads/master', _SHA1 + '\n')
+        self._write('refs/heads/x', _SHA1 + '\n')
+        self._write('refs/tags/x', _SHA2 + '\n')
+        self._write('refs/remotes/origin/master', _SHA3 + '\n')
+        self._write('refs/remotes/origin/HEAD', 'ref: refs/remotes/origin/master\n')
+
+        # when
+        store = refs.store()
+
+        # then
+        self.assertEqual(store.expand('master'), ['refs/heads/master'])
+        self.assertEqual(store.expand('HEAD'), ['refs/heads/master'])
+        self.assertEqual(store.expand('x'), ['refs/tags/x', 'refs/heads/x'])
+        self.assertEqual(store.expand('origin'), ['refs/remotes/origin/master'])
+        self.assertEqual(store.expand('refs/heads/master'), ['refs/heads/master'])
+        self.assertEqual(store.expand('missing'), [])
+
+    def test_shorten(self):
+
+        # given
+        self._write('refs/heads/master', _SHA1 + '\n')
+        self._write('refs/heads/x', _SHA1 + '\n')
+        self._write('refs/tags/x', _SHA1 + '\n')
+
+        # when
+        store = refs.store()
+
+        # then
+        self.assertEqual(store.shorten('refs/heads/master'), 'master')
+        self.assertEqual(store.shorten('refs/heads/x'), 'heads/x')
+        self.assertEqual(store.shorten('refs/remotes/origin/HEAD'), 'origin')
+
+    def test_linkedWorktree(self):
+
+        # given
+        worktree = os.path.join(self.dirpath, 'worktree')
+        worktree_git_dir = os.path.join(self.git_dir, 'worktrees', 'worktree')
+        os.makedirs(worktree)
+        with open(os.path.join(worktree, '.git'), 'w') as gitfile:
+            gitfile.write('gitdir: {}\n'.format(worktree_git_dir))
+        self._write('HEAD', 'ref: refs/heads/other\n', git_dir=worktree_git_dir)
+        self._write('commondir', '../..\n', git_dir=worktree_git_dir)
+        self._write('refs/bisect/bad', _SHA2 + '\n', git_dir=worktree_git_dir)
+        self._write('refs/bisect/bad', _SHA3 + '\n')
+        self._pack('{} refs/heads/other'.format(_SHA1))
+        os.chdir(worktree)
+
+        # when
+        store = refs.store()
+
+        # then
+        self.assertEqual(store.common_dir, self.git_dir)
+        self.assertEqual(store.symbolic_target('HEAD'), 'refs/heads/other')
+        self.assertEqual(store.resolve('HEAD'), _SHA1)
+        self.assertEqual(store.matching('bad'), [('refs/bisect/bad', _SHA2)])
+
+    def test_reftable(self):
+
+        # given
+        os.makedirs(os.path.join(self.git_dir, 'reftable'))
+
+        # expect
+        with self.assertRaises(refs.RefsUnavailable):
+            refs.store()
+
+    def test_store_notARepository(self):
+
+        # given
+        os.chdir(self.dirpath)
+
+        # expect
+        with self.assertRaises(refs.RefsUnavailable):
+            refs.store()
@@ -0,0 +1,263 @@
+import mock
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from bin.commands.utils import porcelain, resultcache
+
+_SHA1 = '1' * 40
+_SHA2 = '2' * 40
+
+
+class TestResultCacheParseBasis(unittest.TestCase):
+
+    def test_parseBasis(self):
+        self.assertEqual(resultcache.parse_basis('head'), resultcache.Basis(('head',), None))
+        self.assertEqual(resultcache.parse_basis('Refs, head index'), resultcache.Basis(('head', 'index', 'refs'), None))
+        self.assertEqual(resultcache.parse_basis('worktree ttl=2.5'), resultcache.Basis(('worktree',), 2.5))
+        self.assertEqual(resultcache.parse_basis('ttl=60'), resultcache.Basis((), 60))
+
+    def test_parseBasis_invalid(self):
+        for value in ('', 'tree', 'ttl=', 'ttl=0', 'ttl=soon', 'head ttl=-1'):
+            with self.assertRaises(ValueError):
+                resultcache.parse_basis(value)
+
+
+class TestResultCacheFingerprint(unittest.TestCase):
+
+    def setUp(self):
+        self.dirpath = os.path.realpath(tempfile.mkdtemp())
+        self.git_dir = os.path.join(self.dirpath, '.git')
+        os.makedirs(os.path.join(self.git_dir, 'objects'))
+        os.makedirs(os.path.join(self.git_dir, 'refs', 'heads'))
+        self._write('HEAD', 'ref: refs/heads/master\n')
+        self._write('refs/heads/master', _SHA1 + '\n')
+        self._write('index', 'index')
+
+        self.environ_patcher = mock.patch.dict('os.environ')
+        self.environ_patcher.start()
+        os.environ.pop('GIT_DIR', None)
+        os.chdir(self.dirpath)
+
+        self.context = mock.Mock()
+        self.context.status.return_value = porcelain.Status(None, [])
+
+    def tearDown(self):
+        self.environ_patcher.stop()
+        shutil.rmtree(self.dirpath)
+
+    def _write(self, path, contents):
+        path = os.path.join(self.git_dir, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as written:
+            written.write(contents)
+        # move the modification time so changes are seen even on filesystems with coarse timestamps
+        modified = time.time() + len(os.listdir(os.path.dirname(path)))
+        os.utime(path, (modified, modified))
+
+    def _fingerprint(self, *bases):
+        return resultcache.fingerprint(bases, self.context)
+
+    def test_fingerprint_head(self):
+
+        # given
+        before = self._fingerprint('head')
+
+        # when
+        self._write('index', 'changed')
+        unchanged = self._fingerprint('head')
+        self._write('refs/heads/master', _SHA2 + '\n')
+
+        # then
+        self.assertEqual(before, unchanged)
+        self.assertNotEqual(before, self._fingerprint('head'))
+
+    def test_fingerprint_index(self):
+
+        # given
+        before = self._fingerprint('index')
+
+        # when
+        self._write('refs/heads/master', _SHA2 + '\n')
+        unchanged = self._fingerprint('index')
+        os.remove(os.path.join(self.git_dir, 'index'))
+
+        # then
+        self.assertEqual(before, unchanged)
+        self.assertNotEqual(before, self._fingerprint('index'))
+
+    def test_fingerprint_refs(self):
+
+        # given
+        before = self._fingerprint('refs')
+
+        # when
+        self._write('refs/tags/v1', _SHA1 + '\n')
+
+        # then
+        self.assertNotEqual(before, self._fingerprint('refs'))
+
+    def test_fingerprint_worktree(self):
+
+        # given
+        self.context.status.return_value = porcelain.Status(None, [porcelain.Entry('untracked', '?', '?', 'N...', 'new.txt', None)])
+        before = self._fingerprint('worktree')
+
+        # when
+        with open('new.txt', 'w') as new_file:
+            new_file.write('new')
+
+        # then
+        self.assertNotEqual(before, self._fingerprint('worktree'))
+        self.context.status.assert_called_with('all', summary_threshold=1000)
+
+    def test_fingerprint_worktree_sharedScan(self):
+
+        # given
+        scan = mock.Mock(return_value=porcelain.Status(None, [porcelain.Entry('untracked', '?', '?', 'N...', 'new.txt', None)]))
+
+        # when
+        shared = resultcache.fingerprint(('worktree',), self.context, scan)
+
+        # then
+        self.assertIsNotNone(shared)
+        scan.assert_called_once_with()
+        self.context.status.assert_not_called()
+
+    def test_fingerprint_worktree_summarized(self):
+
+        # given
+        summary = porcelain.Summary()
+        summary.add(porcelain.Entry('untracked', '?', '?', 'N...', 'new.txt', None))
+        scan = mock.Mock(return_value=porcelain.Status(None, [], summary=summary))
+        before = resultcache.fingerprint(('worktree',), self.context, scan)
+
+        # when
+        summary.add(porcelain.Entry('untracked', '?', '?', 'N...', 'other.txt', None))
+
+        # then
+        self.assertNotEqual(before, resultcache.fingerprint(('worktree',), self.context, scan))
+
+    def test_fingerprint_ttlOnly(self):
+
+        # expect
+        self.assertIsNotNone(self._fingerprint())
+        self.context.status.assert_not_called()
+
+    def test_fingerprint_refsUnavailable(self):
+
+        # given
+        os.makedirs(os.path.join(self.git_dir, 'reftable'))
+
+        # expect
+        self.assertIsNone(self._fingerprint('head'))
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.cache = resultcache.ResultCache(os.path.join(self.dirpath, 'cache'), max_size=100)
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def _age(self, key, seconds):
+        path = os.path.join(self.cache.directory, key)
+        used = time.time() - seconds
+        os.utime(path, (used, used))
+
+    def test_getAndPut(self):
+
+        # when
+        self.cache.put('key', 'the\noutput\0')
+
+        # then
+        self.assertEqual(self.cache.get('key'), 'the\noutput\0')
+        self.assertIsNone(self.cache.get('other'))
+
+    def test_get_expired(self):
+
+        # given
+        self.cache.put('key', 'output')
+
+        # expect
+        self.assertEqual(self.cache.get('key', ttl=60), 'output')
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self.assertIsNone(self.cache.get('key', ttl=60))
+
+    def test_getWithAge(self):
+
+        # given
+        self.cache.put('key', 'output')
+
+        # when
+        with mock.patch('time.time', return_value=time.time() + 61):
+            cached = self.cache.get_with_age('key')
+
+        # then: however old
+        self.assertEqual(cached[0], 'output')
+        self.assertAlmostEqual(cached[1], 61, delta=1)
+        self.assertIsNone(self.cache.get_with_age('other'))
+
+    def test_put_unwritable(self):
+
+        # given
+        open(self.cache.directory, 'w').close()
+
+        # when
+        self.cache.put('key', 'output')
+        self.cache.evict()
+
+        # then
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_evict_leastRecentlyUsed(self):
+
+        # given
+        for key in ('a', 'b', 'c'):
+            self.cache.put(key, 'x' * 30)
+        self._age('a', 30)
+        self._age('b', 20)
+        self._age('c', 10)
+        self.cache.get('a')
+
+        # when
+        self.cache.evict()
+
+        # then
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+    def test_evict_nothingStored(self):
+
+        # given
+        self.cache.put('key', 'x' * 200)
+        cache = resultcache.ResultCache(self.cache.directory, max_size=0)
+
+        # when
+        cache.evict()
+
+        # then
+        self.assertIsNotNone(cache.get('key'))
+
+
+class TestResultCacheOpen(unittest.TestCase):
+
+    @mock.patch('bin.commands.utils.directories.git_directory', return_value='/repo/.git')
+    def test_open(self, mock_gitdirectory):
+
+        # when
+        cache = resultcache.open_(10)
+
+        # then
+        self.assertEqual(cache.directory, '/repo/.git/git-state/cache')
+        self.assertEqual(cache.max_size, 10)
+
+    @mock.patch('bin.commands.utils.directories.git_directory', return_value=None)
+    def test_open_notARepository(self, mock_gitdirectory):
+        self.assertIsNone(resultcache.open_())
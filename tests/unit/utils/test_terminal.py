@@ -0,0 +1,101 @@
+import mock
+import struct
+import subprocess
+import unittest
+
+from bin.commands.utils import terminal
+
+
+class TestTerminalSize(unittest.TestCase):
+
+    @mock.patch('fcntl.ioctl', return_value=struct.pack('hh', 24, 80))
+    def test_size(self, mock_ioctl):
+
+        # given
+        stream = mock.Mock()
+        stream.fileno.return_value = 1
+
+        # expect
+        self.assertEqual(terminal.size(stream), (80, 24))
+        self.assertEqual(terminal.lines(stream), 24)
+
+    @mock.patch('fcntl.ioctl', side_effect=IOError(25, 'Inappropriate ioctl for device'))
+    @mock.patch.dict('os.environ', {'COLUMNS': '100', 'LINES': '40'})
+    def test_size_fromEnvironment(self, mock_ioctl):
+        self.assertEqual(terminal.size(mock.Mock()), (100, 40))
+
+    @mock.patch('fcntl.ioctl', side_effect=IOError(25, 'Inappropriate ioctl for device'))
+    @mock.patch.dict('os.environ', {}, clear=True)
+    def test_size_unknown(self, mock_ioctl):
+        self.assertIsNone(terminal.size(mock.Mock()))
+        self.assertIsNone(terminal.lines(mock.Mock()))
+
+    def test_isTerminal(self):
+
+        # given
+        stream = mock.Mock()
+        stream.isatty.return_value = True
+
+        # expect
+        self.assertTrue(terminal.is_terminal(stream))
+        self.assertFalse(terminal.is_terminal(object()))
+
+    def test_clear(self):
+
+        # given
+        stream = mock.Mock()
+
+        # when
+        terminal.clear(stream)
+
+        # then
+        stream.write.assert_called_once_with('\033[H\033[2J')
+        stream.flush.assert_called_once_with()
+
+
+class TestTerminalPager(unittest.TestCase):
+
+    @mock.patch.dict('os.environ', {'GIT_PAGER': 'more', 'PAGER': 'most'}, clear=True)
+    @mock.patch('bin.commands.utils.git.get_config_value', return_value='less -S')
+    def test_pagerCommand_gitPager(self, mock_getconfigvalue):
+        self.assertEqual(terminal.pager_command(), 'more')
+        mock_getconfigvalue.assert_not_called()
+
+    @mock.patch.dict('os.environ', {'PAGER': 'most'}, clear=True)
+    @mock.patch('bin.commands.utils.git.get_config_value', return_value='less -S')
+    def test_pagerCommand_corePager(self, mock_getconfigvalue):
+        self.assertEqual(terminal.pager_command(), 'less -S')
+        mock_getconfigvalue.assert_called_once_with('core.pager')
+
+    @mock.patch.dict('os.environ', {'PAGER': 'most'}, clear=True)
+    @mock.patch('bin.commands.utils.git.get_config_value', return_value=None)
+    def test_pagerCommand_pager(self, mock_getconfigvalue):
+        self.assertEqual(terminal.pager_command(), 'most')
+
+    @mock.patch.dict('os.environ', {}, clear=True)
+    @mock.patch('bin.commands.utils.git.get_config_value', return_value=None)
+    def test_pagerCommand_default(self, mock_getconfigvalue):
+        self.assertEqual(terminal.pager_command(), 'less')
+
+    @mock.patch('bin.commands.utils.git.get_config_value')
+    def test_pagerCommand_disabled(self, mock_getconfigvalue):
+        for pager in ('cat', '', '  '):
+            with mock.patch.dict('os.environ', {'GIT_PAGER': pager}):
+                self.assertIsNone(terminal.pager_command())
+
+    @mock.patch.dict('os.environ', {'LESS': 'R'}, clear=True)
+    @mock.patch('subprocess.Popen')
+    def test_pager(self, mock_popen):
+
+        # when
+        pager = terminal.pager('less')
+
+        # then
+        self.assertIs(pager, mock_popen.return_value)
+        mock_popen.assert_called_once_with('less', shell=True, stdin=subprocess.PIPE, env={'LESS': 'R', 'LV': '-c'})
+
+    @mock.patch('bin.commands.utils.terminal.pager_command', return_value=None)
+    @mock.patch('subprocess.Popen')
+    def test_pager_disabled(self, mock_popen, mock_pagercommand):
+        self.assertIsNone(terminal.pager())
+        mock_popen.assert_not_called()
@@ -0,0 +1,189 @@
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+
+from bin.commands.utils import watch
+
+
+class _WatchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dirpath = os.path.realpath(tempfile.mkdtemp())
+        self.git_dir = os.path.join(self.dirpath, '.git')
+        os.makedirs(os.path.join(self.git_dir, 'objects'))
+        os.makedirs(os.path.join(self.git_dir, 'refs', 'heads'))
+        os.makedirs(os.path.join(self.dirpath, 'src'))
+        self._write('.git/HEAD', 'ref: refs/heads/master\n')
+
+        self.environ_patcher = mock.patch.dict('os.environ')
+        self.environ_patcher.start()
+        os.environ.pop('GIT_DIR', None)
+        self.layout = watch._Layout(self.dirpath)
+
+    def tearDown(self):
+        self.environ_patcher.stop()
+        shutil.rmtree(self.dirpath)
+
+    def _path(self, path):
+        return os.path.join(self.dirpath, path)
+
+    def _write(self, path, contents='contents\n'):
+        with open(self._path(path), 'w') as written:
+            written.write(contents)
+
+
+class TestWatchClassify(_WatchTestCase):
+
+    def test_classify(self):
+        self.assertEqual(self.layout.classify(self._path('.git/HEAD')), 'head')
+        self.assertEqual(self.layout.classify(self._path('.git/index')), 'index')
+        self.assertEqual(self.layout.classify(self._path('.git/config')), 'config')
+        self.assertEqual(self.layout.classify(self._path('.git/packed-refs')), 'refs')
+        self.assertEqual(self.layout.classify(self._path('.git/refs/heads/master')), 'refs')
+        self.assertEqual(self.layout.classify(self._path('src/file.txt')), 'worktree')
+        self.assertEqual(self.layout.classify(self._path('src')), 'worktree')
+
+    def test_classify_ignored(self):
+        self.assertIsNone(self.layout.classify(self._path('.git/index.lock')))
+        self.assertIsNone(self.layout.classify(self._path('.git/refs/heads/master.lock')))
+        self.assertIsNone(self.layout.classify(self._path('.git/objects/ab/cdef')))
+        self.assertIsNone(self.layout.classify(self._path('.git/git-state/cache/key')))
+        self.assertIsNone(self.layout.classify(self._path('sub/.git/HEAD')))
+        self.assertIsNone(self.layout.classify(os.path.dirname(self.dirpath)))
+
+    def test_classify_withoutWorktree(self):
+
+        # given
+        layout = watch._Layout(self.dirpath, worktree=False)
+
+        # expect
+        self.assertEqual(layout.classify(self._path('.git/HEAD')), 'head')
+        self.assertIsNone(layout.classify(self._path('src/file.txt')))
+
+    def test_walk_skipsGitDirectories(self):
+
+        # given
+        os.makedirs(self._path('sub/.git/objects'))
+
+        # expect
+        self.assertEqual(list(self.layout.walk(self.dirpath)), [self.dirpath, self._path('src'), self._path('sub')])
+
+
+class TestWatchInotify(_WatchTestCase):
+
+    def setUp(self):
+        super(TestWatchInotify, self).setUp()
+        try:
+            self.watcher = watch._InotifyWatcher(self.layout)
+        except watch.WatchUnavailable:  # pragma: no cover
+            self.skipTest('inotify is not available')
+
+    def tearDown(self):
+        self.watcher.close()
+        super(TestWatchInotify, self).tearDown()
+
+    def test_wait(self):
+
+        # when
+        self._write('src/file.txt')
+        self._write('.git/index.lock')
+        os.rename(self._path('.git/index.lock'), self._path('.git/index'))
+
+        # then
+        self.assertEqual(self.watcher.wait(1), set(['worktree', 'index']))
+
+    def test_wait_timeout(self):
+        self.assertEqual(self.watcher.wait(0.05), set())
+
+    def test_wait_ignoresOtherChanges(self):
+
+        # when
+        self._write('.git/objects/object')
+        self._write('.git/refs/heads/master.lock')
+
+        # then
+        self.assertEqual(self.watcher.wait(0.2), set())
+
+    def test_wait_watchesNewDirectories(self):
+
+        # given
+        os.makedirs(self._path('.git/refs/heads/feature'))
+        os.makedirs(self._path('new/nested'))
+        self.assertEqual(self.watcher.wait(1), set(['refs', 'worktree']))
+
+        # when
+        self._write('new/nested/file.txt')
+        self._write('.git/refs/heads/feature/one', '1' * 40 + '\n')
+
+        # then
+        self.assertEqual(self.watcher.wait(1), set(['refs', 'worktree']))
+
+    def test_wait_withoutWorktree(self):
+
+        # given
+        self.watcher.close()
+        self.watcher = watch._InotifyWatcher(watch._Layout(self.dirpath, worktree=False))
+
+        # when
+        self._write('src/file.txt')
+        self._write('.git/HEAD', 'ref: refs/heads/feature\n')
+
+        # then
+        self.assertEqual(self.watcher.wait(1), set(['head']))
+        self.assertNotIn(self._path('src'), self.watcher._directories.values())
+
+    def test_watch_outOfWatches(self):
+
+        # given
+        self.watcher.close()
+
+        # when
+        with mock.patch('bin.commands.utils.watch._InotifyWatcher._watch', side_effect=watch.WatchUnavailable('full')):
+            with watch.watch(self.dirpath) as watcher:
+
+                # then
+                self.assertIsInstance(watcher, watch._PollingWatcher)
+
+
+class TestWatchPolling(_WatchTestCase):
+
+    @mock.patch('bin.commands.utils.watch._POLL_INTERVAL', 0.01)
+    def test_wait(self):
+
+        # given
+        watcher = watch._PollingWatcher(self.layout)
+
+        # when
+        self._write('src/file.txt')
+        self._write('.git/config')
+
+        # then
+        self.assertEqual(watcher.wait(1), set(['worktree', 'config']))
+        self.assertEqual(watcher.wait(0.05), set())
+
+    @mock.patch('bin.commands.utils.watch._POLL_INTERVAL', 0.01)
+    def test_wait_withoutWorktree(self):
+
+        # given
+        watcher = watch._PollingWatcher(watch._Layout(self.dirpath, worktree=False))
+
+        # when
+        self._write('src/file.txt')
+
+        # then
+        self.assertEqual(watcher.wait(0.05), set())
+
+    @mock.patch('bin.commands.utils.watch._POLL_INTERVAL', 0.01)
+    def test_wait_modifiedRef(self):
+
+        # given
+        self._write('.git/refs/heads/master', '1' * 40 + '\n')
+        watcher = watch._PollingWatcher(self.layout)
+
+        # when
+        self._write('.git/refs/heads/master', '2' * 40 + '\n\n')
+
+        # then
+        self.assertEqual(watcher.wait(1), set(['refs']))